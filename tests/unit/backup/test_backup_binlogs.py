@@ -1,6 +1,12 @@
 import mock
+import pytest
 
+from twindb_backup.backup import _copy_binlogs as copy_binlogs
+from twindb_backup.backup import _expire_binlogs as expire_binlogs
 from twindb_backup.backup import backup_binlogs
+from twindb_backup.copy.binlog_copy import BinlogCopy
+from twindb_backup.destination.exceptions import DestinationError
+from twindb_backup.exceptions import OperationError
 from twindb_backup.source.mysql_source import MySQLClient
 from twindb_backup.status.binlog_status import BinlogStatus
 
@@ -9,6 +15,91 @@ from twindb_backup.status.binlog_status import BinlogStatus
 @mock.patch("twindb_backup.backup.osp")
 def test_backup_binlogs_returns_if_no_binlogs(mock_osp, mock_save):
     with mock.patch.object(MySQLClient, "variable", return_value=None):
-        backup_binlogs("foo", mock.Mock())
+        config = mock.Mock()
+        config.destination.return_value.status_cache = None
+        backup_binlogs("foo", config)
         assert mock_osp.dirname.call_count == 0
         assert mock_save.call_count == 0
+
+
+BINLOGS = ["mysql-bin.%06d" % i for i in range(1, 7)]
+
+
+def _copy_binlogs(status, dst, workers, failed=None):
+    config = mock.Mock()
+    config.mysql.binlog_upload_workers = workers
+
+    def backup_stream(_config, src, _dst):
+        if failed and src.get_name().endswith(failed):
+            raise DestinationError("upload failed")
+
+    with mock.patch("twindb_backup.backup._backup_stream", side_effect=backup_stream), mock.patch(
+        "twindb_backup.backup.BinlogParser"
+    ) as mock_parser, mock.patch("twindb_backup.backup.BinlogIndex") as mock_index:
+        mock_parser.return_value.created_at = 100
+        mock_index.build.return_value.to_json.return_value = "{}"
+        copy_binlogs(config, "hourly", mock.Mock(), "/var/lib/mysql", BINLOGS, dst, status)
+    return config.destination.return_value
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_copy_binlogs_adds_all_in_order(workers):
+    status = BinlogStatus()
+    _copy_binlogs(status, mock.Mock(), workers)
+    assert [copy.name for copy in status] == BINLOGS
+
+
+def test_copy_binlogs_uploads_index():
+    status = BinlogStatus()
+    upload_dst = _copy_binlogs(status, mock.Mock(), 2)
+    assert sorted(call[0][1] for call in upload_dst.write.call_args_list) == [copy.index_key for copy in status]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_copy_binlogs_no_gaps_on_failure(workers):
+    status = BinlogStatus()
+    dst = mock.Mock()
+    with pytest.raises(OperationError):
+        _copy_binlogs(status, dst, workers, failed="mysql-bin.000003")
+
+    assert [copy.name for copy in status] == BINLOGS[:2]
+    dst.write.assert_called_once_with(status.serialize(), status.status_path)
+
+
+def test_copy_binlogs_records_suffix():
+    status = BinlogStatus()
+    config = mock.Mock()
+    config.mysql.binlog_upload_workers = 2
+
+    def backup_stream(_config, src, _dst):
+        src.suffix += ".zst.gpg"
+
+    with mock.patch("twindb_backup.backup._backup_stream", side_effect=backup_stream), mock.patch(
+        "twindb_backup.backup.BinlogParser"
+    ), mock.patch("twindb_backup.backup.BinlogIndex"):
+        copy_binlogs(config, "hourly", mock.Mock(), "/var/lib/mysql", BINLOGS[:2], mock.Mock(), status)
+
+    assert [copy.suffix for copy in status] == [".zst.gpg", ".zst.gpg"]
+    assert BinlogStatus(status.serialize()).latest_backup.suffix == ".zst.gpg"
+
+
+@mock.patch("twindb_backup.backup.time.time", return_value=10 * 24 * 3600)
+def test_expire_binlogs_zstd(mock_time):
+    status = BinlogStatus()
+    old = BinlogCopy("master1", "mysql-bin.000001", 100, suffix=".zst")
+    legacy = BinlogCopy("master1", "mysql-bin.000002", 200)
+    fresh = BinlogCopy("master1", "mysql-bin.000003", 9 * 24 * 3600, suffix=".zst")
+    for copy in (old, legacy, fresh):
+        status.add(copy)
+    dst = mock.Mock()
+
+    expire_binlogs(dst, status, 7)
+
+    deleted = dst.delete_many.call_args[0][0]
+    assert "master1/binlog/mysql-bin.000001.zst" in deleted
+    assert "master1/binlog/mysql-bin.000001.gz" not in deleted
+    assert "master1/binlog/mysql-bin.000001.index.json" in deleted
+    assert "master1/binlog/mysql-bin.000002.zst" in deleted
+    assert "master1/binlog/mysql-bin.000002.gz.gpg" in deleted
+    assert not any("000003" in path for path in deleted)
+    assert [copy.name for copy in status] == ["mysql-bin.000003"]
@@ -0,0 +1,54 @@
+import mock
+import pytest
+
+from twindb_backup.backup import backup_everything
+from twindb_backup.configuration.scheduler import SchedulerConfig
+from twindb_backup.exceptions import OperationError
+
+
+def _config(**kwargs):
+    config = mock.Mock()
+    config.backup_dirs = ["/etc", "/home"]
+    config.bandwidth = None
+    config.scheduler = SchedulerConfig(**kwargs)
+    return config
+
+
+@mock.patch("twindb_backup.backup.save_measures")
+@mock.patch("twindb_backup.backup.export_info")
+@mock.patch("twindb_backup.backup.backup_binlogs")
+@mock.patch("twindb_backup.backup.backup_mysql")
+@mock.patch("twindb_backup.backup.backup_directory")
+def test_backup_everything_by_priority(mock_directory, mock_mysql, mock_binlogs, mock_export, mock_save_measures):
+    calls = []
+    mock_directory.side_effect = lambda run_type, config, directory: calls.append(directory)
+    mock_mysql.side_effect = lambda run_type, config: calls.append("mysql")
+    mock_binlogs.side_effect = lambda run_type, config: calls.append("binlogs")
+    config = _config(priority_mysql="10", priority_binlogs="5")
+
+    backup_everything("daily", config)
+
+    assert calls == ["mysql", "binlogs", "/etc", "/home"]
+    assert mock_export.call_count == 1
+    assert mock_save_measures.call_count == 1
+
+
+@mock.patch("twindb_backup.backup.save_measures")
+@mock.patch("twindb_backup.backup.export_info")
+@mock.patch("twindb_backup.backup.backup_binlogs")
+@mock.patch("twindb_backup.backup.backup_mysql")
+@mock.patch("twindb_backup.backup.backup_directory")
+def test_backup_everything_runs_all_jobs_on_failure(
+    mock_directory, mock_mysql, mock_binlogs, mock_export, mock_save_measures
+):
+    mock_directory.side_effect = OperationError("tar failed")
+    config = _config(budget="3")
+
+    with pytest.raises(OperationError):
+        backup_everything("daily", config)
+
+    assert mock_directory.call_count == 2
+    mock_mysql.assert_called_once_with("daily", config)
+    mock_binlogs.assert_called_once_with("daily", config)
+    assert mock_export.call_count == 0
+    assert mock_save_measures.call_count == 0
@@ -0,0 +1,51 @@
+import mock
+import pytest
+
+from twindb_backup.backup import _check_jobs, copy_finished_metrics
+from twindb_backup.copy.mysql_copy import MySQLCopy
+from twindb_backup.scheduler import Job
+from twindb_backup.status.mysql_status import MySQLStatus
+
+
+def test_copy_finished_metrics():
+    status = MySQLStatus()
+    for run_type, name, finished in [("daily", "a", 100), ("daily", "b", 400), ("hourly", "c", 900)]:
+        status.add(MySQLCopy("master1", run_type, name, backup_finished=finished))
+
+    metrics = copy_finished_metrics(status)
+
+    assert [(metric.tags["run_type"], metric.value) for metric in metrics] == [("hourly", 900), ("daily", 400)]
+    assert all(metric.name == "copy.last_finished_timestamp_seconds" for metric in metrics)
+    assert all(metric.tags["source"] == "mysql" for metric in metrics)
+
+
+def _job(name, started, finished, error=None):
+    job = Job(name, None)
+    job.started = started
+    job.finished = finished
+    job.error = error
+    return job
+
+
+@mock.patch("twindb_backup.backup.export_info")
+@mock.patch("twindb_backup.backup.export_metrics")
+def test_check_jobs_exports_files_finished(mock_export_metrics, mock_export_info):
+    _check_jobs(
+        mock.Mock(), "daily", [_job("files:/etc", 100, 150), _job("files:/home", 110, 200), _job("mysql", 0, 900)]
+    )
+
+    metrics = mock_export_metrics.call_args[0][1]
+    assert [(metric.name, metric.value, metric.tags) for metric in metrics] == [
+        ("copy.last_finished_timestamp_seconds", 200, {"source": "files", "run_type": "daily"})
+    ]
+    assert mock_export_info.call_args[1]["data"] == 100
+
+
+@mock.patch("twindb_backup.backup.export_info")
+@mock.patch("twindb_backup.backup.export_metrics")
+def test_check_jobs_failed_files_copy(mock_export_metrics, mock_export_info):
+    with pytest.raises(RuntimeError):
+        _check_jobs(mock.Mock(), "daily", [_job("files:/etc", 100, 150), _job("files:/home", 110, 200, RuntimeError())])
+
+    mock_export_metrics.assert_not_called()
+    mock_export_info.assert_not_called()
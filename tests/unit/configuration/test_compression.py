@@ -2,6 +2,7 @@ import pytest
 
 from twindb_backup.configuration import CompressionConfig
 from twindb_backup.configuration.exceptions import ConfigurationError
+from twindb_backup.modifiers import AdaptiveCompressor, Zstd
 
 
 def test_init_default():
@@ -12,3 +13,23 @@ def test_init_default():
 def test_unsupported_program_raises():
     with pytest.raises(ConfigurationError):
         CompressionConfig(program="foo")
+
+
+def test_zstd_modifier():
+    cc = CompressionConfig(program="zstd", threads="4", level="5", long_window="27")
+    modifier = cc.get_modifier(None)
+    assert isinstance(modifier, Zstd)
+    assert modifier._modifier_cmd == ["zstd", "-q", "-5", "-T4", "--long=27", "-c", "-"]
+
+
+def test_adaptive_modifier():
+    cc = CompressionConfig(program="adaptive", min_level="2", max_level="6", cpu_share="0.25")
+    modifier = cc.get_modifier(None)
+    assert isinstance(modifier, AdaptiveCompressor)
+    assert modifier.in_process
+    assert 2 <= modifier.level <= 6
+
+
+def test_invalid_cpu_share_raises():
+    with pytest.raises(ConfigurationError):
+        CompressionConfig(program="adaptive", cpu_share="2")
@@ -17,3 +17,19 @@ def test_mysql_set_xbstream_binary():
     mc = MySQLConfig()
     mc.xbstream_binary = "foo"
     assert mc.xbstream_binary == "foo"
+
+
+def test_mysql_binlog_upload_workers():
+    assert MySQLConfig().binlog_upload_workers == 4
+    assert MySQLConfig(binlog_upload_workers="16").binlog_upload_workers == 16
+    assert MySQLConfig(binlog_upload_workers="0").binlog_upload_workers == 1
+
+
+def test_mysql_restore_options():
+    mc = MySQLConfig()
+    assert mc.restore_parallel is None
+    assert mc.restore_use_memory is None
+
+    mc = MySQLConfig(restore_parallel="8", restore_use_memory="2G")
+    assert mc.restore_parallel == 8
+    assert mc.restore_use_memory == 2 * 1024**3
@@ -0,0 +1,29 @@
+import pytest
+
+from twindb_backup.configuration import TwinDBBackupConfig
+from twindb_backup.configuration.exceptions import ConfigurationError
+
+
+def _config(tmpdir, content):
+    cfg_file = tmpdir.join("twindb-backup.cfg")
+    cfg_file.write(content)
+    return TwinDBBackupConfig(config_file=str(cfg_file))
+
+
+def test_no_bandwidth(tmpdir):
+    assert _config(tmpdir, "[source]\n").bandwidth is None
+
+
+def test_bandwidth(tmpdir):
+    tbc = _config(tmpdir, "[bandwidth]\nrate=10M\nburst=1M\nschedule=22:00-06:00=0\n")
+    assert tbc.bandwidth.rate == 10485760
+    assert tbc.bandwidth.burst == 1048576
+    assert tbc.bandwidth.schedule == [(1320, 360, 0)]
+    assert tbc.bandwidth.bucket is tbc.bandwidth.bucket
+
+
+@pytest.mark.parametrize("option", ["rate=fast", "burst=-1", "schedule=night=0"])
+def test_bandwidth_invalid_raises(tmpdir, option):
+    tbc = _config(tmpdir, "[bandwidth]\n%s\n" % option)
+    with pytest.raises(ConfigurationError):
+        assert tbc.bandwidth
@@ -0,0 +1,61 @@
+import pytest
+
+from twindb_backup.configuration import TwinDBBackupConfig
+from twindb_backup.configuration.exceptions import ConfigurationError
+from twindb_backup.destination.dedup import DedupDestination
+from twindb_backup.destination.s3 import S3
+
+
+def _config(tmpdir, content):
+    cfg_file = tmpdir.join("twindb-backup.cfg")
+    cfg_file.write(content)
+    return TwinDBBackupConfig(config_file=str(cfg_file))
+
+
+S3_CONFIG = """
+[destination]
+backup_destination=s3
+
+[s3]
+AWS_ACCESS_KEY_ID=XXXXX
+AWS_SECRET_ACCESS_KEY=YYYYY
+AWS_DEFAULT_REGION=us-east-1
+BUCKET=twindb-backups
+"""
+
+
+def test_no_dedup(tmpdir):
+    tbc = _config(tmpdir, S3_CONFIG)
+    assert tbc.dedup is None
+    assert isinstance(tbc.destination(), S3)
+    assert tbc.compression.rsyncable is None
+
+
+def test_dedup(tmpdir):
+    tbc = _config(tmpdir, S3_CONFIG + "[dedup]\nchunk_size=1048576\nconcurrency=2\n")
+    assert tbc.dedup.chunk_size == 1048576
+    assert tbc.dedup.concurrency == 2
+
+    dst = tbc.destination()
+    assert isinstance(dst, DedupDestination)
+    assert isinstance(dst.destination, S3)
+    assert tbc.compression.rsyncable is True
+    assert tbc.compression.get_modifier(None)._modifier_cmd == ["gzip", "-9", "--rsyncable", "-c", "-"]
+
+
+def test_dedup_rsyncable_off(tmpdir):
+    tbc = _config(tmpdir, S3_CONFIG + "[dedup]\n[compression]\nprogram=pigz\nrsyncable=no\n")
+    assert tbc.compression.rsyncable is False
+
+
+def test_dedup_ssh_raises(tmpdir):
+    tbc = _config(tmpdir, "[destination]\nbackup_destination=ssh\n[ssh]\nbackup_host=127.0.0.1\n[dedup]\n")
+    with pytest.raises(ConfigurationError):
+        tbc.destination()
+
+
+@pytest.mark.parametrize("option", ["chunk_size=1024", "concurrency=0", "chunk_size=foo"])
+def test_dedup_invalid_raises(tmpdir, option):
+    tbc = _config(tmpdir, S3_CONFIG + "[dedup]\n%s\n" % option)
+    with pytest.raises(ConfigurationError):
+        assert tbc.dedup
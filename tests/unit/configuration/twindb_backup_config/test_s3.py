@@ -1,4 +1,8 @@
+import pytest
+
 from twindb_backup.configuration import TwinDBBackupConfig
+from twindb_backup.configuration.exceptions import ConfigurationError
+from twindb_backup.destination.s3 import S3_UPLOAD_CONCURRENCY, S3_UPLOAD_PART_SIZE
 
 
 def test_s3(config_file):
@@ -7,6 +11,36 @@ def test_s3(config_file):
     assert tbc.s3.aws_secret_access_key == "YYYYY"
     assert tbc.s3.aws_default_region == "us-east-1"
     assert tbc.s3.bucket == "twindb-backups"
+    assert tbc.s3.upload_concurrency == S3_UPLOAD_CONCURRENCY
+    assert tbc.s3.upload_part_size == S3_UPLOAD_PART_SIZE
+
+
+def test_s3_upload_options(tmpdir):
+    cfg_file = tmpdir.join("twindb-backup.cfg")
+    with open(str(cfg_file), "w") as fp:
+        fp.write(
+            "[s3]\n"
+            "AWS_ACCESS_KEY_ID=XXXXX\n"
+            "AWS_SECRET_ACCESS_KEY=YYYYY\n"
+            "BUCKET=twindb-backups\n"
+            "upload_concurrency=8\n"
+            "upload_part_size=16777216\n"
+            "upload_memory_budget=268435456\n"
+            "download_concurrency=16\n"
+            "download_memory_budget=536870912\n"
+            "list_concurrency=4\n"
+            "listing_cache_ttl=60\n"
+            "listing_cache_dir=/tmp/listings\n"
+        )
+    tbc = TwinDBBackupConfig(config_file=str(cfg_file))
+    assert tbc.s3.upload_concurrency == 8
+    assert tbc.s3.upload_part_size == 16 * 1024**2
+    assert tbc.s3.upload_memory_budget == 256 * 1024**2
+    assert tbc.s3.download_concurrency == 16
+    assert tbc.s3.download_memory_budget == 512 * 1024**2
+    assert tbc.s3.list_concurrency == 4
+    assert tbc.s3.listing_cache_ttl == 60
+    assert tbc.s3.listing_cache_dir == "/tmp/listings"
 
 
 def test_no_s3_section(tmpdir):
@@ -15,3 +49,12 @@ def test_no_s3_section(tmpdir):
         fp.write("")
     tbc = TwinDBBackupConfig(config_file=str(cfg_file))
     assert tbc.s3 is None
+
+
+def test_s3_invalid_upload_validation(tmpdir):
+    cfg_file = tmpdir.join("twindb-backup.cfg")
+    with open(str(cfg_file), "w") as fp:
+        fp.write("[s3]\nAWS_ACCESS_KEY_ID=XXXXX\nAWS_SECRET_ACCESS_KEY=YYYYY\nBUCKET=b\nupload_validation=foo\n")
+    tbc = TwinDBBackupConfig(config_file=str(cfg_file))
+    with pytest.raises(ConfigurationError):
+        assert tbc.s3
@@ -0,0 +1,33 @@
+import pytest
+
+from twindb_backup.configuration import TwinDBBackupConfig
+from twindb_backup.configuration.exceptions import ConfigurationError
+
+
+def _config(tmpdir, content):
+    cfg_file = tmpdir.join("twindb-backup.cfg")
+    cfg_file.write(content)
+    return TwinDBBackupConfig(config_file=str(cfg_file))
+
+
+def test_no_scheduler(tmpdir):
+    tbc = _config(tmpdir, "[source]\n")
+    assert tbc.scheduler.budget == 1
+    assert tbc.scheduler.priority("mysql") == 0
+    assert tbc.scheduler.weight("files") == 1
+
+
+def test_scheduler(tmpdir):
+    tbc = _config(tmpdir, "[scheduler]\nbudget=4\npriority_mysql=10\nweight_mysql=2\nweight_binlogs=0\n")
+    assert tbc.scheduler.budget == 4
+    assert tbc.scheduler.priority("mysql") == 10
+    assert tbc.scheduler.priority("files") == 0
+    assert tbc.scheduler.weight("mysql") == 2
+    assert tbc.scheduler.weight("binlogs") == 0
+
+
+@pytest.mark.parametrize("option", ["budget=0", "weight_files=-1", "priority_mysql=high"])
+def test_scheduler_invalid_raises(tmpdir, option):
+    tbc = _config(tmpdir, "[scheduler]\n%s\n" % option)
+    with pytest.raises(ConfigurationError):
+        assert tbc.scheduler
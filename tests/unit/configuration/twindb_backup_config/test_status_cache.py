@@ -0,0 +1,22 @@
+from twindb_backup.configuration import TwinDBBackupConfig
+from twindb_backup.status.cache import STATUS_CACHE_PATH
+
+DESTINATION = "[destination]\nbackup_destination=ssh\n[ssh]\nbackup_host=127.0.0.1\nbackup_dir=/tmp/backups\n"
+
+
+def _config(tmpdir, content):
+    cfg_file = tmpdir.join("twindb-backup.cfg")
+    cfg_file.write(DESTINATION + content)
+    return TwinDBBackupConfig(config_file=str(cfg_file))
+
+
+def test_no_status_cache(tmpdir):
+    assert _config(tmpdir, "").destination().status_cache is None
+
+
+def test_status_cache_default_path(tmpdir):
+    assert _config(tmpdir, "[status_cache]\n").destination().status_cache.path == STATUS_CACHE_PATH
+
+
+def test_status_cache(tmpdir):
+    assert _config(tmpdir, "[status_cache]\npath=/foo\n").destination().status_cache.path == "/foo"
@@ -0,0 +1,24 @@
+import pytest
+
+from twindb_backup.copy.file_copy import FileCopy
+
+
+@pytest.mark.parametrize(
+    "path, source, taken_at, parent_prefix",
+    [
+        ("s3://bucket/master1/daily/files/_etc-2023-01-01_10_00_00.tar.gz", "_etc", "2023-01-01_10_00_00", None),
+        (
+            "/backups/master1/hourly/files/_var_lib-data-2023-01-01_11_00_00.inc-daily-2023-01-01_00_00_00.tar.gz",
+            "_var_lib-data",
+            "2023-01-01_11_00_00",
+            "master1/daily/files/_var_lib-data-2023-01-01_00_00_00.tar",
+        ),
+        ("master1/hourly/files/foo", None, None, None),
+    ],
+)
+def test_init_from_path(path, source, taken_at, parent_prefix):
+    copy = FileCopy(path=path)
+    assert copy.source == source
+    assert copy.taken_at == taken_at
+    assert copy.parent_prefix == parent_prefix
+    assert copy.incremental is (parent_prefix is not None)
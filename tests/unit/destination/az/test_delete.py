@@ -1,6 +1,8 @@
+import mock
 import pytest
 
 import twindb_backup.destination.az as az
+from twindb_backup.destination.exceptions import AzureBlobDestinationError
 
 from .util import mocked_az
 
@@ -21,3 +23,23 @@ def test_delete_fail():
     with pytest.raises(Exception):
         c.delete("test")
     c._container_client.delete_blob.assert_called_once_with(c.render_path("test"))
+
+
+def test_delete_many():
+    """Tests AZ.delete_many method, skipping missing blobs."""
+    c = mocked_az()
+    c._container_client.delete_blobs.return_value = iter([mock.Mock(status_code=202), mock.Mock(status_code=404)])
+
+    c.delete_many(["a", "b"])
+    c._container_client.delete_blobs.assert_called_once_with(
+        c.render_path("a"), c.render_path("b"), raise_on_any_failure=False
+    )
+
+
+def test_delete_many_fail():
+    """Tests AZ.delete_many method, raising an error if some blobs are not deleted"""
+    c = mocked_az()
+    c._container_client.delete_blobs.return_value = iter([mock.Mock(status_code=403)])
+
+    with pytest.raises(AzureBlobDestinationError):
+        c.delete_many(["a"])
@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, call, patch
 
 import azure.core.exceptions as ae
 import pytest
@@ -13,22 +13,28 @@ def test_download_to_pipe_success():
         mc_os.fdopen.return_value = mc_fdopen
 
         c = mocked_az()
+        c._download_chunk_size = 4
+        c._container_client.get_blob_client.return_value.get_blob_properties.return_value.size = 6
 
         mc_dbr = MagicMock()
+        mc_dbr.readall.side_effect = [b"foo-", b"ke"]
         c._container_client.download_blob.return_value = mc_dbr
 
         c._download_to_pipe(c.render_path("foo-key"), 100, 200)
 
         mc_os.close.assert_called_once_with(100)
         mc_os.fdopen.assert_called_once_with(200, "wb")
-        c._container_client.download_blob.assert_called_once_with(c.render_path("foo-key"))
-        mc_dbr.readinto.assert_called_once_with(mc_fdopen.__enter__())
+        c._container_client.get_blob_client.assert_called_once_with(c.render_path("foo-key"))
+        c._container_client.download_blob.assert_any_call(c.render_path("foo-key"), offset=0, length=4)
+        c._container_client.download_blob.assert_any_call(c.render_path("foo-key"), offset=4, length=2)
+        mc_fdopen.__enter__().write.assert_has_calls([call(b"foo-"), call(b"ke")])
 
 
 def test_download_to_pipe_fail():
     """Tests AZ.download_to_pipe method, re-raises exception when download fails in child process"""
-    with patch("twindb_backup.destination.az.os") as mc_os:
+    with patch("twindb_backup.destination.az.os") as mc_os, patch("twindb_backup.destination.download.time"):
         c = mocked_az()
+        c._container_client.get_blob_client.return_value.get_blob_properties.return_value.size = 6
 
         c._container_client.download_blob.side_effect = ae.HttpResponseError()
 
@@ -37,4 +43,4 @@ def test_download_to_pipe_fail():
 
         mc_os.close.assert_called_once_with(100)
         mc_os.fdopen.assert_called_once_with(200, "wb")
-        c._container_client.download_blob.assert_called_once_with(c.render_path("foo-key"))
+        c._container_client.download_blob.assert_called_with(c.render_path("foo-key"), offset=0, length=6)
@@ -2,6 +2,7 @@ from unittest.mock import MagicMock
 
 import azure.core.exceptions as ae
 import pytest
+from azure.core import MatchConditions
 from azure.storage.blob import StorageStreamDownloader
 
 from twindb_backup.destination.exceptions import FileNotFound
@@ -43,3 +44,14 @@ def test_read_fail_not_found():
     ):
         c.read(EXAMPLE_FILE)
     c._container_client.download_blob.assert_called_once_with(c.render_path(EXAMPLE_FILE), encoding="utf-8")
+
+
+def test_read_if_modified_not_modified():
+    """Tests AZ.read_if_modified method, returning no content if the blob ETag didn't change"""
+    c = mocked_az()
+    c._container_client.download_blob.side_effect = ae.ResourceNotModifiedError()
+
+    assert c.read_if_modified(EXAMPLE_FILE, "etag") == (None, "etag")
+    c._container_client.download_blob.assert_called_once_with(
+        c.render_path(EXAMPLE_FILE), encoding="utf-8", etag="etag", match_condition=MatchConditions.IfModified
+    )
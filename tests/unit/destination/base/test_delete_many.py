@@ -0,0 +1,37 @@
+import mock
+import pytest
+
+from twindb_backup.destination.base_destination import BaseDestination, split_batches
+from twindb_backup.destination.exceptions import DestinationError, FileNotFound
+
+
+def test_delete_many_calls_delete():
+    dst = mock.Mock()
+    BaseDestination.delete_many(dst, ["a", "b", "c"], concurrency=2)
+    assert sorted(call.args[0] for call in dst.delete.call_args_list) == ["a", "b", "c"]
+
+
+def test_delete_many_skips_missing():
+    dst = mock.Mock()
+    dst.delete.side_effect = [FileNotFound("a"), None]
+    BaseDestination.delete_many(dst, ["a", "b"], concurrency=1)
+    assert dst.delete.call_count == 2
+
+
+def test_delete_many_raises():
+    dst = mock.Mock()
+    dst.delete.side_effect = DestinationError("failed")
+    with pytest.raises(DestinationError):
+        BaseDestination.delete_many(dst, ["a"])
+
+
+@pytest.mark.parametrize(
+    "items, size, batches",
+    [
+        ([], 2, []),
+        ([1, 2, 3], 2, [[1, 2], [3]]),
+        ([1, 2], 2, [[1, 2]]),
+    ],
+)
+def test_split_batches(items, size, batches):
+    assert split_batches(items, size) == batches
@@ -0,0 +1,256 @@
+import hashlib
+import io
+import random
+from contextlib import contextmanager
+
+import mock
+import pytest
+
+from twindb_backup.destination.base_destination import BaseDestination
+from twindb_backup.destination.dedup import ContentDefinedChunker, DedupDestination, _chunk_path
+from twindb_backup.destination.exceptions import DedupDestinationError, FileNotFound
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MemoryDestination(BaseDestination):
+    def __init__(self):
+        super(MemoryDestination, self).__init__("s3://bucket")
+        self.files = {}
+
+    def delete(self, path):
+        try:
+            del self.files[path]
+        except KeyError:
+            raise FileNotFound(path)
+
+    @contextmanager
+    def get_stream(self, copy):
+        yield io.BytesIO(self.files[copy.key])
+
+    def read(self, filepath):
+        try:
+            return self.files[filepath]
+        except KeyError:
+            raise FileNotFound(filepath)
+
+    def save(self, handler, filepath):
+        with handler as file_obj:
+            self.files[filepath] = file_obj.read()
+
+    def version(self, filepath):
+        return str(len(self.files[filepath])) if filepath in self.files else None
+
+    def write(self, content, filepath):
+        self.files[filepath] = content.encode("utf-8") if isinstance(content, str) else content
+
+    def list_files(self, prefix=None, recursive=False, pattern=None, files_only=False):
+        return sorted("s3://bucket/%s" % name for name in self.files)
+
+    def _list_files(self, prefix=None, recursive=False, files_only=False):
+        raise NotImplementedError
+
+
+class Copy(object):
+    def __init__(self, key):
+        self.key = key
+
+
+@contextmanager
+def _stream(data):
+    yield io.BytesIO(data)
+
+
+def _random(size, seed=0):
+    return random.Random(seed).getrandbits(8 * size).to_bytes(size, "little")
+
+
+def _chunks(data):
+    return list(ContentDefinedChunker(CHUNK_SIZE).split(io.BytesIO(data)))
+
+
+def test_chunker_bounds():
+    data = _random(4 * 1024 * 1024)
+    chunks = _chunks(data)
+
+    assert b"".join(chunks) == data
+    assert all(CHUNK_SIZE // 4 <= len(chunk) <= CHUNK_SIZE * 4 for chunk in chunks[:-1])
+    assert len(chunks) > 4 * 1024 * 1024 // (CHUNK_SIZE * 4)
+
+
+def test_chunker_boundaries_are_content_defined():
+    data = _random(4 * 1024 * 1024)
+    shifted = _chunks(b"inserted bytes" + data)
+
+    assert len(set(_chunks(data)) - set(shifted)) <= 2
+
+
+def test_chunker_low_entropy():
+    assert [len(chunk) for chunk in _chunks(b"\x00" * (CHUNK_SIZE * 9))] == [CHUNK_SIZE * 4] * 2 + [CHUNK_SIZE]
+
+
+def test_save_get_stream():
+    inner = MemoryDestination()
+    dst = DedupDestination(inner, chunk_size=CHUNK_SIZE, concurrency=4)
+    data = _random(1024 * 1024)
+
+    dst.save(_stream(data), "master1/daily/mysql/backup.xbstream.gz")
+
+    assert "master1/daily/mysql/backup.xbstream.gz" not in inner.files
+    assert "master1/daily/mysql/backup.xbstream.gz.manifest.json" in inner.files
+    with dst.get_stream(Copy("master1/daily/mysql/backup.xbstream.gz")) as stream:
+        assert stream.read() == data
+
+
+def test_save_uploads_only_new_chunks():
+    inner = MemoryDestination()
+    dst = DedupDestination(inner, chunk_size=CHUNK_SIZE)
+    data = _random(1024 * 1024)
+
+    dst.save(_stream(data), "master1/daily/mysql/first")
+    chunks = {name for name in inner.files if name.startswith(".chunks/")}
+    dst.save(_stream(data[:1000] + b"changed" + data[1000:]), "master1/daily/mysql/second")
+    new_chunks = {name for name in inner.files if name.startswith(".chunks/")} - chunks
+
+    assert 0 < len(new_chunks) <= 3
+
+
+def test_save_checks_only_skipped_chunks():
+    inner = MemoryDestination()
+    dst = DedupDestination(inner, chunk_size=CHUNK_SIZE)
+    data = _random(1024 * 1024)
+    dst.save(_stream(data), "master1/daily/mysql/first")
+    changed = data[:1000] + b"changed" + data[1000:]
+    skipped = {hashlib.sha256(chunk).hexdigest() for chunk in _chunks(data)} & {
+        hashlib.sha256(chunk).hexdigest() for chunk in _chunks(changed)
+    }
+
+    with mock.patch.object(inner, "list_files", wraps=inner.list_files) as mock_list_files, mock.patch.object(
+        inner, "version", wraps=inner.version
+    ) as mock_version:
+        dst.save(_stream(changed), "master1/daily/mysql/second")
+
+    assert mock_list_files.call_count == 1
+    assert sorted(call[0][0] for call in mock_version.call_args_list) == sorted(map(_chunk_path, skipped))
+
+
+def test_delete_collects_unreferenced_chunks():
+    inner = MemoryDestination()
+    dst = DedupDestination(inner, chunk_size=CHUNK_SIZE)
+    data = _random(1024 * 1024)
+    dst.save(_stream(data), "master1/daily/mysql/first")
+    dst.save(_stream(data + _random(256 * 1024, seed=1)), "master1/daily/mysql/second")
+
+    dst.delete("s3://bucket/master1/daily/mysql/second")
+    with dst.get_stream(Copy("master1/daily/mysql/first")) as stream:
+        assert stream.read() == data
+
+    dst.delete("master1/daily/mysql/first")
+    assert not inner.files
+
+
+def test_delete_keeps_chunks_of_other_hosts():
+    inner = MemoryDestination()
+    host1 = DedupDestination(inner, chunk_size=CHUNK_SIZE)
+    host2 = DedupDestination(inner, chunk_size=CHUNK_SIZE)
+    data = _random(1024 * 1024)
+    host1.save(_stream(data), "master1/daily/mysql/first")
+    saved_write = inner.write
+
+    def _write(content, filepath):
+        saved_write(content, filepath)
+        if filepath.endswith(".manifest.json"):
+            # host1 deletes its copy while host2 saves a copy with the same chunks
+            host1.delete("master1/daily/mysql/first")
+
+    with mock.patch.object(inner, "write", side_effect=_write):
+        host2.save(_stream(data), "master2/daily/mysql/first")
+
+    with host2.get_stream(Copy("master2/daily/mysql/first")) as stream:
+        assert stream.read() == data
+
+
+def test_save_discards_copy_if_chunks_deleted():
+    inner = MemoryDestination()
+    host1 = DedupDestination(inner, chunk_size=CHUNK_SIZE)
+    host2 = DedupDestination(inner, chunk_size=CHUNK_SIZE, concurrency=1)
+    data = _random(1024 * 1024)
+    host1.save(_stream(data), "master1/daily/mysql/first")
+    saved_write = inner.write
+    deleted = []
+
+    def _write(content, filepath):
+        if not deleted:
+            # host1 reads the manifests before host2 saves its one
+            deleted.append(True)
+            host1.delete("master1/daily/mysql/first")
+        saved_write(content, filepath)
+
+    with mock.patch.object(inner, "write", side_effect=_write):
+        with pytest.raises(DedupDestinationError):
+            host2.save(_stream(data), "master2/daily/mysql/first")
+
+    assert not [name for name in inner.files if not name.startswith(".chunks/")]
+
+
+def test_delete_many_lists_manifests_once():
+    inner = MemoryDestination()
+    dst = DedupDestination(inner, chunk_size=CHUNK_SIZE)
+    dst.save(_stream(_random(256 * 1024)), "master1/daily/mysql/first")
+    dst.save(_stream(_random(256 * 1024, seed=1)), "master1/daily/mysql/second")
+
+    with mock.patch.object(inner, "list_files", wraps=inner.list_files) as mock_list_files:
+        dst.delete_many(["master1/daily/mysql/first", "master1/daily/mysql/second"])
+
+    assert mock_list_files.call_count == 1
+    assert not inner.files
+
+
+def test_list_files():
+    inner = MemoryDestination()
+    dst = DedupDestination(inner, chunk_size=CHUNK_SIZE)
+    dst.save(_stream(b"foo"), "master1/daily/files/foo")
+    inner.files["master1/daily/files/bar"] = b"bar"
+
+    assert dst.list_files("s3://bucket/master1") == [
+        "s3://bucket/master1/daily/files/bar",
+        "s3://bucket/master1/daily/files/foo",
+    ]
+
+
+def test_list_copies():
+    inner = MemoryDestination()
+    inner.list_copies = mock.Mock(
+        return_value=["s3://bucket/master1/daily/files/bar", "s3://bucket/master1/daily/files/foo.manifest.json"]
+    )
+    dst = DedupDestination(inner)
+
+    assert dst.list_copies("files", run_type="daily") == [
+        "s3://bucket/master1/daily/files/bar",
+        "s3://bucket/master1/daily/files/foo",
+    ]
+    inner.list_copies.assert_called_once_with("files", run_type="daily")
+
+
+def test_not_deduplicated_copy():
+    inner = MemoryDestination()
+    inner.files["master1/daily/files/bar"] = b"bar"
+    dst = DedupDestination(inner)
+
+    with dst.get_stream(Copy("master1/daily/files/bar")) as stream:
+        assert stream.read() == b"bar"
+    dst.delete("master1/daily/files/bar")
+    assert not inner.files
+
+
+@mock.patch("twindb_backup.destination.download.time")
+def test_corrupted_chunk_raises(mock_time):
+    inner = MemoryDestination()
+    dst = DedupDestination(inner, chunk_size=CHUNK_SIZE)
+    data = _random(16 * 1024)
+    dst.save(_stream(data), "master1/daily/files/foo")
+    inner.files[_chunk_path(hashlib.sha256(data).hexdigest())] = b"garbage"
+
+    with pytest.raises(DedupDestinationError):
+        with dst.get_stream(Copy("master1/daily/files/foo")) as stream:
+            stream.read()
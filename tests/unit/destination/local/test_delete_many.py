@@ -0,0 +1,9 @@
+from twindb_backup.destination.local import Local
+
+
+def test_delete_many(tmpdir):
+    tmpdir.join("a").write("a")
+    tmpdir.join("b").write("b")
+    dst = Local(str(tmpdir))
+    dst.delete_many(["a", str(tmpdir.join("b")), "missing"])
+    assert tmpdir.listdir() == []
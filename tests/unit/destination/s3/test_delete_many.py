@@ -0,0 +1,29 @@
+import mock
+import pytest
+from moto import mock_s3
+
+from twindb_backup.destination.exceptions import S3DestinationError
+
+
+@mock_s3
+def test_delete_many(s3):
+    s3.create_bucket()
+    keys = ["host/hourly/mysql/%04d.xbstream.gz" % i for i in range(1005)]
+    for key in keys:
+        s3.s3_client.put_object(Body=b"x", Bucket="test-bucket", Key=key)
+    s3.s3_client.put_object(Body=b"x", Bucket="test-bucket", Key="host/status")
+
+    with mock.patch.object(s3, "_delete_batch", wraps=s3._delete_batch) as mock_batch:
+        s3.delete_many(keys[:1000] + ["s3://test-bucket/" + key for key in keys[1000:]] + ["host/missing"])
+
+    assert [len(call.args[0]) for call in mock_batch.call_args_list] == [1000, 6]
+    assert s3.list_files("host/", recursive=True) == ["s3://test-bucket/host/status"]
+
+
+@mock_s3
+def test_delete_many_raises(s3):
+    s3.create_bucket()
+    with mock.patch.object(
+        s3, "_delete_batch", return_value=[{"Key": "host/status", "Code": "AccessDenied"}]
+    ), pytest.raises(S3DestinationError):
+        s3.delete_many(["host/status"])
@@ -0,0 +1,26 @@
+import os
+
+import mock
+from moto import mock_s3
+
+from twindb_backup.destination.s3 import S3
+
+
+@mock_s3
+def test_get_stream_downloads_ranges():
+    s3 = S3(
+        bucket="test-bucket",
+        aws_access_key_id="access_key",
+        aws_secret_access_key="secret_key",
+        download_chunk_size=1024,
+        download_concurrency=3,
+    )
+    s3.create_bucket()
+    payload = os.urandom(10 * 1024 + 1)
+    s3.write(payload, "foo/bar")
+    copy = mock.Mock()
+    copy.key = "foo/bar"
+
+    with s3.get_stream(copy) as stream:
+        with os.fdopen(stream, "rb", closefd=False) as stream_file:
+            assert stream_file.read() == payload
@@ -1,6 +1,8 @@
 import pytest
 from moto import mock_s3
 
+from twindb_backup.destination.s3 import S3
+
 
 @mock_s3
 def test__list_files_returns_sorted_list_empty_prefix(s3):
@@ -80,3 +82,67 @@ def test__list_files_with_pattern(s3):
 
     files_list = s3.list_files(prefix="", pattern=".*/foo/.*")
     assert files_list == ["s3://test-bucket/object/foo/bar"]
+
+
+@mock_s3
+def test_list_copies(s3):
+    s3.create_bucket()
+    for key in [
+        "master1/daily/mysql/mysql-1.xbstream.gz",
+        "master1/hourly/mysql/mysql-2.xbstream.gz",
+        "master1/daily/files/_etc-1.tar.gz",
+        "master1/binlog/mysql-bin.000001.gz",
+        "master2/daily/mysql/mysql-3.xbstream.gz",
+    ]:
+        s3.s3_client.put_object(Body="hello world", Bucket="test-bucket", Key=key)
+
+    assert s3.list_copies("mysql", run_type="daily") == [
+        "s3://test-bucket/master1/daily/mysql/mysql-1.xbstream.gz",
+        "s3://test-bucket/master2/daily/mysql/mysql-3.xbstream.gz",
+    ]
+    assert s3.list_copies("binlog") == ["s3://test-bucket/master1/binlog/mysql-bin.000001.gz"]
+    assert s3.list_copies("files", run_type="weekly") == []
+
+
+@mock_s3
+def test_list_files_cached(tmpdir):
+    s3 = S3(
+        bucket="test-bucket",
+        aws_access_key_id="access_key",
+        aws_secret_access_key="secret_key",
+        listing_cache_ttl=60,
+        listing_cache_dir=str(tmpdir),
+    )
+    s3.create_bucket()
+    s3.write("foo", "master1/daily/mysql/mysql-1")
+    assert s3.list_files("master1/") == ["s3://test-bucket/master1/daily/mysql/mysql-1"]
+
+    # Not seen until the listing expires
+    s3.s3_client.put_object(Body="foo", Bucket="test-bucket", Key="master1/daily/mysql/mysql-2")
+    assert s3.list_files("master1/") == ["s3://test-bucket/master1/daily/mysql/mysql-1"]
+
+    # Own writes invalidate the listing
+    s3.write("foo", "master1/daily/mysql/mysql-3")
+    assert len(s3.list_files("master1/")) == 3
+
+
+@mock_s3
+def test_list_files_not_cached_for_dedup(tmpdir):
+    s3 = S3(
+        bucket="test-bucket",
+        aws_access_key_id="access_key",
+        aws_secret_access_key="secret_key",
+        listing_cache_ttl=60,
+        listing_cache_dir=str(tmpdir),
+    )
+    s3.create_bucket()
+    assert s3.list_files("") == []
+    assert s3.list_files(".chunks/") == []
+
+    # Another host saves a copy
+    s3.s3_client.put_object(Body="foo", Bucket="test-bucket", Key=".chunks/ab/ab")
+    s3.s3_client.put_object(Body="foo", Bucket="test-bucket", Key="master2/daily/mysql/mysql-1.manifest.json")
+    assert s3.list_files(".chunks/") == ["s3://test-bucket/.chunks/ab/ab"]
+    assert s3.list_files("", pattern=r"\.manifest\.json$") == [
+        "s3://test-bucket/master2/daily/mysql/mysql-1.manifest.json"
+    ]
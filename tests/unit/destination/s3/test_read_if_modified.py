@@ -0,0 +1,27 @@
+import pytest
+from moto import mock_s3
+
+from twindb_backup.destination.exceptions import FileNotFound
+
+
+@mock_s3
+def test_read_if_modified(s3):
+    s3.create_bucket()
+    s3.write("foo", "master1/status")
+
+    content, version = s3.read_if_modified("master1/status", None)
+    assert content == b"foo"
+    assert version == s3.version("master1/status")
+
+    assert s3.read_if_modified("master1/status", version) == (None, version)
+
+    s3.write("bar", "master1/status")
+    assert s3.read_if_modified("master1/status", version)[0] == b"bar"
+
+
+@mock_s3
+def test_read_if_modified_missing(s3):
+    s3.create_bucket()
+    assert s3.version("master1/status") is None
+    with pytest.raises(FileNotFound):
+        s3.read_if_modified("master1/status", None)
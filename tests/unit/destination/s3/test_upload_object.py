@@ -0,0 +1,104 @@
+import io
+import os
+
+import mock
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_s3
+
+from twindb_backup.destination.exceptions import S3DestinationError
+from twindb_backup.destination.s3 import S3, S3_MAX_PART_SIZE, S3_MIN_PART_SIZE, S3MultipartUpload
+
+PART_SIZE = S3_MIN_PART_SIZE
+
+
+@pytest.fixture
+def payload():
+    return os.urandom(2 * PART_SIZE + 1024)
+
+
+@pytest.fixture
+def s3_uploader():
+    s3 = S3(
+        bucket="test-bucket",
+        aws_access_key_id="access_key",
+        aws_secret_access_key="secret_key",
+        upload_part_size=PART_SIZE,
+        upload_concurrency=2,
+    )
+    return s3
+
+
+def _get(s3, key):
+    return s3.s3_client.get_object(Bucket="test-bucket", Key=key)["Body"].read()
+
+
+@mock_s3
+def test_upload_object_small(s3_uploader):
+    s3_uploader.create_bucket()
+    s3_uploader._upload_object(io.BytesIO(b"foo"), "foo/bar")
+    assert _get(s3_uploader, "foo/bar") == b"foo"
+
+
+@mock_s3
+def test_upload_object_multipart(s3_uploader, payload):
+    s3_uploader.create_bucket()
+    s3_uploader._upload_object(io.BytesIO(payload), "foo/bar")
+
+    assert _get(s3_uploader, "foo/bar") == payload
+    assert len(s3_uploader.part_latencies) == 3
+
+
+def _uploads(s3):
+    return s3.s3_client.list_multipart_uploads(Bucket="test-bucket").get("Uploads", [])
+
+
+@mock_s3
+def test_upload_object_aborts(s3_uploader, payload):
+    s3_uploader.create_bucket()
+    upload = S3MultipartUpload(s3_uploader.s3_client, "test-bucket", "foo/bar", part_size=PART_SIZE, concurrency=1)
+    upload_part = s3_uploader.s3_client.upload_part
+
+    def fail_last_part(**kwargs):
+        if kwargs["PartNumber"] == 3:
+            raise ClientError({"Error": {"Code": "500", "Message": "Oops"}}, "UploadPart")
+        return upload_part(**kwargs)
+
+    with mock.patch("twindb_backup.destination.s3.time.sleep"), mock.patch.object(
+        s3_uploader.s3_client, "upload_part", side_effect=fail_last_part
+    ):
+        with pytest.raises(S3DestinationError):
+            upload.run(io.BytesIO(payload))
+
+    assert _uploads(s3_uploader) == []
+    assert s3_uploader.s3_client.list_objects_v2(Bucket="test-bucket")["KeyCount"] == 0
+
+
+@mock_s3
+def test_upload_object_aborts_interrupted(s3_uploader, payload):
+    s3_uploader.create_bucket()
+    upload = S3MultipartUpload(s3_uploader.s3_client, "test-bucket", "foo/bar", part_size=PART_SIZE, concurrency=1)
+
+    with mock.patch.object(s3_uploader.s3_client, "complete_multipart_upload", side_effect=KeyboardInterrupt):
+        with pytest.raises(KeyboardInterrupt):
+            upload.run(io.BytesIO(payload))
+
+    assert _uploads(s3_uploader) == []
+
+
+@pytest.mark.parametrize(
+    "part_size, first_part_size",
+    [
+        (PART_SIZE, PART_SIZE),
+        (1024, S3_MIN_PART_SIZE),
+        (1024**4, S3_MAX_PART_SIZE),
+    ],
+)
+def test_part_size_limits(part_size, first_part_size):
+    assert S3MultipartUpload(mock.Mock(), "test-bucket", "foo", part_size=part_size).part_size == first_part_size
+
+
+def test_get_part_size_grows():
+    upload = S3MultipartUpload(mock.Mock(), "test-bucket", "foo", part_size=PART_SIZE)
+    assert upload.get_part_size(1000) == PART_SIZE
+    assert upload.get_part_size(1001) == 2 * PART_SIZE
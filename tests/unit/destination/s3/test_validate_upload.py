@@ -0,0 +1,63 @@
+import io
+import os
+
+import mock
+import pytest
+from moto import mock_s3
+
+from twindb_backup.destination.exceptions import S3DestinationError
+from twindb_backup.destination.s3 import S3, S3_MIN_PART_SIZE, S3UploadValidation
+
+
+def _s3(tmpdir, validation):
+    return S3(
+        bucket="test-bucket",
+        aws_access_key_id="access_key",
+        aws_secret_access_key="secret_key",
+        upload_part_size=S3_MIN_PART_SIZE,
+        upload_validation=validation,
+    )
+
+
+@mock_s3
+@pytest.mark.parametrize("size", [10, S3_MIN_PART_SIZE + 10])
+@pytest.mark.parametrize("validation", [S3UploadValidation.head, S3UploadValidation.strict])
+def test_validate_upload_uses_head(tmpdir, size, validation):
+    s3 = _s3(tmpdir, validation)
+    s3.create_bucket()
+    with mock.patch.object(s3.s3_client, "get_object") as mock_get_object:
+        assert s3._upload_object(io.BytesIO(os.urandom(size)), "foo/bar") == 0
+        mock_get_object.assert_not_called()
+
+
+@mock_s3
+def test_validate_upload_skipped(tmpdir):
+    s3 = _s3(tmpdir, S3UploadValidation.none)
+    s3.create_bucket()
+    with mock.patch.object(s3.s3_client, "head_object") as mock_head_object:
+        s3._upload_object(io.BytesIO(b"foo"), "foo/bar")
+        mock_head_object.assert_not_called()
+
+
+@mock_s3
+def test_validate_upload_size_mismatch(s3):
+    s3.create_bucket()
+    s3.write(b"foo", "foo/bar")
+    with pytest.raises(S3DestinationError):
+        s3._validate_upload("foo/bar", 4)
+
+
+@mock_s3
+def test_validate_upload_etag_mismatch(s3):
+    s3.create_bucket()
+    s3.write(b"foo", "foo/bar")
+    s3._validate_upload("foo/bar", 3, "acbd18db4cc2f85cedef654fccc4a4d8")
+    with pytest.raises(S3DestinationError):
+        s3._validate_upload("foo/bar", 3, "00000000000000000000000000000000")
+
+
+@mock_s3
+def test_validate_upload_missing_object(s3):
+    s3.create_bucket()
+    with pytest.raises(S3DestinationError):
+        s3._validate_upload("foo/bar", 3)
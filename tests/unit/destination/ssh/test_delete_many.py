@@ -0,0 +1,17 @@
+import mock
+
+from twindb_backup.destination.ssh import SSH_DELETE_BATCH_SIZE, Ssh
+
+
+@mock.patch.object(Ssh, "execute_command")
+def test_delete_many(mock_execute):
+    dst = Ssh(remote_path="/backups")
+    dst.delete_many(["a", "b c"])
+    mock_execute.assert_called_once_with("rm -f -- /backups/a '/backups/b c'")
+
+
+@mock.patch.object(Ssh, "execute_command")
+def test_delete_many_batches(mock_execute):
+    dst = Ssh(remote_path="/backups")
+    dst.delete_many(["f%d" % i for i in range(SSH_DELETE_BATCH_SIZE + 1)])
+    assert mock_execute.call_count == 2
@@ -0,0 +1,68 @@
+import io
+import random
+import time
+
+import mock
+import pytest
+
+from twindb_backup.destination.download import ByteRange, RangedDownload, split_ranges
+
+
+@pytest.mark.parametrize(
+    "size, chunk_size, expected",
+    [
+        (0, 4, []),
+        (3, 4, [ByteRange("foo", 0, 2)]),
+        (8, 4, [ByteRange("foo", 0, 3), ByteRange("foo", 4, 7)]),
+        (9, 4, [ByteRange("foo", 0, 3), ByteRange("foo", 4, 7), ByteRange("foo", 8, 8)]),
+    ],
+)
+def test_split_ranges(size, chunk_size, expected):
+    assert split_ranges("foo", size, chunk_size) == expected
+
+
+def test_ranged_download_keeps_order():
+    payload = bytes(random.getrandbits(8) for _ in range(1000))
+
+    def fetch(byte_range):
+        # Later ranges finish first
+        time.sleep(0.001 * (10 - byte_range.start // 100))
+        end = byte_range.end + 1
+        return payload[byte_range.start : end]
+
+    out = io.BytesIO()
+    download = RangedDownload(fetch, split_ranges("foo", len(payload), 100), concurrency=4, memory_budget=300)
+    assert download.run(out) == len(payload)
+    assert out.getvalue() == payload
+
+
+def test_ranged_download_bounds_memory():
+    in_flight = []
+    peak = []
+
+    def fetch(byte_range):
+        in_flight.append(byte_range)
+        peak.append(len(in_flight))
+        time.sleep(0.001)
+        in_flight.remove(byte_range)
+        return b"x" * (byte_range.end - byte_range.start + 1)
+
+    RangedDownload(fetch, split_ranges("foo", 1000, 100), concurrency=8, memory_budget=200).run(io.BytesIO())
+    assert max(peak) <= 2
+
+
+@mock.patch("twindb_backup.destination.download.time.sleep")
+def test_ranged_download_retries(mock_sleep):
+    fetch = mock.Mock(side_effect=[IOError("oops"), b"foo"])
+    out = io.BytesIO()
+    RangedDownload(fetch, [ByteRange("foo", 0, 2)]).run(out)
+    assert out.getvalue() == b"foo"
+    mock_sleep.assert_called_once_with(2)
+
+
+@mock.patch("twindb_backup.destination.download.time.sleep")
+def test_ranged_download_raises(mock_sleep):
+    fetch = mock.Mock(side_effect=IOError("oops"))
+    with pytest.raises(IOError):
+        RangedDownload(fetch, [ByteRange("foo", 0, 2)], retries=2).run(io.BytesIO())
+    assert fetch.call_count == 3
@@ -0,0 +1,46 @@
+import mock
+import pytest
+
+from twindb_backup.destination.listing import ListingCache, copy_prefix
+
+
+@pytest.mark.parametrize(
+    "host, media_type, run_type, prefix",
+    [
+        ("master1", "mysql", "daily", "master1/daily/mysql/"),
+        ("master1/", "files", "hourly", "master1/hourly/files/"),
+        ("master1/", "binlog", None, "master1/binlog/"),
+        ("master1", "binlog", "daily", "master1/binlog/"),
+    ],
+)
+def test_copy_prefix(host, media_type, run_type, prefix):
+    assert copy_prefix(host, media_type, run_type=run_type) == prefix
+
+
+def test_listing_cache(tmpdir):
+    cache = ListingCache(str(tmpdir), ttl=60)
+    assert cache.get("s3://foo", "master1/") is None
+
+    cache.put("s3://foo", "master1/", ["master1/a"])
+    assert cache.get("s3://foo", "master1/") == ["master1/a"]
+    assert cache.get("s3://bar", "master1/") is None
+
+
+@mock.patch("twindb_backup.destination.listing.time.time")
+def test_listing_cache_expires(mock_time, tmpdir):
+    mock_time.return_value = 1000
+    cache = ListingCache(str(tmpdir), ttl=60)
+    cache.put("s3://foo", "master1/", ["master1/a"])
+
+    mock_time.return_value = 1061
+    assert cache.get("s3://foo", "master1/") is None
+
+
+def test_listing_cache_invalidate(tmpdir):
+    cache = ListingCache(str(tmpdir), ttl=60)
+    cache.put("s3://foo", "master1/", ["master1/a"])
+    cache.put("s3://foo", "master2/", ["master2/a"])
+
+    cache.invalidate("s3://foo", "master1/daily/mysql/b")
+    assert cache.get("s3://foo", "master1/") is None
+    assert cache.get("s3://foo", "master2/") == ["master2/a"]
@@ -1,7 +1,7 @@
 import mock
 import pytest
 
-from twindb_backup.exporter.base_exporter import ExportCategory, ExportMeasureType
+from twindb_backup.exporter.base_exporter import ExportCategory, ExportMeasureType, Metric, MetricType
 from twindb_backup.exporter.datadog_exporter import DataDogExporter
 from twindb_backup.exporter.exceptions import DataDogExporterError
 
@@ -108,3 +108,30 @@ def test__datadog_exporter_export_string_agument(mock_statsd, category, measure_
     with pytest.raises(DataDogExporterError):
         exporter.export(category, measure_type, "str")
     mock_statsd.assert_not_called()
+
+
+@mock.patch("twindb_backup.exporter.datadog_exporter.statsd")
+@mock.patch("twindb_backup.exporter.datadog_exporter.initialize")
+def test__datadog_exporter_export_gauge(mock_initialize, mock_statsd):
+    exporter = DataDogExporter("foo", "bar")
+    exporter.export_gauge("bandwidth.throughput", 10.5)
+    mock_statsd.gauge.assert_called_once_with("twindb.bandwidth.throughput", 10.5, tags=None)
+    with pytest.raises(DataDogExporterError):
+        exporter.export_gauge("bandwidth.throughput", "fast")
+
+
+@mock.patch("twindb_backup.exporter.datadog_exporter.statsd")
+@mock.patch("twindb_backup.exporter.datadog_exporter.initialize")
+def test__datadog_exporter_export_metrics(mock_initialize, mock_statsd):
+    exporter = DataDogExporter("foo", "bar")
+    tags = {"source": "files", "stage": "Gpg"}
+    exporter.export_metrics(
+        [
+            Metric("pipeline.bytes_in", 10, MetricType.counter, tags),
+            Metric("destination.part_latency", 0.5, MetricType.timing, tags),
+        ]
+    )
+    mock_statsd.increment.assert_called_once_with("twindb.pipeline.bytes_in", 10, tags=["source:files", "stage:Gpg"])
+    mock_statsd.histogram.assert_called_once_with(
+        "twindb.destination.part_latency", 0.5, tags=["source:files", "stage:Gpg"]
+    )
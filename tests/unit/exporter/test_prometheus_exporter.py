@@ -0,0 +1,98 @@
+import mock
+import pytest
+
+from twindb_backup.configuration import TwinDBBackupConfig
+from twindb_backup.exporter.base_exporter import ExportCategory, ExportMeasureType, Metric, MetricType
+from twindb_backup.exporter.exceptions import PrometheusExporterError
+from twindb_backup.exporter.prometheus_exporter import PrometheusExporter
+
+
+@pytest.fixture
+def exporter(tmpdir):
+    return PrometheusExporter(
+        textfile_dir=str(tmpdir.join("textfile")),
+        state_file=str(tmpdir.join("state", "prometheus.json")),
+    )
+
+
+def _read(exporter):
+    with open(exporter.textfile_path) as prom:
+        return prom.read()
+
+
+def test_prometheus_exporter_counters_accumulate(exporter, tmpdir):
+    tags = {"source": "mysql", "stage": "Gzip"}
+    exporter.export_metrics([Metric("pipeline.bytes_out", 100, MetricType.counter, tags)])
+    PrometheusExporter(
+        textfile_dir=str(tmpdir.join("textfile")),
+        state_file=str(tmpdir.join("state", "prometheus.json")),
+    ).export_metric(Metric("pipeline.bytes_out", 50, MetricType.counter, tags))
+
+    text = _read(exporter)
+    assert "# TYPE twindb_pipeline_bytes_out_total counter" in text
+    assert 'twindb_pipeline_bytes_out_total{source="mysql",stage="Gzip"} 150' in text
+
+
+def test_prometheus_exporter_histogram(exporter):
+    tags = {"stage": "S3"}
+    exporter.export_metrics(
+        [
+            Metric("pipeline.wall_time", 0.3, MetricType.timing, tags),
+            Metric("pipeline.wall_time", 42.0, MetricType.timing, tags),
+        ]
+    )
+
+    text = _read(exporter)
+    assert "# TYPE twindb_pipeline_wall_time_seconds histogram" in text
+    assert 'twindb_pipeline_wall_time_seconds_bucket{stage="S3",le="0.1"} 0' in text
+    assert 'twindb_pipeline_wall_time_seconds_bucket{stage="S3",le="0.5"} 1' in text
+    assert 'twindb_pipeline_wall_time_seconds_bucket{stage="S3",le="60"} 2' in text
+    assert 'twindb_pipeline_wall_time_seconds_bucket{stage="S3",le="+Inf"} 2' in text
+    assert 'twindb_pipeline_wall_time_seconds_sum{stage="S3"} 42.3' in text
+    assert 'twindb_pipeline_wall_time_seconds_count{stage="S3"} 2' in text
+
+
+def test_prometheus_exporter_gauges(exporter):
+    exporter.export_metric(Metric("copy.last_finished_timestamp_seconds", 10, tags={"run_type": "daily"}))
+    exporter.export_metric(Metric("copy.last_finished_timestamp_seconds", 5, tags={"run_type": "daily"}))
+    with mock.patch("twindb_backup.exporter.prometheus_exporter.time.time", return_value=1700000000):
+        exporter.export(ExportCategory.mysql, ExportMeasureType.backup, 12.5)
+
+    text = _read(exporter)
+    assert 'twindb_copy_last_finished_timestamp_seconds{run_type="daily"} 5' in text
+    assert "twindb_mysql_backup_time_seconds 12.5" in text
+    assert "twindb_mysql_backup_last_success_timestamp_seconds 1700000000" in text
+
+
+def test_prometheus_exporter_escapes_labels(exporter):
+    exporter.export_metric(Metric("foo", 1, tags={"path": 'a"b\\c'}))
+    assert 'twindb_foo{path="a\\"b\\\\c"} 1' in _read(exporter)
+
+
+def test_prometheus_exporter_invalid_data(exporter):
+    with pytest.raises(PrometheusExporterError):
+        exporter.export(ExportCategory.files, ExportMeasureType.backup, "foo")
+
+
+@mock.patch("twindb_backup.exporter.prometheus_exporter.urlopen")
+def test_prometheus_exporter_pushes(mock_urlopen, tmpdir):
+    exporter = PrometheusExporter(
+        textfile_dir=str(tmpdir.join("textfile")),
+        state_file=str(tmpdir.join("prometheus.json")),
+        pushgateway="http://localhost:9091/",
+    )
+    exporter.export_metric(Metric("foo", 1))
+
+    request = mock_urlopen.call_args[0][0]
+    assert request.get_method() == "PUT"
+    assert request.full_url.startswith("http://localhost:9091/metrics/job/twindb_backup/instance/")
+    assert b"twindb_foo 1" in request.data
+
+
+def test_prometheus_exporter_config(tmpdir):
+    cfg_file = tmpdir.join("twindb-backup.cfg")
+    cfg_file.write("[export]\ntransport=prometheus\ntextfile_dir=%s\npushgateway=http://gw:9091\n" % tmpdir)
+    exporter = TwinDBBackupConfig(config_file=str(cfg_file)).exporter
+
+    assert isinstance(exporter, PrometheusExporter)
+    assert exporter.textfile_path == str(tmpdir.join("twindb_backup.prom"))
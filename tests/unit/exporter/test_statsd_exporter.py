@@ -1,6 +1,7 @@
 import mock
 from statsd import StatsClient
 
+from twindb_backup.exporter.base_exporter import Metric, MetricType
 from twindb_backup.exporter.statsd_exporter import StatsdExporter
 
 
@@ -10,3 +11,23 @@ def test_stasd_exporter_constructor():
         assert exporter._suffix == "twindb."
         assert isinstance(exporter._client, StatsClient)
         mock_StatsClient_init.assert_called_once_with("localhost", 8125)
+
+
+def test_statsd_exporter_export_gauge():
+    with mock.patch.object(StatsClient, "gauge") as mock_gauge:
+        exporter = StatsdExporter("localhost", 8125)
+        exporter.export_gauge("bandwidth.bytes", 1024)
+        mock_gauge.assert_called_once_with("twindb.bandwidth.bytes", 1024)
+
+
+def test_statsd_exporter_export_metrics():
+    exporter = StatsdExporter("localhost", 8125)
+    with mock.patch.object(exporter, "_client") as mock_client:
+        exporter.export_metrics(
+            [
+                Metric("pipeline.bytes_out", 100, MetricType.counter, {"source": "mysql", "stage": "Gzip"}),
+                Metric("pipeline.wall_time", 1.5, MetricType.timing, {"source": "mysql", "stage": "Gzip"}),
+            ]
+        )
+        mock_client.incr.assert_called_once_with("twindb.pipeline.bytes_out.mysql.Gzip", 100)
+        mock_client.timing.assert_called_once_with("twindb.pipeline.wall_time.mysql.Gzip", 1.5)
@@ -0,0 +1,69 @@
+import gzip
+import io
+import os
+
+import mock
+import pytest
+
+from twindb_backup.modifiers.adaptive import AdaptiveCompressor, LevelController
+from twindb_backup.modifiers.pipeline import Pipeline
+
+
+@pytest.fixture
+def payload():
+    return os.urandom(1024) * 1000 + b"foo"
+
+
+def test_adaptive_compressor_output_is_gzip(payload):
+    compressor = AdaptiveCompressor(None, threads=2, block_size=100 * 1024)
+    pipeline = Pipeline(io.BytesIO(payload), [compressor], buffer_size=64 * 1024)
+    with pipeline.get_stream() as output:
+        compressed = output.read()
+
+    assert len(compressed) < len(payload)
+    assert gzip.decompress(compressed) == payload
+    assert pipeline.stats[0].bytes_in == len(payload)
+    assert pipeline.stats[0].bytes_out == len(compressed)
+
+
+def test_adaptive_compressor_empty_stream():
+    with Pipeline(io.BytesIO(b""), [AdaptiveCompressor(None)]).get_stream() as output:
+        assert output.read() == b""
+
+
+@mock.patch("twindb_backup.modifiers.adaptive.psutil.cpu_count", return_value=8)
+def test_adaptive_compressor_threads_capped_by_cpu_share(mock_cpu_count):
+    assert AdaptiveCompressor(None, threads=8, cpu_share=0.25)._threads == 2
+    assert AdaptiveCompressor(None, cpu_share=0.5)._threads == 4
+    assert AdaptiveCompressor(None, threads=1, cpu_share=0.5)._threads == 1
+
+
+@pytest.mark.parametrize(
+    "cpu_used, host_cpu, wait_share, level",
+    [
+        # Compression holds up the stream
+        (0.1, 10.0, 0.5, 4),
+        # The backup uses more CPU than allowed
+        (0.6, 10.0, 0.0, 4),
+        # The host is busy
+        (0.1, 95.0, 0.0, 4),
+        # The compressor keeps up and there is CPU to spare
+        (0.1, 10.0, 0.0, 6),
+        # Somewhere in between
+        (0.1, 10.0, 0.05, 5),
+    ],
+)
+def test_level_controller_adjust(cpu_used, host_cpu, wait_share, level):
+    controller = LevelController(min_level=1, max_level=9, cpu_share=0.5)
+    assert controller.level == 5
+    assert controller.adjust(cpu_used, host_cpu, wait_share) == level
+
+
+def test_level_controller_bounds():
+    controller = LevelController(min_level=3, max_level=4, cpu_share=0.5)
+    for _ in range(5):
+        controller.adjust(0.0, 0.0, 0.0)
+    assert controller.level == 4
+    for _ in range(5):
+        controller.adjust(1.0, 0.0, 0.0)
+    assert controller.level == 3
@@ -0,0 +1,101 @@
+import gzip
+import io
+
+import pytest
+
+from twindb_backup.modifiers.base import Modifier, ModifierException
+from twindb_backup.modifiers.gzip import Gzip
+from twindb_backup.modifiers.keeplocal import KeepLocal
+from twindb_backup.modifiers.pipeline import BufferRing, Pipeline
+
+
+class Upper(Modifier):
+    def modify(self, chunk):
+        return bytes(chunk).upper()
+
+
+class Broken(Modifier):
+    def modify(self, chunk):
+        raise IOError("broken stage")
+
+
+@pytest.fixture
+def payload():
+    return b"foo bar " * 1000
+
+
+def test_buffer_ring_acquire_after_close():
+    ring = BufferRing(count=1, size=8)
+    buf = ring.acquire()
+    assert len(buf) == 8
+    ring.close()
+    assert ring.acquire() is None
+
+
+def test_pipeline_without_modifiers(payload):
+    stream = io.BytesIO(payload)
+    with Pipeline(stream).get_stream() as output:
+        assert output.read() == payload
+
+
+def test_pipeline_in_process(payload, tmpdir):
+    local_copy = str(tmpdir.join("local"))
+    pipeline = Pipeline(
+        io.BytesIO(payload),
+        [Upper(None), KeepLocal(None, local_copy)],
+        buffer_size=100,
+        buffer_count=2,
+    )
+    with pipeline.get_stream() as output:
+        assert output.read(10) == b"FOO BAR FO"
+        assert output.read() == payload.upper()[10:]
+
+    with open(local_copy, "rb") as local_file:
+        assert local_file.read() == payload.upper()
+
+    assert [stats.name for stats in pipeline.stats] == ["Upper", "KeepLocal"]
+    assert pipeline.stats[0].bytes_in == len(payload)
+    assert pipeline.stats[1].bytes_out == len(payload)
+
+
+def test_pipeline_in_process_before_external(payload, tmpdir):
+    local_copy = str(tmpdir.join("local"))
+    pipeline = Pipeline(
+        io.BytesIO(payload),
+        [KeepLocal(None, local_copy), Gzip(None, level=1)],
+        buffer_size=100,
+    )
+    with pipeline.get_stream() as output:
+        assert gzip.decompress(output.read()) == payload
+
+    with open(local_copy, "rb") as local_file:
+        assert local_file.read() == payload
+
+
+def test_pipeline_external_before_in_process(payload, tmpdir):
+    local_copy = str(tmpdir.join("local"))
+    with open(str(tmpdir.join("in")), "wb") as in_file:
+        in_file.write(payload)
+
+    pipeline = Pipeline(
+        open(str(tmpdir.join("in")), "rb"),
+        [Gzip(None, level=1), KeepLocal(None, local_copy)],
+    )
+    with pipeline.get_stream() as output:
+        compressed = output.read()
+
+    assert gzip.decompress(compressed) == payload
+    with open(local_copy, "rb") as local_file:
+        assert local_file.read() == compressed
+
+    gzip_stats = pipeline.stats[0]
+    assert gzip_stats.name == "Gzip"
+    assert gzip_stats.bytes_in >= len(payload)
+    assert gzip_stats.bytes_out == len(compressed)
+    assert gzip_stats.stall_time == pytest.approx(gzip_stats.wall_time - gzip_stats.busy_time)
+
+
+def test_pipeline_raises_if_stage_fails(payload):
+    with pytest.raises(ModifierException):
+        with Pipeline(io.BytesIO(payload), [Broken(None)]).get_stream() as output:
+            output.read()
@@ -0,0 +1,59 @@
+import gzip
+
+import mock
+import pytest
+
+from twindb_backup.modifiers.bzip2 import Bzip2
+from twindb_backup.modifiers.exceptions import ModifierException
+from twindb_backup.modifiers.gpg import Gpg
+from twindb_backup.modifiers.gzip import Gzip
+from twindb_backup.modifiers.pigz import Pigz
+from twindb_backup.modifiers.revert import revert_modifiers, revert_pipeline
+from twindb_backup.modifiers.zstd import Zstd
+
+
+@pytest.mark.parametrize(
+    "name, which, modifiers",
+    [
+        ("mysql-2023-01-01_00_00_00.xbstream", None, []),
+        ("mysql-2023-01-01_00_00_00.xbstream.gz", None, [Gzip]),
+        ("mysql-2023-01-01_00_00_00.xbstream.gz", "/usr/bin/pigz", [Pigz]),
+        ("mysql-2023-01-01_00_00_00.xbstream.bz", None, [Bzip2]),
+        ("mysql-2023-01-01_00_00_00.xbstream.zst", None, [Zstd]),
+    ],
+)
+def test_revert_modifiers(name, which, modifiers):
+    with mock.patch("twindb_backup.modifiers.revert.shutil.which", return_value=which):
+        stages = revert_modifiers(name)
+    assert [type(stage.modifier) for stage in stages] == modifiers
+
+
+def test_revert_modifiers_decrypts_first(tmpdir):
+    keyring = tmpdir.join("keyring")
+    keyring.write("")
+    gpg = mock.Mock(recipient="a@a.com", keyring=str(keyring), secret_keyring=str(keyring))
+
+    with mock.patch("twindb_backup.modifiers.revert.shutil.which", return_value=None):
+        stages = revert_modifiers("files-2023-01-01_00_00_00.tar.gz.gpg", gpg=gpg)
+
+    assert [type(stage.modifier) for stage in stages] == [Gpg, Gzip]
+    assert [stage.stage_name for stage in stages] == ["Gpg", "Gzip"]
+
+
+def test_revert_modifiers_without_gpg_config():
+    with pytest.raises(ModifierException):
+        revert_modifiers("files-2023-01-01_00_00_00.tar.gz.gpg")
+
+
+def test_revert_pipeline(tmpdir):
+    payload = b"foo bar " * 100000
+    copy = tmpdir.join("files-2023-01-01_00_00_00.tar.gz")
+    copy.write_binary(gzip.compress(payload))
+
+    with mock.patch("twindb_backup.modifiers.revert.shutil.which", return_value=None):
+        pipeline = revert_pipeline(open(str(copy), "rb"), copy.basename)
+    with pipeline.get_stream() as output:
+        assert output.read() == payload
+
+    assert [stats.name for stats in pipeline.stats] == ["Gzip"]
+    assert pipeline.stats[0].wall_time > 0
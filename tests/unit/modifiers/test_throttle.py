@@ -0,0 +1,123 @@
+import io
+import threading
+
+import mock
+import pytest
+
+from twindb_backup.modifiers.exceptions import ModifierException
+from twindb_backup.modifiers.throttle import TokenBucket, parse_rate, parse_schedule, throttle_stream
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("0", 0), ("1000", 1000), ("10K", 10240), ("1.5M", 1572864), ("2g", 2147483648), ("8MB/s", 8388608)],
+)
+def test_parse_rate(value, expected):
+    assert parse_rate(value) == expected
+
+
+@pytest.mark.parametrize("value", ["fast", "-1", "10T"])
+def test_parse_rate_invalid(value):
+    with pytest.raises(ModifierException):
+        parse_rate(value)
+
+
+def test_parse_schedule():
+    assert parse_schedule("09:00-18:30=10M 22:00-06:00=0") == [(540, 1110, 10485760), (1320, 360, 0)]
+    assert parse_schedule(None) == []
+    with pytest.raises(ModifierException):
+        parse_schedule("25:00-06:00=1M")
+
+
+@pytest.mark.parametrize(
+    "hour, expected",
+    [(10, 100), (20, 1000), (23, 0), (3, 0), (7, 1000)],
+)
+def test_token_bucket_schedule(hour, expected):
+    bucket = TokenBucket(1000, schedule=parse_schedule("09:00-18:00=100 22:00-06:00=0"))
+    with mock.patch("twindb_backup.modifiers.throttle.time.localtime") as mock_localtime:
+        mock_localtime.return_value.tm_hour = hour
+        mock_localtime.return_value.tm_min = 0
+        assert bucket.rate == expected
+
+
+@mock.patch("twindb_backup.modifiers.throttle.time")
+def test_token_bucket_waits_for_tokens(mock_time):
+    clock = [0.0]
+    mock_time.monotonic.side_effect = lambda: clock[0]
+    mock_time.time.side_effect = lambda: clock[0]
+    mock_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+    bucket = TokenBucket(1000, burst=500)
+
+    bucket.consume(500)
+    assert clock[0] == 0
+    bucket.consume(1500)
+    assert clock[0] == pytest.approx(1.5)
+    assert bucket.counters["bytes"] == 2000
+    assert bucket.counters["throttled_time"] == pytest.approx(1.5)
+
+
+def test_token_bucket_unlimited():
+    bucket = TokenBucket(0)
+    bucket.consume(10**12)
+    assert bucket.counters["bytes"] == 10**12
+    assert bucket.counters["throttled_time"] == 0
+
+
+def test_token_bucket_shared():
+    assert TokenBucket.shared(1000) is TokenBucket.shared(1000)
+    assert TokenBucket.shared(1000) is not TokenBucket.shared(1000, burst=10)
+
+
+@mock.patch("twindb_backup.modifiers.throttle.time")
+def test_token_bucket_shared_by_processes(mock_time, tmpdir):
+    clock = [0.0]
+    mock_time.monotonic.side_effect = lambda: clock[0]
+    mock_time.time.side_effect = lambda: clock[0]
+    mock_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+    state_file = str(tmpdir.join("run", "bandwidth.state"))
+    backup = TokenBucket(1000, burst=500, state_file=state_file)
+    restore = TokenBucket(1000, burst=500, state_file=state_file)
+
+    backup.consume(500)
+    restore.consume(500)
+
+    assert clock[0] == pytest.approx(0.5)
+    assert restore.counters["throttled_time"] == pytest.approx(0.5)
+    assert backup.counters["throttled_time"] == 0
+
+
+def test_token_bucket_state_file_fallback(tmpdir):
+    state_dir = tmpdir.join("state")
+    state_dir.write("not a directory")
+    bucket = TokenBucket(1000, burst=500, state_file=str(state_dir.join("bandwidth.state")))
+
+    bucket.consume(100)
+    assert bucket.counters["bytes"] == 100
+
+
+def test_token_bucket_limits_concurrent_streams():
+    bucket = TokenBucket(1000, burst=100)
+    threads = [threading.Thread(target=bucket.consume, args=(150,)) for _ in range(2)]
+    with mock.patch("twindb_backup.modifiers.throttle.time.sleep") as mock_sleep:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    # 300 bytes with 100 bytes burst need at least 0.2 seconds at 1000 B/s
+    assert sum(call[0][0] for call in mock_sleep.call_args_list) >= 0.19
+
+
+def test_throttle_stream():
+    bucket = TokenBucket(0)
+    data = b"x" * 3000000
+    stream = throttle_stream(io.BytesIO(data), bucket)
+    with stream as output:
+        assert output.fileno() >= 0
+        assert output.read() == data
+    assert bucket.counters["bytes"] == len(data)
+
+
+def test_throttle_stream_no_bucket():
+    stream = io.BytesIO(b"foo")
+    assert throttle_stream(stream, None) is stream
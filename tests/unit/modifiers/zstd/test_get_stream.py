@@ -0,0 +1,42 @@
+from subprocess import PIPE
+
+import mock
+import pytest
+
+from twindb_backup.modifiers import Zstd
+
+
+@pytest.mark.parametrize(
+    "kwargs, cmd",
+    [
+        ({}, ["zstd", "-q", "-3", "-T0", "-c", "-"]),
+        ({"level": 1, "threads": 4}, ["zstd", "-q", "-1", "-T4", "-c", "-"]),
+        ({"level": 22, "long_window": 30}, ["zstd", "-q", "--ultra", "-22", "-T0", "--long=30", "-c", "-"]),
+        ({"long_window": 0}, ["zstd", "-q", "-3", "-T0", "--long", "-c", "-"]),
+        ({"rsyncable": True}, ["zstd", "-q", "-3", "-T0", "--rsyncable", "-c", "-"]),
+    ],
+)
+@mock.patch("twindb_backup.modifiers.base.Popen")
+def test_get_stream(mock_popen, kwargs, cmd):
+    mock_stream = mock.MagicMock()
+
+    m = Zstd(mock_stream, **kwargs)
+    with m.get_stream():
+        mock_popen.assert_called_once_with(cmd, stdin=mock_stream.__enter__(), stdout=PIPE, stderr=PIPE)
+
+
+@mock.patch("twindb_backup.modifiers.base.Popen")
+def test_revert_stream(mock_popen):
+    mock_popen.return_value.communicate.return_value = (None, None)
+    mock_popen.return_value.returncode = 0
+    mock_stream = mock.MagicMock()
+
+    m = Zstd(mock_stream, long_window=30)
+    with m.revert_stream():
+        mock_popen.assert_called_once_with(
+            ["zstd", "-q", "-d", "--long=30", "-c"], stdin=mock_stream.__enter__(), stdout=PIPE, stderr=PIPE
+        )
+
+
+def test_suffix():
+    assert Zstd(None).suffix == ".zst"
@@ -0,0 +1,39 @@
+import mock
+import pytest
+
+from twindb_backup.copy.file_copy import FileCopy
+from twindb_backup.exceptions import TwinDBBackupError
+from twindb_backup.restore import get_files_parent
+
+
+def _config(files):
+    config = mock.Mock()
+    config.destination.return_value.remote_path = "s3://bucket"
+    config.destination.return_value.list_files.return_value = files
+    return config
+
+
+INCREMENTAL = "s3://bucket/master1/hourly/files/_data-2023-01-02_10_00_00.inc-daily-2023-01-02_00_00_00.tar.gz"
+
+
+def test_get_files_parent():
+    config = _config(["s3://bucket/master1/daily/files/_data-2023-01-02_00_00_00.tar.gz"])
+
+    parent = get_files_parent(config, FileCopy(path=INCREMENTAL))
+
+    assert parent.key == "master1/daily/files/_data-2023-01-02_00_00_00.tar.gz"
+    config.destination.return_value.list_files.assert_called_once_with(
+        "s3://bucket/master1/daily/files/_data-2023-01-02_00_00_00.tar", recursive=True, files_only=True
+    )
+
+
+def test_get_files_parent_raises():
+    # An older full copy must not be taken for the deleted parent
+    config = _config([])
+    config.destination.return_value.list_files.side_effect = lambda prefix, **kwargs: [
+        path
+        for path in ["s3://bucket/master1/weekly/files/_data-2023-01-01_00_00_00.tar.gz"]
+        if path.startswith(prefix)
+    ]
+    with pytest.raises(TwinDBBackupError):
+        get_files_parent(config, FileCopy(path=INCREMENTAL))
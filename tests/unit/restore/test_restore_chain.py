@@ -0,0 +1,101 @@
+import mock
+import pytest
+
+from twindb_backup.copy.mysql_copy import MySQLCopy
+from twindb_backup.exceptions import TwinDBBackupError
+from twindb_backup.restore import _restore_chain, chain_state_key, get_incremental_chain, restore_from_mysql
+from twindb_backup.status.mysql_status import MySQLStatus
+
+
+def _copy(name, lsn, parent=None):
+    return MySQLCopy(
+        "master1",
+        "hourly" if parent else "daily",
+        name,
+        backup_started=lsn,
+        backup_finished=lsn + 1,
+        type="incremental" if parent else "full",
+        lsn=lsn,
+        parent=parent,
+    )
+
+
+@pytest.fixture
+def chain():
+    full = _copy("full.xbstream.gz", 10)
+    inc1 = _copy("inc1.xbstream.gz", 20, parent=full.key)
+    inc2 = _copy("inc2.xbstream.gz", 30, parent=inc1.key)
+    return [full, inc1, inc2]
+
+
+def test_get_incremental_chain(chain):
+    status = MySQLStatus()
+    for copy in chain:
+        status.add(copy)
+
+    assert [c.key for c in get_incremental_chain(status, chain[2])] == [c.key for c in chain]
+
+
+def test_get_incremental_chain_broken(chain):
+    status = MySQLStatus()
+    status.add(chain[2])
+
+    with pytest.raises(TwinDBBackupError):
+        get_incremental_chain(status, chain[2])
+
+
+@mock.patch("twindb_backup.restore._xtrabackup_prepare", return_value=True)
+@mock.patch("twindb_backup.restore.restore_from_mysql_incremental", return_value=True)
+@mock.patch("twindb_backup.restore.restore_from_mysql_full", return_value=True)
+def test_restore_chain_from_cached_state(mock_full, mock_inc, mock_prepare, chain, tmpdir):
+    cache = mock.MagicMock()
+    cache.__contains__.side_effect = lambda key: key == chain_state_key(chain[0], 20)
+    config = mock.Mock(bandwidth=None)
+
+    _restore_chain(config, mock.Mock(), chain, str(tmpdir), cache=cache)
+
+    cache.restore_in.assert_called_once_with("full.xbstream.gz.lsn-20", str(tmpdir))
+    mock_full.assert_not_called()
+    assert mock_inc.call_count == 1
+    assert mock_inc.call_args.kwargs["redo_only"] is True
+    cache.add.assert_called_once_with(str(tmpdir), "full.xbstream.gz.lsn-30")
+    mock_prepare.assert_called_once()
+
+
+@mock.patch("twindb_backup.restore._xtrabackup_prepare", return_value=True)
+@mock.patch("twindb_backup.restore.restore_from_mysql_incremental", return_value=True)
+@mock.patch("twindb_backup.restore.restore_from_mysql_full", return_value=True)
+def test_restore_chain_without_cache(mock_full, mock_inc, mock_prepare, chain, tmpdir):
+    _restore_chain(mock.Mock(bandwidth=None), mock.Mock(), chain, str(tmpdir))
+
+    assert mock_full.call_args.kwargs["redo_only"] is True
+    assert [call.kwargs["redo_only"] for call in mock_inc.call_args_list] == [True, False]
+    mock_prepare.assert_not_called()
+
+
+@mock.patch("twindb_backup.restore.restore_from_mysql_incremental", return_value=False)
+@mock.patch("twindb_backup.restore.restore_from_mysql_full", return_value=True)
+def test_restore_chain_failed_step_is_not_cached(mock_full, mock_inc, chain, tmpdir):
+    cache = mock.MagicMock()
+    cache.__contains__.return_value = False
+
+    with pytest.raises(TwinDBBackupError):
+        _restore_chain(mock.Mock(bandwidth=None), mock.Mock(), chain, str(tmpdir), cache=cache)
+
+    cache.add.assert_called_once_with(str(tmpdir), "full.xbstream.gz.lsn-10")
+
+
+@mock.patch("twindb_backup.restore.update_grastate")
+@mock.patch("twindb_backup.restore.export_info")
+@mock.patch("twindb_backup.restore.MySQLStatus")
+@mock.patch("twindb_backup.restore.restore_from_mysql_full", return_value=False)
+def test_restore_from_mysql_full_fails_without_cache(
+    mock_full, mock_status, mock_export_info, mock_grastate, chain, tmpdir
+):
+    mock_status.return_value.__getitem__.return_value = chain[0]
+    config = mock.Mock(keep_local_path=None, bandwidth=None)
+
+    with pytest.raises(TwinDBBackupError):
+        restore_from_mysql(config, chain[0], str(tmpdir))
+
+    mock_export_info.assert_not_called()
@@ -0,0 +1,68 @@
+import mock
+
+from twindb_backup.configuration.mysql import MySQLConfig
+from twindb_backup.restore import _extract_xbstream, _xtrabackup_prepare, get_prepare_memory, get_restore_parallel
+
+
+def _config(**kwargs):
+    config = mock.Mock()
+    config.mysql = MySQLConfig(**kwargs)
+    return config
+
+
+@mock.patch("twindb_backup.restore.psutil.cpu_count", return_value=16)
+@mock.patch("twindb_backup.restore.get_free_memory", return_value=1024)
+def test_restore_resources_auto(mock_free_memory, mock_cpu_count):
+    config = _config()
+    assert get_restore_parallel(config) == 16
+    assert get_prepare_memory(config) == 1024
+
+
+def test_restore_resources_configured():
+    config = _config(restore_parallel="4", restore_use_memory="1M")
+    assert get_restore_parallel(config) == 4
+    assert get_prepare_memory(config) == 1024**2
+
+
+@mock.patch("twindb_backup.restore.export_metrics")
+@mock.patch("twindb_backup.restore.Popen")
+def test_xtrabackup_prepare(mock_popen, mock_export_metrics):
+    mock_popen.return_value.__enter__.return_value.returncode = 0
+    config = _config(restore_parallel="4", restore_use_memory="1M")
+
+    assert _xtrabackup_prepare(config, "xtrabackup", "/foo", redo_only=True, incremental_dir="/bar")
+    mock_popen.assert_called_once_with(
+        [
+            "xtrabackup",
+            "--use-memory=1048576",
+            "--parallel=4",
+            "--prepare",
+            "--apply-log-only",
+            "--target-dir=/foo",
+            "--incremental-dir=/bar",
+        ],
+        stdout=None,
+        stderr=None,
+    )
+    metric = mock_export_metrics.call_args[0][1][0]
+    assert metric.name == "restore.prepare_time"
+    assert metric.tags == {"source": "mysql", "step": "apply_log_only"}
+
+
+@mock.patch("twindb_backup.restore.export_metrics")
+@mock.patch("twindb_backup.restore.Popen")
+def test_xtrabackup_prepare_fails(mock_popen, mock_export_metrics):
+    mock_popen.return_value.__enter__.return_value.returncode = 1
+
+    assert not _xtrabackup_prepare(_config(restore_parallel="4"), "xtrabackup", "/foo")
+    mock_export_metrics.assert_not_called()
+
+
+@mock.patch("twindb_backup.restore.Popen")
+def test_extract_xbstream_parallel(mock_popen):
+    mock_proc = mock_popen.return_value.__enter__.return_value
+    mock_proc.communicate.return_value = (b"", b"")
+    mock_proc.returncode = 0
+
+    assert _extract_xbstream("stream", "/foo", "xbstream", parallel=8)
+    assert mock_popen.call_args[0][0] == ["xbstream", "-x", "--parallel=8"]
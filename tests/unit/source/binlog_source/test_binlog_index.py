@@ -0,0 +1,73 @@
+import pytest
+
+from twindb_backup.source.binlog_source import BinlogIndex
+from twindb_backup.source.exceptions import BinlogSourceError
+
+SERVER_UUID = "e129feb2-980b-11e8-bcfd-08002737f846"
+
+
+def test_build(mysql_bin_000001):
+    index = BinlogIndex.build(mysql_bin_000001)
+
+    assert index.name == "mysql-bin.000001"
+    assert index.first_timestamp == 1533403742
+    assert index.last_timestamp == 1533425188
+    assert index.last_event_position == 46860
+    assert index.end_position == 46883
+    assert index.gtid_set == SERVER_UUID + ":1-97"
+    assert index.event_counts[33] == 97
+    assert index.transactions[0] == [1533403743, 151]
+
+
+def test_build_truncated(mysql_bin_000001):
+    with open(mysql_bin_000001, "rb+") as binlog:
+        binlog.truncate(46882)
+
+    index = BinlogIndex.build(mysql_bin_000001)
+    assert index.end_position == 46860
+    assert index.last_event_position < 46860
+
+
+def test_build_empty(tmpdir):
+    binlog = tmpdir.join("mysql-bin.000002")
+    binlog.write(b"\xfebin", mode="wb")
+
+    index = BinlogIndex.build(str(binlog))
+    assert index.end_position == 4
+    assert index.first_timestamp is None
+    assert index.gtid_set == ""
+
+
+def test_build_raises():
+    with pytest.raises(BinlogSourceError):
+        BinlogIndex.build("foo")
+
+
+def test_json(mysql_bin_000001):
+    index = BinlogIndex.build(mysql_bin_000001)
+    loaded = BinlogIndex.from_json(index.to_json())
+
+    assert loaded.to_json() == index.to_json()
+    assert loaded.event_counts == index.event_counts
+
+
+def test_contains_gtid(mysql_bin_000001):
+    index = BinlogIndex.build(mysql_bin_000001)
+
+    assert index.contains_gtid(SERVER_UUID + ":1")
+    assert index.contains_gtid(SERVER_UUID.upper() + ":97")
+    assert not index.contains_gtid(SERVER_UUID + ":98")
+
+
+@pytest.mark.parametrize(
+    "timestamp, position",
+    [
+        (1533403742, 151),
+        (1533403743, 6666),
+        (1533403746, 43566),
+        (1533425188, 46883),
+    ],
+)
+def test_stop_position(mysql_bin_000001, timestamp, position):
+    index = BinlogIndex.build(mysql_bin_000001)
+    assert index.stop_position(timestamp) == position
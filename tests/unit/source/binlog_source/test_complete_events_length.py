@@ -0,0 +1,18 @@
+from twindb_backup.source.binlog_source import BinlogParser, complete_events_length
+
+
+def test_complete_events_length(mysql_bin_000001):
+    with open(str(mysql_bin_000001), "rb") as binlog:
+        data = binlog.read()
+    last_event = BinlogParser(str(mysql_bin_000001)).end_position
+
+    assert complete_events_length(data, 0) == len(data)
+    assert complete_events_length(data[:-1], 0) == last_event
+    assert complete_events_length(data[4:], 4) == len(data) - 4
+    assert complete_events_length(data[last_event:-1], last_event) == 0
+
+
+def test_complete_events_length_short_data():
+    assert complete_events_length(b"", 0) == 0
+    assert complete_events_length(b"\xfebin", 0) == 4
+    assert complete_events_length(b"\xfebin" + b"x" * 10, 0) == 4
@@ -0,0 +1,96 @@
+import socket
+from errno import ENOENT
+
+import mock
+import pytest
+from paramiko import SSHException
+
+from twindb_backup.ssh.client import SshClient, SshConnectionPool
+from twindb_backup.ssh.exceptions import SshClientException
+
+
+@mock.patch("twindb_backup.ssh.client.SSHClient")
+def test_pool_reuses_connection(mock_client):
+    pool = SshConnectionPool(keepalive=10)
+    client = SshClient(host="foo", pool=pool)
+
+    with client._shell() as shell1:
+        pass
+    with client._shell() as shell2:
+        pass
+
+    assert shell1 is shell2
+    mock_client.return_value.connect.assert_called_once_with(
+        hostname="foo", key_filename="/root/.id_rsa", port=22, username="root"
+    )
+    mock_client.return_value.get_transport.return_value.set_keepalive.assert_called_once_with(10)
+    mock_client.return_value.close.assert_not_called()
+
+
+@mock.patch("twindb_backup.ssh.client.SSHClient")
+def test_pool_reconnects_inactive(mock_client):
+    pool = SshConnectionPool()
+    shell = pool.get("foo", 22, "root", "key")
+    shell.get_transport.return_value.is_active.return_value = False
+
+    pool.get("foo", 22, "root", "key")
+
+    shell.close.assert_called_once_with()
+    assert mock_client.return_value.connect.call_count == 2
+
+
+@mock.patch("twindb_backup.ssh.client.SSHClient")
+def test_pool_drops_connection_of_parent(mock_client):
+    pool = SshConnectionPool()
+    pool.get("foo", 22, "root", "key")
+    with mock.patch("twindb_backup.ssh.client.os.getpid", return_value=-1):
+        pool.get("foo", 22, "root", "key")
+        pool.close()
+
+    assert mock_client.return_value.connect.call_count == 2
+    assert mock_client.return_value.close.call_count == 1
+
+
+@mock.patch("twindb_backup.ssh.client.SSHClient")
+def test_pool_connect_fails(mock_client):
+    mock_client.return_value.connect.side_effect = socket.error("refused")
+
+    with pytest.raises(SshClientException):
+        SshConnectionPool().get("foo", 22, "root", "key")
+    mock_client.return_value.close.assert_called_once_with()
+
+
+@mock.patch("twindb_backup.ssh.client.SSHClient")
+def test_shell_discards_broken_connection(mock_client):
+    pool = SshConnectionPool()
+    client = SshClient(host="foo", pool=pool)
+
+    with pytest.raises(SshClientException):
+        with client._shell() as shell:
+            shell.get_transport.return_value.is_active.return_value = False
+            raise SSHException("connection reset")
+
+    shell.get_transport.return_value.is_active.return_value = True
+    with client._shell():
+        pass
+    assert mock_client.return_value.connect.call_count == 2
+
+
+@mock.patch("twindb_backup.ssh.client.SSHClient")
+def test_shell_wraps_socket_error(mock_client):
+    client = SshClient(host="foo", pool=SshConnectionPool())
+
+    with pytest.raises(SshClientException):
+        with client._shell():
+            raise socket.error("broken pipe")
+
+
+@mock.patch("twindb_backup.ssh.client.SSHClient")
+def test_shell_keeps_missing_file_error(mock_client):
+    client = SshClient(host="foo", pool=SshConnectionPool())
+
+    with pytest.raises(IOError) as err:
+        with client._shell():
+            raise IOError(ENOENT, "No such file")
+    assert err.value.errno == ENOENT
+    mock_client.return_value.close.assert_not_called()
@@ -1,6 +1,7 @@
 import mock
 import pytest
 
+from twindb_backup import STATUS_WRITE_VERSION
 from twindb_backup.status.base_status import BaseStatus
 from twindb_backup.status.exceptions import CorruptedStatus
 
@@ -19,7 +20,7 @@ def test_init_empty_raises():
 @mock.patch.object(BaseStatus, "_load")
 def test_init_unpacks(mock_load, status_raw_content):
     status = BaseStatus(content=status_raw_content)
-    assert status.version == 1
+    assert status.version == STATUS_WRITE_VERSION
     mock_load.assert_called_once_with(
         "{\r\n"
         '    "hourly": {\r\n'
@@ -56,7 +57,7 @@ def test_invalid_content_raises(status_raw_content_with_invalid_hash):
 @mock.patch.object(BaseStatus, "_load")
 def test_init_reads_deprecated(mock_load, deprecated_status_raw_content):
     status = BaseStatus(content=deprecated_status_raw_content)
-    assert status.version == 1
+    assert status.version == STATUS_WRITE_VERSION
     mock_load.assert_called_once_with(
         "        {\r\n"
         '              "monthly": {},\r\n'
@@ -1,9 +1,10 @@
+from twindb_backup import STATUS_WRITE_VERSION
 from twindb_backup.status.binlog_status import BinlogStatus
 
 
 def test_init_not_empty(raw_binlog_status):
     instance = BinlogStatus(raw_binlog_status)
-    assert instance.version == 1
+    assert instance.version == STATUS_WRITE_VERSION
     assert len(instance) == 5
 
 
@@ -1,5 +1,7 @@
+import json
 from copy import deepcopy
 
+from twindb_backup import STATUS_FORMAT_VERSION
 from twindb_backup.status.binlog_status import BinlogStatus
 
 
@@ -18,3 +20,8 @@ def test_serialize(raw_binlog_status):
     status_converted = status_original.serialize()
 
     assert BinlogStatus(content=status_converted) == status_original
+
+
+def test_serialize_indexes_copies(raw_binlog_status):
+    serialized = json.loads(BinlogStatus(raw_binlog_status).serialize(version=STATUS_FORMAT_VERSION))
+    assert "master1/binlog/mysqlbin001.bin" in serialized["status"]["copies"]
@@ -1,4 +1,7 @@
+import pytest
+
 from twindb_backup.copy.mysql_copy import MySQLCopy
+from twindb_backup.status.exceptions import StatusKeyNotFound
 from twindb_backup.status.mysql_status import MySQLStatus
 
 
@@ -23,3 +26,16 @@ def test_get_item_returns_copy_by_basename_unicode(
     assert copy.run_type == "hourly"
     assert copy.host == "master1"
     assert copy.name == "mysql-2018-03-28_04_11_16.xbstream.gz"
+
+
+def test_get_item_after_add_and_remove(deprecated_status_raw_content):
+    status = MySQLStatus(deprecated_status_raw_content)
+    copy = MySQLCopy("master1", "daily", "foo.xbstream.gz", backup_started=1, backup_finished=2, type="full")
+    status.add(copy)
+    assert status[copy.key] is copy
+    assert status.daily[copy.key] is copy
+
+    status.remove(copy.key)
+    with pytest.raises(StatusKeyNotFound):
+        status[copy.key]
+    assert copy.key not in status.daily
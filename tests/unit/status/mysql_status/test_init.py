@@ -3,7 +3,7 @@ from base64 import b64encode
 
 import pytest
 
-from twindb_backup import INTERVALS, LOG, STATUS_FORMAT_VERSION
+from twindb_backup import INTERVALS, LOG, STATUS_WRITE_VERSION
 from twindb_backup.copy.mysql_copy import MySQLCopy
 from twindb_backup.status.exceptions import CorruptedStatus
 from twindb_backup.status.mysql_status import MySQLStatus
@@ -11,14 +11,14 @@ from twindb_backup.status.mysql_status import MySQLStatus
 
 def test_init_creates_empty():
     status = MySQLStatus()
-    assert status.version == STATUS_FORMAT_VERSION
+    assert status.version == STATUS_WRITE_VERSION
     for i in INTERVALS:
         assert getattr(status, i) == {}
 
 
 def test_init_creates_instance_from_old(deprecated_status_raw_content):
     status = MySQLStatus(deprecated_status_raw_content)
-    assert status.version == STATUS_FORMAT_VERSION
+    assert status.version == STATUS_WRITE_VERSION
     key = "master1/hourly/mysql/mysql-2018-03-28_04_11_16.xbstream.gz"
     copy = MySQLCopy(
         "master1",
@@ -59,7 +59,7 @@ pid-file=/var/run/mysqld/mysqld.pid
 
 def test_init_creates_instance_from_new(status_raw_content):
     status = MySQLStatus(status_raw_content)
-    assert status.version == STATUS_FORMAT_VERSION
+    assert status.version == STATUS_WRITE_VERSION
     key = "master1/hourly/mysql/mysql-2018-03-28_04_11_16.xbstream.gz"
     copy = MySQLCopy(
         "master1",
@@ -143,7 +143,7 @@ def test_init_invalid_json(invalid_deprecated_status_raw_content):
 
 def test_init_with_new_format(status_raw_content):
     status = MySQLStatus(status_raw_content)
-    assert status.version == 1
+    assert status.version == STATUS_WRITE_VERSION
 
 
 def test_init_with_new_format_with_wrong_checksum(
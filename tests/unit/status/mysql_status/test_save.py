@@ -0,0 +1,60 @@
+from twindb_backup.copy.mysql_copy import MySQLCopy
+from twindb_backup.destination.local import Local
+from twindb_backup.status.cache import StatusCache
+from twindb_backup.status.mysql_status import MySQLStatus
+
+
+def _copy(name, started):
+    return MySQLCopy("master1", "daily", name, backup_started=started, backup_finished=started + 1, type="full")
+
+
+def test_save_without_cache_writes(tmpdir):
+    dst = Local(str(tmpdir.mkdir("dst")))
+    tmpdir.join("dst").mkdir("master1")
+    status = MySQLStatus(dst=dst, status_directory="master1")
+    status.add(_copy("foo", 100))
+    status.save(dst)
+
+    assert MySQLStatus(dst=dst, status_directory="master1") == status
+
+
+def test_save_merges_concurrent_updates(tmpdir):
+    dst = Local(str(tmpdir.mkdir("dst")))
+    tmpdir.join("dst").mkdir("master1")
+    cache = StatusCache(str(tmpdir.join("cache")))
+    old = _copy("old", 50)
+    status = MySQLStatus(status_directory="master1", cache=cache)
+    status.add(old)
+    status.save(dst)
+
+    status_a = MySQLStatus(dst=dst, status_directory="master1", cache=cache)
+    status_b = MySQLStatus(dst=dst, status_directory="master1", cache=cache)
+    copy_a = _copy("foo", 100)
+    copy_b = _copy("bar", 200)
+    status_a.add(copy_a)
+    status_a.save(dst)
+    status_b.add(copy_b)
+    status_b.remove(old.key)
+    status_b.save(dst)
+
+    result = MySQLStatus(dst=dst, status_directory="master1")
+    assert copy_a.key in result.daily
+    assert copy_b.key in result.daily
+    assert old.key not in result.daily
+    assert status_b == result
+
+
+def test_save_to_other_destination_doesnt_merge(tmpdir):
+    dst = Local(str(tmpdir.mkdir("dst")))
+    tmpdir.join("dst").mkdir("master1")
+    local_dst = Local(str(tmpdir.mkdir("local")))
+    tmpdir.join("local").mkdir("master1")
+    cache = StatusCache(str(tmpdir.join("cache")))
+    MySQLStatus(status_directory="master1", cache=cache).save(local_dst)
+
+    status = MySQLStatus(status_directory="master1", cache=cache)
+    status.add(_copy("foo", 100))
+    status.save(dst)
+    status.save(local_dst)
+
+    assert MySQLStatus(dst=local_dst, status_directory="master1") == status
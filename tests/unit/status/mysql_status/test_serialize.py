@@ -1,6 +1,12 @@
+import hashlib
 import json
+from base64 import b64decode
 from copy import deepcopy
 
+import pytest
+
+from twindb_backup import INTERVALS, STATUS_FORMAT_VERSION, STATUS_WRITE_VERSION
+from twindb_backup.status.exceptions import CorruptedStatus
 from twindb_backup.status.mysql_status import MySQLStatus
 
 
@@ -52,3 +58,60 @@ def test_serialize_is_valid(status_raw_content):
     assert "status" in dict_from_status
     assert "version" in dict_from_status
     assert "md5" in dict_from_status
+
+
+def test_serialize_indexes_copies(deprecated_status_raw_content):
+    status = MySQLStatus(content=deprecated_status_raw_content)
+    serialized = json.loads(status.serialize(version=STATUS_FORMAT_VERSION))
+
+    assert serialized["version"] == STATUS_FORMAT_VERSION
+    copies = serialized["status"]["copies"]
+    key = "master1/hourly/mysql/mysql-2018-03-28_04_11_16.xbstream.gz"
+    assert copies["hourly"][key]["lsn"] == 19903207
+    assert set(copies) == set(INTERVALS)
+
+
+def test_serialize_deduplicates_configs(deprecated_status_raw_content):
+    status = MySQLStatus(content=deprecated_status_raw_content)
+    catalog = json.loads(status.serialize(version=STATUS_FORMAT_VERSION))["status"]
+
+    # Both copies have the same my.cnf, it's stored once.
+    assert len(catalog["configs"]) == 1
+    digest = list(catalog["configs"])[0]
+    for copies in catalog["copies"].values():
+        for value in copies.values():
+            assert value["config"] == {"/etc/my.cnf": digest}
+    assert catalog["configs"][digest].startswith("[mysqld]")
+
+
+def test_serialize_writes_version_1(status_raw_content):
+    status = MySQLStatus(content=status_raw_content)
+    serialized = json.loads(status.serialize())
+
+    # Releases before 3.3.0 read only this layout
+    assert serialized["version"] == STATUS_WRITE_VERSION == 1
+    assert serialized["md5"] == hashlib.md5(serialized["status"].encode("utf-8")).hexdigest()
+    assert json.loads(b64decode(serialized["status"])) == json.loads(str(status))
+
+
+@pytest.mark.parametrize("version", [1, STATUS_FORMAT_VERSION])
+def test_serialize_round_trip(status_raw_content, version):
+    status = MySQLStatus(content=status_raw_content)
+
+    assert MySQLStatus(content=status.serialize(version=version)) == status
+
+
+def test_serialize_wrong_checksum(status_raw_content):
+    serialized = json.loads(MySQLStatus(content=status_raw_content).serialize(version=STATUS_FORMAT_VERSION))
+    serialized["status"]["copies"]["hourly"] = {}
+
+    with pytest.raises(CorruptedStatus):
+        MySQLStatus(content=json.dumps(serialized))
+
+
+def test_serialize_unknown_version(status_raw_content):
+    serialized = json.loads(MySQLStatus(content=status_raw_content).serialize())
+    serialized["version"] = STATUS_FORMAT_VERSION + 1
+
+    with pytest.raises(CorruptedStatus):
+        MySQLStatus(content=json.dumps(serialized))
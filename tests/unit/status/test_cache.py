@@ -0,0 +1,66 @@
+import mock
+import pytest
+
+from twindb_backup.destination.exceptions import FileNotFound
+from twindb_backup.destination.local import Local
+from twindb_backup.status.cache import StatusCache
+
+
+def test_read_caches_content(tmpdir):
+    dst = Local(str(tmpdir.mkdir("dst")))
+    dst.write("foo", "status")
+    cache = StatusCache(str(tmpdir.join("cache")))
+
+    content, version = cache.read(dst, "status")
+    assert content == "foo"
+    assert version == dst.version("status")
+
+    with mock.patch.object(Local, "read") as mock_read:
+        assert cache.read(dst, "status") == ("foo", version)
+        mock_read.assert_not_called()
+
+
+def test_read_revalidates(tmpdir):
+    dst = Local(str(tmpdir.mkdir("dst")))
+    dst.write("foo", "status")
+    cache = StatusCache(str(tmpdir.join("cache")))
+    cache.read(dst, "status")
+
+    dst.write("foobar", "status")
+    assert cache.read(dst, "status") == ("foobar", dst.version("status"))
+
+
+def test_read_missing_raises(tmpdir):
+    dst = Local(str(tmpdir.mkdir("dst")))
+    cache = StatusCache(str(tmpdir.join("cache")))
+    with pytest.raises((FileNotFound, FileNotFoundError)):
+        cache.read(dst, "status")
+
+
+def test_write_through(tmpdir):
+    dst = Local(str(tmpdir.mkdir("dst")))
+    cache = StatusCache(str(tmpdir.join("cache")))
+
+    version = cache.write(dst, "status", "foo")
+    assert dst.read("status") == "foo"
+    assert version == dst.version("status")
+
+    with mock.patch.object(Local, "read") as mock_read:
+        assert cache.read(dst, "status") == ("foo", version)
+        mock_read.assert_not_called()
+
+
+def test_unversioned_destination_isnt_cached(tmpdir):
+    dst = mock.Mock(remote_path="/foo")
+    dst.read_if_modified.return_value = ("foo", None)
+    cache = StatusCache(str(tmpdir.join("cache")))
+
+    cache.read(dst, "status")
+    cache.read(dst, "status")
+    assert dst.read_if_modified.call_args_list == [mock.call("status", None), mock.call("status", None)]
+
+
+def test_key_includes_destination():
+    dst_a = mock.Mock(remote_path="s3://a")
+    dst_b = mock.Mock(remote_path="s3://b")
+    assert StatusCache.key(dst_a, "master1/status") != StatusCache.key(dst_b, "master1/status")
@@ -0,0 +1,130 @@
+import gzip
+import json
+import shutil
+import socket
+from os import path as osp
+
+import mock
+import pytest
+
+from tests.unit.source.binlog_source.conftest import mysql_bin_000001  # noqa: F401
+from twindb_backup.binlog_follow import BinlogFollower
+from twindb_backup.configuration.compression import CompressionConfig
+from twindb_backup.destination.local import Local
+from twindb_backup.source.binlog_source import BinlogSegmentSource, BinlogSource
+from twindb_backup.status.binlog_status import BinlogStatus
+
+
+@pytest.fixture
+def binlog_dir(tmpdir, mysql_bin_000001):
+    shutil.copy(str(mysql_bin_000001), str(tmpdir.join("mysql-bin.000002")))
+    return tmpdir
+
+
+@pytest.fixture
+def follower(tmpdir, binlog_dir):
+    with mock.patch("twindb_backup.binlog_follow.MySQLClient") as mock_client:
+        mock_client.return_value.variable.return_value = str(binlog_dir.join("mysql-bin"))
+        follower = BinlogFollower(mock.MagicMock(), state_file=str(tmpdir.join("state", "follow.json")))
+    return follower
+
+
+def _set_binlogs(follower, binlogs):
+    cursor = follower._mysql_client.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [{"Log_name": name} for name in binlogs]
+
+
+@pytest.fixture
+def empty_status():
+    with mock.patch("twindb_backup.binlog_follow.BinlogStatus", return_value=BinlogStatus()) as mock_status:
+        yield mock_status
+
+
+@pytest.fixture
+def mock_backup_stream():
+    with mock.patch("twindb_backup.binlog_follow._backup_stream") as mock_backup_stream:
+        yield mock_backup_stream
+
+
+def test_poll_copies_active_binlog_incrementally(follower, binlog_dir, empty_status, mock_backup_stream):
+    _set_binlogs(follower, ["mysql-bin.000002"])
+    binlog_path = str(binlog_dir.join("mysql-bin.000002"))
+    with open(binlog_path, "rb") as binlog:
+        data = binlog.read()
+    # The last event is being written
+    with open(binlog_path, "wb") as binlog:
+        binlog.write(data[:-10])
+
+    follower.poll()
+
+    src = mock_backup_stream.call_args[0][1]
+    assert isinstance(src, BinlogSegmentSource)
+    first_segment = follower.state["offset"]
+    assert 0 < first_segment < len(data) - 10
+
+    with open(binlog_path, "wb") as binlog:
+        binlog.write(data)
+    follower.poll()
+
+    assert mock_backup_stream.call_count == 2
+    assert follower.state["offset"] == len(data)
+    assert len(follower.state["segments"]) == 2
+
+    follower.poll()
+    assert mock_backup_stream.call_count == 2
+
+    with open(follower._state_file) as state_file:
+        assert json.load(state_file) == follower.state
+
+
+def test_poll_copies_closed_binlog(follower, binlog_dir, empty_status, mock_backup_stream):
+    shutil.copy(str(binlog_dir.join("mysql-bin.000002")), str(binlog_dir.join("mysql-bin.000003")))
+    _set_binlogs(follower, ["mysql-bin.000002", "mysql-bin.000003"])
+    follower._state = {"binlog": "mysql-bin.000002", "offset": 100, "segments": ["host/binlog/seg-1"]}
+
+    follower.poll()
+
+    closed_src = mock_backup_stream.call_args_list[0][0][1]
+    assert type(closed_src) is BinlogSource
+    assert empty_status.return_value.latest_backup.name == "mysql-bin.000002"
+    follower._dst.delete_many.assert_called_once_with(["host/binlog/seg-1"])
+
+    active_src = mock_backup_stream.call_args_list[1][0][1]
+    assert isinstance(active_src, BinlogSegmentSource)
+    assert follower.state["binlog"] == "mysql-bin.000003"
+
+
+def test_follower_resumes_from_state_file(follower, tmpdir, binlog_dir):
+    follower._state = {"binlog": "mysql-bin.000002", "offset": 123, "segments": []}
+    follower._save_state()
+
+    with mock.patch("twindb_backup.binlog_follow.MySQLClient"):
+        resumed = BinlogFollower(mock.MagicMock(), state_file=follower._state_file)
+    assert resumed.state == follower.state
+
+
+def test_poll_uploads_compressed_segment(tmpdir, binlog_dir):
+    dst = Local(str(tmpdir.mkdir("dst")))
+    config = mock.Mock(
+        compression=CompressionConfig(program="gzip"),
+        keep_local_path=None,
+        gpg=None,
+        bandwidth=None,
+        exporter=None,
+    )
+    config.destination.return_value = dst
+    with mock.patch("twindb_backup.binlog_follow.MySQLClient") as mock_client:
+        mock_client.return_value.variable.return_value = str(binlog_dir.join("mysql-bin"))
+        follower = BinlogFollower(config, state_file=str(tmpdir.join("state", "follow.json")))
+    _set_binlogs(follower, ["mysql-bin.000002"])
+    with open(str(binlog_dir.join("mysql-bin.000002")), "rb") as binlog:
+        data = binlog.read()
+    tmpdir.join("dst").mkdir(socket.gethostname()).mkdir("binlog")
+
+    with mock.patch("twindb_backup.binlog_follow.BinlogStatus", return_value=BinlogStatus()):
+        follower.poll()
+
+    [segment] = follower.state["segments"]
+    assert segment.endswith(".gz")
+    with open(osp.join(dst.path, segment), "rb") as segment_file:
+        assert gzip.decompress(segment_file.read()) == data[: follower.state["offset"]]
@@ -1,8 +1,9 @@
 import os
 
+import mock
 import pytest
 
-from twindb_backup.cache.cache import Cache, CacheException
+from twindb_backup.cache.cache import Cache, CacheException, clone_file, parse_size
 
 
 def test_init_raises_exception():
@@ -74,3 +75,101 @@ def test_restore_in(cache_dir, tmpdir):
 
     assert os.path.exists(os.path.join(dst, "ibdata1"))
     assert os.path.exists(os.path.join(dst, "mysql"))
+
+
+def test_in_ignores_paths_and_tmp(cache_dir):
+    c = Cache(str(cache_dir))
+    cache_dir.mkdir(".tmp-1-foo")
+
+    assert ".tmp-1-foo" not in c
+    assert str(cache_dir) not in c
+
+
+def test_add_leaves_no_tmp(cache_dir, tmpdir):
+    c = Cache(str(cache_dir))
+    tmpdir.mkdir("foo").join("ibdata1").write("content")
+
+    c.add(str(tmpdir.join("foo")))
+
+    assert c.items == ["foo"]
+    assert not [name for name in os.listdir(str(cache_dir)) if name.startswith(".tmp-")]
+    assert c.size == len("content")
+
+
+def test_add_removes_stale_tmp(cache_dir, tmpdir):
+    c = Cache(str(cache_dir))
+    # A run that crashed while populating the cache
+    cache_dir.mkdir(".tmp-999999999-abc").mkdir("foo").join("ibdata1").write("partial")
+    tmpdir.mkdir("bar")
+
+    c.add(str(tmpdir.join("bar")))
+
+    assert "foo" not in c
+    assert not os.path.exists(str(cache_dir.join(".tmp-999999999-abc")))
+
+
+def test_add_evicts_least_recently_used(cache_dir, tmpdir):
+    c = Cache(str(cache_dir), max_size=25)
+    for name in ["foo", "bar", "baz"]:
+        tmpdir.mkdir(name).join("ibdata1").write("x" * 10)
+
+    c.add(str(tmpdir.join("foo")))
+    os.utime(str(cache_dir.join("foo")), (1, 1))
+    c.add(str(tmpdir.join("bar")))
+    os.utime(str(cache_dir.join("bar")), (2, 2))
+    # restore makes foo the most recently used item
+    c.restore_in("foo", str(tmpdir.mkdir("dst")))
+    c.add(str(tmpdir.join("baz")))
+
+    assert sorted(c.items) == ["baz", "foo"]
+    assert c.size == 20
+
+
+def test_add_too_large(cache_dir, tmpdir):
+    c = Cache(str(cache_dir), max_size=5)
+    tmpdir.mkdir("foo").join("ibdata1").write("x" * 10)
+
+    c.add(str(tmpdir.join("foo")))
+
+    assert "foo" not in c
+
+
+def test_restore_in_missing(cache_dir, tmpdir):
+    c = Cache(str(cache_dir))
+
+    with pytest.raises(CacheException):
+        c.restore_in("foo", str(tmpdir))
+
+
+def test_clone_file(tmpdir):
+    src = tmpdir.join("src")
+    src.write("x" * 100000)
+
+    clone_file(str(src), str(tmpdir.join("dst")))
+
+    assert tmpdir.join("dst").read() == "x" * 100000
+
+
+def test_clone_file_falls_back_to_copy(tmpdir):
+    src = tmpdir.join("src")
+    src.write("content")
+
+    with mock.patch("twindb_backup.cache.cache.fcntl.ioctl", side_effect=OSError), mock.patch(
+        "twindb_backup.cache.cache.os.copy_file_range", side_effect=OSError, create=True
+    ):
+        clone_file(str(src), str(tmpdir.join("dst")))
+
+    assert tmpdir.join("dst").read() == "content"
+
+
+@pytest.mark.parametrize(
+    "value, size",
+    [("100", 100), ("10K", 10240), ("1.5G", 1610612736), ("2TB", 2 * 1024**4)],
+)
+def test_parse_size(value, size):
+    assert parse_size(value) == size
+
+
+def test_parse_size_invalid():
+    with pytest.raises(CacheException):
+        parse_size("foo")
@@ -0,0 +1,70 @@
+import gzip
+import io
+
+import mock
+
+from twindb_backup.export import export_metrics, pipeline_metrics, restore_metrics
+from twindb_backup.exporter.base_exporter import MetricType
+from twindb_backup.modifiers.gzip import Gzip
+from twindb_backup.modifiers.keeplocal import KeepLocal
+from twindb_backup.modifiers.pipeline import Pipeline, StageStats
+
+
+class FileSource(object):
+    media_type = "files"
+
+
+class S3(object):
+    part_latencies = [0.1, 0.2]
+
+
+def test_pipeline_metrics(tmpdir):
+    payload = b"foo bar " * 100000
+    with open(str(tmpdir.join("in")), "wb") as in_file:
+        in_file.write(payload)
+    pipeline = Pipeline(
+        open(str(tmpdir.join("in")), "rb"),
+        [Gzip(None, level=1), KeepLocal(None, str(tmpdir.join("local")))],
+    )
+    with pipeline.get_stream() as output:
+        compressed = output.read()
+    assert gzip.decompress(compressed) == payload
+
+    metrics = pipeline_metrics(FileSource(), pipeline, S3(), pipeline.stats[0].started)
+
+    values = {(metric.name, metric.tags.get("stage")): metric for metric in metrics}
+    assert values[("pipeline.bytes_out", "FileSource")].value >= len(payload)
+    assert values[("pipeline.bytes_out", "Gzip")].value == len(compressed)
+    assert values[("pipeline.bytes_out", "KeepLocal")].value == len(compressed)
+    assert values[("pipeline.bytes_in", "S3")].value == len(compressed)
+    assert values[("pipeline.bytes_in", "S3")].metric_type == MetricType.counter
+    assert values[("pipeline.wall_time", "Gzip")].metric_type == MetricType.timing
+    assert values[("pipeline.compression_ratio", None)].value > 1
+    assert [metric.value for metric in metrics if metric.name == "destination.part_latency"] == [0.1, 0.2]
+    assert all(metric.tags["source"] == "files" for metric in metrics)
+
+
+def test_export_metrics():
+    cfg = mock.Mock()
+    export_metrics(cfg, ["foo"])
+    cfg.exporter.export_metrics.assert_called_once_with(["foo"])
+
+    cfg.exporter = None
+    export_metrics(cfg, ["foo"])
+
+
+def test_restore_metrics():
+    stage = StageStats("xbstream")
+    stage.bytes_in = 10
+    metrics = restore_metrics("mysql", [stage])
+
+    assert {metric.name for metric in metrics} == {
+        "restore_pipeline.bytes_in",
+        "restore_pipeline.bytes_out",
+        "restore_pipeline.wall_time",
+        "restore_pipeline.busy_time",
+        "restore_pipeline.stall_time",
+        "restore_pipeline.backpressure_time",
+    }
+    assert metrics[0].value == 10
+    assert metrics[0].tags == {"source": "mysql", "stage": "xbstream"}
@@ -7,8 +7,13 @@ test_twindb_backup
 
 Tests for `twindb_backup` module.
 """
+import subprocess
+import time
+
+import mock
 import pytest
 
+from twindb_backup.copy.file_copy import FileCopy
 from twindb_backup.source.file_source import FileSource
 
 
@@ -19,3 +24,82 @@ from twindb_backup.source.file_source import FileSource
 def test_make_file_name_from_full(path, name):
     src = FileSource(path, "foo")
     assert src._sanitize_filename() == name
+
+
+def _tar(src, archive):
+    with src.get_stream() as stream, open(archive, "wb") as fp:
+        fp.write(stream.read())
+    src.commit_snapshot()
+
+
+def _untar(archive, dst_dir):
+    subprocess.check_call(["tar", "xf", archive, "--listed-incremental=/dev/null"], cwd=dst_dir)
+
+
+def test_incremental_needs_full_snapshot(tmpdir):
+    snapshot_dir = str(tmpdir.mkdir("snapshots"))
+    data_dir = str(tmpdir.mkdir("data"))
+
+    assert not FileSource(data_dir, "hourly", full_backup="daily", snapshot_dir=snapshot_dir).incremental
+    assert not FileSource(data_dir, "daily", full_backup="daily", snapshot_dir=snapshot_dir).incremental
+
+    _tar(FileSource(data_dir, "daily", full_backup="daily", snapshot_dir=snapshot_dir), str(tmpdir.join("full.tar")))
+    full_name = FileSource(data_dir, "daily", full_backup="daily", snapshot_dir=snapshot_dir).get_name()
+    src = FileSource(data_dir, "hourly", full_backup="daily", snapshot_dir=snapshot_dir)
+    assert src.incremental
+    assert FileCopy(path=src.get_name()).parent_prefix == full_name
+    assert not FileSource(data_dir, "hourly", snapshot_dir=snapshot_dir).incremental
+
+
+def test_incremental_roundtrip(tmpdir):
+    snapshot_dir = str(tmpdir.mkdir("snapshots"))
+    data_dir = tmpdir.mkdir("data")
+    data_dir.join("cold").write("cold" * 1000)
+    data_dir.join("hot").write("v1")
+    data_dir.join("deleted").write("deleted")
+
+    _tar(
+        FileSource(str(data_dir), "daily", full_backup="daily", snapshot_dir=snapshot_dir),
+        str(tmpdir.join("full.tar")),
+    )
+    time.sleep(0.01)
+    data_dir.join("hot").write("v2")
+    data_dir.join("deleted").remove()
+    data_dir.join("new").write("new")
+    _tar(
+        FileSource(str(data_dir), "hourly", full_backup="daily", snapshot_dir=snapshot_dir),
+        str(tmpdir.join("inc.tar")),
+    )
+
+    members = subprocess.check_output(["tar", "tf", str(tmpdir.join("inc.tar"))]).decode().split()
+    assert not any(member.endswith("/cold") for member in members)
+
+    restored = tmpdir.mkdir("restored")
+    _untar(str(tmpdir.join("full.tar")), str(restored))
+    _untar(str(tmpdir.join("inc.tar")), str(restored))
+    restored_data = restored.join(str(data_dir))
+    assert sorted(p.basename for p in restored_data.listdir()) == ["cold", "hot", "new"]
+    assert restored_data.join("hot").read() == "v2"
+
+
+def test_retention_keeps_parents_of_incrementals(tmpdir):
+    src = FileSource("/data", "daily", full_backup="daily", snapshot_dir=str(tmpdir))
+    src._host = "master1"
+    dailies = [
+        "s3://bucket/master1/daily/files/_data-2023-01-01_00_00_00.tar.gz",
+        "s3://bucket/master1/daily/files/_data-2023-01-02_00_00_00.tar.gz",
+        "s3://bucket/master1/daily/files/_data-2023-01-03_00_00_00.tar.gz",
+    ]
+    hourlies = ["s3://bucket/master1/hourly/files/_data-2023-01-02_10_00_00.inc-daily-2023-01-02_00_00_00.tar.gz"]
+    dst = mock.Mock()
+    dst.remote_path = "s3://bucket"
+    dst.list_files.side_effect = lambda prefix, **kwargs: [
+        path for path in dailies + hourlies if path.startswith(prefix)
+    ]
+    config = mock.Mock()
+    config.retention.daily = 1
+    config.retention_local.daily = 1
+
+    src.apply_retention_policy(dst, config, "daily")
+
+    dst.delete_many.assert_called_once_with(dailies[:1])
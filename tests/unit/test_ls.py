@@ -1,5 +1,8 @@
+from functools import partial
+
 import mock
 
+from twindb_backup.destination.base_destination import BaseDestination
 from twindb_backup.ls import list_available_backups
 
 
@@ -12,6 +15,7 @@ def test_list_available_backups_ssh():
     mock_dst = mock.Mock()
     mock_dst.remote_path = "/foo/bar"
     mock_dst.list_files.return_value = []
+    mock_dst.list_copies.side_effect = partial(BaseDestination.list_copies, mock_dst)
 
     mock_config.destination.return_value = mock_dst
 
@@ -0,0 +1,293 @@
+import io
+import os
+import time
+from contextlib import contextmanager
+
+import mock
+import pytest
+
+from tests.unit.source.binlog_source.conftest import mysql_bin_000001  # noqa: F401
+from twindb_backup.copy.binlog_copy import BinlogCopy
+from twindb_backup.copy.mysql_copy import MySQLCopy
+from twindb_backup.destination.exceptions import FileNotFound
+from twindb_backup.exceptions import TwinDBBackupError
+from twindb_backup.pitr import (
+    RecoveryTarget,
+    binlogs_to_apply,
+    choose_base_copy,
+    fetch_active_binlog,
+    fetch_binlog,
+    replay_binlogs,
+    restore_to_point_in_time,
+)
+from twindb_backup.source.binlog_source import BinlogIndex, _iter_events, complete_events_length
+from twindb_backup.status.binlog_status import BinlogStatus
+from twindb_backup.status.mysql_status import MySQLStatus
+
+SERVER_UUID = "e129feb2-980b-11e8-bcfd-08002737f846"
+T0 = int(time.mktime(time.strptime("2023-01-01 00:00:00", "%Y-%m-%d %H:%M:%S")))
+
+
+def _until(offset):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(T0 + offset))
+
+
+def _binlogs(indexes):
+    """Binlog status and a destination with indexes of binlogs mysql-bin.000001, ..."""
+    status = BinlogStatus()
+    content = {}
+    for n, (first, last, gtids) in enumerate(indexes, 1):
+        name = "mysql-bin.%06d" % n
+        copy = BinlogCopy("master1", name, T0 + first)
+        status.add(copy)
+        content[copy.index_key] = BinlogIndex(
+            name,
+            first_timestamp=T0 + first,
+            last_timestamp=T0 + last,
+            gtids={SERVER_UUID: gtids},
+        ).to_json()
+
+    def read(path):
+        try:
+            return content[path]
+        except KeyError:
+            raise FileNotFound(path)
+
+    return status, mock.Mock(read=mock.Mock(side_effect=read), list_files=mock.Mock(return_value=[]))
+
+
+BINLOGS = [(0, 99, [[1, 10]]), (100, 199, [[11, 20]]), (200, 299, [[21, 30]])]
+
+
+def test_recovery_target():
+    assert RecoveryTarget(_until(10)).timestamp == T0 + 10
+    assert RecoveryTarget(SERVER_UUID.upper() + ":5").gtid == (SERVER_UUID, 5)
+    with pytest.raises(TwinDBBackupError):
+        RecoveryTarget("yesterday")
+
+
+def test_mysqlbinlog_args(mysql_bin_000001):
+    index = BinlogIndex.build(mysql_bin_000001)
+    with open(mysql_bin_000001, "rb") as binlog:
+        data = binlog.read()
+    gtid_events = [position for position, _, type_code, _ in _iter_events(data, len(data)) if type_code == 33]
+
+    assert RecoveryTarget(_until(10)).mysqlbinlog_args(mysql_bin_000001) == ["--stop-datetime=%s" % _until(10)]
+    # Stops where the transaction 6 starts
+    assert RecoveryTarget(SERVER_UUID + ":5").mysqlbinlog_args(mysql_bin_000001) == [
+        "--stop-position=%d" % gtid_events[5]
+    ]
+    assert RecoveryTarget(SERVER_UUID + ":97").mysqlbinlog_args(mysql_bin_000001) == [
+        "--stop-position=%d" % index.end_position
+    ]
+    with pytest.raises(TwinDBBackupError):
+        RecoveryTarget(SERVER_UUID + ":98").mysqlbinlog_args(mysql_bin_000001)
+
+
+@pytest.mark.parametrize(
+    "offset, expected",
+    [
+        (50, ["mysql-bin.000001"]),
+        (150, ["mysql-bin.000001", "mysql-bin.000002"]),
+        (199, ["mysql-bin.000001", "mysql-bin.000002"]),
+        (1000, ["mysql-bin.000001", "mysql-bin.000002", "mysql-bin.000003"]),
+    ],
+)
+def test_binlogs_to_apply_until_time(offset, expected):
+    status, dst = _binlogs(BINLOGS)
+    binlogs = binlogs_to_apply(status, dst, RecoveryTarget(_until(offset)))
+    assert [copy.name for copy, _ in binlogs] == expected
+
+
+def test_binlogs_to_apply_until_gtid():
+    status, dst = _binlogs(BINLOGS)
+    binlogs = binlogs_to_apply(status, dst, RecoveryTarget(SERVER_UUID + ":15"), start_binlog="mysql-bin.000002")
+    assert [copy.name for copy, _ in binlogs] == ["mysql-bin.000002"]
+
+    with pytest.raises(TwinDBBackupError):
+        binlogs_to_apply(status, dst, RecoveryTarget(SERVER_UUID + ":31"))
+
+
+def test_binlogs_to_apply_without_index():
+    status, dst = _binlogs(BINLOGS)
+    dst.read.side_effect = FileNotFound("no index")
+
+    binlogs = binlogs_to_apply(status, dst, RecoveryTarget(_until(150)))
+    assert [(copy.name, index) for copy, index in binlogs] == [("mysql-bin.000001", None), ("mysql-bin.000002", None)]
+
+
+def test_binlogs_to_apply_raises_on_gap():
+    status, dst = _binlogs(BINLOGS)
+    status.remove("master1/binlog/mysql-bin.000002")
+
+    with pytest.raises(TwinDBBackupError):
+        binlogs_to_apply(status, dst, RecoveryTarget(_until(250)))
+    with pytest.raises(TwinDBBackupError):
+        binlogs_to_apply(status, dst, RecoveryTarget(_until(250)), start_binlog="mysql-bin.000002")
+
+
+def test_choose_base_copy():
+    status = MySQLStatus()
+    for name, binlog, finished in [
+        ("full.xbstream.gz", "mysql-bin.000001", 10),
+        ("inc.xbstream.gz", "mysql-bin.000002", 110),
+        ("no-coordinates.xbstream.gz", None, 120),
+    ]:
+        status.add(
+            MySQLCopy(
+                "master1",
+                "daily",
+                name,
+                type="full",
+                binlog=binlog,
+                position=4 if binlog else None,
+                backup_finished=T0 + finished,
+            )
+        )
+
+    assert choose_base_copy(status, RecoveryTarget(_until(50))).name == "full.xbstream.gz"
+    assert choose_base_copy(status, RecoveryTarget(_until(500))).name == "inc.xbstream.gz"
+    assert (
+        choose_base_copy(status, RecoveryTarget(SERVER_UUID + ":15"), binlog="mysql-bin.000002").name
+        == "full.xbstream.gz"
+    )
+    with pytest.raises(TwinDBBackupError):
+        choose_base_copy(status, RecoveryTarget(_until(0)))
+
+
+@mock.patch("twindb_backup.pitr.Popen")
+def test_replay_binlogs(mock_popen, tmpdir):
+    proc = mock_popen.return_value.__enter__.return_value
+    proc.communicate.return_value = (None, b"")
+    proc.returncode = 0
+    sql_path = str(tmpdir.join("replay.sql"))
+
+    replay_binlogs(["/tmp/mysql-bin.000001", "/tmp/mysql-bin.000002"], 120, sql_path, ["--stop-datetime=x"])
+    assert mock_popen.call_args[0][0] == [
+        "mysqlbinlog",
+        "--start-position=120",
+        "--stop-datetime=x",
+        "/tmp/mysql-bin.000001",
+        "/tmp/mysql-bin.000002",
+    ]
+
+    proc.returncode = 1
+    with pytest.raises(TwinDBBackupError):
+        replay_binlogs(["/tmp/mysql-bin.000001"], 4, sql_path, [])
+
+
+@pytest.mark.parametrize(
+    "suffix, expected_key",
+    [
+        (".zst.gpg", "master1/binlog/mysql-bin.000001.zst.gpg"),
+        # Copies without a recorded suffix use the configured compression
+        (None, "master1/binlog/mysql-bin.000001.gz"),
+    ],
+)
+@mock.patch("twindb_backup.pitr.restore_pipeline")
+def test_fetch_binlog_uses_stored_suffix(mock_pipeline, suffix, expected_key, tmpdir):
+    mock_pipeline.return_value.get_stream.return_value.__enter__.return_value = io.BytesIO(b"binlog")
+    config = mock.Mock(gpg=None, bandwidth=None)
+    config.compression.get_modifier.return_value.suffix = ".gz"
+    dst = mock.Mock()
+    path = str(tmpdir.join("mysql-bin.000001"))
+
+    fetch_binlog(config, dst, BinlogCopy("master1", "mysql-bin.000001", T0, suffix=suffix), path)
+
+    assert dst.get_stream.call_args[0][0].key == expected_key
+    assert mock_pipeline.call_args[0][2] == expected_key
+    with open(path, "rb") as binlog:
+        assert binlog.read() == b"binlog"
+
+
+def _segments(data, offsets):
+    """Destination with segments of mysql-bin.000002 starting at the offsets."""
+    content = {}
+    for offset, end in zip(offsets, offsets[1:] + [len(data)]):
+        content["master1/binlog/mysql-bin.000002.seg-%016d.gz" % offset] = data[offset:end]
+    # A segment of a closed binlog that wasn't deleted
+    content["master1/binlog/mysql-bin.000001.seg-0000000000000000.gz"] = b"stale"
+
+    def get_stream(copy):
+        return _stream(content[copy.key])
+
+    return mock.Mock(
+        remote_path="s3://bucket",
+        list_files=mock.Mock(return_value=sorted("s3://bucket/" + key for key in content)),
+        get_stream=mock.Mock(side_effect=get_stream),
+    )
+
+
+@contextmanager
+def _stream(data):
+    yield io.BytesIO(data)
+
+
+@mock.patch("twindb_backup.pitr.restore_pipeline")
+def test_fetch_active_binlog(mock_pipeline, mysql_bin_000001, tmpdir):
+    mock_pipeline.side_effect = lambda config, stream, name: mock.Mock(get_stream=mock.Mock(return_value=stream))
+    with open(mysql_bin_000001, "rb") as binlog:
+        data = binlog.read()
+    status, _ = _binlogs(BINLOGS[:1])
+    dst = _segments(data, [0, complete_events_length(data[: len(data) // 2], 0)])
+
+    copy, index = fetch_active_binlog(mock.Mock(gpg=None, bandwidth=None), dst, status, "master1", str(tmpdir))
+
+    assert copy.key == "master1/binlog/mysql-bin.000002"
+    assert index.to_json() == BinlogIndex.build(mysql_bin_000001).to_json().replace(
+        "mysql-bin.000001", "mysql-bin.000002"
+    )
+    with open(str(tmpdir.join("mysql-bin.000002")), "rb") as binlog:
+        assert binlog.read() == data
+
+
+@mock.patch("twindb_backup.pitr.restore_pipeline")
+def test_fetch_active_binlog_raises_on_gap(mock_pipeline, mysql_bin_000001, tmpdir):
+    mock_pipeline.side_effect = lambda config, stream, name: mock.Mock(get_stream=mock.Mock(return_value=stream))
+    with open(mysql_bin_000001, "rb") as binlog:
+        data = binlog.read()
+    status, _ = _binlogs(BINLOGS[:1])
+    boundary = complete_events_length(data[: len(data) // 2], 0)
+    dst = _segments(data, [0, boundary])
+    dst.list_files.return_value = [name for name in dst.list_files.return_value if "seg-0000000000000000" not in name]
+
+    with pytest.raises(TwinDBBackupError):
+        fetch_active_binlog(mock.Mock(gpg=None, bandwidth=None), dst, status, "master1", str(tmpdir))
+
+
+def test_binlogs_to_apply_active_binlog():
+    status, dst = _binlogs(BINLOGS[:2])
+    active = (
+        BinlogCopy("master1", "mysql-bin.000003", T0 + 200),
+        BinlogIndex("mysql-bin.000003", first_timestamp=T0 + 200, last_timestamp=T0 + 299),
+    )
+
+    binlogs = binlogs_to_apply(status, dst, RecoveryTarget(_until(250)), start_binlog="mysql-bin.000002", active=active)
+
+    assert [(copy.name, index) for copy, index in binlogs] == [
+        ("mysql-bin.000002", mock.ANY),
+        ("mysql-bin.000003", active[1]),
+    ]
+
+
+@mock.patch("twindb_backup.pitr.replay_binlogs")
+@mock.patch("twindb_backup.pitr.restore_from_mysql")
+@mock.patch("twindb_backup.pitr.fetch_binlog")
+@mock.patch("twindb_backup.pitr.MySQLStatus")
+@mock.patch("twindb_backup.pitr.BinlogStatus")
+def test_restore_to_point_in_time_saves_sql_outside_datadir(
+    mock_binlog_status, mock_mysql_status, mock_fetch, mock_restore, mock_replay, tmpdir
+):
+    status, dst = _binlogs(BINLOGS)
+    mock_binlog_status.return_value = status
+    config = mock.Mock()
+    config.destination.return_value = dst
+    copy = MySQLCopy("master1", "daily", "full.xbstream.gz", binlog="mysql-bin.000001", position=120)
+    datadir = tmpdir.mkdir("datadir")
+    tmp_dir = tmpdir.mkdir("tmp")
+
+    sql_path = restore_to_point_in_time(config, _until(50), str(datadir), copy=copy, tmp_dir=str(tmp_dir))
+
+    assert os.path.dirname(sql_path) == str(tmp_dir)
+    assert os.listdir(str(datadir)) == []
+    assert mock_replay.call_args[0][2] == sql_path
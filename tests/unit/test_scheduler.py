@@ -0,0 +1,86 @@
+import threading
+import time
+
+from twindb_backup.scheduler import Job, JobScheduler
+
+
+def _recorder():
+    log = []
+    lock = threading.Lock()
+    running = []
+
+    def func(name, delay=0.05):
+        with lock:
+            running.append(name)
+            log.append(("start", name, len(running)))
+        time.sleep(delay)
+        with lock:
+            running.remove(name)
+            log.append(("end", name))
+
+    return log, func
+
+
+def test_jobs_run_one_at_a_time_by_priority():
+    log, func = _recorder()
+    scheduler = JobScheduler()
+    scheduler.add(Job("files", func, args=("files", 0)))
+    scheduler.add(Job("mysql", func, args=("mysql", 0), priority=10))
+    scheduler.add(Job("binlogs", func, args=("binlogs", 0), priority=5))
+
+    jobs = scheduler.run()
+
+    assert [job.name for job in jobs] == ["mysql", "binlogs", "files"]
+    assert [entry[1] for entry in log if entry[0] == "start"] == ["mysql", "binlogs", "files"]
+    assert max(entry[2] for entry in log if entry[0] == "start") == 1
+
+
+def test_jobs_run_concurrently_within_budget():
+    log, func = _recorder()
+    scheduler = JobScheduler(budget=3)
+    for name in ["a", "b", "c", "d"]:
+        scheduler.add(Job(name, func, args=(name,)))
+    scheduler.run()
+
+    assert max(entry[2] for entry in log if entry[0] == "start") == 3
+
+
+def test_heavy_job_runs_alone():
+    log, func = _recorder()
+    scheduler = JobScheduler(budget=2)
+    scheduler.add(Job("light", func, args=("light",)))
+    scheduler.add(Job("heavy", func, args=("heavy",), weight=5))
+    scheduler.add(Job("last", func, args=("last",)))
+    scheduler.run()
+
+    starts = {entry[1]: entry[2] for entry in log if entry[0] == "start"}
+    assert starts["heavy"] == 1
+    assert log.index(("end", "heavy")) < log.index(("start", "last", 1))
+
+
+def test_failed_job_does_not_stop_others():
+    def fail():
+        raise RuntimeError("boom")
+
+    done = []
+    scheduler = JobScheduler()
+    scheduler.add(Job("fail", fail))
+    scheduler.add(Job("ok", done.append, args=(1,)))
+    jobs = scheduler.run()
+
+    assert isinstance(jobs[0].error, RuntimeError)
+    assert jobs[1].error is None
+    assert jobs[1].duration >= 0
+    assert done == [1]
+
+
+def test_exited_job_fails():
+    def exit_job():
+        exit(1)
+
+    scheduler = JobScheduler()
+    scheduler.add(Job("exit", exit_job))
+    jobs = scheduler.run()
+
+    assert isinstance(jobs[0].error, SystemExit)
+    assert jobs[0].finished is not None
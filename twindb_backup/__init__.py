@@ -41,7 +41,10 @@ from collections import namedtuple
 __author__ = "TwinDB Development Team"
 __email__ = "dev@twindb.com"
 __version__ = "3.3.0"
-STATUS_FORMAT_VERSION = 1
+STATUS_FORMAT_VERSION = 2
+# Releases before 3.3.0 can't read version 2. Status files are written
+# in version 1 until the next release, so a rollback can read them.
+STATUS_WRITE_VERSION = 1
 LOCK_FILE = "/var/run/twindb-backup.lock"
 LOG_FILE = "/var/log/twindb-backup-measures.log"
 INTERVALS = ["hourly", "daily", "weekly", "monthly", "yearly"]
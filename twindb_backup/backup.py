@@ -6,25 +6,31 @@ import configparser
 import errno
 import fcntl
 import signal
+import socket
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from os import path as osp
 from resource import RLIMIT_NOFILE, getrlimit, setrlimit
 
 from pymysql import InternalError
 
-from twindb_backup import LOCK_FILE, LOG, MY_CNF_COMMON_PATHS, get_timeout, save_measures
+from twindb_backup import INTERVALS, LOCK_FILE, LOG, MY_CNF_COMMON_PATHS, get_timeout, save_measures
 from twindb_backup.configuration import TwinDBBackupConfig
 from twindb_backup.copy.binlog_copy import BinlogCopy
 from twindb_backup.copy.mysql_copy import MySQLCopy
 from twindb_backup.destination.exceptions import DestinationError
 from twindb_backup.exceptions import LockWaitTimeoutError, OperationError
-from twindb_backup.export import export_info
-from twindb_backup.exporter.base_exporter import ExportCategory, ExportMeasureType
+from twindb_backup.export import export_bandwidth, export_info, export_metrics, pipeline_metrics
+from twindb_backup.exporter.base_exporter import ExportCategory, ExportMeasureType, Metric
+from twindb_backup.modifiers.exceptions import ModifierException
 from twindb_backup.modifiers.gpg import Gpg
 from twindb_backup.modifiers.keeplocal import KeepLocal
-from twindb_backup.source.binlog_source import BinlogParser, BinlogSource
+from twindb_backup.modifiers.pipeline import Pipeline
+from twindb_backup.modifiers.throttle import Throttle
+from twindb_backup.scheduler import Job, JobScheduler
+from twindb_backup.source.binlog_source import BinlogIndex, BinlogParser, BinlogSource
 from twindb_backup.source.exceptions import SourceError
 from twindb_backup.source.file_source import FileSource
 from twindb_backup.source.mariadb_source import MariaDBSource
@@ -43,63 +49,139 @@ MYSQL_SRC_MAP = {
 
 def _backup_stream(config, src, dst, callbacks=None):
     """
+    Build a pipeline of modifiers from the source to the destination
+    and save the stream. Metrics of every pipeline stage are exported.
 
     :param config: Tool config
     :type config: TwinDBBackupConfig
     :param src:
     :param dst:
     :param callbacks:
-    :return:
+    :return: Pipeline that saved the stream.
+    :rtype: Pipeline
     """
-    stream = src.get_stream()
+    started = time.time()
+    pipeline = Pipeline(src.get_stream())
 
     # Compression modifier
-    cmp_modifier = config.compression.get_modifier(stream)
-    stream = cmp_modifier.get_stream()
+    cmp_modifier = config.compression.get_modifier(None)
+    pipeline.add(cmp_modifier)
     src.suffix += cmp_modifier.suffix
 
     # KeepLocal modifier
     if config.keep_local_path:
         keep_local_path = config.keep_local_path
-        kl_modifier = KeepLocal(stream, osp.join(keep_local_path, src.get_name()))
-        stream = kl_modifier.get_stream()
+        kl_modifier = KeepLocal(None, osp.join(keep_local_path, src.get_name()))
+        pipeline.add(kl_modifier)
         if callbacks is not None:
-            callbacks.append((kl_modifier, {"keep_local_path": keep_local_path, "dst": dst}))
+            callbacks.append(
+                (
+                    kl_modifier,
+                    {"keep_local_path": keep_local_path, "dst": dst},
+                )
+            )
     else:
         LOG.debug("keep_local_path is not present in the config file")
     # GPG modifier
     if config.gpg:
-        gpg_modifier = Gpg(stream, config.gpg.recipient, config.gpg.keyring)
-
-        stream = gpg_modifier.get_stream()
+        pipeline.add(Gpg(None, config.gpg.recipient, config.gpg.keyring))
         src.suffix += ".gpg"
-    dst.save(stream, src.get_name())
+    # Throttle modifier. All streams share one bandwidth limit
+    if config.bandwidth:
+        pipeline.add(Throttle(None, config.bandwidth.bucket))
+    dst.save(pipeline.get_stream(), src.get_name())
+    export_metrics(config, pipeline_metrics(src, pipeline, dst, started))
+    return pipeline
 
 
 def backup_files(run_type, config: TwinDBBackupConfig):
-    """Backup local directories
+    """Backup local directories. Directories are copied concurrently
+    as the scheduler config allows.
 
     :param run_type: Run type
     :type run_type: str
     :param config: Configuration
     :type config: TwinDBBackupConfig
     """
-    backup_start = time.time()
+    scheduler = JobScheduler(budget=config.scheduler.budget)
+    for job in _files_jobs(run_type, config):
+        scheduler.add(job)
+    _check_jobs(config, run_type, scheduler.run())
+
+
+def backup_directory(run_type, config, directory):
+    """Backup a local directory
+
+    :param run_type: Run type
+    :type run_type: str
+    :param config: Configuration
+    :type config: TwinDBBackupConfig
+    :param directory: Directory to backup
+    :type directory: str
+    """
+    LOG.debug("copying %s", directory)
     try:
-        for directory in config.backup_dirs:
-            LOG.debug("copying %s", directory)
-            src = FileSource(directory, run_type, tar_options=config.tar_options)
-            dst = config.destination()
-            _backup_stream(config, src, dst)
-            src.apply_retention_policy(dst, config, run_type)
+        src = FileSource(
+            directory,
+            run_type,
+            tar_options=config.tar_options,
+            full_backup=config.files_full_backup,
+        )
+        dst = config.destination()
+        _backup_stream(config, src, dst)
+        src.commit_snapshot()
+        src.apply_retention_policy(dst, config, run_type)
     except (DestinationError, SourceError, SshClientException) as err:
         raise OperationError(err)
-    export_info(
-        config,
-        data=time.time() - backup_start,
-        category=ExportCategory.files,
-        measure_type=ExportMeasureType.backup,
-    )
+
+
+def _files_jobs(run_type, config):
+    return [
+        Job(
+            "files:%s" % directory,
+            backup_directory,
+            args=(run_type, config, directory),
+            priority=config.scheduler.priority("files"),
+            weight=config.scheduler.weight("files"),
+        )
+        for directory in config.backup_dirs
+    ]
+
+
+def _check_jobs(config, run_type, jobs):
+    """
+    Export how long the files backup took and when it finished
+    and raise the error of the first failed job if any.
+
+    :param config: Tool configuration
+    :type config: TwinDBBackupConfig
+    :param run_type: Run type
+    :type run_type: str
+    :param jobs: Finished jobs
+    :type jobs: list(Job)
+    """
+    files_jobs = [job for job in jobs if job.name.startswith("files:") and job.started is not None]
+    if files_jobs and not any(job.error for job in files_jobs):
+        finished = max(job.finished for job in files_jobs)
+        export_info(
+            config,
+            data=finished - min(job.started for job in files_jobs),
+            category=ExportCategory.files,
+            measure_type=ExportMeasureType.backup,
+        )
+        export_metrics(
+            config,
+            [
+                Metric(
+                    "copy.last_finished_timestamp_seconds",
+                    finished,
+                    tags={"source": "files", "run_type": run_type},
+                )
+            ],
+        )
+    for job in jobs:
+        if job.error is not None:
+            raise job.error
 
 
 def backup_mysql(run_type, config):
@@ -116,7 +198,7 @@ def backup_mysql(run_type, config):
 
     dst = config.destination()
     backup_start = time.time()
-    status = MySQLStatus(dst=dst)
+    status = MySQLStatus(dst=dst, cache=dst.status_cache)
 
     kwargs = {
         "backup_type": status.next_backup_type(config.mysql.full_backup, run_type),
@@ -165,6 +247,7 @@ def backup_mysql(run_type, config):
         category=ExportCategory.mysql,
         measure_type=ExportMeasureType.backup,
     )
+    export_metrics(config, copy_finished_metrics(status))
 
     status.save(dst)
 
@@ -173,6 +256,30 @@ def backup_mysql(run_type, config):
         callback[0].callback(**callback[1])
 
 
+def copy_finished_metrics(status):
+    """
+    Build gauges with the time the latest MySQL copy of every run type
+    finished. A monitoring system computes the copy age from them.
+
+    :param status: MySQL status
+    :type status: MySQLStatus
+    :return: Metrics
+    :rtype: list(Metric)
+    """
+    metrics = []
+    for run_type in INTERVALS:
+        copies = [copy for copy in getattr(status, run_type).values() if copy.backup_finished]
+        if copies:
+            metrics.append(
+                Metric(
+                    "copy.last_finished_timestamp_seconds",
+                    max(copy.backup_finished for copy in copies),
+                    tags={"source": "mysql", "run_type": run_type},
+                )
+            )
+    return metrics
+
+
 def backup_binlogs(run_type, config):  # pylint: disable=too-many-locals
     """Copy MySQL binlog files to the backup destination.
 
@@ -186,7 +293,7 @@ def backup_binlogs(run_type, config):  # pylint: disable=too-many-locals
         return
 
     dst = config.destination()
-    status = BinlogStatus(dst=dst)
+    status = BinlogStatus(dst=dst, cache=dst.status_cache)
     mysql_client = MySQLClient(defaults_file=config.mysql.defaults_file)
     log_bin_basename = mysql_client.variable("log_bin_basename")
     if log_bin_basename is None:
@@ -202,21 +309,23 @@ def backup_binlogs(run_type, config):  # pylint: disable=too-many-locals
             last_binlog=status.latest_backup.name if status.latest_backup else None,
         )
 
-    for binlog_name in backup_set:
-        src = BinlogSource(run_type, mysql_client, binlog_name)
-        binlog_copy = BinlogCopy(
-            src.host,
-            binlog_name,
-            BinlogParser(osp.join(binlog_dir, binlog_name)).created_at,
-        )
-        _backup_stream(config, src, dst)
-        status.add(binlog_copy)
+    _copy_binlogs(config, run_type, mysql_client, binlog_dir, backup_set, dst, status)
 
     try:
         expire_log_days = config.mysql.expire_log_days
     except (configparser.NoSectionError, configparser.NoOptionError):
         expire_log_days = 7
 
+    _expire_binlogs(dst, status, expire_log_days)
+    status.save(dst)
+
+
+def _expire_binlogs(dst, status, expire_log_days):
+    """
+    Delete binlog copies and their indexes older than ``expire_log_days``
+    and remove them from the status.
+    """
+    expired = []
     for copy in status:
         now = int(time.time())
         LOG.debug("Reviewing copy %s. Now: %d", copy, now)
@@ -226,10 +335,58 @@ def backup_binlogs(run_type, config):  # pylint: disable=too-many-locals
                 "Deleting copy that was taken %d seconds ago",
                 now - copy.created_at,
             )
-            dst.delete(copy.key + ".gz")
-            status.remove(copy.key)
+            expired.append(copy)
 
-    status.save(dst)
+    # Missing objects, e.g. other suffixes of copies without a recorded one, are skipped by delete_many()
+    dst.delete_many([path for copy in expired for path in copy.stored_keys + [copy.index_key]])
+    for copy in expired:
+        status.remove(copy.key)
+
+
+def _copy_binlogs(config, run_type, mysql_client, binlog_dir, backup_set, dst, status):
+    # pylint: disable=too-many-arguments
+    """
+    Upload binlogs concurrently and add them to the status.
+
+    Binlogs are uploaded by a pool of ``config.mysql.binlog_upload_workers``
+    threads and may finish in any order. Every binlog is uploaded
+    together with its :class:`BinlogIndex`. The status is updated in the main
+    thread in binlog order though. A binlog is added only when it and all
+    binlogs before it are uploaded, so a failure never leaves a gap
+    in the status.
+
+    :raise OperationError: if failed to upload a binlog. The status is saved
+        with the binlogs that preceded the failed one.
+    """
+    copies = [
+        BinlogCopy(
+            socket.gethostname(),
+            binlog_name,
+            BinlogParser(osp.join(binlog_dir, binlog_name)).created_at,
+        )
+        for binlog_name in backup_set
+    ]
+
+    def _upload(binlog_copy):
+        index = BinlogIndex.build(osp.join(binlog_dir, binlog_copy.name))
+        upload_dst = config.destination()
+        src = BinlogSource(run_type, mysql_client, binlog_copy.name)
+        _backup_stream(config, src, upload_dst)
+        binlog_copy.suffix = src.suffix
+        upload_dst.write(index.to_json(), binlog_copy.index_key)
+
+    with ThreadPoolExecutor(max_workers=config.mysql.binlog_upload_workers) as executor:
+        futures = [executor.submit(_upload, binlog_copy) for binlog_copy in copies]
+        for binlog_copy, future in zip(copies, futures):
+            try:
+                future.result()
+            except (DestinationError, SourceError, SshClientException, ModifierException) as err:
+                for pending in futures:
+                    pending.cancel()
+                LOG.error("Failed to copy binlog %s: %s", binlog_copy.name, err)
+                status.save(dst)
+                raise OperationError(err)
+            status.add(binlog_copy)
 
 
 def binlogs_to_backup(cursor, last_binlog=None):
@@ -274,7 +431,10 @@ def set_open_files_limit():
 
 def backup_everything(run_type, twindb_config, binlogs_only=False):
     """
-    Run backup job
+    Run backup job. Copies of directories, the MySQL copy and binlogs
+    shipping are independent jobs. They run concurrently as
+    the scheduler config allows. If a job fails, other jobs still
+    run to the end and then the error is raised.
 
     :param run_type: hourly, daily, etc
     :type run_type: str
@@ -288,13 +448,30 @@ def backup_everything(run_type, twindb_config, binlogs_only=False):
     try:
         if not binlogs_only:
             backup_start = time.time()
-            backup_files(run_type, twindb_config)
-            backup_mysql(run_type, twindb_config)
-            backup_binlogs(run_type, twindb_config)
+            scheduler_config = twindb_config.scheduler
+            scheduler = JobScheduler(budget=scheduler_config.budget)
+            for job in _files_jobs(run_type, twindb_config):
+                scheduler.add(job)
+            for name, func in (("mysql", backup_mysql), ("binlogs", backup_binlogs)):
+                scheduler.add(
+                    Job(
+                        name,
+                        func,
+                        args=(run_type, twindb_config),
+                        priority=scheduler_config.priority(name),
+                        weight=scheduler_config.weight(name),
+                    )
+                )
+            _check_jobs(twindb_config, run_type, scheduler.run())
             end = time.time()
             save_measures(backup_start, end)
+            export_metrics(
+                twindb_config,
+                [Metric("backup.last_success_timestamp_seconds", end, tags={"run_type": run_type})],
+            )
         else:
             backup_binlogs(run_type, twindb_config)
+        export_bandwidth(twindb_config)
     except configparser.NoSectionError as err:
         LOG.debug(traceback.format_exc())
         LOG.error(err)
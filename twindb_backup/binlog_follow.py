@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Module that follows MySQL binary logs as they are written.
+
+Unlike ``backup --binlogs-only`` the follower doesn't rotate binlogs.
+It reads the active binlog from the last copied position and ships
+new events as segments. A segment object is named after the binlog and
+the position where it starts, e.g. ``master1/binlog/mysql-bin.000005.seg-0000000000004096.gz``.
+When MySQL rotates the binlog, the closed binlog is copied as a whole
+like ``backup`` does, added to the binlog status, and its segments
+are deleted. Point-in-time recovery replays the segments of the active
+binlog after the closed binlogs.
+
+The binlog name and position are persisted in a local state file,
+so a restarted follower continues where it stopped.
+"""
+import errno
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from os import path as osp
+
+from twindb_backup import DEFAULT_FILE_ENCODING, LOG
+from twindb_backup.backup import _backup_stream
+from twindb_backup.copy.binlog_copy import BinlogCopy
+from twindb_backup.destination.exceptions import DestinationError
+from twindb_backup.exceptions import LockWaitTimeoutError, OperationError
+from twindb_backup.source.binlog_source import (
+    BinlogIndex,
+    BinlogParser,
+    BinlogSegmentSource,
+    BinlogSource,
+    complete_events_length,
+)
+from twindb_backup.source.exceptions import SourceError
+from twindb_backup.source.mysql_source import MySQLClient
+from twindb_backup.status.binlog_status import BinlogStatus
+from twindb_backup.util import mkdir_p
+
+BINLOG_FOLLOW_STATE_FILE = "/var/lib/twindb-backup/binlog-follow.json"
+BINLOG_FOLLOW_INTERVAL = 5
+# Don't read more than this from the active binlog in one segment.
+BINLOG_SEGMENT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class BinlogFollower:
+    """
+    Ship binary logs to the destination as they grow.
+
+    :param config: Tool configuration
+    :type config: TwinDBBackupConfig
+    :param run_type: Run type of the copies. It's only used in names
+        of local copies if ``keep_local_path`` is set.
+    :type run_type: str
+    :param state_file: Path to a file where the binlog position is persisted.
+    :type state_file: str
+    :param interval: How often to poll the binlog, in seconds.
+    :type interval: int
+    """
+
+    def __init__(self, config, run_type="hourly", state_file=BINLOG_FOLLOW_STATE_FILE, interval=BINLOG_FOLLOW_INTERVAL):
+        self._config = config
+        self._run_type = run_type
+        self._state_file = state_file
+        self._interval = interval
+        self._dst = config.destination()
+        self._mysql_client = MySQLClient(defaults_file=config.mysql.defaults_file)
+        self._state = self._load_state()
+
+    @property
+    def state(self):
+        """
+        Follower position: binlog name, offset in it and uploaded segments.
+
+        :rtype: dict
+        """
+        return self._state
+
+    def run(self, once=False):
+        """
+        Follow binlogs until interrupted.
+
+        :param once: If True, poll binlogs only once.
+        :type once: bool
+        """
+        with self._lock():
+            while True:
+                try:
+                    self.poll()
+                except (DestinationError, SourceError, OSError) as err:
+                    if once:
+                        raise OperationError(err) from err
+                    LOG.error("Failed to copy binlog events: %s", err)
+                    LOG.error("Will retry in %d seconds", self._interval)
+                if once:
+                    return
+                time.sleep(self._interval)
+
+    def poll(self):
+        """Copy closed binlogs and new events of the active one."""
+        binlogs = self._binlogs()
+        if not binlogs:
+            LOG.debug("Binary logging is disabled")
+            return
+
+        if self._state["binlog"] is None:
+            self._start(binlogs)
+
+        while True:
+            name = self._state["binlog"]
+            if name not in binlogs:
+                LOG.warning("Binlog %s was purged before it was copied", name)
+                later = [binlog for binlog in binlogs if binlog > name]
+                self._advance(later[0] if later else binlogs[-1])
+                continue
+
+            if name == binlogs[-1]:
+                self._copy_segment(name)
+                return
+
+            self._copy_closed(name)
+            self._advance(binlogs[binlogs.index(name) + 1])
+
+    def _start(self, binlogs):
+        status = BinlogStatus(dst=self._dst, cache=self._dst.status_cache)
+        last_binlog = status.latest_backup.name if status.latest_backup else None
+        later = [binlog for binlog in binlogs if last_binlog is None or binlog > last_binlog]
+        self._advance(later[0] if later else binlogs[-1])
+
+    def _advance(self, binlog):
+        LOG.debug("Following binlog %s", binlog)
+        self._state = {"binlog": binlog, "offset": 0, "segments": []}
+        self._save_state()
+
+    def _copy_segment(self, name):
+        """Copy complete events written to the active binlog since the last poll."""
+        offset = self._state["offset"]
+        with open(osp.join(self._binlog_dir, name), "rb") as binlog:
+            binlog.seek(offset)
+            data = binlog.read(BINLOG_SEGMENT_MAX_SIZE)
+
+        length = complete_events_length(data, offset)
+        if not length:
+            return
+
+        src = BinlogSegmentSource(self._run_type, self._mysql_client, name, offset, data[:length])
+        _backup_stream(self._config, src, self._dst)
+        LOG.debug("Copied %d bytes of %s from position %d", length, name, offset)
+
+        self._state["segments"].append(src.get_name())
+        self._state["offset"] = offset + length
+        self._save_state()
+
+    def _copy_closed(self, name):
+        """Copy a rotated binlog as a whole and delete its segments."""
+        status = BinlogStatus(dst=self._dst, cache=self._dst.status_cache)
+        src = BinlogSource(self._run_type, self._mysql_client, name)
+        binlog_path = osp.join(self._binlog_dir, name)
+        binlog_copy = BinlogCopy(src.host, name, BinlogParser(binlog_path).created_at)
+        if any(copy.key == binlog_copy.key for copy in status):
+            LOG.debug("Binlog %s is already copied", name)
+        else:
+            _backup_stream(self._config, src, self._dst)
+            binlog_copy.suffix = src.suffix
+            self._dst.write(BinlogIndex.build(binlog_path).to_json(), binlog_copy.index_key)
+            status.add(binlog_copy)
+            status.save(self._dst)
+            LOG.info("Copied closed binlog %s", name)
+
+        self._dst.delete_many(self._state["segments"])
+
+    @property
+    def _binlog_dir(self):
+        log_bin_basename = self._mysql_client.variable("log_bin_basename")
+        if log_bin_basename is None:
+            raise OperationError("Binary logging is disabled")
+        return osp.dirname(log_bin_basename)
+
+    def _binlogs(self):
+        if self._mysql_client.variable("log_bin_basename") is None:
+            return []
+        with self._mysql_client.cursor() as cursor:
+            cursor.execute("SHOW BINARY LOGS")
+            return [row["Log_name"] for row in cursor.fetchall()]
+
+    def _load_state(self):
+        try:
+            with open(self._state_file, encoding=DEFAULT_FILE_ENCODING) as state_file:
+                state = json.load(state_file)
+            LOG.debug("Resuming from binlog %s, position %d", state["binlog"], state["offset"])
+            return state
+        except IOError as err:
+            if err.errno != errno.ENOENT:
+                raise OperationError(f"Failed to read {self._state_file}: {err}") from err
+        except (ValueError, KeyError) as err:
+            LOG.warning("Ignoring corrupted state file %s: %s", self._state_file, err)
+        return {"binlog": None, "offset": 0, "segments": []}
+
+    def _save_state(self):
+        mkdir_p(osp.dirname(self._state_file), mode=0o700)
+        tmp_file = self._state_file + ".tmp"
+        with open(tmp_file, "w", encoding=DEFAULT_FILE_ENCODING) as state_file:
+            json.dump(self._state, state_file)
+        os.rename(tmp_file, self._state_file)
+
+    @contextmanager
+    def _lock(self):
+        """Make sure only one follower works with the state file."""
+        mkdir_p(osp.dirname(self._state_file), mode=0o700)
+        with open(self._state_file + ".lock", "w", encoding=DEFAULT_FILE_ENCODING) as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError as err:
+                raise LockWaitTimeoutError(f"Another binlog follower is running? {err}") from err
+            yield
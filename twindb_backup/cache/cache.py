@@ -1,16 +1,100 @@
 """Backup copy cache"""
 
+import errno
+import fcntl
+import json
 import os
+import re
 import shutil
+import tempfile
+from contextlib import contextmanager
 
-from twindb_backup import LOG
+from twindb_backup import DEFAULT_FILE_ENCODING, LOG
 from twindb_backup.cache.exceptions import CacheException
 
+# ioctl that makes dst share extents with src (btrfs, XFS with reflink=1).
+FICLONE = 0x40049409
+
+CACHE_INDEX = ".index.json"
+CACHE_LOCK = ".lock"
+CACHE_TMP_PREFIX = ".tmp-"
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*$", re.IGNORECASE)
+
+
+def parse_size(value):
+    """
+    Parse a size like ``200G`` to bytes.
+
+    :param value: Size in bytes with an optional K, M, G or T suffix.
+    :type value: str
+    :return: Size in bytes.
+    :rtype: int
+    :raise CacheException: if the size is invalid.
+    """
+    match = SIZE_PATTERN.match(str(value))
+    if not match:
+        raise CacheException(f"Invalid size {value!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def clone_file(src, dst):
+    """
+    Copy a file the cheapest way the file system allows.
+
+    A reflink shares data blocks between the files, so the copy is instant
+    and takes no space until either file is modified. Otherwise the kernel
+    copies the data with copy_file_range() and only if that's not supported
+    the data goes through user space.
+
+    Hard links aren't used, because MySQL modifies a restored datadir in place
+    and that would modify the cached copy, too.
+
+    :param src: Source file.
+    :type src: str
+    :param dst: Destination file.
+    :type dst: str
+    :return: Destination file.
+    :rtype: str
+    """
+    with open(src, "rb") as src_fd, open(dst, "wb") as dst_fd:
+        try:
+            fcntl.ioctl(dst_fd.fileno(), FICLONE, src_fd.fileno())
+        except OSError:
+            _copy_range(src_fd, dst_fd)
+    shutil.copystat(src, dst)
+    return dst
+
+
+def _copy_range(src_fd, dst_fd):
+    remaining = os.fstat(src_fd.fileno()).st_size
+    try:
+        while remaining > 0:
+            copied = os.copy_file_range(src_fd.fileno(), dst_fd.fileno(), remaining)
+            if not copied:
+                break
+            remaining -= copied
+    except (AttributeError, OSError):
+        # Both offsets moved by the same number of bytes, continue from there
+        shutil.copyfileobj(src_fd, dst_fd)
+
+
+def _tree_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                continue
+    return size
+
 
 class Cache:
     """Class implements local cache to save full backup copies"""
 
-    def __init__(self, path):
+    def __init__(self, path, max_size=None):
         """Init Cache object with cache storage in local path.
         The cache is a directory on a local file system e.g.
         ``/var/tmp/cache``.
@@ -19,16 +103,37 @@ class Cache:
             /var/tmp/cache/mysql-2017-05-12_03_47_21.xbstream.gz/
             /var/tmp/cache/mysql-2017-05-13_22_04_06.xbstream.gz/
 
+        Items are populated in a temporary directory and renamed
+        into place, so a crashed run never leaves a partial item.
+        If the cache grows over ``max_size`` bytes items are evicted,
+        least recently used first.
+
         :param path: path to directory that becomes cache
+        :param max_size: Size limit in bytes. None means no limit.
+        :type max_size: int
         :raise CacheException: if path doesn't exist
         """
         if os.path.exists(path):
             self.path = path
         else:
             raise CacheException(f"Cache directory {path} doesn't exist")
+        self.max_size = max_size
 
     def __contains__(self, item):
-        return item in os.listdir(self.path)
+        if not item or item.startswith(".") or os.sep in item:
+            return False
+        return os.path.isdir(os.path.join(self.path, item))
+
+    @property
+    def items(self):
+        """Names of cached items."""
+        return [item for item in os.listdir(self.path) if item in self]
+
+    @property
+    def size(self):
+        """Total size of cached items in bytes."""
+        with self._locked(fcntl.LOCK_EX) as index:
+            return sum(self._item_size(index, item) for item in self.items)
 
     def add(self, path, key=None):
         # pylint: disable=line-too-long
@@ -51,43 +156,160 @@ class Cache:
         you need to specify the key e.g.
         ``add('/var/tmp/cache', 'mysql-2017-05-13_22_04_06.xbstream.gz')``
 
+        A directory larger than ``max_size`` isn't cached.
+
         :param path: full or relative path
         :type path: str
         :param key: if specified the directory will be added as this key name
             in the cache
         :raise: CacheException if errors
         """
-        if key:
-            LOG.debug("Cache key %s", key)
-            dst = os.path.join(self.path, key)
-        else:
-            dst = os.path.join(self.path, os.path.basename(path))
+        key = key or os.path.basename(path.rstrip(os.sep))
+        LOG.debug("Cache key %s", key)
+        if key.startswith(".") or os.sep in key:
+            raise CacheException(f"Invalid cache key {key!r}")
+
+        size = _tree_size(path)
+        if self.max_size is not None and size > self.max_size:
+            LOG.warning("%s takes %d bytes, more than the cache size %d. Not caching it.", path, size, self.max_size)
+            return
 
+        with self._locked(fcntl.LOCK_EX) as index:
+            self._remove_stale_tmp()
+            self._evict(index, size)
+
+        dst = os.path.join(self.path, key)
+        tmp_dir = tempfile.mkdtemp(prefix=f"{CACHE_TMP_PREFIX}{os.getpid()}-", dir=self.path)
         LOG.debug("Saving content of %s in %s", path, dst)
         try:
-            shutil.copytree(path, dst)
+            shutil.copytree(path, os.path.join(tmp_dir, key), symlinks=True, copy_function=clone_file)
+            with self._locked(fcntl.LOCK_EX) as index:
+                if key in self:
+                    LOG.debug("%s is already cached", key)
+                else:
+                    os.rename(os.path.join(tmp_dir, key), dst)
+                    # copytree() copied the source mtime, the item is used now
+                    os.utime(dst)
+                    index[key] = size
+                self._evict(index, 0, keep=key)
         except OSError as err:
             raise CacheException(err) from err
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
 
     def restore_in(self, item, path):
         """Restore backup copy item in path.
 
+        The item becomes the most recently used one. It can't be
+        evicted while it's being restored.
+
         :param item: directory in the cache
         :type item: str
         :param path: directory where to restore item
         :type path: str
+        :raise CacheException: if the item isn't cached or failed to restore it.
         """
+        with self._locked(fcntl.LOCK_SH):
+            if item not in self:
+                raise CacheException(f"{item} is not cached")
 
-        item_content_path = os.path.join(self.path, item)
-
-        for entry in os.listdir(item_content_path):
-            full_path = os.path.join(item_content_path, entry)
-            if os.path.isdir(full_path):
-                shutil.copytree(full_path, os.path.join(path, entry))
-            else:
-                shutil.copy(full_path, path)
+            item_content_path = os.path.join(self.path, item)
+            os.utime(item_content_path)
+            LOG.debug("Restoring %s from cache in %s", item, path)
+            try:
+                for entry in os.listdir(item_content_path):
+                    full_path = os.path.join(item_content_path, entry)
+                    if os.path.isdir(full_path) and not os.path.islink(full_path):
+                        shutil.copytree(
+                            full_path,
+                            os.path.join(path, entry),
+                            symlinks=True,
+                            copy_function=clone_file,
+                        )
+                    elif os.path.islink(full_path):
+                        os.symlink(os.readlink(full_path), os.path.join(path, entry))
+                    else:
+                        clone_file(full_path, os.path.join(path, entry))
+            except OSError as err:
+                raise CacheException(err) from err
 
     def purge(self):
         """Remove all entries from the cache"""
-        for item in os.listdir(self.path):
+        with self._locked(fcntl.LOCK_EX) as index:
+            for item in os.listdir(self.path):
+                if item in self or item.startswith(CACHE_TMP_PREFIX):
+                    shutil.rmtree(os.path.join(self.path, item))
+            index.clear()
+
+    @contextmanager
+    def _locked(self, operation):
+        """
+        Lock the cache. Restores hold a shared lock, so items
+        aren't evicted under them. Changes hold an exclusive lock.
+
+        :return: Item sizes. Changes are saved if the lock is exclusive.
+        :rtype: dict
+        """
+        with open(os.path.join(self.path, CACHE_LOCK), "a", encoding=DEFAULT_FILE_ENCODING) as lock_fd:
+            fcntl.flock(lock_fd, operation)
+            try:
+                index = self._read_index()
+                yield index
+                if operation == fcntl.LOCK_EX:
+                    self._write_index(index)
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.path, CACHE_INDEX), encoding=DEFAULT_FILE_ENCODING) as index_fd:
+                return json.load(index_fd)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        index = {item: size for item, size in index.items() if item in self}
+        tmp_fd, tmp_path = tempfile.mkstemp(prefix=CACHE_INDEX, dir=self.path)
+        with os.fdopen(tmp_fd, "w", encoding=DEFAULT_FILE_ENCODING) as index_fd:
+            json.dump(index, index_fd, sort_keys=True)
+        os.rename(tmp_path, os.path.join(self.path, CACHE_INDEX))
+
+    def _item_size(self, index, item):
+        if item not in index:
+            # Items cached before the index was introduced
+            index[item] = _tree_size(os.path.join(self.path, item))
+        return index[item]
+
+    def _evict(self, index, needed, keep=None):
+        """
+        Remove least recently used items until ``needed`` bytes
+        more fit in ``max_size``.
+        """
+        if self.max_size is None:
+            return
+
+        items = sorted(
+            ((os.stat(os.path.join(self.path, item)).st_mtime, item) for item in self.items),
+            reverse=True,
+        )
+        total = sum(self._item_size(index, item) for _, item in items)
+        while items and total + needed > self.max_size:
+            _, item = items.pop()
+            if item == keep:
+                continue
+            LOG.info("Evicting %s from cache %s", item, self.path)
             shutil.rmtree(os.path.join(self.path, item))
+            total -= index.pop(item)
+
+    def _remove_stale_tmp(self):
+        """Remove temporary directories of runs that crashed."""
+        for name in os.listdir(self.path):
+            match = re.match(rf"^{re.escape(CACHE_TMP_PREFIX)}(\d+)-", name)
+            if not match:
+                continue
+            try:
+                os.kill(int(match.group(1)), 0)
+            except OSError as err:
+                if err.errno == errno.ESRCH:
+                    LOG.debug("Removing %s left by a crashed run", name)
+                    shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
@@ -14,13 +14,15 @@ import click
 
 from twindb_backup import INTERVALS, LOCK_FILE, LOG, MEDIA_TYPES, __version__, setup_logging
 from twindb_backup.backup import run_backup_job
-from twindb_backup.cache.cache import Cache, CacheException
+from twindb_backup.binlog_follow import BINLOG_FOLLOW_INTERVAL, BINLOG_FOLLOW_STATE_FILE, BinlogFollower
+from twindb_backup.cache.cache import Cache, CacheException, parse_size
 from twindb_backup.clone import clone_mysql
 from twindb_backup.configuration import TwinDBBackupConfig
 from twindb_backup.copy.file_copy import FileCopy
 from twindb_backup.copy.mysql_copy import MySQLCopy
 from twindb_backup.exceptions import TwinDBBackupError
 from twindb_backup.ls import list_available_backups
+from twindb_backup.pitr import restore_to_point_in_time
 from twindb_backup.restore import restore_from_file, restore_from_mysql
 from twindb_backup.share import share
 from twindb_backup.status.binlog_status import BinlogStatus
@@ -139,6 +141,35 @@ def backup(ctx, run_type, lock_file, binlogs_only):
         exit(1)
 
 
+@main.command(name="binlog-follow")
+@click.option(
+    "--interval",
+    default=BINLOG_FOLLOW_INTERVAL,
+    show_default=True,
+    help="How often to copy new binlog events, in seconds.",
+)
+@click.option(
+    "--state-file",
+    default=BINLOG_FOLLOW_STATE_FILE,
+    show_default=True,
+    help="File where the last copied binlog position is saved.",
+)
+@click.pass_context
+def binlog_follow(ctx, interval, state_file):
+    """Continuously copy MySQL binary logs as they are written"""
+    try:
+        BinlogFollower(ctx.obj["twindb_config"], state_file=state_file, interval=interval).run()
+    except TwinDBBackupError as err:
+        LOG.error(err)
+        LOG.debug(traceback.format_exc())
+        exit(1)
+
+    except KeyboardInterrupt:
+        LOG.info("Exiting...")
+        kill_children()
+        exit(1)
+
+
 @main.command(name="ls")
 @click.option("--type", "copy_type", type=click.Choice(MEDIA_TYPES), default=None)
 @click.pass_context
@@ -174,8 +205,9 @@ def share_backup(ctx, s3_url):
 @click.pass_context
 def status(ctx, copy_type, hostname):
     """Print backups status"""
-    dst = ctx.obj["twindb_config"].destination(backup_source=hostname)
-    print(MEDIA_STATUS_MAP[copy_type](dst=dst, status_directory=hostname))
+    twindb_config = ctx.obj["twindb_config"]
+    dst = twindb_config.destination(backup_source=hostname)
+    print(MEDIA_STATUS_MAP[copy_type](dst=dst, status_directory=hostname, cache=dst.status_cache))
 
 
 @main.group("restore")
@@ -194,22 +226,56 @@ def restore(ctx):
     show_default=True,
 )
 @click.option("--cache", help="Save full backup copy in this directory", default=None)
+@click.option(
+    "--cache-size",
+    help="Keep the cache under this size, e.g. 200G. " "Least recently used copies are evicted. No limit by default.",
+    default=None,
+)
+@click.option(
+    "--until",
+    help="Roll the copy forward to this point in time with binlogs. "
+    "Give local time as 'YYYY-MM-DD HH:MM:SS' or a GTID. "
+    "If no copy is specified, the nearest copy before the target is used.",
+    default=None,
+)
+@click.option(
+    "--hostname",
+    help="With --until and no copy, restore backups of this host.",
+    show_default=True,
+    default=socket.gethostname(),
+)
 @click.pass_context
-def restore_mysql(ctx, dst, backup_copy, cache):
+def restore_mysql(ctx, dst, backup_copy, cache, cache_size, until, hostname):
     """Restore from mysql backup"""
     LOG.debug("mysql: %r", ctx.obj["twindb_config"])
 
-    if not backup_copy:
+    if not backup_copy and not until:
         LOG.info("No backup copy specified. Choose one from below:")
         list_available_backups(ctx.obj["twindb_config"])
         exit(1)
 
     try:
         ensure_empty(dst)
+        if cache:
+            cache = Cache(cache, max_size=parse_size(cache_size) if cache_size else None)
+
+        if not backup_copy:
+            restore_to_point_in_time(
+                ctx.obj["twindb_config"],
+                until,
+                dst,
+                hostname=hostname,
+                cache=cache,
+            )
+            return
 
         incomplete_copy = MySQLCopy(path=backup_copy)
         dst_storage = ctx.obj["twindb_config"].destination(backup_source=incomplete_copy.host)
-        mysql_status = MySQLStatus(dst=dst_storage, status_directory=incomplete_copy.host)
+        mysql_status = MySQLStatus(
+            dst=dst_storage,
+            status_directory=incomplete_copy.host,
+            cache=dst_storage.status_cache,
+        )
 
         copies = [cp for cp in mysql_status if backup_copy.endswith(cp.name)]
         try:
@@ -225,8 +291,16 @@ def restore_mysql(ctx, dst, backup_copy, cache):
                 "Multiple copies match pattern %s. Make sure you give unique " "copy name for restore."
             )
 
-        if cache:
-            restore_from_mysql(ctx.obj["twindb_config"], copy, dst, cache=Cache(cache))
+        if until:
+            restore_to_point_in_time(
+                ctx.obj["twindb_config"],
+                until,
+                dst,
+                copy=copy,
+                cache=cache,
+            )
+        elif cache:
+            restore_from_mysql(ctx.obj["twindb_config"], copy, dst, cache=cache)
         else:
             restore_from_mysql(ctx.obj["twindb_config"], copy, dst)
 
@@ -292,8 +366,14 @@ def verify(ctx):
     default=socket.gethostname(),
     show_default=True,
 )
+@click.option("--cache", help="Save full backup copy in this directory", default=None)
+@click.option(
+    "--cache-size",
+    help="Keep the cache under this size, e.g. 200G. " "Least recently used copies are evicted. No limit by default.",
+    default=None,
+)
 @click.pass_context
-def verify_mysql(ctx, hostname, dst, backup_copy):
+def verify_mysql(ctx, hostname, dst, backup_copy, cache, cache_size):
     """Verify backup"""
     LOG.debug("mysql: %r", ctx.obj["twindb_config"])
 
@@ -302,7 +382,18 @@ def verify_mysql(ctx, hostname, dst, backup_copy):
             list_available_backups(ctx.obj["twindb_config"])
             exit(1)
 
-        print(verify_mysql_backup(ctx.obj["twindb_config"], dst, backup_copy, hostname))
+        print(
+            verify_mysql_backup(
+                ctx.obj["twindb_config"],
+                dst,
+                backup_copy,
+                hostname,
+                cache=Cache(cache, max_size=parse_size(cache_size) if cache_size else None) if cache else None,
+            )
+        )
+    except CacheException as err:
+        LOG.error(err)
+        exit(1)
 
     finally:
 
@@ -7,7 +7,9 @@ from configparser import ConfigParser, NoOptionError, NoSectionError
 from shlex import split
 
 from twindb_backup import INTERVALS, LOG
+from twindb_backup.configuration.bandwidth import BandwidthConfig
 from twindb_backup.configuration.compression import CompressionConfig
+from twindb_backup.configuration.dedup import DedupConfig
 from twindb_backup.configuration.destinations.az import AZConfig
 from twindb_backup.configuration.destinations.gcs import GCSConfig
 from twindb_backup.configuration.destinations.s3 import S3Config
@@ -17,12 +19,20 @@ from twindb_backup.configuration.gpg import GPGConfig
 from twindb_backup.configuration.mysql import MySQLConfig
 from twindb_backup.configuration.retention import RetentionPolicy
 from twindb_backup.configuration.run_intervals import RunIntervals
+from twindb_backup.configuration.scheduler import SchedulerConfig
 from twindb_backup.destination.az import AZ
+from twindb_backup.destination.dedup import DedupDestination
 from twindb_backup.destination.gcs import GCS
 from twindb_backup.destination.s3 import S3
 from twindb_backup.destination.ssh import Ssh
 from twindb_backup.exporter.datadog_exporter import DataDogExporter
+from twindb_backup.exporter.prometheus_exporter import (
+    PROMETHEUS_STATE_FILE,
+    PROMETHEUS_TEXTFILE_DIR,
+    PrometheusExporter,
+)
 from twindb_backup.exporter.statsd_exporter import StatsdExporter
+from twindb_backup.status.cache import STATUS_CACHE_PATH, StatusCache
 
 DEFAULT_CONFIG_FILE_PATH = "/etc/twindb/twindb-backup.cfg"
 
@@ -156,6 +166,13 @@ class TwinDBBackupConfig:
                     statsd_host = self.__cfg.get("export", "statsd_host")
                     statsd_port = self.__cfg.get("export", "statsd_port")
                     return StatsdExporter(statsd_host, statsd_port)
+                if transport == "prometheus":
+                    options = self.__read_options_from_section("export")
+                    return PrometheusExporter(
+                        textfile_dir=options.get("textfile_dir", PROMETHEUS_TEXTFILE_DIR),
+                        state_file=options.get("state_file", PROMETHEUS_STATE_FILE),
+                        pushgateway=options.get("pushgateway"),
+                    )
                 else:
                     raise ConfigurationError(f"Metric exported '{transport}' is not implemented")
             except NoOptionError as err:
@@ -171,10 +188,47 @@ class TwinDBBackupConfig:
         :rtype: CompressionConfig
         """
         try:
-            return CompressionConfig(**self.__read_options_from_section("compression"))
+            options = self.__read_options_from_section("compression")
+        except NoSectionError:
+            options = {}
+        # Deduplication needs compressed output that resyncs after a change
+        if self.dedup and "rsyncable" not in options:
+            options["rsyncable"] = "yes"
+        return CompressionConfig(**options)
+
+    @property
+    def dedup(self):
+        """Deduplication configuration or None if copies aren't deduplicated."""
+        try:
+            return DedupConfig(**self.__read_options_from_section("dedup"))
+
+        except NoSectionError:
+            return None
+
+    @property
+    def bandwidth(self):
+        """
+        :return: Bandwidth limit configuration or None if streams aren't throttled.
+        :rtype: BandwidthConfig
+        """
+        try:
+            return BandwidthConfig(**self.__read_options_from_section("bandwidth"))
+
+        except NoSectionError:
+            return None
+
+    @property
+    def scheduler(self):
+        """
+        :return: Backup jobs scheduler configuration. Jobs run
+            one at a time if the section is missing.
+        :rtype: SchedulerConfig
+        """
+        try:
+            return SchedulerConfig(**self.__read_options_from_section("scheduler"))
 
         except NoSectionError:
-            return CompressionConfig()
+            return SchedulerConfig()
 
     @property
     def gpg(self):
@@ -219,13 +273,38 @@ class TwinDBBackupConfig:
         except NoOptionError:
             return None
 
+    @property
+    def files_full_backup(self):
+        """
+        How often to take full copies of ``backup_dirs``, e.g. ``daily``.
+        Shorter runs take incremental copies. None if every copy is full.
+        """
+        try:
+            full_backup = self.__cfg.get("source", "files_full_backup").strip("\"'")
+        except (NoSectionError, NoOptionError):
+            return None
+        if full_backup not in INTERVALS:
+            raise ConfigurationError(f"files_full_backup must be one of {', '.join(INTERVALS)}, got {full_backup}")
+        return full_backup
+
     def destination(self, backup_source=socket.gethostname()):
         """
         :param backup_source: Hostname of the host where backup is taken from.
         :type backup_source: str
-        :return: Backup destination instance
+        :return: Backup destination instance. Its ``status_cache``
+            is set if the ``[status_cache]`` section is configured.
         :rtype: BaseDestination
         """
+        dst = self._destination(backup_source)
+        dedup = self.dedup
+        if dedup is not None:
+            if not isinstance(dst, (S3, GCS)):
+                raise ConfigurationError("Deduplication is supported only with s3 and gcs destinations")
+            dst = DedupDestination(dst, chunk_size=dedup.chunk_size, concurrency=dedup.concurrency)
+        dst.status_cache = self._status_cache()
+        return dst
+
+    def _destination(self, backup_source):
         try:
             backup_destination = self.__cfg.get("destination", "backup_destination")
             if backup_destination == "ssh":
@@ -244,6 +323,15 @@ class TwinDBBackupConfig:
                     aws_secret_access_key=self.s3.aws_secret_access_key,
                     aws_default_region=self.s3.aws_default_region,
                     hostname=backup_source,
+                    upload_concurrency=self.s3.upload_concurrency,
+                    upload_part_size=self.s3.upload_part_size,
+                    upload_memory_budget=self.s3.upload_memory_budget,
+                    upload_validation=self.s3.upload_validation,
+                    download_concurrency=self.s3.download_concurrency,
+                    download_memory_budget=self.s3.download_memory_budget,
+                    list_concurrency=self.s3.list_concurrency,
+                    listing_cache_ttl=self.s3.listing_cache_ttl,
+                    listing_cache_dir=self.s3.listing_cache_dir,
                 )
             elif backup_destination == "gcs":
                 return GCS(
@@ -265,6 +353,14 @@ class TwinDBBackupConfig:
         except NoSectionError as err:
             raise ConfigurationError(f"{self._config_file} is missing required section 'destination'") from err
 
+    def _status_cache(self):
+        try:
+            options = self.__read_options_from_section("status_cache")
+        except NoSectionError:
+            return None
+
+        return StatusCache(path=options.get("path", STATUS_CACHE_PATH))
+
     def _retention(self, section):
         kwargs = {}
         for i in INTERVALS:
@@ -0,0 +1,61 @@
+"""Bandwidth limit configuration"""
+
+from twindb_backup.configuration.exceptions import ConfigurationError
+from twindb_backup.modifiers.exceptions import ModifierException
+from twindb_backup.modifiers.throttle import BANDWIDTH_STATE_FILE, TokenBucket, parse_rate, parse_schedule
+
+
+class BandwidthConfig:
+    """
+    Bandwidth limit configuration
+
+    :param rate: bytes per second with an optional K, M or G suffix,
+        zero means unlimited
+    :type rate: str
+    :param burst: how many bytes may be sent at once, one second worth of rate by default
+    :type burst: str
+    :param schedule: time-of-day windows with their own rate,
+        e.g. ``09:00-18:00=10M 22:00-06:00=0``
+    :type schedule: str
+    :param state_file: file where processes share the token bucket
+    :type state_file: str
+    """
+
+    def __init__(self, **kwargs):
+        try:
+            self._rate = parse_rate(kwargs.get("rate", "0"))
+            self._burst = parse_rate(kwargs["burst"]) if "burst" in kwargs else None
+            self._schedule = parse_schedule(kwargs.get("schedule"))
+        except ModifierException as err:
+            raise ConfigurationError(f"Invalid bandwidth option: {err}") from err
+        self._state_file = kwargs.get("state_file", BANDWIDTH_STATE_FILE)
+
+    @property
+    def rate(self):
+        """Bytes per second outside of schedule windows, zero if unlimited."""
+
+        return self._rate
+
+    @property
+    def burst(self):
+        """Token bucket size in bytes or None for one second worth of rate."""
+
+        return self._burst
+
+    @property
+    def schedule(self):
+        """List of tuples (start minute, end minute, rate)."""
+
+        return self._schedule
+
+    @property
+    def state_file(self):
+        """File where processes share the token bucket."""
+
+        return self._state_file
+
+    @property
+    def bucket(self):
+        """Token bucket shared by all streams of all processes."""
+
+        return TokenBucket.shared(self._rate, burst=self._burst, schedule=self._schedule, state_file=self._state_file)
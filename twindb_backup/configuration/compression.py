@@ -1,10 +1,11 @@
 """Compression configuration"""
 
+from twindb_backup import LOG
 from twindb_backup.configuration.exceptions import ConfigurationError
 from twindb_backup.modifiers import COMPRESSION_MODIFIERS
 
 
-class CompressionConfig:
+class CompressionConfig:  # pylint: disable=too-many-instance-attributes
     """Compression configuration
 
     :param program: compression program
@@ -13,6 +14,16 @@ class CompressionConfig:
     :type threads: int
     :param level: compression level
     :type level: int
+    :param long_window: zstd long distance matching window log
+    :type long_window: int
+    :param min_level: the lowest level of adaptive compression
+    :type min_level: int
+    :param max_level: the highest level of adaptive compression
+    :type max_level: int
+    :param cpu_share: share of the host CPU adaptive compression may use
+    :type cpu_share: float
+    :param rsyncable: make compressed output friendly to deduplication
+    :type rsyncable: bool
     """
 
     def __init__(self, **kwargs):
@@ -24,6 +35,22 @@ class CompressionConfig:
 
         self._level = int(kwargs.get("level")) if "level" in kwargs else None
 
+        self._long_window = int(kwargs.get("long_window")) if "long_window" in kwargs else None
+
+        self._min_level = int(kwargs.get("min_level")) if "min_level" in kwargs else None
+
+        self._max_level = int(kwargs.get("max_level")) if "max_level" in kwargs else None
+
+        self._cpu_share = float(kwargs.get("cpu_share")) if "cpu_share" in kwargs else None
+        if self._cpu_share is not None and not 0 < self._cpu_share <= 1:
+            raise ConfigurationError(f"cpu_share must be between 0 and 1, got {self._cpu_share}")
+
+        self._rsyncable = None
+        if "rsyncable" in kwargs:
+            self._rsyncable = str(kwargs.get("rsyncable")).lower() in ("1", "yes", "true", "on")
+            if self._rsyncable and "rsyncable" not in COMPRESSION_MODIFIERS[self.program]["kwargs"]:
+                LOG.warning("%s doesn't support rsyncable output. Deduplication will be poor.", self.program)
+
     @property
     def program(self):
         """Compression program."""
@@ -42,6 +69,36 @@ class CompressionConfig:
 
         return self._level
 
+    @property
+    def long_window(self):
+        """Long distance matching window log (zstd only)."""
+
+        return self._long_window
+
+    @property
+    def min_level(self):
+        """The lowest level of adaptive compression."""
+
+        return self._min_level
+
+    @property
+    def max_level(self):
+        """The highest level of adaptive compression."""
+
+        return self._max_level
+
+    @property
+    def cpu_share(self):
+        """Share of the host CPU adaptive compression may use."""
+
+        return self._cpu_share
+
+    @property
+    def rsyncable(self):
+        """Whether compressed output is friendly to deduplication."""
+
+        return self._rsyncable
+
     def get_modifier(self, stream):
         """
         Build a compression modifier based on the given configuration
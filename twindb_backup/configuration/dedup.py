@@ -0,0 +1,40 @@
+"""Deduplication configuration"""
+
+from twindb_backup.configuration.exceptions import ConfigurationError
+from twindb_backup.destination.dedup import DEDUP_CHUNK_SIZE, DEDUP_CONCURRENCY
+
+
+class DedupConfig:
+    """
+    Deduplication configuration
+
+    :param chunk_size: average chunk size in bytes
+    :type chunk_size: int
+    :param concurrency: how many chunks to transfer in parallel
+    :type concurrency: int
+    """
+
+    def __init__(self, **kwargs):
+        try:
+            self._chunk_size = int(kwargs.get("chunk_size", DEDUP_CHUNK_SIZE))
+            self._concurrency = int(kwargs.get("concurrency", DEDUP_CONCURRENCY))
+        except ValueError as err:
+            raise ConfigurationError(f"Invalid dedup option: {err}") from err
+
+        if self._chunk_size < 64 * 1024:
+            raise ConfigurationError(f"chunk_size must be at least 64 kB, got {self._chunk_size}")
+
+        if self._concurrency < 1:
+            raise ConfigurationError(f"concurrency must be positive, got {self._concurrency}")
+
+    @property
+    def chunk_size(self):
+        """Average chunk size."""
+
+        return self._chunk_size
+
+    @property
+    def concurrency(self):
+        """How many chunks to upload or download in parallel."""
+
+        return self._concurrency
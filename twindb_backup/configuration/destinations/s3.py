@@ -1,7 +1,18 @@
 """Amazon S3 destrination configuration"""
 
+from twindb_backup.configuration.exceptions import ConfigurationError
+from twindb_backup.destination.download import DOWNLOAD_CONCURRENCY, DOWNLOAD_MEMORY_BUDGET
+from twindb_backup.destination.listing import LISTING_CACHE_DIR, LISTING_CACHE_TTL
+from twindb_backup.destination.s3 import (
+    S3_LIST_CONCURRENCY,
+    S3_UPLOAD_CONCURRENCY,
+    S3_UPLOAD_MEMORY_BUDGET,
+    S3_UPLOAD_PART_SIZE,
+    S3UploadValidation,
+)
 
-class S3Config:
+
+class S3Config:  # pylint: disable=too-many-instance-attributes
     """Amazon S3 configuration."""
 
     def __init__(
@@ -10,12 +21,32 @@ class S3Config:
         aws_secret_access_key,
         bucket,
         aws_default_region="us-east-1",
-    ):
+        upload_concurrency=S3_UPLOAD_CONCURRENCY,
+        upload_part_size=S3_UPLOAD_PART_SIZE,
+        upload_memory_budget=S3_UPLOAD_MEMORY_BUDGET,
+        upload_validation=S3UploadValidation.head,
+        download_concurrency=DOWNLOAD_CONCURRENCY,
+        download_memory_budget=DOWNLOAD_MEMORY_BUDGET,
+        list_concurrency=S3_LIST_CONCURRENCY,
+        listing_cache_ttl=LISTING_CACHE_TTL,
+        listing_cache_dir=LISTING_CACHE_DIR,
+    ):  # pylint: disable=too-many-arguments
 
         self._aws_access_key_id = aws_access_key_id
         self._aws_secret_access_key = aws_secret_access_key
         self._bucket = bucket
         self._aws_default_region = aws_default_region
+        self._upload_concurrency = int(upload_concurrency)
+        self._upload_part_size = int(upload_part_size)
+        self._upload_memory_budget = int(upload_memory_budget)
+        self._upload_validation = upload_validation
+        self._download_concurrency = int(download_concurrency)
+        self._download_memory_budget = int(download_memory_budget)
+        self._list_concurrency = int(list_concurrency)
+        self._listing_cache_ttl = int(listing_cache_ttl)
+        self._listing_cache_dir = listing_cache_dir
+        if upload_validation not in (S3UploadValidation.none, S3UploadValidation.head, S3UploadValidation.strict):
+            raise ConfigurationError(f"Unsupported upload validation mode {upload_validation}")
 
     @property
     def aws_access_key_id(self):
@@ -36,3 +67,48 @@ class S3Config:
     def aws_default_region(self):
         """AWS_DEFAULT_REGION"""
         return self._aws_default_region
+
+    @property
+    def upload_concurrency(self):
+        """How many parts of a backup copy to upload concurrently"""
+        return self._upload_concurrency
+
+    @property
+    def upload_part_size(self):
+        """Multipart upload part size in bytes"""
+        return self._upload_part_size
+
+    @property
+    def upload_memory_budget(self):
+        """How many bytes parts waiting for upload may take"""
+        return self._upload_memory_budget
+
+    @property
+    def upload_validation(self):
+        """How to check an uploaded backup copy: none, head or strict"""
+        return self._upload_validation
+
+    @property
+    def download_concurrency(self):
+        """How many ranges of a backup copy to download concurrently"""
+        return self._download_concurrency
+
+    @property
+    def download_memory_budget(self):
+        """How many bytes downloaded ranges waiting to be written may take"""
+        return self._download_memory_budget
+
+    @property
+    def list_concurrency(self):
+        """How many prefixes to list concurrently"""
+        return self._list_concurrency
+
+    @property
+    def listing_cache_ttl(self):
+        """Seconds a listing is cached locally, zero disables the cache"""
+        return self._listing_cache_ttl
+
+    @property
+    def listing_cache_dir(self):
+        """Directory where listings are cached"""
+        return self._listing_cache_dir
@@ -1,9 +1,12 @@
 """MySQL instance configuration"""
 
 from twindb_backup import INTERVALS
+from twindb_backup.cache.cache import parse_size
 
+BINLOG_UPLOAD_WORKERS = 4
 
-class MySQLConfig:
+
+class MySQLConfig:  # pylint: disable=too-many-instance-attributes
     """
     MySQL Instance configuration
     """
@@ -15,6 +18,11 @@ class MySQLConfig:
         self._expire_log_days = int(kwargs.get("expire_log_days", 7))
         self._xtrabackup_binary = kwargs.get("xtrabackup_binary")
         self._xbstream_binary = kwargs.get("xbstream_binary")
+        self._binlog_upload_workers = max(1, int(kwargs.get("binlog_upload_workers", BINLOG_UPLOAD_WORKERS)))
+        restore_parallel = kwargs.get("restore_parallel")
+        self._restore_parallel = max(1, int(restore_parallel)) if restore_parallel else None
+        restore_use_memory = kwargs.get("restore_use_memory")
+        self._restore_use_memory = parse_size(restore_use_memory) if restore_use_memory else None
 
     @property
     def defaults_file(self):
@@ -34,6 +42,30 @@ class MySQLConfig:
 
         return self._expire_log_days
 
+    @property
+    def binlog_upload_workers(self):
+        """How many binlogs to upload concurrently"""
+
+        return self._binlog_upload_workers
+
+    @property
+    def restore_parallel(self):
+        """
+        How many threads xbstream and xtrabackup use to extract and prepare
+        a restored copy. None means one per CPU.
+        """
+
+        return self._restore_parallel
+
+    @property
+    def restore_use_memory(self):
+        """
+        Buffer pool size in bytes of ``xtrabackup --prepare``.
+        None means a half of available memory.
+        """
+
+        return self._restore_use_memory
+
     @property
     def xtrabackup_binary(self):
         """Path to xtrabackup binary"""
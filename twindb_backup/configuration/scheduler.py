@@ -0,0 +1,56 @@
+"""Backup jobs scheduler configuration"""
+
+from twindb_backup.configuration.exceptions import ConfigurationError
+from twindb_backup.scheduler import JOB_KINDS, SCHEDULER_BUDGET, SCHEDULER_PRIORITY, SCHEDULER_WEIGHT
+
+
+class SchedulerConfig:
+    """
+    Backup jobs scheduler configuration
+
+    :param budget: sum of weights of jobs that may run at once
+    :type budget: int
+    :param priority_<kind>: priority of files, mysql or binlogs jobs
+    :type priority_<kind>: int
+    :param weight_<kind>: weight of files, mysql or binlogs jobs
+    :type weight_<kind>: int
+    """
+
+    def __init__(self, **kwargs):
+        try:
+            self._budget = int(kwargs.get("budget", SCHEDULER_BUDGET))
+            self._priorities = {kind: int(kwargs.get(f"priority_{kind}", SCHEDULER_PRIORITY)) for kind in JOB_KINDS}
+            self._weights = {kind: int(kwargs.get(f"weight_{kind}", SCHEDULER_WEIGHT)) for kind in JOB_KINDS}
+        except ValueError as err:
+            raise ConfigurationError(f"Invalid scheduler option: {err}") from err
+
+        if self._budget < 1:
+            raise ConfigurationError(f"budget must be positive, got {self._budget}")
+
+        for kind, weight in self._weights.items():
+            if weight < 0:
+                raise ConfigurationError(f"weight_{kind} must not be negative, got {weight}")
+
+    @property
+    def budget(self):
+        """Sum of weights of jobs that may run at once."""
+
+        return self._budget
+
+    def priority(self, kind):
+        """
+        :param kind: Job kind - files, mysql or binlogs.
+        :type kind: str
+        :return: Priority of jobs of this kind.
+        :rtype: int
+        """
+        return self._priorities[kind]
+
+    def weight(self, kind):
+        """
+        :param kind: Job kind - files, mysql or binlogs.
+        :type kind: str
+        :return: Weight of jobs of this kind.
+        :rtype: int
+        """
+        return self._weights[kind]
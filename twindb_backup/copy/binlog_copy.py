@@ -2,6 +2,9 @@
 
 from twindb_backup.copy.base_copy import BaseCopy
 
+# Suffixes a binlog copy may be stored with if the status doesn't record it
+BINLOG_COMPRESSION_SUFFIXES = (".gz", ".bz", ".zst")
+
 
 class BinlogCopy(BaseCopy):  # pylint: disable=too-few-public-methods
     """
@@ -14,12 +17,16 @@ class BinlogCopy(BaseCopy):  # pylint: disable=too-few-public-methods
     :type name: str
     :param created_at: Time when copy created
     :type created_at: int
+    :param suffix: Suffixes the modifiers appended to the stored file,
+        e.g. ``.zst.gpg``. None if it's unknown.
+    :type suffix: str
     """
 
-    def __init__(self, host, name, created_at):
+    def __init__(self, host, name, created_at, suffix=None):
         super(BinlogCopy, self).__init__(host, name)
         self._created_at = int(created_at)
         self._source_type = "binlog"
+        self.suffix = suffix
 
     def __eq__(self, other):
         """
@@ -47,11 +54,32 @@ class BinlogCopy(BaseCopy):  # pylint: disable=too-few-public-methods
     def _extra_path(self):
         return None
 
+    @property
+    def host(self):
+        """Host where the binlog was copied from"""
+        return self._host
+
     @property
     def created_at(self):
         """Time of created copy"""
         return self._created_at
 
+    @property
+    def stored_keys(self):
+        """
+        Keys the copy may be stored under. Statuses written before
+        the suffix was recorded don't have it, so any compression suffix
+        with and without encryption is possible.
+        """
+        if self.suffix is not None:
+            return [self.key + self.suffix]
+        return [self.key + ext + gpg for ext in BINLOG_COMPRESSION_SUFFIXES for gpg in ("", ".gpg")]
+
+    @property
+    def index_key(self):
+        """Path to the binlog index. It's stored next to the copy."""
+        return self.key + ".index.json"
+
     @property
     def name(self):
         """Binlog copy name as in SHOW BINARY LOGS."""
@@ -2,8 +2,17 @@
 This module describes class to work with backup copies of the file type.
 """
 
+import re
+
 from twindb_backup.copy.periodic_copy import PeriodicCopy
 
+# e.g. _home_data-2023-01-01_10_00_00.tar.gz or, for an incremental copy
+# taken against a daily full copy, _home_data-2023-01-01_10_00_00.inc-daily-2023-01-01_00_00_00.tar.gz
+FILE_COPY_NAME_PATTERN = re.compile(
+    r"^(?P<source>.+?)-(?P<time>\d{4}-\d{2}-\d{2}_\d{2}_\d{2}_\d{2})\."
+    r"(?:inc-(?P<parent_run_type>[a-z]+)-(?P<parent_time>\d{4}-\d{2}-\d{2}_\d{2}_\d{2}_\d{2})\.)?tar"
+)
+
 
 class FileCopy(PeriodicCopy):
     """
@@ -20,3 +29,36 @@ class FileCopy(PeriodicCopy):
     def __init__(self, *args, **kwargs):
         super(FileCopy, self).__init__(*args, **kwargs)
         self._source_type = "files"
+        self._match = FILE_COPY_NAME_PATTERN.match(self.name)
+
+    @property
+    def incremental(self):
+        """True if the copy includes only files changed since its parent full copy."""
+        return bool(self._match and self._match.group("parent_time"))
+
+    @property
+    def parent_prefix(self):
+        """
+        Key of the parent full copy up to the compression and encryption
+        suffixes, e.g. ``master1/daily/files/_home-2023-01-01_00_00_00.tar``.
+        None if the copy is full.
+        """
+        if not self.incremental:
+            return None
+        return "{host}/{run_type}/{source_type}/{source}-{time}.tar".format(
+            host=self.host,
+            run_type=self._match.group("parent_run_type"),
+            source_type=self._source_type,
+            source=self.source,
+            time=self._match.group("parent_time"),
+        )
+
+    @property
+    def source(self):
+        """Backed up path as it appears in the copy name, e.g. ``_home_data``."""
+        return self._match.group("source") if self._match else None
+
+    @property
+    def taken_at(self):
+        """Time the copy was taken as ``YYYY-MM-DD_HH_MM_SS``."""
+        return self._match.group("time") if self._match else None
@@ -6,16 +6,28 @@ import builtins
 import os
 import socket
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from multiprocessing import Process
 
 import azure.core.exceptions as ae
+from azure.core import MatchConditions
 from azure.storage.blob import ContainerClient
 
 from twindb_backup import LOG
 from twindb_backup.copy.base_copy import BaseCopy
-from twindb_backup.destination.base_destination import BaseDestination
-from twindb_backup.destination.exceptions import FileNotFound
+from twindb_backup.destination.base_destination import DELETE_CONCURRENCY, BaseDestination, split_batches
+from twindb_backup.destination.download import (
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_CONCURRENCY,
+    DOWNLOAD_MEMORY_BUDGET,
+    RangedDownload,
+    split_ranges,
+)
+from twindb_backup.destination.exceptions import AzureBlobDestinationError, FileNotFound
+
+# A blob batch request accepts up to 256 subrequests.
+AZ_DELETE_BATCH_SIZE = 256
 
 
 class AZ(BaseDestination):
@@ -28,6 +40,9 @@ class AZ(BaseDestination):
         hostname: str = socket.gethostname(),
         chunk_size: int = 4 * 1024 * 1024,  # TODO: Add support for chunk size
         remote_path: str = "/",
+        download_concurrency: int = DOWNLOAD_CONCURRENCY,
+        download_chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+        download_memory_budget: int = DOWNLOAD_MEMORY_BUDGET,
     ) -> None:
         """Creates an instance of the Azure Blob Storage Destination class,
           initializes the ContainerClient and validates the connection settings
@@ -38,6 +53,9 @@ class AZ(BaseDestination):
             hostname (str, optional): Hostname of the host performing the backup. Defaults to socket.gethostname().
             chunk_size (int, optional): Size in bytes for read/write streams. Defaults to 4*1024*1024.
             remote_path (str, optional): Remote base path in the container to store backups. Defaults to "/".
+            download_concurrency (int, optional): Number of ranges to download concurrently.
+            download_chunk_size (int, optional): Size in bytes of a downloaded range.
+            download_memory_budget (int, optional): Memory limit in bytes for downloaded ranges waiting to be written.
 
         Raises:
             err: Raises an error if the client cannot be initialized
@@ -48,6 +66,9 @@ class AZ(BaseDestination):
         self._hostname = hostname
         self._chunk_size = chunk_size
         self._remote_path = remote_path
+        self._download_concurrency = download_concurrency
+        self._download_chunk_size = download_chunk_size
+        self._download_memory_budget = download_memory_budget
         super(AZ, self).__init__(self._remote_path)
 
         self._container_client = self._connect()
@@ -97,7 +118,7 @@ class AZ(BaseDestination):
         return f"{self._remote_path}/{path}"
 
     def _download_to_pipe(self, blob_key: str, pipe_in: int, pipe_out: int) -> None:
-        """Downloads a blob from Azure Blob Storage and writes it to a pipe
+        """Downloads a blob from Azure Blob Storage in concurrent ranges and writes it to a pipe
 
         Args:
             blob_key (str): The path to the blob in the container
@@ -107,7 +128,15 @@ class AZ(BaseDestination):
         os.close(pipe_in)
         with os.fdopen(pipe_out, "wb") as pipe_out_file:
             try:
-                self._container_client.download_blob(blob_key).readinto(pipe_out_file)
+                size = self._container_client.get_blob_client(blob_key).get_blob_properties().size
+                RangedDownload(
+                    lambda r: self._container_client.download_blob(
+                        r.source, offset=r.start, length=r.end - r.start + 1
+                    ).readall(),
+                    split_ranges(blob_key, size, self._download_chunk_size),
+                    concurrency=self._download_concurrency,
+                    memory_budget=self._download_memory_budget,
+                ).run(pipe_out_file)
             except builtins.Exception as err:
                 LOG.error(f"Failed to download blob {blob_key}. Error: {type(err).__name__}, Reason: {err}")
                 raise err
@@ -131,6 +160,45 @@ class AZ(BaseDestination):
             LOG.error(f"Failed to delete blob {self.render_path(path)}. Error: {type(err).__name__}, Reason: {err}")
             raise err
 
+    def delete_many(self, paths: t.Iterable[str], concurrency: int = DELETE_CONCURRENCY) -> None:
+        """Deletes blobs with blob batch requests, up to 256 blobs per request.
+        Blobs that don't exist are skipped.
+
+        Args:
+            paths (Iterable[str]): Relative paths to the blobs in the container to delete
+            concurrency (int, optional): Number of batch requests to send concurrently.
+
+        Raises:
+            AzureBlobDestinationError: Raises an error if some blobs failed to be deleted
+        """
+        blobs = [self.render_path(path) for path in paths]
+        batches = split_batches(blobs, AZ_DELETE_BATCH_SIZE)
+        if not batches:
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            failed = [blob for batch_failed in executor.map(self._delete_batch, batches) for blob in batch_failed]
+
+        if failed:
+            raise AzureBlobDestinationError(f"Failed to delete {len(failed)} blobs: {', '.join(failed[:10])}")
+
+    def _delete_batch(self, blobs: t.List[str]) -> t.List[str]:
+        """Deletes up to 256 blobs in one batch request
+
+        Args:
+            blobs (List[str]): Absolute paths to the blobs in the container
+
+        Returns:
+            List[str]: Blobs that failed to be deleted. Missing blobs count as deleted.
+        """
+        LOG.debug(f"Deleting {len(blobs)} blobs in a batch")
+        responses = self._container_client.delete_blobs(*blobs, raise_on_any_failure=False)
+        return [
+            blob
+            for blob, response in zip(blobs, responses)
+            if response.status_code >= 300 and response.status_code != 404
+        ]
+
     @contextmanager
     def get_stream(self, copy: BaseCopy) -> t.Generator[t.BinaryIO, None, None]:
         """Streams a blob from Azure Blob Storage into a pipe
@@ -179,6 +247,44 @@ class AZ(BaseDestination):
             LOG.error(f"Failed to read blob {self.render_path(filepath)}. Error: {type(err).__name__}, Reason: {err}")
             raise err
 
+    def read_if_modified(self, filepath: str, version: t.Optional[str]) -> t.Tuple[t.Optional[str], str]:
+        """Read content of a blob unless its ETag is still ``version``
+
+        Args:
+            filepath (str): Relative path to a blob in the container
+            version (str): ETag of the content the caller has or None
+
+        Raises:
+            FileNotFound: If the blob does not exist
+
+        Returns:
+            tuple: Content of the blob or None if it is not modified, and its ETag
+        """
+        kwargs = {"encoding": "utf-8"}
+        if version is not None:
+            kwargs.update({"etag": version, "match_condition": MatchConditions.IfModified})
+        try:
+            downloader = self._container_client.download_blob(self.render_path(filepath), **kwargs)
+            return downloader.read(), downloader.properties.etag
+        except ae.ResourceNotModifiedError:
+            return None, version
+        except ae.ResourceNotFoundError:
+            raise FileNotFound(f"File {self.render_path(filepath)} does not exist in container {self._container_name}")
+
+    def version(self, filepath: str) -> t.Optional[str]:
+        """Get ETag of a blob
+
+        Args:
+            filepath (str): Relative path to a blob in the container
+
+        Returns:
+            str: ETag of the blob or None if it does not exist
+        """
+        try:
+            return self._container_client.get_blob_client(self.render_path(filepath)).get_blob_properties().etag
+        except ae.ResourceNotFoundError:
+            return None
+
     def save(self, handler: t.BinaryIO, filepath: str) -> None:
         """Save a stream given as handler to filepath in Azure Blob Storage
 
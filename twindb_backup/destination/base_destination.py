@@ -4,11 +4,29 @@ Module defines Base destination class and destination exception(s).
 """
 import re
 from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 from twindb_backup import LOG
-from twindb_backup.destination.exceptions import DestinationError
+from twindb_backup.destination.exceptions import DestinationError, FileNotFound
 from twindb_backup.exceptions import TwinDBBackupInternalError
 
+# How many delete requests to send concurrently.
+DELETE_CONCURRENCY = 4
+
+
+def split_batches(items, size):
+    """
+    Split a list in batches for batch requests.
+
+    :param items: Items to split.
+    :type items: list
+    :param size: Maximum batch size.
+    :type size: int
+    :return: List of batches, the last one may be shorter.
+    :rtype: list(list)
+    """
+    return [items[start:end] for start, end in ((i, i + size) for i in range(0, len(items), size))]
+
 
 class BaseDestination(object):
     """
@@ -25,6 +43,8 @@ class BaseDestination(object):
         if not remote_path:
             raise DestinationError("remote path must be defined and cannot be %r" % remote_path)
         self.remote_path = remote_path.rstrip("/")
+        # Local cache of status files stored on the destination
+        self.status_cache = None
 
     @abstractmethod
     def delete(self, path):
@@ -34,6 +54,44 @@ class BaseDestination(object):
         :param path: Relative path to the file to delete
         """
 
+    def delete_many(self, paths, concurrency=DELETE_CONCURRENCY):
+        """
+        Delete several objects. Objects that don't exist are skipped.
+
+        The default implementation calls :meth:`delete` for every object,
+        ``concurrency`` objects at a time. Destinations that
+        have a batch API override it.
+
+        :param paths: Relative paths or URLs of objects to delete.
+        :type paths: list(str)
+        :param concurrency: How many requests to send concurrently.
+        :type concurrency: int
+        :raise DestinationError: if an object can't be deleted.
+        """
+        paths = list(paths)
+        if not paths:
+            return
+
+        def _delete(path):
+            try:
+                self.delete(path)
+            except (FileNotFound, FileNotFoundError):
+                LOG.debug("%s is already deleted", path)
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            # list() re-raises the first error
+            list(executor.map(_delete, paths))
+
+    @property
+    def part_latencies(self):
+        """
+        Seconds it took to upload every part of the last saved copy.
+        Destinations that don't upload in parts return an empty list.
+
+        :rtype: list(float)
+        """
+        return []
+
     @abstractmethod
     def get_stream(self, copy):
         """
@@ -45,6 +103,20 @@ class BaseDestination(object):
         :return: Standard output.
         """
 
+    def list_copies(self, media_type, run_type=None):
+        """
+        List backup copies of all hosts.
+
+        :param media_type: files, mysql or binlog.
+        :type media_type: str
+        :param run_type: hourly, daily, etc. None for binary logs.
+        :type run_type: str
+        :return: Sorted list of files.
+        :rtype: list
+        """
+        pattern = "/%s/%s/" % (run_type, media_type) if run_type else "/%s/" % media_type
+        return self.list_files(self.remote_path, pattern=pattern, recursive=True, files_only=True)
+
     def list_files(self, prefix=None, recursive=False, pattern=None, files_only=False):
         """
         Get list of file by prefix.
@@ -79,6 +151,42 @@ class BaseDestination(object):
         """
         raise TwinDBBackupInternalError("Method read() is not implemented in %s" % self.__class__)
 
+    def read_if_modified(self, filepath, version):
+        """
+        Read content of a file unless it's still at ``version``.
+
+        The default implementation compares :meth:`version` of the file
+        and reads it if the version changed. Object stores override it
+        with a conditional request.
+
+        :param filepath: Relative path to file.
+        :type filepath: str
+        :param version: Version of the content the caller has
+            or None to read the file unconditionally.
+        :type version: str
+        :return: tuple (content, version). Content is None
+            if the file is not modified.
+        :rtype: tuple
+        :raises FileNotFound: If filepath doesn't exist.
+        """
+        current = self.version(filepath)
+        if version is not None and current == version:
+            return None, current
+        return self.read(filepath), current
+
+    def version(self, filepath):
+        """
+        Version of a file - an ETag, a generation number
+        or a size and modification time.
+
+        :param filepath: Relative path to file.
+        :type filepath: str
+        :return: Opaque version string. None if the file doesn't exist
+            or the destination doesn't track versions.
+        :rtype: str
+        """
+        return None
+
     @abstractmethod
     def save(self, handler, filepath):
         """
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+Module for the deduplicating destination layer.
+
+:class:`DedupDestination` wraps another destination. A saved stream is
+split into content-defined chunks. Every chunk is stored once under its
+SHA256 digest in ``.chunks/``, and the copy itself becomes a small
+manifest ``<copy>.manifest.json`` that lists the chunks. Copies that
+share most of their content, e.g. daily full backups of mostly cold data,
+share most of their chunks.
+
+A chunk boundary depends only on the bytes around it, so an insertion
+in the stream changes one or two chunks rather than every chunk after it.
+Compressed streams keep boundaries stable only if the compressor is
+``--rsyncable``. An encrypted stream doesn't deduplicate.
+
+Chunks are garbage collected from the manifests. Deleting copies
+deletes their manifests, then reads the remaining manifests and deletes
+the chunks of the deleted copies that no remaining copy uses. Nothing
+but the manifests keeps track of the chunks, so hosts that save
+and delete copies at the same time never overwrite each other's
+bookkeeping.
+"""
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from twindb_backup import LOG
+from twindb_backup.destination.base_destination import DELETE_CONCURRENCY, BaseDestination
+from twindb_backup.destination.download import ByteRange, RangedDownload
+from twindb_backup.destination.exceptions import DedupDestinationError, FileNotFound
+
+DEDUP_CHUNK_SIZE = 4 * 1024 * 1024
+DEDUP_CONCURRENCY = 8
+DEDUP_CHUNKS_DIR = ".chunks"
+DEDUP_MANIFEST_SUFFIX = ".manifest.json"
+DEDUP_MANIFEST_VERSION = 1
+# Bytes a boundary anchor starts with. Any bytes will do,
+# the anchor just must never change.
+DEDUP_ANCHOR = b"\x7b\x3d\x91"
+
+_CHUNK_NAME = re.compile(r"(?:^|/)%s/[0-9a-f]{2}/([0-9a-f]{64})$" % re.escape(DEDUP_CHUNKS_DIR))
+_MANIFEST_NAME = re.compile(r"%s$" % re.escape(DEDUP_MANIFEST_SUFFIX))
+
+
+class ContentDefinedChunker(object):
+    """
+    Split a stream into chunks of variable size at content-defined boundaries.
+
+    A boundary follows an anchor - a byte pattern that occurs in random data
+    on average every ``chunk_size`` bytes. The anchor is found by the regular
+    expression engine, so scanning runs at C speed rather than byte by byte
+    as a rolling hash in Python would. Chunks are never shorter than
+    ``chunk_size / 4`` and never longer than ``chunk_size * 4``.
+
+    :param chunk_size: Average chunk size.
+    :type chunk_size: int
+    """
+
+    def __init__(self, chunk_size=DEDUP_CHUNK_SIZE):
+        self.min_size = max(1, chunk_size // 4)
+        self.max_size = chunk_size * 4
+        # An anchor of n bits occurs every 2 ** n bytes on average.
+        bits = min(8 * len(DEDUP_ANCHOR), max(1, int(round(math.log(max(2, chunk_size - self.min_size), 2)))))
+        literal_bytes = (bits - 1) // 8
+        masked_bits = bits - 8 * literal_bytes
+        low = DEDUP_ANCHOR[literal_bytes] & (0xFF << (8 - masked_bits)) & 0xFF
+        high = low | (0xFF >> masked_bits)
+        self._anchor = re.compile(
+            re.escape(DEDUP_ANCHOR[:literal_bytes])
+            + b"["
+            + re.escape(bytes([low]))
+            + b"-"
+            + re.escape(bytes([high]))
+            + b"]"
+        )
+
+    def split(self, file_obj):
+        """
+        Read the stream and yield its chunks.
+
+        :param file_obj: File object to read from.
+        :return: Generator of chunks.
+        :rtype: generator
+        """
+        buf = bytearray()
+        eof = False
+        while True:
+            while not eof and len(buf) < self.max_size:
+                data = file_obj.read(self.max_size)
+                if data:
+                    buf += data
+                else:
+                    eof = True
+            if not buf:
+                return
+            cut = self._boundary(buf, eof)
+            yield bytes(buf[:cut])
+            del buf[:cut]
+
+    def _boundary(self, buf, eof):
+        end = min(len(buf), self.max_size)
+        match = self._anchor.search(buf, self.min_size, end)
+        if match:
+            return match.end()
+        if eof and len(buf) <= self.max_size:
+            return len(buf)
+        return end
+
+
+def _chunk_path(digest):
+    return "%s/%s/%s" % (DEDUP_CHUNKS_DIR, digest[:2], digest)
+
+
+@contextmanager
+def _bytes_handler(data):
+    yield io.BytesIO(data)
+
+
+class DedupDestination(BaseDestination):
+    """
+    Destination that deduplicates copies by content.
+
+    :param destination: Destination where chunks and manifests are stored.
+        Its ``read()`` must return bytes.
+    :type destination: BaseDestination
+    :param chunk_size: Average chunk size.
+    :type chunk_size: int
+    :param concurrency: How many chunks to upload or download in parallel.
+    :type concurrency: int
+    """
+
+    def __init__(self, destination, chunk_size=DEDUP_CHUNK_SIZE, concurrency=DEDUP_CONCURRENCY):
+        super(DedupDestination, self).__init__(destination.remote_path)
+        self._destination = destination
+        self._chunker = ContentDefinedChunker(chunk_size)
+        self._concurrency = max(1, concurrency)
+
+    @property
+    def destination(self):
+        """Destination where chunks and manifests are stored."""
+        return self._destination
+
+    def save(self, handler, filepath):
+        """
+        Split the stream into chunks, upload new chunks and save the manifest.
+
+        The chunk store is listed once, chunks found there aren't uploaded.
+        A delete that reads the manifests before this one is saved may
+        free such a chunk. That's why after the manifest is saved
+        the chunks that weren't uploaded are checked one by one
+        and the copy is discarded if any of them is gone.
+
+        :param handler: Incoming stream.
+        :type handler: file
+        :param filepath: Save stream as this name.
+        :type filepath: str
+        :raise DedupDestinationError: if failed to upload a chunk
+            or a chunk was deleted while the copy was saved.
+        """
+        stored = self._stored_chunks()
+        chunks = []
+        seen = set()
+        skipped = set()
+        uploaded = 0
+        with handler as file_obj, ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            pending = deque()
+            for chunk in self._chunker.split(file_obj):
+                digest = hashlib.sha256(chunk).hexdigest()
+                chunks.append([digest, len(chunk)])
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                if digest in stored:
+                    skipped.add(digest)
+                    continue
+                pending.append(executor.submit(self._save_chunk, chunk, digest))
+                uploaded += len(chunk)
+                # Keep a bounded number of chunks in memory
+                while len(pending) > 2 * self._concurrency:
+                    self._wait(pending.popleft())
+            while pending:
+                self._wait(pending.popleft())
+
+        manifest = {
+            "version": DEDUP_MANIFEST_VERSION,
+            "size": sum(size for _, size in chunks),
+            "chunks": chunks,
+        }
+        self._destination.write(json.dumps(manifest), self._manifest_path(filepath))
+
+        missing = self._missing_chunks(sorted(skipped))
+        if missing:
+            self.delete(filepath)
+            raise DedupDestinationError(
+                "%d chunks of %s were deleted by a concurrent delete, the copy is discarded" % (len(missing), filepath)
+            )
+        LOG.debug(
+            "Saved %s: %d bytes in %d chunks, %d bytes uploaded",
+            filepath,
+            manifest["size"],
+            len(chunks),
+            uploaded,
+        )
+
+    @contextmanager
+    def get_stream(self, copy):
+        """
+        Rebuild the copy from its chunks. Chunks are downloaded in parallel.
+        Copies saved without deduplication are streamed as is.
+
+        :param copy: Backup copy
+        :type copy: BaseCopy
+        :return: Stream with the copy content.
+        :raise DedupDestinationError: if failed to download a chunk.
+        """
+        try:
+            manifest = json.loads(self._destination.read(self._manifest_path(copy.key)))
+        except FileNotFound:
+            LOG.debug("%s is not deduplicated", copy.key)
+            with self._destination.get_stream(copy) as stream:
+                yield stream
+            return
+
+        read_fd, write_fd = os.pipe()
+        errors = []
+
+        def _write_chunks():
+            try:
+                with os.fdopen(write_fd, "wb") as pipe_out:
+                    RangedDownload(
+                        self._read_chunk,
+                        [ByteRange(digest, 0, size - 1) for digest, size in manifest["chunks"]],
+                        concurrency=self._concurrency,
+                    ).run(pipe_out)
+            except Exception as err:  # pylint: disable=broad-except
+                errors.append(err)
+
+        writer = threading.Thread(target=_write_chunks, name="dedup-reader")
+        writer.start()
+        with os.fdopen(read_fd, "rb") as pipe_in:
+            yield pipe_in
+        writer.join()
+        if errors:
+            raise DedupDestinationError("Failed to restore %s: %s" % (copy.key, errors[0]))
+
+    def delete(self, path):
+        """
+        Delete a copy and the chunks no other copy refers to.
+
+        :param path: Relative path or URL of the copy.
+        :type path: str
+        """
+        self.delete_many([path])
+
+    def delete_many(self, paths, concurrency=DELETE_CONCURRENCY):
+        """
+        Delete several copies and then the chunks of these copies
+        that no remaining copy uses. The remaining manifests
+        are listed and read once for all copies.
+
+        :param paths: Relative paths or URLs of the copies.
+        :type paths: list(str)
+        :param concurrency: How many delete requests to send concurrently.
+        :type concurrency: int
+        """
+        plain = []
+        manifests = {}
+        for path in paths:
+            path = self._relative_path(path)
+            try:
+                manifests[path] = json.loads(self._destination.read(self._manifest_path(path)))
+            except FileNotFound:
+                plain.append(path)
+
+        # Manifests go first, a copy must not outlive its chunks.
+        self._destination.delete_many(plain + [self._manifest_path(path) for path in manifests], concurrency)
+        candidates = {digest for manifest in manifests.values() for digest, _ in manifest["chunks"]}
+        if not candidates:
+            return
+
+        released = sorted(candidates - self._used_chunks(concurrency))
+        self._destination.delete_many([_chunk_path(digest) for digest in released], concurrency)
+        LOG.debug("Deleted %d copies and %d unreferenced chunks", len(paths), len(released))
+
+    def list_copies(self, media_type, run_type=None):
+        """
+        List backup copies of all hosts with the wrapped destination,
+        so only the copy prefixes are listed. Manifests are listed
+        under the copy names.
+        """
+        return self._copy_names(self._destination.list_copies(media_type, run_type=run_type))
+
+    def list_files(self, prefix=None, recursive=False, pattern=None, files_only=False):
+        """
+        List copies. Manifests are listed under the copy names,
+        the chunk store is not listed.
+        """
+        return self._copy_names(
+            self._destination.list_files(
+                prefix=prefix,
+                recursive=recursive,
+                pattern=pattern,
+                files_only=files_only,
+            )
+        )
+
+    def read(self, filepath):
+        return self._destination.read(filepath)
+
+    def read_if_modified(self, filepath, version):
+        return self._destination.read_if_modified(filepath, version)
+
+    def version(self, filepath):
+        return self._destination.version(filepath)
+
+    def write(self, content, filepath):
+        self._destination.write(content, filepath)
+
+    def _read_chunk(self, byte_range):
+        digest = byte_range.source
+        data = self._destination.read(_chunk_path(digest))
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise DedupDestinationError("Chunk %s is corrupted" % digest)
+        return data
+
+    def _save_chunk(self, chunk, digest):
+        self._destination.save(_bytes_handler(chunk), _chunk_path(digest))
+
+    def _stored_chunks(self):
+        """Digests of chunks in the chunk store."""
+        names = self._destination.list_files(
+            "%s/%s/" % (self.remote_path, DEDUP_CHUNKS_DIR),
+            recursive=True,
+            files_only=True,
+        )
+        return {match.group(1) for match in map(_CHUNK_NAME.search, names) if match}
+
+    def _missing_chunks(self, digests):
+        """Digests of the given chunks that aren't in the chunk store."""
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            versions = executor.map(lambda digest: self._destination.version(_chunk_path(digest)), digests)
+            return {digest for digest, version in zip(digests, versions) if version is None}
+
+    def _used_chunks(self, concurrency):
+        """Digests of chunks at least one saved copy uses."""
+        names = self._destination.list_files(
+            self.remote_path,
+            recursive=True,
+            pattern=_MANIFEST_NAME.pattern,
+            files_only=True,
+        )
+        paths = [self._relative_path(name) for name in names if _MANIFEST_NAME.search(name)]
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            manifests = executor.map(self._read_manifest, paths)
+            return {digest for manifest in manifests if manifest for digest, _ in manifest["chunks"]}
+
+    def _read_manifest(self, path):
+        try:
+            return json.loads(self._destination.read(path))
+        except FileNotFound:
+            # Deleted after it was listed
+            return None
+
+    @staticmethod
+    def _copy_names(files):
+        end = -len(DEDUP_MANIFEST_SUFFIX)
+        return sorted(
+            name[:end] if name.endswith(DEDUP_MANIFEST_SUFFIX) else name
+            for name in files
+            if "%s/" % DEDUP_CHUNKS_DIR not in name
+        )
+
+    def _relative_path(self, path):
+        prefix = self.remote_path.rstrip("/") + "/"
+        start = len(prefix)
+        return path[start:] if path.startswith(prefix) else path
+
+    @staticmethod
+    def _manifest_path(filepath):
+        return filepath + DEDUP_MANIFEST_SUFFIX
+
+    @staticmethod
+    def _wait(future):
+        try:
+            future.result()
+        except Exception as err:  # pylint: disable=broad-except
+            raise DedupDestinationError("Failed to upload a chunk: %s" % err)
+
+    def __str__(self):
+        return "%s(%s)" % (self.__class__.__name__, self._destination)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Module with a parallel downloader shared by remote destinations.
+
+A backup copy is fetched as a sequence of byte ranges. The ranges are
+downloaded concurrently, but written to the output in their natural order,
+so the consumer sees the same stream a single GET would return.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from twindb_backup import LOG
+
+DOWNLOAD_CONCURRENCY = 8
+DOWNLOAD_CHUNK_SIZE = 16 * 1024**2
+# How much memory downloaded, but not yet written ranges may take.
+DOWNLOAD_MEMORY_BUDGET = 256 * 1024**2
+DOWNLOAD_RETRIES = 5
+
+ByteRange = namedtuple("ByteRange", ["source", "start", "end"])
+"""
+A piece of a backup copy.
+
+``source`` is whatever the destination needs to fetch the piece:
+an object key, a blob. ``start`` and ``end`` are offsets within the source,
+``end`` is inclusive like in the HTTP Range header.
+"""
+
+
+def split_ranges(source, size, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Split an object into byte ranges.
+
+    :param source: Object the ranges belong to.
+    :param size: Object size in bytes.
+    :type size: int
+    :param chunk_size: Range size in bytes.
+    :type chunk_size: int
+    :return: List of ranges. An empty object has no ranges.
+    :rtype: list(ByteRange)
+    """
+    return [ByteRange(source, start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+
+class RangedDownload(object):
+    """
+    Download byte ranges concurrently and write them in order.
+
+    Downloaded ranges wait in a reorder buffer until all preceding ranges
+    are written. The number of ranges in flight is bounded, so the buffer
+    never takes more than ``memory_budget`` bytes.
+
+    :param fetch: Function that takes a :py:class:`ByteRange`
+        and returns its content as bytes.
+    :type fetch: callable
+    :param ranges: Ranges to download, in the order they should be written.
+    :type ranges: list(ByteRange)
+    :param concurrency: Number of ranges to download concurrently.
+    :type concurrency: int
+    :param memory_budget: Memory limit for the reorder buffer in bytes.
+    :type memory_budget: int
+    :param retries: How many times to retry a failed range.
+    :type retries: int
+    """
+
+    def __init__(
+        self,
+        fetch,
+        ranges,
+        concurrency=DOWNLOAD_CONCURRENCY,
+        memory_budget=DOWNLOAD_MEMORY_BUDGET,
+        retries=DOWNLOAD_RETRIES,
+    ):  # pylint: disable=too-many-arguments
+        self._fetch = fetch
+        self._ranges = list(ranges)
+        self._concurrency = max(1, concurrency)
+        self._retries = retries
+        largest = max([r.end - r.start + 1 for r in self._ranges] or [1])
+        self._window = max(1, min(memory_budget // largest, 2 * self._concurrency))
+
+    def run(self, file_obj):
+        """
+        Download the ranges and write them to a file object.
+
+        :param file_obj: File object to write to.
+        :return: Number of written bytes.
+        :rtype: int
+        :raise Exception: whatever ``fetch`` raised after the last retry.
+        """
+        total = 0
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            try:
+                for idx, byte_range in enumerate(self._ranges[: self._window]):
+                    futures[idx] = executor.submit(self._fetch_with_retries, byte_range)
+
+                for idx in range(len(self._ranges)):
+                    data = futures.pop(idx).result()
+                    following = idx + self._window
+                    if following < len(self._ranges):
+                        futures[following] = executor.submit(self._fetch_with_retries, self._ranges[following])
+                    file_obj.write(data)
+                    total += len(data)
+            finally:
+                for future in futures.values():
+                    future.cancel()
+
+        LOG.debug("Downloaded %d bytes in %d ranges", total, len(self._ranges))
+        return total
+
+    def _fetch_with_retries(self, byte_range):
+        retry_interval = 2
+        for attempt in range(self._retries + 1):
+            try:
+                return self._fetch(byte_range)
+            except Exception as err:  # pylint: disable=broad-except
+                if attempt == self._retries:
+                    raise
+                LOG.warning(
+                    "Failed to download bytes %d-%d of %s: %s",
+                    byte_range.start,
+                    byte_range.end,
+                    byte_range.source,
+                    err,
+                )
+                LOG.warning("Will retry in %d seconds", retry_interval)
+                time.sleep(retry_interval)
+                retry_interval *= 2
+        return None
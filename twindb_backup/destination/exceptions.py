@@ -39,3 +39,9 @@ class AzureBlobDestinationError(DestinationError):
     """Azure-blob destination errors"""
 
     pass
+
+
+class DedupDestinationError(DestinationError):
+    """Deduplicating destination errors"""
+
+    pass
@@ -4,6 +4,7 @@ Module for GCS destination.
 """
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from functools import partial
 from multiprocessing import Process
@@ -14,13 +15,22 @@ from google.auth.exceptions import GoogleAuthError
 from google.cloud.storage import Client
 
 from twindb_backup import LOG
-from twindb_backup.destination.base_destination import BaseDestination
+from twindb_backup.destination.base_destination import DELETE_CONCURRENCY, BaseDestination, split_batches
+from twindb_backup.destination.download import (
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_CONCURRENCY,
+    DOWNLOAD_MEMORY_BUDGET,
+    RangedDownload,
+    split_ranges,
+)
 from twindb_backup.destination.exceptions import FileNotFound, GCSDestinationError
 
 GCS_CONNECT_TIMEOUT = 60
 GCS_READ_TIMEOUT = 600
 DEFAULT_CHUNK_SIZE = 250 * 1024 * 1024
 _CHUNK_PART_REGEXP = r"/part-[0-9]{16}$"
+# A batch request accepts up to 100 calls.
+GCS_DELETE_BATCH_SIZE = 100
 
 
 class GCS(BaseDestination):
@@ -33,6 +43,10 @@ class GCS(BaseDestination):
     * **gc_credentials_file** - (required) GC credentials json filepath.
     * **chunk_size** - when storing a stream use this a a chunk size.
         The stream will be stored a set of chunks of this size on the GS.
+    * **download_concurrency** - How many ranges to download concurrently.
+    * **download_chunk_size** - Size of a downloaded range in bytes.
+    * **download_memory_budget** - How much memory downloaded ranges
+        waiting to be written may take.
     """
 
     # def save(self, handler, filepath):
@@ -50,6 +64,9 @@ class GCS(BaseDestination):
                 "when initializing %s class" % self.__class__.__name__
             )
         self._chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        self._download_concurrency = kwargs.get("download_concurrency", DOWNLOAD_CONCURRENCY)
+        self._download_chunk_size = kwargs.get("download_chunk_size", DOWNLOAD_CHUNK_SIZE)
+        self._download_memory_budget = kwargs.get("download_memory_budget", DOWNLOAD_MEMORY_BUDGET)
         self.__bucket_obj = None
 
     @property
@@ -79,6 +96,33 @@ class GCS(BaseDestination):
         for blob in blobs:
             blob.delete()
 
+    def delete_many(self, paths, concurrency=DELETE_CONCURRENCY):
+        """
+        Delete several files with batch requests, up to 100 blobs
+        per request. Files that don't exist are skipped.
+
+        :param paths: Paths to files in the bucket.
+        :type paths: list(str)
+        :param concurrency: How many files to look up chunks of concurrently.
+        :type concurrency: int
+        :raise GCSDestinationError: if failed to delete blobs.
+        """
+        paths = list(paths)
+        if not paths:
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            blobs = [blob for path_blobs in executor.map(self._list_blob_or_chunks, paths) for blob in path_blobs]
+
+        client = self._bucket_obj.client
+        try:
+            for batch in split_batches(blobs, GCS_DELETE_BATCH_SIZE):
+                with client.batch():
+                    for blob in batch:
+                        blob.delete()
+        except GoogleAPIError as err:
+            raise GCSDestinationError("Failed to delete blobs: %s" % err)
+
     def delete_bucket(self, force=False):
         """Delete the bucket in gcs that was storing the backups.
 
@@ -122,6 +166,39 @@ class GCS(BaseDestination):
         except NotFound as err:
             raise FileNotFound(err)
 
+    def read_if_modified(self, filepath, version):
+        """
+        Read content from a file unless its generation is still ``version``.
+        The generation is checked with a metadata request, the content
+        is downloaded only if it changed.
+
+        :param filepath: relative path to a file with status.
+        :type filepath: str
+        :param version: Generation of the content the caller has or None.
+        :type version: str
+        :return: tuple (content, generation). Content is None if not modified.
+        :rtype: tuple
+        :raises FileNotFound: if filepath doesn't exist on the destination.
+        """
+        obj = self._bucket_obj.get_blob(filepath)
+        if obj is None:
+            raise FileNotFound("%s does not exist" % filepath)
+        generation = str(obj.generation)
+        if generation == version:
+            return None, generation
+        try:
+            return obj.download_as_string(if_generation_match=obj.generation), generation
+        except NotFound as err:
+            raise FileNotFound(err)
+
+    def version(self, filepath):
+        """
+        :return: Generation of the object.
+        :rtype: str
+        """
+        obj = self._bucket_obj.get_blob(filepath)
+        return None if obj is None else str(obj.generation)
+
     def write(self, content, filepath):
         """
         Write a string passed in ``content`` to a filepath on the destination.
@@ -171,10 +248,17 @@ class GCS(BaseDestination):
 
     def _download_to_pipe(self, path, pipe_in, pipe_out):
         os.close(pipe_in)
-        pipe_out = os.fdopen(pipe_out, "w")
-
-        for blob in self._list_blob_or_chunks(path):
-            blob.download_to_file(pipe_out)
+        ranges = []
+        for blob in sorted(self._list_blob_or_chunks(path), key=lambda b: b.name):
+            ranges.extend(split_ranges(blob, blob.size, self._download_chunk_size))
+
+        with os.fdopen(pipe_out, "wb") as pipe_out_file:
+            RangedDownload(
+                lambda r: r.source.download_as_bytes(start=r.start, end=r.end),
+                ranges,
+                concurrency=self._download_concurrency,
+                memory_budget=self._download_memory_budget,
+            ).run(pipe_out_file)
 
     def _list_blob_or_chunks(self, path):
         """
@@ -228,7 +312,7 @@ class GCS(BaseDestination):
         :rtype: set(str)
         """
         if prefix:
-            prefix = prefix.lstrip("gs://").lstrip(self.bucket).lstrip("/")
+            prefix = re.sub(r"^gs://%s" % re.escape(self.bucket), "", prefix).lstrip("/")
 
         return set(
             [
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Module defines helpers to list backup copies on a destination.
+
+Copies are stored under ``<host>/<run_type>/<media_type>/`` and binary
+logs under ``<host>/binlog/``, so a destination that lists by prefix
+doesn't need to walk through the whole remote path to find copies
+of one kind. :class:`ListingCache` keeps listings for a short time,
+so commands that list the same prefix again don't go to the destination.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from os import path as osp
+
+from twindb_backup import LOG
+
+LISTING_CACHE_DIR = "/var/lib/twindb-backup/listing-cache"
+# Listings aren't cached by default
+LISTING_CACHE_TTL = 0
+
+
+def copy_prefix(host, media_type, run_type=None):
+    """
+    Relative path where copies of a host are stored.
+
+    :param host: Hostname the copies were taken on.
+    :type host: str
+    :param media_type: files, mysql or binlog.
+    :type media_type: str
+    :param run_type: hourly, daily, etc. Binary logs have no run type.
+    :type run_type: str
+    :return: Prefix with a trailing slash, e.g. ``master1/daily/mysql/``.
+    :rtype: str
+    """
+    if media_type == "binlog" or run_type is None:
+        return "%s/%s/" % (host.strip("/"), media_type)
+    return "%s/%s/%s/" % (host.strip("/"), run_type, media_type)
+
+
+class ListingCache(object):
+    """
+    Local cache of listings keyed by destination and prefix.
+
+    A listing expires after ``ttl`` seconds. Objects written or deleted
+    by this host invalidate listings of prefixes they belong to.
+
+    :param path: Local directory where listings are stored.
+    :type path: str
+    :param ttl: Seconds a listing is valid.
+    :type ttl: int
+    """
+
+    def __init__(self, path=LISTING_CACHE_DIR, ttl=LISTING_CACHE_TTL):
+        self._path = path
+        self._ttl = ttl
+
+    @property
+    def ttl(self):
+        """Seconds a listing is valid."""
+        return self._ttl
+
+    def get(self, remote_path, prefix):
+        """
+        Get a cached listing.
+
+        :param remote_path: Destination remote path, e.g. ``s3://bucket``.
+        :type remote_path: str
+        :param prefix: Listed prefix.
+        :type prefix: str
+        :return: List of keys or None if the listing isn't cached or expired.
+        :rtype: list
+        """
+        try:
+            with open(self._entry_path(remote_path, prefix)) as entry_fd:
+                entry = json.load(entry_fd)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if (entry.get("remote_path"), entry.get("prefix")) != (remote_path, prefix):
+            return None
+        if time.time() - entry.get("created_at", 0) > self._ttl:
+            return None
+        LOG.debug("Using cached listing of %s/%s", remote_path, prefix)
+        return entry["keys"]
+
+    def put(self, remote_path, prefix, keys):
+        """
+        Cache a listing.
+
+        :param remote_path: Destination remote path.
+        :type remote_path: str
+        :param prefix: Listed prefix.
+        :type prefix: str
+        :param keys: Keys found under the prefix.
+        :type keys: list
+        """
+        entry = {"remote_path": remote_path, "prefix": prefix, "created_at": time.time(), "keys": keys}
+        try:
+            os.makedirs(self._path, exist_ok=True)
+            tmp_fd, tmp_path = tempfile.mkstemp(dir=self._path, suffix=".tmp")
+            with os.fdopen(tmp_fd, "w") as entry_fd:
+                json.dump(entry, entry_fd)
+            os.rename(tmp_path, self._entry_path(remote_path, prefix))
+        except (IOError, OSError) as err:
+            LOG.warning("Failed to cache listing of %s/%s: %s", remote_path, prefix, err)
+
+    def invalidate(self, remote_path, key):
+        """
+        Drop cached listings that include ``key``.
+
+        :param remote_path: Destination remote path.
+        :type remote_path: str
+        :param key: Key of a written or deleted object.
+        :type key: str
+        """
+        try:
+            names = [name for name in os.listdir(self._path) if name.endswith(".json")]
+        except (IOError, OSError):
+            return
+
+        for name in names:
+            entry_path = osp.join(self._path, name)
+            try:
+                with open(entry_path) as entry_fd:
+                    entry = json.load(entry_fd)
+                if entry.get("remote_path") == remote_path and key.startswith(entry.get("prefix", "")):
+                    os.unlink(entry_path)
+            except (IOError, OSError, ValueError):
+                continue
+
+    def _entry_path(self, remote_path, prefix):
+        digest = hashlib.sha256(("%s/%s" % (remote_path, prefix)).encode("utf-8")).hexdigest()
+        return osp.join(self._path, digest + ".json")
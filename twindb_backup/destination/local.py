@@ -2,11 +2,14 @@
 """
 Module defines Local destination.
 """
+import os
 from os import path as osp
+from shutil import copyfileobj
 from subprocess import Popen
 
 from twindb_backup import LOG
-from twindb_backup.destination.base_destination import BaseDestination
+from twindb_backup.destination.base_destination import DELETE_CONCURRENCY, BaseDestination
+from twindb_backup.modifiers.pipeline import PIPELINE_BUFFER_SIZE
 from twindb_backup.util import mkdir_p, run_command
 
 
@@ -54,12 +57,8 @@ class Local(BaseDestination):
         :param handler: Input stream
         """
         with handler as in_stream:
-            proc = Popen(
-                ["cat", "-"],
-                stdin=in_stream,
-                stdout=open(osp.join(self.path, filepath), "wb"),
-            )
-            proc.wait()
+            with open(osp.join(self.path, filepath), "wb") as out_stream:
+                copyfileobj(in_stream, out_stream, PIPELINE_BUFFER_SIZE)
 
     def _list_files(self, prefix=None, recursive=False, files_only=False):
         rec_cond = "" if recursive else " -maxdepth 1"
@@ -81,6 +80,33 @@ class Local(BaseDestination):
         proc = Popen(cmd)
         proc.communicate()
 
+    def delete_many(self, paths, concurrency=DELETE_CONCURRENCY):
+        """
+        Delete several files. Files are unlinked in this process,
+        no ``rm`` is forked per file. Missing files are skipped.
+
+        :param paths: Paths to files, absolute or relative to ``self.path``.
+        :type paths: list(str)
+        :param concurrency: Not used, unlink() is local.
+        """
+        for path in paths:
+            LOG.debug("Deleting %s", path)
+            try:
+                os.unlink(osp.join(self.path, path))
+            except FileNotFoundError:
+                LOG.debug("%s is already deleted", path)
+
+    def version(self, filepath):
+        """
+        :return: Size and modification time of the file.
+        :rtype: str
+        """
+        try:
+            stat = os.stat(osp.join(self.path, filepath))
+        except FileNotFoundError:
+            return None
+        return "%d:%d" % (stat.st_size, stat.st_mtime_ns)
+
     def write(self, content, filepath):
         with open(osp.join(self.path, filepath), "w") as fdesc:
             fdesc.write(content)
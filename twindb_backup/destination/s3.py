@@ -2,42 +2,68 @@
 """
 Module for S3 destination.
 """
+import base64
+import hashlib
 import os
 import re
 import socket
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from multiprocessing import Process
+from threading import Condition, Lock
 from urllib.parse import urlparse
 
 import boto3
-from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 from botocore.exceptions import ClientError
 
 from twindb_backup import LOG
-from twindb_backup.destination.base_destination import BaseDestination
+from twindb_backup.destination.base_destination import DELETE_CONCURRENCY, BaseDestination, split_batches
+from twindb_backup.destination.dedup import DEDUP_CHUNKS_DIR
+from twindb_backup.destination.download import (
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_CONCURRENCY,
+    DOWNLOAD_MEMORY_BUDGET,
+    RangedDownload,
+    split_ranges,
+)
 from twindb_backup.destination.exceptions import FileNotFound, S3DestinationError
+from twindb_backup.destination.listing import LISTING_CACHE_DIR, LISTING_CACHE_TTL, ListingCache, copy_prefix
 from twindb_backup.exceptions import OperationError
 
 S3_CONNECT_TIMEOUT = 60
 S3_READ_TIMEOUT = 600
 
-# The transfer size threshold for which multipart uploads to S3/Ceph RGW will
-# automatically be triggered
-S3_UPLOAD_CHUNK_SIZE_BYTES = 256 * 1024**2
+# Default size of a part in a multipart upload.
+S3_UPLOAD_PART_SIZE = 64 * 1024**2
 
-# The maximum number of threads that will be making requests to perform a
-# transfer.
+# S3 doesn't accept parts smaller than 5 MiB (except the last one)
+# and larger than 5 GiB. An upload can't have more than 10000 parts.
+S3_MIN_PART_SIZE = 5 * 1024**2
+S3_MAX_PART_SIZE = 5 * 1024**3
+S3_MAX_PARTS = 10000
+
+# The stream size is unknown, so the part size doubles every
+# S3_PART_SIZE_GROWTH_STEP parts and the upload never runs out
+# of part numbers.
+S3_PART_SIZE_GROWTH_STEP = 1000
+
+# The maximum number of threads that upload parts concurrently.
 S3_UPLOAD_CONCURRENCY = 4
 
-# The maximum amount of read parts that can be queued in memory to be written
-# for a download. The size of each of these read parts is at most the size of
-# ``S3_UPLOAD_IO_CHUNKS_SIZE_BYTES``.
-S3_UPLOAD_IO_QUEUE_SIZE = 200
+# How much memory parts that are read from the stream but not yet
+# uploaded may take.
+S3_UPLOAD_MEMORY_BUDGET = 1024**3
+
+# How many times to retry a part upload before giving up.
+S3_UPLOAD_PART_RETRIES = 5
 
-# The max size of each chunk in the io queue.
-S3_UPLOAD_IO_CHUNKS_SIZE_BYTES = 256 * 1024
+# How many prefixes to list concurrently.
+S3_LIST_CONCURRENCY = 8
+
+# DeleteObjects accepts up to 1000 keys.
+S3_DELETE_BATCH_SIZE = 1000
 
 AWS_DEFAULT_REGION = "us-east-1"
 
@@ -49,6 +75,247 @@ class S3FileAccess(object):  # pylint: disable=too-few-public-methods
     private = "private"
 
 
+class S3UploadValidation(object):  # pylint: disable=too-few-public-methods
+    """How to check an uploaded object"""
+
+    none = "none"
+    head = "head"
+    strict = "strict"
+
+
+class S3MultipartUpload(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Upload a stream to S3 as a multipart upload.
+
+    The stream is cut into parts that are uploaded concurrently and
+    possibly out of order. A failed part is retried, so a network hiccup
+    doesn't throw away the whole upload. If the upload fails anyway,
+    it's aborted, so S3 doesn't keep (and bill) the uploaded parts.
+
+    :param s3_client: S3 client. It must be safe to use from multiple threads.
+    :param bucket: S3 bucket name.
+    :type bucket: str
+    :param key: Object key.
+    :type key: str
+    :param part_size: Size of a part in bytes.
+    :type part_size: int
+    :param concurrency: How many parts to upload concurrently.
+    :type concurrency: int
+    :param memory_budget: Bytes that parts waiting for upload may take.
+    :type memory_budget: int
+    :param strict: If True, send a checksum of every part and check
+        S3 has stored the part with the same checksum.
+    :type strict: bool
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket,
+        key,
+        part_size=S3_UPLOAD_PART_SIZE,
+        concurrency=S3_UPLOAD_CONCURRENCY,
+        memory_budget=S3_UPLOAD_MEMORY_BUDGET,
+        strict=False,
+    ):  # pylint: disable=too-many-arguments
+        self._s3_client = s3_client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = min(max(part_size, S3_MIN_PART_SIZE), S3_MAX_PART_SIZE)
+        self._concurrency = max(1, concurrency)
+        self._memory_budget = memory_budget
+        self._upload_id = None
+        self._lock = Lock()
+        self._budget = Condition()
+        self._bytes_in_flight = 0
+        self._errors = []
+        self._strict = strict
+        self._digests = {}
+        self._size = 0
+        self._part_latencies = []
+
+    @property
+    def part_size(self):
+        """Size of the first part."""
+        return self._part_size
+
+    @property
+    def size(self):
+        """Number of uploaded bytes."""
+        return self._size
+
+    @property
+    def part_latencies(self):
+        """Seconds it took to upload every part, in order parts finished."""
+        return list(self._part_latencies)
+
+    @property
+    def etag(self):
+        """
+        ETag S3 should report for the uploaded object. It's computed
+        from the uploaded data while uploading.
+        """
+        if not self._digests:
+            return None
+        if self._upload_id is None:
+            return self._digests[1].hex()
+        digests = [self._digests[n] for n in sorted(self._digests)]
+        return "%s-%d" % (hashlib.md5(b"".join(digests)).hexdigest(), len(digests))
+
+    def get_part_size(self, part_number):
+        """
+        Size of a part with a given number.
+
+        :param part_number: Part number, starting from one.
+        :type part_number: int
+        :return: Part size in bytes.
+        :rtype: int
+        """
+        growth = (part_number - 1) // S3_PART_SIZE_GROWTH_STEP
+        return min(self._part_size * 2**growth, S3_MAX_PART_SIZE)
+
+    def run(self, file_obj):
+        """
+        Read the stream and upload it.
+
+        :param file_obj: A file like object to upload.
+        :return: Number of uploaded bytes.
+        :rtype: int
+        :raise S3DestinationError: if failed to upload the stream.
+        """
+        chunk = _read_exactly(file_obj, self.get_part_size(1))
+        if len(chunk) < self.get_part_size(1):
+            LOG.debug("Stream is smaller than a part. Uploading it in one request.")
+            digest = hashlib.md5(chunk).digest()
+            kwargs = {"ContentMD5": base64.b64encode(digest).decode()} if self._strict else {}
+            started = time.time()
+            self._s3_client.put_object(Body=chunk, Bucket=self._bucket, Key=self._key, **kwargs)
+            self._part_latencies.append(time.time() - started)
+            self._digests[1] = digest
+            self._size = len(chunk)
+            return self._size
+
+        response = self._s3_client.create_multipart_upload(Bucket=self._bucket, Key=self._key)
+        self._upload_id = response["UploadId"]
+        LOG.debug("Multipart upload id %s", self._upload_id)
+        try:
+            total, parts = self._upload_parts(file_obj, chunk)
+            self._s3_client.complete_multipart_upload(
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            # Interrupted uploads are aborted, too
+            self._abort()
+            raise
+
+        self._size = total
+        LOG.debug("Uploaded %d bytes in %d parts", total, len(parts))
+        return total
+
+    def _upload_parts(self, file_obj, chunk):
+        """
+        Upload the stream in parts starting from the first chunk.
+
+        :return: Number of uploaded bytes and part descriptions for completion.
+        :rtype: tuple
+        :raise S3DestinationError: if a part failed to upload.
+        """
+        total = 0
+        part_number = 1
+        futures = []
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            while chunk:
+                self._reserve(len(chunk))
+                if self._errors:
+                    break
+                futures.append(executor.submit(self._upload_part, part_number, chunk))
+                total += len(chunk)
+                part_number += 1
+                chunk = _read_exactly(file_obj, self.get_part_size(part_number))
+            parts = [future.result() for future in futures]
+
+        if self._errors:
+            raise S3DestinationError(self._errors[0])
+        return total, parts
+
+    def _upload_part(self, part_number, data):
+        """Upload one part retrying on errors. Return a part description for completion."""
+        try:
+            if self._errors:
+                return None
+
+            digest = hashlib.md5(data).digest()
+            md5 = digest.hex()
+            with self._lock:
+                self._digests[part_number] = digest
+
+            kwargs = {"ContentMD5": base64.b64encode(digest).decode()} if self._strict else {}
+            retry_interval = 2
+            for attempt in range(S3_UPLOAD_PART_RETRIES + 1):
+                try:
+                    started = time.time()
+                    response = self._s3_client.upload_part(
+                        Bucket=self._bucket,
+                        Key=self._key,
+                        UploadId=self._upload_id,
+                        PartNumber=part_number,
+                        Body=data,
+                        **kwargs
+                    )
+                    with self._lock:
+                        self._part_latencies.append(time.time() - started)
+                    break
+                except ClientError as err:
+                    if attempt == S3_UPLOAD_PART_RETRIES:
+                        raise
+                    LOG.warning("Failed to upload part %d: %s", part_number, err)
+                    LOG.warning("Will retry in %d seconds", retry_interval)
+                    time.sleep(retry_interval)
+                    retry_interval *= 2
+
+            if (
+                self._strict
+                and response.get("ServerSideEncryption") != "aws:kms"
+                and response["ETag"].strip('"') != md5
+            ):
+                raise S3DestinationError(
+                    "Part %d checksum mismatch: sent %s, S3 stored %s" % (part_number, md5, response["ETag"])
+                )
+
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+        except (ClientError, IOError, S3DestinationError) as err:
+            LOG.error("Failed to upload part %d of s3://%s/%s: %s", part_number, self._bucket, self._key, err)
+            self._errors.append(err)
+            return None
+
+        finally:
+            self._free(len(data))
+
+    def _reserve(self, size):
+        """Wait until the part fits into the memory budget."""
+        with self._budget:
+            while self._bytes_in_flight and self._bytes_in_flight + size > self._memory_budget and not self._errors:
+                self._budget.wait()
+            self._bytes_in_flight += size
+
+    def _free(self, size):
+        with self._budget:
+            self._bytes_in_flight -= size
+            self._budget.notify_all()
+
+    def _abort(self):
+        """Abort the multipart upload, so S3 doesn't keep its parts."""
+        LOG.warning("Aborting upload %s of s3://%s/%s", self._upload_id, self._bucket, self._key)
+        try:
+            self._s3_client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id)
+        except ClientError as err:
+            LOG.error("Failed to abort upload %s of s3://%s/%s: %s", self._upload_id, self._bucket, self._key, err)
+
+
 class S3(BaseDestination):
     """
     S3 destination class.
@@ -60,12 +327,40 @@ class S3(BaseDestination):
     * **aws_secret_access_key** - AWS secret key.
     * **aws_default_region** - AWS default region.
     * **hostname** - Hostname of a host where a backup is taken from.
+    * **upload_concurrency** - How many parts to upload concurrently.
+    * **upload_part_size** - Multipart upload part size in bytes.
+    * **upload_memory_budget** - How much memory parts waiting for upload may take.
+    * **upload_validation** - How to check an uploaded object.
+      See :py:class:`S3UploadValidation`.
+    * **download_concurrency** - How many ranges to download concurrently.
+    * **download_chunk_size** - Size of a downloaded range in bytes.
+    * **download_memory_budget** - How much memory downloaded ranges
+      waiting to be written may take.
+    * **list_concurrency** - How many prefixes to list concurrently.
+    * **listing_cache_ttl** - Seconds a listing is cached locally.
+      Zero disables the cache.
+    * **listing_cache_dir** - Directory where listings are cached.
     """
 
     def __init__(self, **kwargs):
 
         self._bucket = kwargs.get("bucket")
         self._hostname = kwargs.get("hostname", socket.gethostname())
+        self._upload_concurrency = kwargs.get("upload_concurrency", S3_UPLOAD_CONCURRENCY)
+        self._upload_part_size = kwargs.get("upload_part_size", S3_UPLOAD_PART_SIZE)
+        self._upload_memory_budget = kwargs.get("upload_memory_budget", S3_UPLOAD_MEMORY_BUDGET)
+        self._upload_validation = kwargs.get("upload_validation", S3UploadValidation.head)
+        self._download_concurrency = kwargs.get("download_concurrency", DOWNLOAD_CONCURRENCY)
+        self._download_chunk_size = kwargs.get("download_chunk_size", DOWNLOAD_CHUNK_SIZE)
+        self._download_memory_budget = kwargs.get("download_memory_budget", DOWNLOAD_MEMORY_BUDGET)
+        self._list_concurrency = kwargs.get("list_concurrency", S3_LIST_CONCURRENCY)
+        listing_cache_ttl = kwargs.get("listing_cache_ttl", LISTING_CACHE_TTL)
+        self._listing_cache = (
+            ListingCache(kwargs.get("listing_cache_dir", LISTING_CACHE_DIR), listing_cache_ttl)
+            if listing_cache_ttl
+            else None
+        )
+        self._part_latencies = []
 
         self.remote_path = "s3://{bucket}".format(bucket=self._bucket)
         super(S3, self).__init__(self.remote_path)
@@ -75,7 +370,16 @@ class S3(BaseDestination):
         os.environ["AWS_DEFAULT_REGION"] = kwargs.get("aws_default_region", AWS_DEFAULT_REGION)
 
         # Setup an authenticated S3 client that we will use throughout
-        self.s3_client = self.setup_s3_client()
+        self.s3_client = self.setup_s3_client(
+            max_pool_connections=max(
+                10, self._upload_concurrency + 1, self._download_concurrency + 1, self._list_concurrency
+            )
+        )
+
+    @property
+    def part_latencies(self):
+        """Seconds it took to upload every part of the last saved copy."""
+        return self._part_latencies
 
     @property
     def bucket(self):
@@ -112,15 +416,40 @@ class S3(BaseDestination):
         :type path: str
         :raise S3DestinationError: if failed to delete object.
         """
-        key = path.replace("s3://%s/" % self._bucket, "") if path.startswith("s3://") else path
+        key = self._key(path)
+        LOG.debug("deleting s3://%s/%s", self._bucket, key)
 
-        s3client = boto3.resource("s3")
-        bucket = s3client.Bucket(self._bucket)
+        response = self.s3_client.delete_object(Bucket=self._bucket, Key=key)
+        self._invalidate_listing(key)
+        return response
+
+    def delete_many(self, paths, concurrency=DELETE_CONCURRENCY):
+        """
+        Delete objects with DeleteObjects, up to 1000 keys per request.
+        Batches are sent ``concurrency`` at a time.
+
+        :param paths: Keys or URLs of S3 objects.
+        :type paths: list(str)
+        :param concurrency: How many requests to send concurrently.
+        :type concurrency: int
+        :raise S3DestinationError: if failed to delete some objects.
+        """
+        keys = [self._key(path) for path in paths]
+        batches = split_batches(keys, S3_DELETE_BATCH_SIZE)
+        if not batches:
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            errors = [error for batch_errors in executor.map(self._delete_batch, batches) for error in batch_errors]
 
-        s3obj = s3client.Object(bucket.name, key)
-        LOG.debug("deleting s3://%s/%s", bucket.name, key)
+        for key in keys:
+            self._invalidate_listing(key)
 
-        return s3obj.delete()
+        if errors:
+            raise S3DestinationError(
+                "Failed to delete %d objects: %s"
+                % (len(errors), ", ".join("%s (%s)" % (err["Key"], err.get("Code")) for err in errors[:10]))
+            )
 
     def delete_all_objects(self):
         """
@@ -128,14 +457,8 @@ class S3(BaseDestination):
 
         :raise S3DestinationError: if failed to delete objects from the bucket.
         """
-        paginator = self.s3_client.get_paginator("list_objects")
-        response = paginator.paginate(Bucket=self._bucket)
-
-        for item in response.search("Contents"):
-            if not item:
-                continue
-
-            self.s3_client.delete_object(Bucket=self._bucket, Key=item["Key"])
+        keys, _ = self._list_objects("")
+        self.delete_many(keys)
 
         return True
 
@@ -193,20 +516,25 @@ class S3(BaseDestination):
             # before we start writing to it.
             os.close(read_fd)
 
+            def _fetch(byte_range):
+                response = s3_client.get_object(
+                    Bucket=bucket_name,
+                    Key=byte_range.source,
+                    Range="bytes=%d-%d" % (byte_range.start, byte_range.end),
+                )
+                return response["Body"].read()
+
             with os.fdopen(write_fd, "wb") as w_pipe:
                 try:
-                    retry_interval = 2
-                    for _ in range(10):
-                        try:
-                            s3_client.download_fileobj(bucket_name, key, w_pipe)
-                            return
-                        except ClientError as err:
-                            LOG.warning(err)
-                            LOG.warning("Will retry in %d seconds", retry_interval)
-                            time.sleep(retry_interval)
-                            retry_interval *= 2
-
-                except IOError as err:
+                    size = s3_client.head_object(Bucket=bucket_name, Key=key)["ContentLength"]
+                    RangedDownload(
+                        _fetch,
+                        split_ranges(key, size, self._download_chunk_size),
+                        concurrency=self._download_concurrency,
+                        memory_budget=self._download_memory_budget,
+                    ).run(w_pipe)
+
+                except (ClientError, IOError) as err:
                     LOG.error(err)
                     exit(1)
 
@@ -248,23 +576,28 @@ class S3(BaseDestination):
             if download_proc:
                 download_proc.join()
 
-    @staticmethod
-    def get_transfer_config():
+    def list_copies(self, media_type, run_type=None):
         """
-        Build Transfer config
+        List backup copies of all hosts.
 
-        :return: Transfer config
-        :rtype: boto3.s3.transfer.TransferConfig
+        Hosts are found with one delimited listing of the bucket root,
+        then only ``<host>/<run_type>/<media_type>/`` prefixes are listed,
+        several prefixes at a time.
+
+        :param media_type: files, mysql or binlog.
+        :type media_type: str
+        :param run_type: hourly, daily, etc. None for binary logs.
+        :type run_type: str
+        :return: Full S3 urls in form ``s3://bucket/path/to/file``.
+        :rtype: list(str)
+        :raise S3DestinationError: if failed to list files.
         """
-        transfer_config = TransferConfig(
-            multipart_threshold=S3_UPLOAD_CHUNK_SIZE_BYTES,
-            max_concurrency=S3_UPLOAD_CONCURRENCY,
-            multipart_chunksize=S3_UPLOAD_CHUNK_SIZE_BYTES,
-            max_io_queue=S3_UPLOAD_IO_QUEUE_SIZE,
-            io_chunksize=S3_UPLOAD_IO_CHUNKS_SIZE_BYTES,
-        )
+        _, hosts = self._list_objects("", delimiter="/")
+        prefixes = [copy_prefix(host, media_type, run_type=run_type) for host in hosts]
+        with ThreadPoolExecutor(max_workers=max(1, self._list_concurrency)) as executor:
+            listings = list(executor.map(self._list_prefix, prefixes))
 
-        return transfer_config
+        return sorted(self._url(key) for keys in listings for key in keys)
 
     def list_files(self, prefix=None, recursive=False, pattern=None, files_only=False):
         """
@@ -283,39 +616,19 @@ class S3(BaseDestination):
         :rtype: list(str)
         :raise S3DestinationError: if failed to list files.
         """
-        s3client = boto3.resource("s3")
-        bucket = s3client.Bucket(self._bucket)
-
         LOG.debug("Listing bucket %s", self._bucket)
         LOG.debug("prefix = %s", prefix)
 
-        norm_prefix = prefix.replace("s3://%s" % bucket.name, "")
+        norm_prefix = (prefix or "").replace("s3://%s" % self._bucket, "")
         norm_prefix = norm_prefix.lstrip("/")
         LOG.debug("normal prefix = %s", norm_prefix)
 
-        # Try to list the bucket several times
-        # because of intermittent error NoSuchBucket:
-        # https://travis-ci.org/twindb/backup/jobs/204053690
-        expire = time.time() + S3_READ_TIMEOUT
-        retry_interval = 2
-        while time.time() < expire:
-            try:
-                files = []
-                all_objects = bucket.objects.filter(Prefix=norm_prefix)
-                for file_object in all_objects:
-                    if pattern:
-                        if re.search(pattern, file_object.key):
-                            files.append("s3://{bucket}/{key}".format(bucket=self._bucket, key=file_object.key))
-                    else:
-                        files.append("s3://{bucket}/{key}".format(bucket=self._bucket, key=file_object.key))
-
-                return sorted(files)
-            except ClientError as err:
-                LOG.warning("%s. Will retry in %d seconds.", err, retry_interval)
-                time.sleep(retry_interval)
-                retry_interval *= 2
+        keys = self._list_prefix(norm_prefix)
+        if pattern:
+            regexp = re.compile(pattern)
+            keys = [key for key in keys if regexp.search(key)]
 
-        raise S3DestinationError("Failed to list files.")
+        return sorted(self._url(key) for key in keys)
 
     def read(self, filepath):
         """
@@ -333,6 +646,44 @@ class S3(BaseDestination):
         except self.s3_client.exceptions.NoSuchKey:
             raise FileNotFound("%s does not exist" % filepath)
 
+    def read_if_modified(self, filepath, version):
+        """
+        Read content of filepath unless its ETag is still ``version``.
+        It's one conditional GET request.
+
+        :param filepath: Path in S3 bucket.
+        :param version: ETag of the content the caller has or None.
+        :return: tuple (content, ETag). Content is None if not modified.
+        :rtype: tuple
+        :raises FileNotFound: If filepath doesn't exist.
+        """
+        kwargs = {"Bucket": self._bucket, "Key": filepath}
+        if version is not None:
+            kwargs["IfNoneMatch"] = version
+        try:
+            response = self.s3_client.get_object(**kwargs)
+            return response["Body"].read(), response["ETag"]
+
+        except self.s3_client.exceptions.NoSuchKey:
+            raise FileNotFound("%s does not exist" % filepath)
+
+        except ClientError as err:
+            if err.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+                return None, version
+            raise
+
+    def version(self, filepath):
+        """
+        :return: ETag of the object.
+        :rtype: str
+        """
+        try:
+            return self.s3_client.head_object(Bucket=self._bucket, Key=filepath)["ETag"]
+        except ClientError as err:
+            if err.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
     def save(self, handler, filepath):
         """
         Read from handler and save it to Amazon S3
@@ -345,9 +696,12 @@ class S3(BaseDestination):
             LOG.debug("Returning code %d", ret)
 
     @staticmethod
-    def setup_s3_client():
+    def setup_s3_client(max_pool_connections=10):
         """Creates an authenticated s3 client.
 
+        :param max_pool_connections: Size of the client connection pool.
+            It should be no less than the number of threads using the client.
+        :type max_pool_connections: int
         :return: S3 client instance.
         :rtype: botocore.client.BaseClient
         """
@@ -355,7 +709,11 @@ class S3(BaseDestination):
             aws_access_key_id=os.environ["AWS_ACCESS_KEY_ID"],
             aws_secret_access_key=os.environ["AWS_SECRET_ACCESS_KEY"],
         )
-        s3_config = Config(connect_timeout=S3_CONNECT_TIMEOUT, read_timeout=S3_READ_TIMEOUT)
+        s3_config = Config(
+            connect_timeout=S3_CONNECT_TIMEOUT,
+            read_timeout=S3_READ_TIMEOUT,
+            max_pool_connections=max_pool_connections,
+        )
         client = session.client("s3", region_name=os.environ["AWS_DEFAULT_REGION"], config=s3_config)
 
         return client
@@ -398,10 +756,90 @@ class S3(BaseDestination):
     def write(self, content, filepath):
         response = self.s3_client.put_object(Body=content, Bucket=self._bucket, Key=filepath)
         self.validate_client_response(response)
+        self._invalidate_listing(filepath)
+
+    def _delete_batch(self, keys):
+        """
+        Delete up to 1000 objects in one request.
+
+        :return: Errors S3 returned for keys it didn't delete.
+            Missing keys count as deleted.
+        :rtype: list(dict)
+        """
+        LOG.debug("Deleting %d objects from s3://%s", len(keys), self._bucket)
+        response = self.s3_client.delete_objects(
+            Bucket=self._bucket,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+        self.validate_client_response(response)
+        return response.get("Errors", [])
+
+    def _key(self, path):
+        prefix = "s3://%s/" % self._bucket
+        return path.replace(prefix, "", 1) if path.startswith(prefix) else path
+
+    def _invalidate_listing(self, key):
+        if self._listing_cache:
+            self._listing_cache.invalidate(self.remote_path, key)
 
     def _list_files(self, prefix=None, recursive=False, files_only=False):
         raise NotImplementedError
 
+    def _list_objects(self, prefix, delimiter=None):
+        """
+        List the bucket with ListObjectsV2 using the shared client.
+
+        :param prefix: Key prefix.
+        :type prefix: str
+        :param delimiter: If given keys are grouped by it.
+        :type delimiter: str
+        :return: tuple (keys, common prefixes).
+        :rtype: tuple
+        :raise S3DestinationError: if failed to list files.
+        """
+        kwargs = {"Bucket": self._bucket, "Prefix": prefix}
+        if delimiter:
+            kwargs["Delimiter"] = delimiter
+
+        # Try to list the bucket several times
+        # because of intermittent error NoSuchBucket:
+        # https://travis-ci.org/twindb/backup/jobs/204053690
+        expire = time.time() + S3_READ_TIMEOUT
+        retry_interval = 2
+        while time.time() < expire:
+            try:
+                keys = []
+                common_prefixes = []
+                for page in self.s3_client.get_paginator("list_objects_v2").paginate(**kwargs):
+                    keys.extend(item["Key"] for item in page.get("Contents", []))
+                    common_prefixes.extend(item["Prefix"] for item in page.get("CommonPrefixes", []))
+                return keys, common_prefixes
+            except ClientError as err:
+                LOG.warning("%s. Will retry in %d seconds.", err, retry_interval)
+                time.sleep(retry_interval)
+                retry_interval *= 2
+
+        raise S3DestinationError("Failed to list files.")
+
+    def _list_prefix(self, prefix):
+        """All keys under the prefix, from the listing cache if it's fresh."""
+        # Other hosts add and delete chunks and manifests. The chunk store
+        # and the whole bucket, where manifests are looked for, are always
+        # listed, a stale listing would free chunks still in use.
+        listing_cache = None if not prefix or prefix.startswith(DEDUP_CHUNKS_DIR) else self._listing_cache
+        if listing_cache:
+            keys = listing_cache.get(self.remote_path, prefix)
+            if keys is not None:
+                return keys
+
+        keys, _ = self._list_objects(prefix)
+        if listing_cache:
+            listing_cache.put(self.remote_path, prefix, keys)
+        return keys
+
+    def _url(self, key):
+        return "s3://{bucket}/{key}".format(bucket=self._bucket, key=key)
+
     def _upload_object(self, file_obj, object_key):
         """Upload objects to S3 in streaming fashion.
 
@@ -412,33 +850,65 @@ class S3(BaseDestination):
         """
         remote_name = "s3://{bucket}/{name}".format(bucket=self._bucket, name=object_key)
 
-        LOG.debug("Generating S3 transfer config")
-        s3_transfer_config = self.get_transfer_config()
-
+        upload = S3MultipartUpload(
+            self.s3_client,
+            self._bucket,
+            object_key,
+            part_size=self._upload_part_size,
+            concurrency=self._upload_concurrency,
+            memory_budget=self._upload_memory_budget,
+            strict=self._upload_validation == S3UploadValidation.strict,
+        )
         LOG.debug("Starting to stream to %s", remote_name)
         try:
-            self.s3_client.upload_fileobj(file_obj, self._bucket, object_key, Config=s3_transfer_config)
+            upload.run(file_obj)
             LOG.debug("Successfully streamed to %s", remote_name)
         except ClientError as err:
             raise S3DestinationError(err)
+        finally:
+            self._part_latencies = upload.part_latencies
+            self._invalidate_listing(object_key)
+
+        if self._upload_validation == S3UploadValidation.none:
+            return 0
 
-        return self._validate_upload(object_key)
+        return self._validate_upload(object_key, upload.size, upload.etag)
 
-    def _validate_upload(self, object_key):
+    def _validate_upload(self, object_key, size, etag=None):
         """
         Validates that upload of an object was successful.
-        Raises an exception if the response code is not 200.
-
+        Checks that the object exists and has the size and the ETag
+        computed while uploading it.
+
+        :param object_key: Uploaded object key.
+        :type object_key: str
+        :param size: Number of uploaded bytes.
+        :type size: int
+        :param etag: Expected ETag. If None, the ETag is not checked.
+        :type etag: str
         :raise S3DestinationError: if object is not available on
-            the destination.
+            the destination or differs from what was uploaded.
         """
         remote_name = "s3://{bucket}/{name}".format(bucket=self._bucket, name=object_key)
 
         LOG.debug("Validating upload to %s", remote_name)
 
-        response = self.s3_client.get_object(Bucket=self._bucket, Key=object_key)
+        try:
+            response = self.s3_client.head_object(Bucket=self._bucket, Key=object_key)
+        except ClientError as err:
+            raise S3DestinationError("Failed to validate upload to %s: %s" % (remote_name, err))
         self.validate_client_response(response)
 
+        if response["ContentLength"] != size:
+            raise S3DestinationError(
+                "Uploaded %d bytes to %s, but S3 stored %d bytes" % (size, remote_name, response["ContentLength"])
+            )
+        # With SSE-KMS the ETag is not an MD5 of the data
+        if etag and response.get("ServerSideEncryption") != "aws:kms" and response["ETag"].strip('"') != etag:
+            raise S3DestinationError(
+                "%s has ETag %s, expected %s. The object is corrupted." % (remote_name, response["ETag"], etag)
+            )
+
         LOG.debug("Upload successfully validated")
 
         return 0
@@ -495,3 +965,16 @@ class S3(BaseDestination):
             CopySource={"Bucket": self._bucket, "Key": source}
         )
         self.validate_client_response(response)
+
+
+def _read_exactly(file_obj, size):
+    """Read size bytes from the file object. Return less only at the end of stream."""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = file_obj.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
@@ -3,6 +3,7 @@
 Module for SSH destination.
 """
 import os
+import shlex
 import socket
 import time
 from contextlib import contextmanager
@@ -11,11 +12,14 @@ from multiprocessing import Process
 from os import path as osp
 
 from twindb_backup import LOG
-from twindb_backup.destination.base_destination import BaseDestination
+from twindb_backup.destination.base_destination import DELETE_CONCURRENCY, BaseDestination, split_batches
 from twindb_backup.destination.exceptions import FileNotFound, SshDestinationError
 from twindb_backup.ssh.client import SshClient
 from twindb_backup.ssh.exceptions import SshClientException
 
+# Files per rm command, keeps the command line well below ARG_MAX.
+SSH_DELETE_BATCH_SIZE = 500
+
 
 class Ssh(BaseDestination):
     """
@@ -92,6 +96,20 @@ class Ssh(BaseDestination):
         cmd = "rm %s" % remote_name
         self.execute_command(cmd)
 
+    def delete_many(self, paths, concurrency=DELETE_CONCURRENCY):
+        """
+        Delete several files with one ``rm`` command per
+        ``SSH_DELETE_BATCH_SIZE`` files instead of a command per file.
+        Missing files are skipped.
+
+        :param paths: Paths to remote files relative to ``self.remote_path``.
+        :type paths: list(str)
+        :param concurrency: Not used, commands run one after another.
+        """
+        remote_names = [shlex.quote(osp.join(self.remote_path, path)) for path in paths]
+        for batch in split_batches(remote_names, SSH_DELETE_BATCH_SIZE):
+            self.execute_command("rm -f -- %s" % " ".join(batch))
+
     def ensure_tcp_port_listening(self, port, wait_timeout=10, wait=True):
         """
         Check that tcp port is open and ready to accept connections.
@@ -253,6 +271,19 @@ class Ssh(BaseDestination):
                     else:
                         break
 
+    def version(self, filepath):
+        """
+        :return: Size and modification time of the remote file.
+        :rtype: str
+        """
+        try:
+            stat = self._ssh_client.get_file_stat(osp.join(self.remote_path, filepath))
+        except IOError as err:
+            if err.errno == ENOENT:
+                return None
+            raise
+        return "%d:%d" % (stat.st_size, stat.st_mtime)
+
     def write(self, content, filepath):
         remote_name = osp.join(self.remote_path, filepath)
         self._ssh_client.write_content(remote_name, content)
@@ -2,6 +2,13 @@
 """
 Module to process export
 """
+import time
+
+from twindb_backup.exporter.base_exporter import Metric, MetricType
+from twindb_backup.modifiers.pipeline import StageStats
+
+STAGE_COUNTERS = ("bytes_in", "bytes_out")
+STAGE_TIMINGS = ("wall_time", "busy_time", "stall_time", "backpressure_time")
 
 
 def export_info(cfg, data, category, measure_type):
@@ -20,3 +27,123 @@ def export_info(cfg, data, category, measure_type):
 
     if transport:
         transport.export(category=category, measure_type=measure_type, data=data)
+
+
+def export_bandwidth(cfg):
+    """
+    Export throughput counters of the bandwidth limiter
+
+    :param cfg: Config file
+    :type cfg: TwinDBBackupConfig
+    """
+    bandwidth = cfg.bandwidth
+    if bandwidth is None:
+        return
+
+    transport = cfg.exporter
+    if transport:
+        for name, value in bandwidth.bucket.counters.items():
+            transport.export_gauge(f"bandwidth.{name}", value)
+
+
+def export_metrics(cfg, metrics):
+    """
+    Export metrics to service
+
+    :param cfg: Config file
+    :type cfg: TwinDBBackupConfig
+    :param metrics: Metrics
+    :type metrics: list(Metric)
+    """
+    transport = cfg.exporter
+
+    if transport:
+        transport.export_metrics(metrics)
+
+
+def pipeline_metrics(src, pipeline, dst, started):
+    """
+    Build metrics of every stage of a backup pipeline: the source,
+    modifiers and the destination. A stage reports bytes in and out,
+    wall time, time it was busy, stalled waiting on the upstream and
+    waiting until the downstream consumes its output.
+    Also reports the compression ratio and upload part latencies.
+
+    :param src: Backup source.
+    :type src: BaseSource
+    :param pipeline: Pipeline that saved the stream. The first modifier
+        must be the compressor.
+    :type pipeline: Pipeline
+    :param dst: Destination the stream was saved to.
+    :type dst: BaseDestination
+    :param started: Time when the pipeline started.
+    :type started: float
+    :return: Metrics
+    :rtype: list(Metric)
+    """
+    stages = list(pipeline.stats)
+    now = time.time()
+
+    source = StageStats(src.__class__.__name__)
+    source.started = started
+    destination = StageStats(dst.__class__.__name__)
+    destination.started = started
+    destination.finished = now
+    if stages:
+        source.finished = stages[0].finished
+        source.bytes_out = stages[0].bytes_in
+        destination.bytes_in = destination.bytes_out = stages[-1].bytes_out
+    else:
+        source.finished = now
+
+    metrics = []
+    for stage in [source] + stages + [destination]:
+        tags = {"source": src.media_type, "stage": stage.name}
+        for name in STAGE_COUNTERS:
+            metrics.append(Metric(f"pipeline.{name}", getattr(stage, name), MetricType.counter, tags))
+        for name in STAGE_TIMINGS:
+            metrics.append(Metric(f"pipeline.{name}", getattr(stage, name), MetricType.timing, tags))
+
+    tags = {"source": src.media_type}
+    if stages and stages[0].bytes_out:
+        metrics.append(Metric("pipeline.compression_ratio", stages[0].bytes_in / stages[0].bytes_out, tags=tags))
+    for latency in dst.part_latencies:
+        metrics.append(Metric("destination.part_latency", latency, MetricType.timing, tags))
+    return metrics
+
+
+def restore_metrics(media_type, stages):
+    """
+    Build metrics of every stage of a restore pipeline:
+    decryption, decompression and the tool that extracts the copy.
+
+    :param media_type: mysql or files.
+    :type media_type: str
+    :param stages: Stage counters.
+    :type stages: list(StageStats)
+    :return: Metrics
+    :rtype: list(Metric)
+    """
+    metrics = []
+    for stage in stages:
+        tags = {"source": media_type, "stage": stage.name}
+        for name in STAGE_COUNTERS:
+            metrics.append(Metric(f"restore_pipeline.{name}", getattr(stage, name), MetricType.counter, tags))
+        for name in STAGE_TIMINGS:
+            metrics.append(Metric(f"restore_pipeline.{name}", getattr(stage, name), MetricType.timing, tags))
+    return metrics
+
+
+def prepare_metrics(duration, redo_only=False):
+    """
+    Build metrics of one ``xtrabackup --prepare`` run.
+
+    :param duration: Seconds the prepare took.
+    :type duration: float
+    :param redo_only: True if it was an ``--apply-log-only`` step of an incremental restore.
+    :type redo_only: bool
+    :return: Metrics
+    :rtype: list(Metric)
+    """
+    tags = {"source": "mysql", "step": "apply_log_only" if redo_only else "final"}
+    return [Metric("restore.prepare_time", duration, MetricType.timing, tags)]
@@ -19,6 +19,46 @@ class ExportMeasureType(object):  # pylint: disable=too-few-public-methods
     restore = 1
 
 
+class MetricType(object):  # pylint: disable=too-few-public-methods
+    """Type of metric: counter, gauge or timing"""
+
+    counter = 0
+    gauge = 1
+    # One sample of a distribution, in seconds
+    timing = 2
+
+
+class Metric(object):  # pylint: disable=too-few-public-methods
+    """
+    A metric sample.
+
+    :param name: Metric name without the ``twindb.`` prefix,
+        e.g. ``pipeline.bytes_out``.
+    :type name: str
+    :param value: Metric value.
+    :type value: int or float
+    :param metric_type: Metric type.
+    :type metric_type: int
+    :param tags: Dimensions of the metric, e.g. ``{"stage": "Gzip"}``.
+    :type tags: dict
+    """
+
+    def __init__(self, name, value, metric_type=MetricType.gauge, tags=None):
+        self.name = name
+        self.value = value
+        self.metric_type = metric_type
+        self.tags = tags or {}
+
+    def __repr__(self):
+        return "%s(%s=%r, type=%d, tags=%r)" % (
+            self.__class__.__name__,
+            self.name,
+            self.value,
+            self.metric_type,
+            self.tags,
+        )
+
+
 class BaseExporter(object):  # pylint: disable=too-few-public-methods
     """
     Base exporter class
@@ -32,3 +72,32 @@ class BaseExporter(object):  # pylint: disable=too-few-public-methods
         """
         Send data to server
         """
+
+    def export_gauge(self, name, value):
+        """
+        Send a gauge, e.g. a throughput counter.
+
+        :param name: Metric name without the ``twindb.`` prefix.
+        :type name: str
+        :param value: Metric value.
+        :type value: int or float
+        """
+        self.export_metric(Metric(name, value))
+
+    def export_metrics(self, metrics):
+        """
+        Send a batch of metrics.
+
+        :param metrics: Metrics to send.
+        :type metrics: list(Metric)
+        """
+        for metric in metrics:
+            self.export_metric(metric)
+
+    def export_metric(self, metric):
+        """
+        Send one metric. Exporters that don't support metrics ignore it.
+
+        :param metric: Metric to send.
+        :type metric: Metric
+        """
@@ -5,7 +5,7 @@ Module defines DataDog exporter class.
 """
 from datadog import initialize, statsd
 
-from twindb_backup.exporter.base_exporter import BaseExporter, ExportCategory, ExportMeasureType
+from twindb_backup.exporter.base_exporter import BaseExporter, ExportCategory, ExportMeasureType, MetricType
 from twindb_backup.exporter.exceptions import DataDogExporterError
 
 
@@ -41,3 +41,20 @@ class DataDogExporter(BaseExporter):  # pylint: disable=too-few-public-methods
             statsd.gauge(metric_name, data)
         else:
             raise DataDogExporterError("Invalid input data")
+
+    def export_metric(self, metric):
+        """
+        Export a metric to DataDog. Tags become DataDog tags.
+        :param metric: Metric to send
+        :raise: DataDogExporterError if the metric value is invalid
+        """
+        if not isinstance(metric.value, (int, float)):
+            raise DataDogExporterError("Invalid input data")
+        name = self._suffix + metric.name
+        tags = ["%s:%s" % (key, value) for key, value in metric.tags.items()] or None
+        if metric.metric_type == MetricType.counter:
+            statsd.increment(name, metric.value, tags=tags)
+        elif metric.metric_type == MetricType.timing:
+            statsd.histogram(name, metric.value, tags=tags)
+        else:
+            statsd.gauge(name, metric.value, tags=tags)
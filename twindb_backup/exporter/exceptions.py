@@ -21,3 +21,9 @@ class StatsdExporterError(BaseExporterError):
     """Statsd exporters error"""
 
     pass
+
+
+class PrometheusExporterError(BaseExporterError):
+    """Prometheus exporters error"""
+
+    pass
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module defines Prometheus exporter class.
+
+The exporter writes metrics in the text exposition format for
+the node_exporter textfile collector and optionally pushes them
+to a Prometheus pushgateway. Every twindb-backup run is a separate
+process, so counters and histograms are kept in a state file
+and accumulate across runs.
+"""
+import fcntl
+import json
+import os
+import socket
+import time
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from twindb_backup import LOG
+from twindb_backup.exporter.base_exporter import BaseExporter, ExportCategory, ExportMeasureType, Metric, MetricType
+from twindb_backup.exporter.exceptions import PrometheusExporterError
+
+PROMETHEUS_TEXTFILE_DIR = "/var/lib/node_exporter/textfile_collector"
+PROMETHEUS_STATE_FILE = "/var/lib/twindb-backup/prometheus.json"
+PROMETHEUS_JOB = "twindb_backup"
+PROMETHEUS_PUSH_TIMEOUT = 10
+# Upper bounds of histogram buckets in seconds.
+PROMETHEUS_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600, 7200, 14400, 28800)
+
+_TYPES = {
+    MetricType.counter: "counter",
+    MetricType.gauge: "gauge",
+    MetricType.timing: "histogram",
+}
+
+
+def _family_name(metric):
+    name = "twindb_" + metric.name.replace(".", "_").replace("-", "_")
+    if metric.metric_type == MetricType.counter:
+        return name + "_total"
+    if metric.metric_type == MetricType.timing:
+        return name + "_seconds"
+    return name
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=None):
+    pairs = sorted(labels.items()) + (extra or [])
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (key, _escape(value)) for key, value in pairs)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusExporter(BaseExporter):
+    """
+    Prometheus exporter class
+
+    * Counters become ``twindb_<name>_total`` counters.
+    * Timings become ``twindb_<name>_seconds`` histograms.
+    * Gauges keep their name, e.g. ``twindb_copy_last_finished_timestamp_seconds``.
+    * Backup and restore times from :meth:`export` become
+      ``twindb_<category>_<backup|restore>_time_seconds`` gauges and
+      ``twindb_<category>_<backup|restore>_last_success_timestamp_seconds``
+      is set to the current time.
+
+    :param textfile_dir: Directory of the node_exporter textfile collector.
+    :type textfile_dir: str
+    :param state_file: File where counters and histograms are kept between runs.
+    :type state_file: str
+    :param pushgateway: Pushgateway URL, e.g. ``http://localhost:9091``.
+        If None metrics are not pushed.
+    :type pushgateway: str
+    :param job: Job name. It's the name of the .prom file
+        and the job label in the pushgateway.
+    :type job: str
+    """
+
+    def __init__(
+        self,
+        textfile_dir=PROMETHEUS_TEXTFILE_DIR,
+        state_file=PROMETHEUS_STATE_FILE,
+        pushgateway=None,
+        job=PROMETHEUS_JOB,
+    ):
+        super(PrometheusExporter, self).__init__()
+        self._textfile_dir = textfile_dir
+        self._state_file = state_file
+        self._pushgateway = pushgateway.rstrip("/") if pushgateway else None
+        self._job = job
+
+    @property
+    def textfile_path(self):
+        """Path to the .prom file the textfile collector reads."""
+        return os.path.join(self._textfile_dir, "%s.prom" % self._job)
+
+    def export(self, category, measure_type, data):
+        """
+        Export backup or restore time
+        :param category: Data meant
+        :param measure_type: Type of measure
+        :param data: Data to posting
+        :raise: PrometheusExporterError if data is invalid
+        """
+        if not isinstance(data, (int, float)):
+            raise PrometheusExporterError("Invalid input data")
+        category_name = "files" if category == ExportCategory.files else "mysql"
+        measure_name = "backup" if measure_type == ExportMeasureType.backup else "restore"
+        self.export_metrics(
+            [
+                Metric("%s.%s_time_seconds" % (category_name, measure_name), data),
+                Metric("%s.%s_last_success_timestamp_seconds" % (category_name, measure_name), time.time()),
+            ]
+        )
+
+    def export_metric(self, metric):
+        """
+        Export a metric
+        :param metric: Metric to send
+        :raise: PrometheusExporterError if the metric value is invalid
+        """
+        self.export_metrics([metric])
+
+    def export_metrics(self, metrics):
+        """
+        Add metrics to the state, rewrite the .prom file
+        and push the metrics to the pushgateway.
+
+        :param metrics: Metrics to send.
+        :type metrics: list(Metric)
+        :raise: PrometheusExporterError if a metric value is invalid
+            or the files can't be written.
+        """
+        for metric in metrics:
+            if not isinstance(metric.value, (int, float)):
+                raise PrometheusExporterError("Invalid value of %s: %r" % (metric.name, metric.value))
+
+        try:
+            os.makedirs(os.path.dirname(self._state_file), exist_ok=True)
+            with open(self._state_file, "a+") as state_fd:
+                # Backup, restore and binlog follow may export at the same time
+                fcntl.flock(state_fd, fcntl.LOCK_EX)
+                state_fd.seek(0)
+                content = state_fd.read()
+                state = json.loads(content) if content else {}
+                for metric in metrics:
+                    self._update(state, metric)
+                text = self.render(state)
+                self._write_textfile(text)
+                state_fd.seek(0)
+                state_fd.truncate()
+                state_fd.write(json.dumps(state, sort_keys=True))
+        except (IOError, OSError, ValueError) as err:
+            raise PrometheusExporterError("Failed to export metrics: %s" % err)
+
+        if self._pushgateway:
+            self._push(text)
+
+    @staticmethod
+    def render(state):
+        """
+        Render the state in the Prometheus text exposition format.
+
+        :param state: Metric families.
+        :type state: dict
+        :return: Text to expose.
+        :rtype: str
+        """
+        lines = []
+        for name in sorted(state):
+            family = state[name]
+            lines.append("# HELP %s twindb-backup metric %s" % (name, family["metric"]))
+            lines.append("# TYPE %s %s" % (name, family["type"]))
+            for sample in sorted(family["samples"], key=lambda x: sorted(x["labels"].items())):
+                labels = sample["labels"]
+                if family["type"] != "histogram":
+                    lines.append("%s%s %s" % (name, _labels(labels), _format_value(sample["value"])))
+                    continue
+                for bound, count in zip(list(PROMETHEUS_BUCKETS) + [float("inf")], sample["buckets"]):
+                    lines.append("%s_bucket%s %d" % (name, _labels(labels, [("le", _format_value(bound))]), count))
+                lines.append("%s_sum%s %s" % (name, _labels(labels), _format_value(sample["sum"])))
+                lines.append("%s_count%s %d" % (name, _labels(labels), sample["count"]))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _update(state, metric):
+        name = _family_name(metric)
+        family = state.setdefault(name, {"type": _TYPES[metric.metric_type], "metric": metric.name, "samples": []})
+        labels = {key: str(value) for key, value in metric.tags.items()}
+        for sample in family["samples"]:
+            if sample["labels"] == labels:
+                break
+        else:
+            sample = {"labels": labels}
+            if family["type"] == "histogram":
+                sample.update({"buckets": [0] * (len(PROMETHEUS_BUCKETS) + 1), "sum": 0.0, "count": 0})
+            else:
+                sample["value"] = 0
+            family["samples"].append(sample)
+
+        if family["type"] == "counter":
+            sample["value"] += metric.value
+        elif family["type"] == "gauge":
+            sample["value"] = metric.value
+        else:
+            # Buckets are cumulative, the last one is +Inf
+            for i, bound in enumerate(PROMETHEUS_BUCKETS):
+                if metric.value <= bound:
+                    sample["buckets"][i] += 1
+            sample["buckets"][-1] += 1
+            sample["sum"] += metric.value
+            sample["count"] += 1
+
+    def _write_textfile(self, text):
+        """Write the .prom file atomically, so the collector never reads half of it."""
+        os.makedirs(self._textfile_dir, exist_ok=True)
+        tmp_path = "%s.%d.tmp" % (self.textfile_path, os.getpid())
+        with open(tmp_path, "w") as tmp_file:
+            tmp_file.write(text)
+        os.rename(tmp_path, self.textfile_path)
+
+    def _push(self, text):
+        """
+        Replace metrics of this job and instance in the pushgateway.
+        A failed push is logged, it doesn't fail the backup.
+        """
+        url = "%s/metrics/job/%s/instance/%s" % (self._pushgateway, self._job, socket.gethostname())
+        request = Request(url, data=text.encode("utf-8"), method="PUT")
+        request.add_header("Content-Type", "text/plain; version=0.0.4")
+        try:
+            with urlopen(request, timeout=PROMETHEUS_PUSH_TIMEOUT) as response:
+                LOG.debug("Pushed metrics to %s: HTTP %d", url, response.status)
+        except (URLError, IOError) as err:
+            LOG.warning("Failed to push metrics to %s: %s", url, err)
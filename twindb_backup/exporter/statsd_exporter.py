@@ -5,7 +5,7 @@ Module defines Statsd exporter class.
 """
 import statsd
 
-from twindb_backup.exporter.base_exporter import BaseExporter, ExportCategory, ExportMeasureType
+from twindb_backup.exporter.base_exporter import BaseExporter, ExportCategory, ExportMeasureType, MetricType
 from twindb_backup.exporter.exceptions import StatsdExporterError
 
 
@@ -40,3 +40,21 @@ class StatsdExporter(BaseExporter):  # pylint: disable=too-few-public-methods
             self._client.timing(metric_name, data)
         else:
             raise StatsdExporterError("Invalid input data")
+
+    def export_metric(self, metric):
+        """
+        Export a metric to StatsD server. StatsD has no tags,
+        so tag values are appended to the metric name,
+        e.g. ``twindb.pipeline.bytes_out.mysql.Gzip``.
+        :param metric: Metric to send
+        :raise: StatsdExporterError if the metric value is invalid
+        """
+        if not isinstance(metric.value, (int, float)):
+            raise StatsdExporterError("Invalid input data")
+        name = ".".join([self._suffix + metric.name] + [str(value) for value in metric.tags.values()])
+        if metric.metric_type == MetricType.counter:
+            self._client.incr(name, metric.value)
+        elif metric.metric_type == MetricType.timing:
+            self._client.timing(name, metric.value)
+        else:
+            self._client.gauge(name, metric.value)
@@ -7,14 +7,18 @@ and return the modified stream for a next modifier or backup destination.
 Modifiers also do reverse operation - i.e. decompress, decrypt.
 """
 
+from twindb_backup.modifiers.adaptive import AdaptiveCompressor
 from twindb_backup.modifiers.bzip2 import Bzip2
 from twindb_backup.modifiers.gzip import Gzip
 from twindb_backup.modifiers.lbzip2 import Lbzip2
 from twindb_backup.modifiers.pigz import Pigz
+from twindb_backup.modifiers.zstd import Zstd
 
 COMPRESSION_MODIFIERS = {
-    "gzip": {"class": Gzip, "kwargs": ["level"]},
+    "gzip": {"class": Gzip, "kwargs": ["level", "rsyncable"]},
     "bzip2": {"class": Bzip2, "kwargs": ["level"]},
     "lbzip2": {"class": Lbzip2, "kwargs": ["threads", "level"]},
-    "pigz": {"class": Pigz, "kwargs": ["threads", "level"]},
+    "pigz": {"class": Pigz, "kwargs": ["threads", "level", "rsyncable"]},
+    "zstd": {"class": Zstd, "kwargs": ["threads", "level", "long_window", "rsyncable"]},
+    "adaptive": {"class": AdaptiveCompressor, "kwargs": ["threads", "min_level", "max_level", "cpu_share"]},
 }
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Module defines modifier that compresses a stream with a compression level
+that adapts to the host load.
+
+The stream is cut into blocks. Every block is compressed into a separate
+gzip member, so the output is a regular multi-member gzip file that
+``gunzip`` or ``pigz -d`` decompress. Because members are independent,
+each block may be compressed with a different level.
+"""
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+from twindb_backup import LOG
+from twindb_backup.modifiers.base import Modifier
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+DEFAULT_MIN_LEVEL = 1
+DEFAULT_MAX_LEVEL = 9
+# Share of the host CPU the compression may use, from 0 to 1.
+DEFAULT_CPU_SHARE = 0.5
+# Host CPU utilization (percent) above which the level goes down
+# no matter how much CPU the backup itself uses.
+HOST_CPU_HIGH_WATERMARK = 90.0
+# How often the controller reconsiders the level, in seconds.
+CONTROL_INTERVAL = 1.0
+# Wait for compression workers longer than this share of the interval
+# means compression is the bottleneck.
+BOTTLENECK_WAIT_SHARE = 0.1
+# Wait shorter than this share means there is room for a better ratio.
+IDLE_WAIT_SHARE = 0.02
+
+
+class LevelController(object):
+    """
+    Decide which compression level to use next.
+
+    The controller lowers the level when compression holds up the stream,
+    when the backup uses more CPU than it's allowed or the host is busy.
+    It raises the level when the compressor keeps up with the stream
+    and there is CPU to spare.
+
+    :param min_level: The lowest level to use.
+    :type min_level: int
+    :param max_level: The highest level to use.
+    :type max_level: int
+    :param cpu_share: Share of the host CPU the backup may use, from 0 to 1.
+    :type cpu_share: float
+    :param interval: How often to reconsider the level, in seconds.
+    :type interval: float
+    """
+
+    def __init__(
+        self,
+        min_level=DEFAULT_MIN_LEVEL,
+        max_level=DEFAULT_MAX_LEVEL,
+        cpu_share=DEFAULT_CPU_SHARE,
+        interval=CONTROL_INTERVAL,
+    ):
+        self._min_level = min_level
+        self._max_level = max(min_level, max_level)
+        self._cpu_share = cpu_share
+        self._interval = interval
+        self._level = (self._min_level + self._max_level) // 2
+        self._process = psutil.Process()
+        self._cpu_count = psutil.cpu_count() or 1
+        self._window_start = None
+        self._cpu_times_start = None
+        self._wait = 0.0
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+    @property
+    def level(self):
+        """Compression level for the next block."""
+        return self._level
+
+    def observe(self, bytes_in, bytes_out, wait):
+        """
+        Account a compressed block.
+
+        :param bytes_in: Size of the block before compression.
+        :type bytes_in: int
+        :param bytes_out: Size of the compressed block.
+        :type bytes_out: int
+        :param wait: Time the stream waited for the compressed block, in seconds.
+        :type wait: float
+        """
+        now = time.time()
+        if self._window_start is None:
+            self._start_window(now)
+        self._bytes_in += bytes_in
+        self._bytes_out += bytes_out
+        self._wait += wait
+
+        elapsed = now - self._window_start
+        if elapsed < self._interval:
+            return
+
+        cpu_times = self._process.cpu_times()
+        cpu_used = (cpu_times.user + cpu_times.system - self._cpu_times_start.user - self._cpu_times_start.system) / (
+            elapsed * self._cpu_count
+        )
+        self.adjust(cpu_used, psutil.cpu_percent(), self._wait / elapsed)
+        LOG.debug(
+            "Compression: in %.1f B/s, out %.1f B/s, CPU share %.2f, level %d",
+            self._bytes_in / elapsed,
+            self._bytes_out / elapsed,
+            cpu_used,
+            self._level,
+        )
+        self._start_window(now)
+
+    def adjust(self, cpu_used, host_cpu_percent, wait_share):
+        """
+        Change the level according to the observed load.
+
+        :param cpu_used: Share of the host CPU this process used.
+        :type cpu_used: float
+        :param host_cpu_percent: Host CPU utilization in percent.
+        :type host_cpu_percent: float
+        :param wait_share: Share of the time the stream waited for compression.
+        :type wait_share: float
+        :return: New level.
+        :rtype: int
+        """
+        if (
+            cpu_used > self._cpu_share
+            or host_cpu_percent > HOST_CPU_HIGH_WATERMARK
+            or wait_share > BOTTLENECK_WAIT_SHARE
+        ):
+            self._level = max(self._min_level, self._level - 1)
+        elif wait_share < IDLE_WAIT_SHARE:
+            self._level = min(self._max_level, self._level + 1)
+        return self._level
+
+    def _start_window(self, now):
+        self._window_start = now
+        self._cpu_times_start = self._process.cpu_times()
+        self._wait = 0.0
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+
+def _compress(data, level):
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class AdaptiveCompressor(Modifier):
+    """
+    Modifier that compresses the input_stream into gzip format
+    and adapts the compression level to the host load.
+    """
+
+    suffix = ".gz"
+
+    def __init__(
+        self,
+        input_stream,
+        threads=None,
+        min_level=DEFAULT_MIN_LEVEL,
+        max_level=DEFAULT_MAX_LEVEL,
+        cpu_share=DEFAULT_CPU_SHARE,
+        block_size=DEFAULT_BLOCK_SIZE,
+    ):  # pylint: disable=too-many-arguments
+        """
+        Modifier that compresses blocks in parallel threads.
+
+        :param input_stream: Input stream. Must be file object
+        :param threads: number of threads to use. It's capped by cpu_share.
+            By default as many as cpu_share allows.
+        :type threads: int
+        :param min_level: the lowest compression level from 1 to 9
+        :type min_level: int
+        :param max_level: the highest compression level from 1 to 9
+        :type max_level: int
+        :param cpu_share: share of the host CPU the compression may use
+        :type cpu_share: float
+        :param block_size: size of an independently compressed block
+        :type block_size: int
+        """
+        super(AdaptiveCompressor, self).__init__(input_stream)
+        max_threads = max(1, int((psutil.cpu_count() or 1) * cpu_share))
+        self._threads = min(threads, max_threads) if threads else max_threads
+        self._block_size = block_size
+        self._controller = LevelController(min_level=min_level, max_level=max_level, cpu_share=cpu_share)
+        self._executor = None
+        self._pending = deque()
+        self._block = bytearray()
+
+    @property
+    def level(self):
+        """Current compression level."""
+        return self._controller.level
+
+    @property
+    def _modifier_cmd(self):
+        """The modifier compresses in-process."""
+        return None
+
+    @property
+    def _unmodifier_cmd(self):
+        """get decompression program cmd"""
+        return ["gunzip", "-c"]
+
+    def begin(self):
+        self._executor = ThreadPoolExecutor(max_workers=self._threads)
+        self._pending = deque()
+        self._block = bytearray()
+
+    def modify(self, chunk):
+        self._block += chunk
+        if len(self._block) < self._block_size:
+            return self._collect(block=False)
+
+        # zlib releases the GIL, so blocks are compressed truly in parallel
+        self._pending.append(
+            (len(self._block), self._executor.submit(_compress, bytes(self._block), self._controller.level))
+        )
+        self._block = bytearray()
+        # Keep a bounded number of blocks in flight
+        return self._collect(block=len(self._pending) > 2 * self._threads)
+
+    def flush(self):
+        if self._block:
+            self._pending.append((len(self._block), self._executor.submit(_compress, bytes(self._block), self.level)))
+            self._block = bytearray()
+        output = []
+        while self._pending:
+            output.append(self._collect(block=True, limit=1))
+        return b"".join(output)
+
+    def end(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _collect(self, block, limit=None):
+        """
+        Return compressed blocks that are ready, in order.
+
+        :param block: Wait for the oldest block if it's not ready yet.
+        :param limit: Return at most this many blocks.
+        """
+        output = []
+        while self._pending and (limit is None or len(output) < limit):
+            size, future = self._pending[0]
+            if not future.done() and not block:
+                break
+            started = time.time()
+            data = future.result()
+            self._pending.popleft()
+            self._controller.observe(size, len(data), time.time() - started)
+            output.append(data)
+            block = False
+        return b"".join(output)
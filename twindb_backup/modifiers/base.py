@@ -2,11 +2,18 @@
 """
 Module defines Modifier() base class and its errors.
 """
+import fcntl
 from contextlib import contextmanager
 from subprocess import PIPE, Popen
 
+import psutil
+
 from twindb_backup import LOG
 from twindb_backup.modifiers.exceptions import ModifierException
+from twindb_backup.modifiers.pipeline import PIPELINE_BUFFER_SIZE, Pipeline
+
+# fcntl.F_SETPIPE_SZ appeared in Python 3.10
+F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
 
 
 class Modifier(object):
@@ -22,6 +29,7 @@ class Modifier(object):
             It's like returned by proc.stdout
         """
         self._input = input_stream
+        self.process_stats = None
 
     @property
     def input(self):
@@ -30,6 +38,23 @@ class Modifier(object):
         """
         return self._input
 
+    @input.setter
+    def input(self, input_stream):
+        self._input = input_stream
+
+    @property
+    def stage_name(self):
+        """Name of the modifier in pipeline counters."""
+        return self.__class__.__name__
+
+    @property
+    def in_process(self):
+        """
+        True if the modifier doesn't need an external tool and modifies
+        the stream in-process with :meth:`modify`.
+        """
+        return self._modifier_cmd is None
+
     @contextmanager
     def get_stream(self):
         """
@@ -37,10 +62,16 @@ class Modifier(object):
 
         :return: output stream handle
         """
+        if self.in_process:
+            with Pipeline(self._input, [self]).get_stream() as output:
+                yield output
+            return
+
         with self._input as input_stream:
             LOG.debug("Running %s", " ".join(self._modifier_cmd))
             proc = Popen(self._modifier_cmd, stdin=input_stream, stdout=PIPE, stderr=PIPE)
             yield proc.stdout
+            self.process_stats = _process_stats(proc.pid)
             proc.communicate()
 
     @contextmanager
@@ -60,8 +91,10 @@ class Modifier(object):
                 stdout=PIPE,
                 stderr=PIPE,
             )
+            _grow_pipe(proc.stdout)
             yield proc.stdout
 
+            self.process_stats = _process_stats(proc.pid)
             _, cerr = proc.communicate()
             if proc.returncode:
                 msg = "%s exited with non-zero code." % " ".join(self._unmodifier_cmd)
@@ -73,16 +106,49 @@ class Modifier(object):
         """Method that will be called after the stream ends"""
         pass
 
+    def begin(self):
+        """
+        Called before the first chunk when the modifier runs in-process.
+        """
+
+    def modify(self, chunk):
+        """
+        Modify a chunk of the stream in-process.
+        The Base modifier does nothing, so it returns the chunk as is.
+
+        :param chunk: Chunk of the input stream.
+        :type chunk: memoryview
+        :return: Modified chunk.
+        :rtype: bytes
+        """
+        return chunk
+
+    def flush(self):
+        """
+        Called after the last chunk when the modifier runs in-process.
+        Returns data the modifier held back, if any.
+
+        :return: The rest of the modified stream.
+        :rtype: bytes
+        """
+        return b""
+
+    def end(self):
+        """
+        Called after the last chunk when the modifier runs in-process.
+        It's called even if the stream failed.
+        """
+
     @property
     def _modifier_cmd(self):
         """
         Command that accepts a stream as STDIN, modifies it and returns result
-        as STDOUT.
+        as STDOUT. None means the modifier runs in-process.
 
         :return: Modifier command
         :rtype: list
         """
-        return ["cat", "-"]
+        return None
 
     @property
     def _unmodifier_cmd(self):
@@ -94,3 +160,40 @@ class Modifier(object):
         :rtype: list
         """
         return ["cat", "-"]
+
+
+def _grow_pipe(pipe):
+    """
+    Make the pipe buffer as large as a pipeline buffer, so a stage
+    isn't blocked as soon as the next one falls behind a little.
+    It's Linux specific, elsewhere the pipe keeps its size.
+    """
+    try:
+        fcntl.fcntl(pipe.fileno(), F_SETPIPE_SZ, PIPELINE_BUFFER_SIZE)
+    except (AttributeError, OSError, TypeError, ValueError) as err:
+        LOG.debug("Failed to resize pipe: %s", err)
+
+
+def _process_stats(pid):
+    """
+    Read I/O and CPU counters of a modifier process before it's reaped.
+
+    :param pid: Process id.
+    :type pid: int
+    :return: Dictionary with bytes the process read and wrote and
+        CPU time it used or None if the counters aren't available.
+    :rtype: dict
+    """
+    try:
+        process = psutil.Process(pid)
+        io_counters = process.io_counters()
+        cpu_times = process.cpu_times()
+    # io_counters() isn't available on all platforms
+    except (psutil.Error, AttributeError, NotImplementedError, TypeError, ValueError) as err:
+        LOG.debug("Failed to read counters of process %s: %s", pid, err)
+        return None
+    return {
+        "bytes_in": io_counters.read_chars,
+        "bytes_out": io_counters.write_chars,
+        "cpu_time": cpu_times.user + cpu_times.system,
+    }
@@ -12,22 +12,28 @@ class Gzip(Modifier):
 
     suffix = ".gz"
 
-    def __init__(self, input_stream, level=9):
+    def __init__(self, input_stream, level=9, rsyncable=False):
         """
         Modifier that uses gzip compression
 
         :param input_stream: Input stream. Must be file object
         :param level: compression level from 1 to 9 (fastest to best)
         :type level: int
+        :param rsyncable: make the output friendly to deduplication
+        :type rsyncable: bool
         """
         super(Gzip, self).__init__(input_stream)
 
         self._level = level
+        self._rsyncable = rsyncable
 
     @property
     def _modifier_cmd(self):
         """get compression program cmd"""
-        return ["gzip", "-{0}".format(self._level), "-c", "-"]
+        cmd = ["gzip", "-{0}".format(self._level)]
+        if self._rsyncable:
+            cmd.append("--rsyncable")
+        return cmd + ["-c", "-"]
 
     @property
     def _unmodifier_cmd(self):
@@ -12,7 +12,7 @@ from twindb_backup.util import mkdir_p
 
 class KeepLocal(Modifier):
     """KeepLocal() class saves a copy of the stream on the local file system.
-    It doesn't alter the stream."""
+    It doesn't alter the stream. The copy is written in-process."""
 
     def __init__(self, input_stream, local_path):
         """
@@ -23,6 +23,7 @@ class KeepLocal(Modifier):
         """
         super(KeepLocal, self).__init__(input_stream)
         self.local_path = local_path
+        self._local_file = None
         local_dir = os.path.dirname(self.local_path)
         try:
             mkdir_p(local_dir)
@@ -31,10 +32,20 @@ class KeepLocal(Modifier):
 
     def callback(self, **kwargs):
         local_dst = Local(kwargs["keep_local_path"])
-        status = MySQLStatus(dst=kwargs["dst"])
+        status = MySQLStatus(dst=kwargs["dst"], cache=kwargs["dst"].status_cache)
         status.save(local_dst)
 
-    @property
-    def _modifier_cmd(self):
-        """get compression program cmd"""
-        return ["tee", self.local_path]
+    def begin(self):
+        try:
+            self._local_file = open(self.local_path, "wb")
+        except IOError as err:
+            raise ModifierException("Failed to open %s: %s" % (self.local_path, err))
+
+    def modify(self, chunk):
+        self._local_file.write(chunk)
+        return chunk
+
+    def end(self):
+        if self._local_file:
+            self._local_file.close()
+            self._local_file = None
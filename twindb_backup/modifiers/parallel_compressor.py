@@ -21,7 +21,8 @@ class ParallelCompressor(Modifier):
         threads=DEFAULT_THREADS,
         level=9,
         suffix=".gz",
-    ):
+        rsyncable=False,
+    ):  # pylint: disable=too-many-arguments
         """
         Modifier that compresses in multiple threads.
 
@@ -30,6 +31,8 @@ class ParallelCompressor(Modifier):
         :type threads: int
         :param level: compression level from 1 to 9 (fastest to best)
         :type level: int
+        :param rsyncable: make the output friendly to deduplication
+        :type rsyncable: bool
         """
         super(ParallelCompressor, self).__init__(input_stream)
 
@@ -37,6 +40,7 @@ class ParallelCompressor(Modifier):
         self._level = level
         self._program = program
         self._suffix = suffix
+        self._rsyncable = rsyncable
 
     @property
     def suffix(self):
@@ -46,14 +50,10 @@ class ParallelCompressor(Modifier):
     @property
     def _modifier_cmd(self):
         """get compression program cmd"""
-        return [
-            self._program,
-            "-{0}".format(self._level),
-            "-p",
-            str(self._threads),
-            "-c",
-            "-",
-        ]
+        cmd = [self._program, "-{0}".format(self._level), "-p", str(self._threads)]
+        if self._rsyncable:
+            cmd.append("--rsyncable")
+        return cmd + ["-c", "-"]
 
     @property
     def _unmodifier_cmd(self):
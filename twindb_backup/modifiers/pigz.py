@@ -14,7 +14,7 @@ class Pigz(ParallelCompressor):
     Modifier that compresses the input_stream with pigz.
     """
 
-    def __init__(self, input_stream, threads=DEFAULT_THREADS, level=9):
+    def __init__(self, input_stream, threads=DEFAULT_THREADS, level=9, rsyncable=False):
         """
         Modifier that uses pigz compression
 
@@ -23,6 +23,8 @@ class Pigz(ParallelCompressor):
         :type threads: int
         :param level: compression level from 1 to 9 (fastest to best)
         :type level: int
+        :param rsyncable: make the output friendly to deduplication
+        :type rsyncable: bool
         """
         super(Pigz, self).__init__(
             input_stream,
@@ -30,4 +32,5 @@ class Pigz(ParallelCompressor):
             threads=threads,
             level=level,
             suffix=".gz",
+            rsyncable=rsyncable,
         )
@@ -0,0 +1,545 @@
+# -*- coding: utf-8 -*-
+"""
+Module defines Pipeline() class that runs a chain of modifiers.
+
+Modifiers that need an external tool (a compressor, gpg) run as processes
+like they always did. Modifiers that can do their job in-process
+(e.g. KeepLocal) are fused together and run in a pump thread over
+a bounded ring of reusable buffers. Their bytes don't cross a kernel pipe
+and no process is spawned for them.
+
+::
+
+ +--------+    +------+    +--------------------+    +-----+    +-------------+
+ | source | -- | gzip | -- | in-process stages  | -- | gpg | -- | destination |
+ +--------+    +------+    | (ring of buffers)  |    +-----+    +-------------+
+                           +--------------------+
+"""
+import io
+import os
+import time
+from contextlib import contextmanager
+from queue import Queue
+from threading import Thread
+
+from twindb_backup import LOG
+from twindb_backup.modifiers.exceptions import ModifierException
+
+# Size of one buffer in the ring.
+PIPELINE_BUFFER_SIZE = 1024 * 1024
+
+# How many buffers are in the ring. It bounds memory that a group
+# of in-process stages may use to PIPELINE_BUFFER_SIZE * PIPELINE_BUFFER_COUNT.
+PIPELINE_BUFFER_COUNT = 16
+
+
+class StageStats(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Counters of one pipeline stage.
+
+    :param name: Stage name.
+    :type name: str
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # Time the stage spent doing actual work.
+        self.busy_time = 0.0
+        # Time the stage waited for data from the upstream.
+        self.stall_time = 0.0
+        # Time the stage waited until the downstream consumes its output.
+        self.backpressure_time = 0.0
+        self.started = None
+        self.finished = None
+
+    @property
+    def wall_time(self):
+        """Time in seconds between the stage start and finish."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def throughput(self):
+        """Output bytes per second."""
+        if not self.wall_time:
+            return 0.0
+        return self.bytes_out / self.wall_time
+
+    def __str__(self):
+        return (
+            "%s: in %d bytes, out %d bytes, wall %.3f s, busy %.3f s, stall %.3f s, backpressure %.3f s, %.1f B/s"
+            % (
+                self.name,
+                self.bytes_in,
+                self.bytes_out,
+                self.wall_time,
+                self.busy_time,
+                self.stall_time,
+                self.backpressure_time,
+                self.throughput,
+            )
+        )
+
+
+class BufferRing(object):
+    """
+    A fixed set of reusable buffers that circulate between a producer
+    and a consumer. The producer acquires a free buffer, fills it
+    and puts it. The consumer gets the filled buffer and releases it
+    when the data is written downstream. Because the number of buffers
+    is fixed a slow consumer stops the producer.
+
+    :param count: Number of buffers.
+    :type count: int
+    :param size: Size of each buffer in bytes.
+    :type size: int
+    """
+
+    def __init__(self, count=PIPELINE_BUFFER_COUNT, size=PIPELINE_BUFFER_SIZE):
+        self._free = Queue()
+        self._filled = Queue()
+        self._closed = False
+        for _ in range(count):
+            self._free.put(bytearray(size))
+
+    @property
+    def closed(self):
+        """True if the consumer doesn't want more data."""
+        return self._closed
+
+    def acquire(self):
+        """
+        Wait for a free buffer.
+
+        :return: Free buffer or None if the ring is closed.
+        :rtype: bytearray
+        """
+        buf = self._free.get()
+        if buf is None or self._closed:
+            return None
+        return buf
+
+    def release(self, buf):
+        """Return a consumed buffer to the ring."""
+        self._free.put(buf)
+
+    def put(self, buf, data):
+        """
+        Pass a filled buffer to the consumer.
+
+        :param buf: Buffer that must be released after the data is consumed.
+        :param data: Bytes to pass downstream. Usually a memoryview of buf.
+        """
+        self._filled.put((buf, data, None))
+
+    def put_eof(self, error=None):
+        """Tell the consumer there will be no more data."""
+        self._filled.put((None, None, error))
+
+    def get(self):
+        """
+        Wait for a filled buffer.
+
+        :return: tuple (buffer, data). The data is None at the end of stream.
+        :rtype: tuple
+        :raise ModifierException: if the producer failed.
+        """
+        buf, data, error = self._filled.get()
+        if error is not None:
+            raise ModifierException(error)
+        return buf, data
+
+    def close(self):
+        """Stop the producer."""
+        self._closed = True
+        self._free.put(None)
+
+
+class RingReader(io.RawIOBase):
+    """
+    File-like object that reads the output of in-process stages
+    straight from a buffer ring.
+
+    :param ring: Buffer ring to read from.
+    :type ring: BufferRing
+    """
+
+    def __init__(self, ring):
+        super(RingReader, self).__init__()
+        self._ring = ring
+        self._buf = None
+        self._data = None
+        self._offset = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        view = memoryview(b).cast("B")
+        if not self._next():
+            return 0
+        offset = self._offset
+        length = min(len(view), len(self._data) - offset)
+        end = offset + length
+        view[:length] = self._data[offset:end]
+        self._offset += length
+        return length
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes. Unlike raw files it returns less than
+        size bytes only at the end of stream.
+        """
+        if size is None or size < 0:
+            return self.readall()
+
+        chunks = []
+        remaining = size
+        while remaining > 0 and self._next():
+            offset = self._offset
+            end = offset + remaining
+            chunk = self._data[offset:end]
+            self._offset += len(chunk)
+            remaining -= len(chunk)
+            chunks.append(bytes(chunk))
+        return b"".join(chunks)
+
+    def _next(self):
+        """Make sure there is unread data. Return False at the end of stream."""
+        if self._data is not None and self._offset < len(self._data):
+            return True
+
+        if self._buf is not None:
+            self._ring.release(self._buf)
+            self._buf = None
+            self._data = None
+
+        while not self._eof:
+            self._buf, self._data = self._ring.get()
+            if self._data is None:
+                self._eof = True
+                break
+            self._offset = 0
+            if len(self._data):
+                return True
+            self._ring.release(self._buf)
+            self._buf = None
+
+        return False
+
+
+class Pipeline(object):
+    """
+    Pipeline runs a chain of modifiers over an input stream.
+
+    The pipeline wires stages by itself, so modifiers added to the pipeline
+    may be created with ``None`` as the input stream.
+
+    :param input_stream: Context manager that yields the input stream
+        (e.g. what ``source.get_stream()`` returns).
+    :param modifiers: List of modifiers. They're applied in the order given.
+    :type modifiers: list(Modifier)
+    :param buffer_size: Size of a buffer in the ring.
+    :type buffer_size: int
+    :param buffer_count: Number of buffers in the ring.
+    :type buffer_count: int
+    :param pipe_output: If True the output stream is always a pipe,
+        so it can be passed to an external tool.
+    :type pipe_output: bool
+    """
+
+    def __init__(
+        self,
+        input_stream,
+        modifiers=None,
+        buffer_size=PIPELINE_BUFFER_SIZE,
+        buffer_count=PIPELINE_BUFFER_COUNT,
+        pipe_output=False,
+    ):
+        self._input = input_stream
+        self._pipe_output = pipe_output
+        self._modifiers = []
+        self._stats = []
+        self._buffer_size = buffer_size
+        self._buffer_count = buffer_count
+        for modifier in modifiers or []:
+            self.add(modifier)
+
+    @property
+    def modifiers(self):
+        """List of modifiers in the pipeline."""
+        return self._modifiers
+
+    @property
+    def stats(self):
+        """
+        List of stage counters. It's populated when the stream is consumed.
+
+        :rtype: list(StageStats)
+        """
+        return self._stats
+
+    def add(self, modifier):
+        """
+        Append a modifier to the pipeline.
+
+        :param modifier: Modifier instance.
+        :type modifier: Modifier
+        :return: The pipeline, so calls can be chained.
+        :rtype: Pipeline
+        """
+        self._modifiers.append(modifier)
+        return self
+
+    @contextmanager
+    def get_stream(self):
+        """
+        Run all stages and yield the output stream.
+
+        :return: output stream handle
+        """
+        # Stages start from the tail, but counters are listed in the pipeline order
+        self._stats = [StageStats(modifier.stage_name) for modifier in self._modifiers]
+        stream = self._input
+        groups = self._groups()
+        first = 0
+        for i, (in_process, modifiers) in enumerate(groups):
+            last = first + len(modifiers)
+            stats = self._stats[first:last]
+            first = last
+            if in_process:
+                stream = self._run_in_process(
+                    stream,
+                    modifiers,
+                    stats,
+                    tail=i == len(groups) - 1 and not self._pipe_output,
+                )
+            else:
+                for modifier, stage in zip(modifiers, stats):
+                    modifier.input = stream
+                    stream = self._run_external(modifier, stage)
+
+        with stream as output:
+            yield output
+
+        for stats in self._stats:
+            LOG.debug("Pipeline stage %s", stats)
+
+    def _groups(self):
+        """
+        Split modifiers into groups of consecutive in-process
+        and external stages.
+
+        :return: list of tuples (in_process, [modifiers])
+        :rtype: list
+        """
+        groups = []
+        for modifier in self._modifiers:
+            if groups and groups[-1][0] == modifier.in_process:
+                groups[-1][1].append(modifier)
+            else:
+                groups.append((modifier.in_process, [modifier]))
+        return groups
+
+    @contextmanager
+    def _run_external(self, modifier, stats):
+        stats.started = time.time()
+        try:
+            with modifier.get_stream() as output:
+                yield output
+        finally:
+            stats.finished = time.time()
+            # An external process waits on both its pipes.
+            # Its time off CPU is accounted as the stall time.
+            if modifier.process_stats:
+                stats.bytes_in = modifier.process_stats["bytes_in"]
+                stats.bytes_out = modifier.process_stats["bytes_out"]
+                stats.busy_time = modifier.process_stats["cpu_time"]
+                stats.stall_time = max(0.0, stats.wall_time - stats.busy_time)
+
+    @contextmanager
+    def _run_in_process(self, input_stream, modifiers, stats, tail=False):
+        """
+        Run in-process modifiers in a pump thread.
+
+        :param input_stream: Upstream context manager.
+        :param modifiers: In-process modifiers.
+        :param stats: Counters of the modifiers.
+        :param tail: If True the group is the last one in the pipeline.
+            Then it yields a file-like object that reads from the ring.
+            Otherwise it yields a read end of a pipe, because the next
+            stage is an external process that needs a file descriptor.
+        """
+        ring = BufferRing(count=self._buffer_count, size=self._buffer_size)
+        errors = []
+
+        with input_stream as handle:
+            threads = [
+                Thread(
+                    target=self._pump,
+                    args=(handle, modifiers, stats, ring),
+                    name="pipeline_pump",
+                    daemon=True,
+                )
+            ]
+            if tail:
+                output = RingReader(ring)
+            else:
+                read_fd, write_fd = os.pipe()
+                output = os.fdopen(read_fd, "rb")
+                threads.append(
+                    Thread(
+                        target=self._drain,
+                        args=(ring, write_fd, stats[-1], errors),
+                        name="pipeline_drain",
+                        daemon=True,
+                    )
+                )
+            for thread in threads:
+                thread.start()
+            try:
+                yield output
+            finally:
+                # If the consumer quit early the pump must not wait
+                # for free buffers forever.
+                output.close()
+                ring.close()
+                for thread in threads:
+                    thread.join()
+        if errors:
+            raise ModifierException(errors[0])
+
+    @staticmethod
+    def _pump(handle, modifiers, stats, ring):
+        """Read the input stream into the ring applying in-process modifiers."""
+        error = None
+        read_into = _reader(handle)
+        for stage in stats:
+            stage.started = time.time()
+        try:
+            for modifier in modifiers:
+                modifier.begin()
+            while True:
+                started = time.time()
+                buf = ring.acquire()
+                stats[-1].backpressure_time += time.time() - started
+                if buf is None:
+                    break
+
+                started = time.time()
+                length = _fill(read_into, buf)
+                stats[0].stall_time += time.time() - started
+                if not length:
+                    ring.release(buf)
+                    break
+
+                data = memoryview(buf)[:length]
+                ring.put(buf, _apply(modifiers, stats, data))
+
+            if not ring.closed:
+                _flush(modifiers, stats, ring)
+
+        except Exception as err:  # pylint: disable=broad-except
+            LOG.error("In-process pipeline stage failed: %s", err)
+            error = err
+        finally:
+            for modifier in modifiers:
+                try:
+                    modifier.end()
+                except (IOError, OSError, ModifierException) as err:
+                    LOG.error("Failed to finish %s: %s", modifier.__class__.__name__, err)
+                    error = error or err
+            for stage in stats:
+                stage.finished = time.time()
+            ring.put_eof(error)
+
+    @staticmethod
+    def _drain(ring, write_fd, stats, errors):
+        """Write the ring content into a pipe for the next external stage."""
+        try:
+            while True:
+                buf, data = ring.get()
+                if data is None:
+                    break
+                started = time.time()
+                view = memoryview(data)
+                while view:
+                    written = os.write(write_fd, view)
+                    view = view[written:]
+                stats.backpressure_time += time.time() - started
+                ring.release(buf)
+        except Exception as err:  # pylint: disable=broad-except
+            errors.append(err)
+            ring.close()
+        finally:
+            os.close(write_fd)
+
+
+def _apply(modifiers, stats, data):
+    """Pass data through in-process modifiers updating their counters."""
+    for modifier, stage in zip(modifiers, stats):
+        stage.bytes_in += len(data)
+        started = time.time()
+        data = modifier.modify(data)
+        stage.busy_time += time.time() - started
+        stage.bytes_out += len(data)
+    return data
+
+
+def _flush(modifiers, stats, ring):
+    """
+    The input is over. Let stages that hold back data (e.g. a compressor
+    waiting for a full block) pass the rest downstream.
+    """
+    for i, modifier in enumerate(modifiers):
+        started = time.time()
+        data = modifier.flush()
+        stats[i].busy_time += time.time() - started
+        stats[i].bytes_out += len(data)
+        following = i + 1
+        data = _apply(modifiers[following:], stats[following:], data)
+        if data:
+            buf = ring.acquire()
+            if buf is None:
+                return
+            ring.put(buf, data)
+
+
+def _reader(handle):
+    """
+    Return a function that reads from the handle into a buffer.
+    If the handle has a file descriptor the data is read directly
+    into the buffer, bypassing any Python level buffering.
+    """
+    if isinstance(handle, int):
+        return lambda view: os.readv(handle, [view])
+    try:
+        fileno = handle.fileno()
+        return lambda view: os.readv(fileno, [view])
+    except (AttributeError, io.UnsupportedOperation, OSError):
+        pass
+    if hasattr(handle, "readinto"):
+        return handle.readinto
+
+    def _read_into(view):
+        chunk = handle.read(len(view))
+        view[: len(chunk)] = chunk
+        return len(chunk)
+
+    return _read_into
+
+
+def _fill(read_into, buf):
+    """Fill the buffer until it's full or the stream ends. Return number of bytes read."""
+    view = memoryview(buf)
+    length = 0
+    while length < len(view):
+        count = read_into(view[length:])
+        if not count:
+            break
+        length += count
+    return length
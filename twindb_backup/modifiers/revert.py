@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Module defines a restore pipeline that reverts modifiers of a backup copy.
+
+The backup pipeline appends a suffix per modifier to the copy name,
+e.g. ``mysql-2023-01-01_00_00_00.xbstream.gz.gpg``. The restore pipeline
+reads the suffixes from the end and reverts the modifiers in the opposite
+order. Every stage is a process, so decryption, decompression and the
+download run concurrently, each limited by its pipe buffer.
+"""
+import shutil
+from contextlib import contextmanager
+
+from twindb_backup import LOG
+from twindb_backup.modifiers.base import Modifier
+from twindb_backup.modifiers.bzip2 import Bzip2
+from twindb_backup.modifiers.exceptions import ModifierException
+from twindb_backup.modifiers.gpg import Gpg
+from twindb_backup.modifiers.gzip import Gzip
+from twindb_backup.modifiers.lbzip2 import Lbzip2
+from twindb_backup.modifiers.pigz import DEFAULT_THREADS, Pigz
+from twindb_backup.modifiers.pipeline import Pipeline
+from twindb_backup.modifiers.zstd import Zstd
+
+
+class Revert(Modifier):
+    """
+    Revert() un-applies another modifier. It lets a :class:`Pipeline`
+    run ``revert_stream()`` of the modifier as a stage with counters.
+
+    :param modifier: Modifier to revert.
+    :type modifier: Modifier
+    """
+
+    def __init__(self, modifier):
+        super(Revert, self).__init__(modifier.input)
+        self._modifier = modifier
+
+    @property
+    def modifier(self):
+        """Reverted modifier."""
+        return self._modifier
+
+    @property
+    def stage_name(self):
+        return self._modifier.stage_name
+
+    @property
+    def in_process(self):
+        return False
+
+    @contextmanager
+    def get_stream(self):
+        self._modifier.input = self._input
+        with self._modifier.revert_stream() as output:
+            yield output
+        self.process_stats = self._modifier.process_stats
+
+
+def _decompressor(suffix, compression, threads):
+    if suffix == ".gz":
+        # pigz decompresses in one thread, but reads, writes
+        # and checks the checksum in separate threads.
+        return Pigz(None, threads=threads) if shutil.which("pigz") else Gzip(None)
+    if suffix == ".bz":
+        return Lbzip2(None, threads=threads) if shutil.which("lbzip2") else Bzip2(None)
+    long_window = compression.long_window if compression and compression.program == "zstd" else None
+    return Zstd(None, long_window=long_window)
+
+
+REVERT_SUFFIXES = (".gpg", ".gz", ".bz", ".zst")
+
+
+def revert_modifiers(name, compression=None, gpg=None):
+    """
+    Build modifiers that restore a copy from its name suffixes.
+
+    :param name: Copy name or key, e.g. ``mysql-2023-01-01_00_00_00.xbstream.gz.gpg``.
+    :type name: str
+    :param compression: Compression configuration. Threads and the zstd window
+        are taken from it.
+    :type compression: CompressionConfig
+    :param gpg: GPG configuration. Required if the copy is encrypted.
+    :type gpg: GPGConfig
+    :return: Revert stages in the order they're applied.
+    :rtype: list(Revert)
+    :raise ModifierException: if the copy is encrypted and gpg isn't configured.
+    """
+    threads = (compression.threads if compression else None) or max(1, DEFAULT_THREADS)
+    modifiers = []
+    while name.endswith(REVERT_SUFFIXES):
+        name, extension = name.rsplit(".", 1)
+        suffix = "." + extension
+        if suffix == ".gpg":
+            if gpg is None:
+                raise ModifierException("Copy is encrypted, but the [gpg] section is not configured")
+            modifiers.append(Gpg(None, gpg.recipient, gpg.keyring, secret_keyring=gpg.secret_keyring))
+        else:
+            modifiers.append(_decompressor(suffix, compression, threads))
+    LOG.debug("Restore stages of %s: %s", name, [m.stage_name for m in modifiers])
+    return [Revert(modifier) for modifier in modifiers]
+
+
+def revert_pipeline(stream, name, compression=None, gpg=None):
+    """
+    Build a pipeline that restores a copy streamed from a destination.
+
+    :param stream: Context manager that yields the downloaded copy.
+    :param name: Copy name or key.
+    :type name: str
+    :param compression: Compression configuration.
+    :type compression: CompressionConfig
+    :param gpg: GPG configuration.
+    :type gpg: GPGConfig
+    :return: Pipeline. Its ``get_stream()`` yields a pipe with the restored stream.
+    :rtype: Pipeline
+    """
+    return Pipeline(stream, revert_modifiers(name, compression=compression, gpg=gpg), pipe_output=True)
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Module defines a modifier that limits the stream bandwidth.
+
+All throttled streams take tokens from one :class:`TokenBucket`.
+The tokens are kept in a state file, so uploads and downloads
+of concurrent processes - a backup, a restore and the binlog follower -
+together never exceed the configured rate.
+"""
+import fcntl
+import os
+import re
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from twindb_backup import LOG
+from twindb_backup.modifiers.base import Modifier
+from twindb_backup.modifiers.exceptions import ModifierException
+from twindb_backup.modifiers.pipeline import Pipeline
+
+RATE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+RATE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:B|B/S)?\s*$", re.IGNORECASE)
+SCHEDULE_PATTERN = re.compile(r"^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})=(\S+)$")
+BANDWIDTH_STATE_FILE = "/var/run/twindb-backup/bandwidth.state"
+# Tokens left and the monotonic time they were counted at
+_STATE_FORMAT = struct.Struct("dd")
+
+_SHARED_BUCKETS = {}
+_SHARED_BUCKETS_LOCK = threading.Lock()
+
+
+def parse_rate(value):
+    """
+    Parse a rate like ``10M`` to bytes per second.
+
+    :param value: Rate in bytes per second with an optional
+        K, M or G suffix. Zero means unlimited.
+    :type value: str
+    :return: Rate in bytes per second.
+    :rtype: int
+    :raise ModifierException: if the rate is invalid.
+    """
+    match = RATE_PATTERN.match(str(value))
+    if not match:
+        raise ModifierException("Invalid rate %r" % value)
+    return int(float(match.group(1)) * RATE_UNITS[match.group(2).upper()])
+
+
+def parse_schedule(value):
+    """
+    Parse time-of-day rate windows like ``09:00-18:00=10M 22:00-06:00=0``.
+    A window may wrap around midnight.
+
+    :param value: Space separated windows.
+    :type value: str
+    :return: List of tuples (start minute, end minute, rate).
+    :rtype: list
+    :raise ModifierException: if a window is invalid.
+    """
+    schedule = []
+    for window in (value or "").split():
+        match = SCHEDULE_PATTERN.match(window)
+        if not match:
+            raise ModifierException("Invalid schedule window %r" % window)
+        start_hour, start_minute, end_hour, end_minute = [int(x) for x in match.groups()[:4]]
+        if start_hour > 23 or end_hour > 24 or start_minute > 59 or end_minute > 59:
+            raise ModifierException("Invalid schedule window %r" % window)
+        schedule.append((start_hour * 60 + start_minute, end_hour * 60 + end_minute, parse_rate(match.group(5))))
+    return schedule
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket. A token is one byte.
+
+    The bucket refills at ``rate`` tokens per second and holds
+    at most ``burst`` tokens. During a schedule window the window's rate
+    is used instead. Zero rate means no limit.
+
+    With ``state_file`` the tokens are stored in the file and
+    every process that uses the same file takes tokens from the same
+    bucket. The file is locked with ``flock()`` while tokens are taken.
+    If the file can't be opened the bucket is local to the process.
+    Counters are always local to the process.
+
+    :param rate: Bytes per second.
+    :type rate: int
+    :param burst: Bucket size in bytes. One second worth of rate by default.
+    :type burst: int
+    :param schedule: List of tuples (start minute, end minute, rate).
+    :type schedule: list
+    :param state_file: File shared by processes or None
+        for a bucket of this process only.
+    :type state_file: str
+    """
+
+    def __init__(self, rate, burst=None, schedule=None, state_file=None):
+        self._rate = rate
+        self._burst = burst
+        self._schedule = schedule or []
+        self._state_file = state_file
+        self._state_fd = None
+        self._lock = threading.Lock()
+        self._tokens = None
+        self._updated = time.monotonic()
+        self._bytes = 0
+        self._throttled_time = 0.0
+        self._started = time.time()
+
+    @classmethod
+    def shared(cls, rate, burst=None, schedule=None, state_file=BANDWIDTH_STATE_FILE):
+        """
+        Return the bucket all streams share. Buckets with the same settings
+        are the same object in a process and share ``state_file``
+        with other processes.
+        """
+        key = (rate, burst, tuple(schedule or []), state_file)
+        with _SHARED_BUCKETS_LOCK:
+            if key not in _SHARED_BUCKETS:
+                _SHARED_BUCKETS[key] = cls(rate, burst=burst, schedule=schedule, state_file=state_file)
+            return _SHARED_BUCKETS[key]
+
+    @property
+    def rate(self):
+        """Current rate in bytes per second, zero if unlimited."""
+        now = time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        for start, end, rate in self._schedule:
+            if start <= minute < end or (end <= start and (minute >= start or minute < end)):
+                return rate
+        return self._rate
+
+    @property
+    def counters(self):
+        """
+        Throughput counters.
+
+        :return: Dictionary with bytes passed through the bucket,
+            seconds streams waited for tokens and average throughput
+            in bytes per second.
+        :rtype: dict
+        """
+        with self._lock:
+            elapsed = time.time() - self._started
+            return {
+                "bytes": self._bytes,
+                "throttled_time": self._throttled_time,
+                "throughput": self._bytes / elapsed if elapsed > 0 else 0.0,
+            }
+
+    def consume(self, count):
+        """
+        Take ``count`` tokens, waiting until the bucket has them.
+
+        :param count: Number of bytes to send.
+        :type count: int
+        """
+        remaining = count
+        while remaining > 0:
+            wait, taken = self._take(remaining)
+            remaining -= taken
+            if wait > 0:
+                time.sleep(wait)
+
+    def _take(self, count):
+        """
+        Take as many tokens as available but not more than count.
+
+        :return: tuple (seconds to wait before the next attempt, tokens taken).
+        """
+        with self._lock:
+            rate = self.rate
+            if not rate:
+                self._bytes += count
+                return 0, count
+
+            burst = self._burst or rate
+            with self._state() as state:
+                tokens, updated = state
+                now = time.monotonic()
+                # The monotonic clock starts over after a reboot
+                if tokens is None or updated > now:
+                    tokens = burst
+                tokens = min(burst, tokens + (now - updated) * rate)
+                taken = int(min(count, tokens))
+                tokens -= taken
+                state[:] = [tokens, now]
+
+            self._bytes += taken
+            if taken == count:
+                return 0, taken
+
+            wait = (min(count - taken, burst) - tokens) / rate
+            self._throttled_time += wait
+            return wait, taken
+
+    @contextmanager
+    def _state(self):
+        """
+        Lock the bucket state and yield it as a list [tokens, updated].
+        Tokens are None if the bucket is new. The caller updates the list
+        in place, the new state is saved when the context exits.
+        """
+        state_fd = self._open_state()
+        if state_fd is None:
+            state = [self._tokens, self._updated]
+            yield state
+            self._tokens, self._updated = state
+            return
+
+        fcntl.flock(state_fd, fcntl.LOCK_EX)
+        try:
+            content = os.pread(state_fd, _STATE_FORMAT.size, 0)
+            state = list(_STATE_FORMAT.unpack(content)) if len(content) == _STATE_FORMAT.size else [None, 0.0]
+            yield state
+            os.pwrite(state_fd, _STATE_FORMAT.pack(*state), 0)
+        finally:
+            fcntl.flock(state_fd, fcntl.LOCK_UN)
+
+    def _open_state(self):
+        if self._state_file and self._state_fd is None:
+            try:
+                os.makedirs(os.path.dirname(self._state_file), exist_ok=True)
+                self._state_fd = os.open(self._state_file, os.O_RDWR | os.O_CREAT, 0o600)
+            except OSError as err:
+                LOG.warning("Bandwidth limit is not shared with other processes: %s", err)
+                self._state_file = None
+        return self._state_fd
+
+
+class Throttle(Modifier):
+    """
+    Throttle() limits the stream bandwidth. It doesn't alter the stream.
+
+    :param input_stream: Input stream.
+    :param bucket: Token bucket to take tokens from.
+    :type bucket: TokenBucket
+    """
+
+    def __init__(self, input_stream, bucket):
+        super(Throttle, self).__init__(input_stream)
+        self._bucket = bucket
+
+    def modify(self, chunk):
+        self._bucket.consume(len(chunk))
+        return chunk
+
+
+def throttle_stream(stream, bucket):
+    """
+    Throttle a stream that e.g. ``destination.get_stream()`` returns.
+
+    :param stream: Context manager that yields the input stream.
+    :param bucket: Token bucket or None if the stream isn't throttled.
+    :type bucket: TokenBucket
+    :return: Context manager that yields the throttled stream.
+        It's backed by a pipe, so external tools may read it.
+    """
+    if bucket is None:
+        return stream
+    LOG.debug("Throttling stream at %d B/s", bucket.rate)
+    return Pipeline(stream, [Throttle(None, bucket)], pipe_output=True).get_stream()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Module defines modifier that compresses a stream with zstd
+"""
+from twindb_backup.modifiers.parallel_compressor import ParallelCompressor
+
+# zstd -T0 starts as many threads as there are cores
+DEFAULT_THREADS = 0
+DEFAULT_LEVEL = 3
+# Levels above this need --ultra
+ZSTD_MAX_REGULAR_LEVEL = 19
+
+
+class Zstd(ParallelCompressor):
+    """
+    Modifier that compresses the input_stream with zstd.
+    """
+
+    def __init__(
+        self,
+        input_stream,
+        threads=DEFAULT_THREADS,
+        level=DEFAULT_LEVEL,
+        long_window=None,
+        rsyncable=False,
+    ):  # pylint: disable=too-many-arguments
+        """
+        Modifier that uses zstd compression
+
+        :param input_stream: Input stream. Must be file object
+        :param threads: number of threads to use (0 - one per core)
+        :type threads: int
+        :param level: compression level from 1 to 22 (fastest to best)
+        :type level: int
+        :param long_window: enable long distance matching with a window
+            of 2 ** long_window bytes. Zero means the zstd default window (128MB).
+            None disables long distance matching.
+        :type long_window: int
+        :param rsyncable: make the output friendly to deduplication
+        :type rsyncable: bool
+        """
+        super(Zstd, self).__init__(
+            input_stream,
+            program="zstd",
+            threads=threads,
+            level=level,
+            suffix=".zst",
+            rsyncable=rsyncable,
+        )
+        self._long_window = long_window
+
+    @property
+    def _long_option(self):
+        if self._long_window is None:
+            return []
+        if self._long_window:
+            return ["--long={0}".format(self._long_window)]
+        return ["--long"]
+
+    @property
+    def _modifier_cmd(self):
+        """get compression program cmd"""
+        cmd = [self._program, "-q"]
+        if self._level > ZSTD_MAX_REGULAR_LEVEL:
+            cmd.append("--ultra")
+        cmd += ["-{0}".format(self._level), "-T{0}".format(self._threads)] + self._long_option
+        if self._rsyncable:
+            cmd.append("--rsyncable")
+        return cmd + ["-c", "-"]
+
+    @property
+    def _unmodifier_cmd(self):
+        """get decompression program cmd"""
+        # A stream compressed with a window larger than 128MB
+        # can only be decompressed with the same --long option.
+        return [self._program, "-q", "-d"] + self._long_option + ["-c"]
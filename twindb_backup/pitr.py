@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Module that restores MySQL to a point in time.
+
+A point-in-time restore starts from the nearest full or incremental copy
+taken before the target. Then binlogs from the copy's binlog coordinates
+up to the target are converted by ``mysqlbinlog`` into a SQL file
+that is replayed after MySQL starts on the restored datadir.
+
+Binlogs are chosen with the indexes stored next to binlog copies,
+so only the binlogs that are needed are downloaded.
+
+If ``binlog-follow`` ships the active binlog, the binlog after the last
+closed one is rebuilt from its segments and replayed after the closed
+binlogs, so the recovery reaches the last shipped event.
+"""
+import os
+import re
+import shutil
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import path as osp
+from subprocess import PIPE, Popen
+
+from twindb_backup import LOG
+from twindb_backup.copy.binlog_copy import BinlogCopy
+from twindb_backup.destination.exceptions import DestinationError, FileNotFound
+from twindb_backup.exceptions import TwinDBBackupError
+from twindb_backup.modifiers.exceptions import ModifierException
+from twindb_backup.modifiers.throttle import throttle_stream
+from twindb_backup.restore import bandwidth_bucket, restore_from_mysql, restore_pipeline
+from twindb_backup.source.binlog_source import BinlogIndex
+from twindb_backup.source.exceptions import BinlogSourceError
+from twindb_backup.status.binlog_status import BinlogStatus
+from twindb_backup.status.mysql_status import MySQLStatus
+
+MYSQLBINLOG_BINARY = "mysqlbinlog"
+PITR_PREFETCH_WORKERS = 4
+# Same format as mysqlbinlog --stop-datetime accepts
+PITR_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# e.g. master1/binlog/mysql-bin.000005.seg-0000000000004096.gz
+SEGMENT_PATTERN = re.compile(r"(?:^|/)(?P<binlog>[^/]+)\.seg-(?P<offset>\d{16})[^/]*$")
+GTID_PATTERN = re.compile(r"^([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}):(\d+)$")
+
+
+class RecoveryTarget:
+    """
+    Point in time to restore to.
+
+    :param until: Local time as ``YYYY-MM-DD HH:MM:SS``
+        or a GTID as ``server_uuid:number``.
+        The transaction with the given GTID is restored.
+    :type until: str
+    :raise TwinDBBackupError: if the target is neither a time nor a GTID.
+    """
+
+    def __init__(self, until):
+        self.until = until.strip()
+        self.timestamp = None
+        self.gtid = None
+
+        match = GTID_PATTERN.match(self.until)
+        if match:
+            self.gtid = (match.group(1).lower(), int(match.group(2)))
+            return
+        try:
+            self.timestamp = int(time.mktime(time.strptime(self.until, PITR_DATETIME_FORMAT)))
+        except ValueError as err:
+            raise TwinDBBackupError(
+                f"Recovery target must be a time as '{PITR_DATETIME_FORMAT}' or a GTID, got '{until}'"
+            ) from err
+
+    def __str__(self):
+        return self.until
+
+    def mysqlbinlog_args(self, last_binlog):
+        """
+        ``mysqlbinlog`` options that stop the replay at the target.
+
+        A GTID target stops where the next transaction starts in the last binlog,
+        so transactions of any server after the target aren't replayed.
+
+        :param last_binlog: Path to the last binlog to replay.
+        :type last_binlog: str
+        :rtype: list
+        :raise TwinDBBackupError: if the GTID isn't in the last binlog.
+        """
+        if self.timestamp is not None:
+            return [f"--stop-datetime={self.until}"]
+
+        try:
+            position = BinlogIndex.gtid_stop_position(last_binlog, self.gtid)
+        except BinlogSourceError as err:
+            raise TwinDBBackupError(err) from err
+        if position is None:
+            raise TwinDBBackupError(f"GTID {self} is not found in {last_binlog}")
+        return [f"--stop-position={position}"]
+
+
+def choose_base_copy(mysql_status, target, binlog=None):
+    """
+    Find the latest MySQL copy to start the recovery from.
+
+    :param mysql_status: MySQL status.
+    :type mysql_status: MySQLStatus
+    :param target: Recovery target.
+    :type target: RecoveryTarget
+    :param binlog: For a GTID target, name of the binlog
+        with the target transaction.
+    :type binlog: str
+    :return: Backup copy.
+    :rtype: MySQLCopy
+    :raise TwinDBBackupError: if no copy was taken before the target.
+    """
+    candidates = []
+    for copy in mysql_status:
+        if not copy.binlog or copy.position is None:
+            continue
+        if target.timestamp is not None and copy.backup_finished and copy.backup_finished <= target.timestamp:
+            candidates.append(copy)
+        elif binlog is not None and copy.binlog < binlog:
+            candidates.append(copy)
+    if not candidates:
+        raise TwinDBBackupError(f"There is no MySQL copy with binlog coordinates taken before {target}")
+    return max(candidates, key=lambda copy: (copy.binlog, int(copy.position)))
+
+
+def _binlog_number(name):
+    return int(name.rsplit(".", 1)[1])
+
+
+def _read_index(dst, binlog_copy):
+    try:
+        return BinlogIndex.from_json(dst.read(binlog_copy.index_key))
+    except (FileNotFound, FileNotFoundError):
+        LOG.warning("Binlog %s has no index", binlog_copy.name)
+        return None
+
+
+def binlogs_to_apply(binlog_status, dst, target, start_binlog=None, active=None):
+    """
+    Choose binlog copies that must be replayed to reach the target.
+
+    :param binlog_status: Binlog status.
+    :type binlog_status: BinlogStatus
+    :param dst: Destination where binlog copies and their indexes are stored.
+    :type dst: BaseDestination
+    :param target: Recovery target.
+    :type target: RecoveryTarget
+    :param start_binlog: Binlog the recovery starts from.
+        If None, binlogs are scanned from the first one.
+    :type start_binlog: str
+    :param active: The active binlog rebuilt from segments and its index.
+        It goes after the closed binlogs.
+    :type active: tuple(BinlogCopy, BinlogIndex)
+    :return: List of (binlog copy, binlog index) tuples in binlog order.
+        The index is None if the copy doesn't have one.
+    :rtype: list
+    :raise TwinDBBackupError: if binlogs are missing or the target isn't found.
+    """
+    copies = sorted(binlog_status, key=lambda copy: copy.name)
+    if active is not None:
+        copies.append(active[0])
+    if start_binlog is not None:
+        copies = [copy for copy in copies if copy.name >= start_binlog]
+        if not copies or copies[0].name != start_binlog:
+            raise TwinDBBackupError(f"Binlog {start_binlog} is not in the backup")
+
+    binlogs = []
+    for binlog_copy in copies:
+        if binlogs and _binlog_number(binlog_copy.name) != _binlog_number(binlogs[-1][0].name) + 1:
+            raise TwinDBBackupError(f"Binlogs between {binlogs[-1][0].name} and {binlog_copy.name} are missing")
+
+        index = active[1] if active is not None and binlog_copy is active[0] else _read_index(dst, binlog_copy)
+        if target.timestamp is not None:
+            first_timestamp = index.first_timestamp if index else binlog_copy.created_at
+            if binlogs and first_timestamp is not None and first_timestamp > target.timestamp:
+                return binlogs
+            binlogs.append((binlog_copy, index))
+            if index and index.last_timestamp is not None and index.last_timestamp >= target.timestamp:
+                return binlogs
+        else:
+            binlogs.append((binlog_copy, index))
+            if index and index.contains_gtid(str(target)):
+                return binlogs
+
+    if target.gtid is not None:
+        raise TwinDBBackupError(f"GTID {target} is not found in the binlog backup")
+    LOG.warning("The last binlog copy ends before %s. Recovering as far as binlogs go.", target)
+    return binlogs
+
+
+def fetch_binlog(twindb_config, dst, binlog_copy, path):
+    """
+    Download a binlog copy, decrypt and decompress it.
+
+    :param twindb_config: Tool configuration.
+    :type twindb_config: TwinDBBackupConfig
+    :param dst: Destination with the binlog copy.
+    :type dst: BaseDestination
+    :param binlog_copy: Binlog copy.
+    :type binlog_copy: BinlogCopy
+    :param path: Save the binlog as this file.
+    :type path: str
+    """
+    suffix = binlog_copy.suffix
+    if suffix is None:
+        # The status was written before suffixes were recorded
+        suffix = twindb_config.compression.get_modifier(None).suffix + (".gpg" if twindb_config.gpg else "")
+    stored_copy = BinlogCopy(binlog_copy.host, binlog_copy.name + suffix, binlog_copy.created_at)
+
+    stream = throttle_stream(dst.get_stream(stored_copy), bandwidth_bucket(twindb_config, dst))
+    stream = restore_pipeline(twindb_config, stream, stored_copy.key).get_stream()
+
+    with stream as handler, open(path, "wb") as binlog:
+        shutil.copyfileobj(handler, binlog)
+    LOG.debug("Fetched %s", binlog_copy.key)
+
+
+def _active_segments(dst, binlog_status, hostname):
+    """
+    :return: Name of the first binlog after the closed ones that has segments
+        and its segments as (offset, name) in offset order.
+        (None, []) if there are no such segments.
+    :rtype: tuple
+    """
+    last_closed = max((copy.name for copy in binlog_status), default="")
+    segments = {}
+    for name in dst.list_files(f"{dst.remote_path}/{hostname}/binlog/", files_only=True):
+        match = SEGMENT_PATTERN.search(name)
+        if match and match.group("binlog") > last_closed:
+            segments.setdefault(match.group("binlog"), []).append((int(match.group("offset")), osp.basename(name)))
+    if not segments:
+        return None, []
+    binlog = min(segments)
+    return binlog, sorted(segments[binlog])
+
+
+def fetch_active_binlog(twindb_config, dst, binlog_status, hostname, path):  # pylint: disable=too-many-locals
+    """
+    Rebuild the active binlog from the segments ``binlog-follow`` shipped.
+    It's the binlog after the last closed one. Segments are downloaded
+    in offset order and appended to the file.
+
+    :param twindb_config: Tool configuration.
+    :type twindb_config: TwinDBBackupConfig
+    :param dst: Destination with the segments.
+    :type dst: BaseDestination
+    :param binlog_status: Binlog status with closed binlogs.
+    :type binlog_status: BinlogStatus
+    :param hostname: Host which binlogs to restore.
+    :type hostname: str
+    :param path: Directory where the binlog is saved.
+    :type path: str
+    :return: The active binlog copy and its index or None if there are no segments.
+    :rtype: tuple(BinlogCopy, BinlogIndex)
+    :raise TwinDBBackupError: if a segment is missing.
+    """
+    binlog, segments = _active_segments(dst, binlog_status, hostname)
+    if binlog is None:
+        return None
+
+    binlog_path = osp.join(path, binlog)
+    with open(binlog_path, "wb") as binlog_file:
+        for offset, name in segments:
+            if offset != binlog_file.tell():
+                raise TwinDBBackupError(
+                    f"Segments of {binlog} between positions {binlog_file.tell()} and {offset} are missing"
+                )
+            segment = BinlogCopy(hostname, name, 0)
+            stream = throttle_stream(dst.get_stream(segment), bandwidth_bucket(twindb_config, dst))
+            with restore_pipeline(twindb_config, stream, segment.key).get_stream() as handler:
+                shutil.copyfileobj(handler, binlog_file)
+            LOG.debug("Fetched %s", segment.key)
+    LOG.info("Rebuilt active binlog %s from %d segments", binlog, len(segments))
+
+    try:
+        index = BinlogIndex.build(binlog_path)
+    except BinlogSourceError as err:
+        raise TwinDBBackupError(err) from err
+    return BinlogCopy(hostname, binlog, index.first_timestamp or 0), index
+
+
+def replay_binlogs(binlog_paths, start_position, sql_path, stop_args):
+    """
+    Convert binlogs into SQL with ``mysqlbinlog``.
+
+    :param binlog_paths: Binlog files in binlog order.
+    :type binlog_paths: list
+    :param start_position: Position in the first binlog to start from.
+    :type start_position: int
+    :param sql_path: Save SQL in this file.
+    :type sql_path: str
+    :param stop_args: ``mysqlbinlog`` options that set where to stop.
+    :type stop_args: list
+    :raise TwinDBBackupError: if mysqlbinlog fails.
+    """
+    cmd = [MYSQLBINLOG_BINARY, f"--start-position={start_position}"] + stop_args + binlog_paths
+    LOG.debug("Running %s", " ".join(cmd))
+    try:
+        with open(sql_path, "wb") as sql_file, Popen(cmd, stdout=sql_file, stderr=PIPE) as proc:
+            _, cerr = proc.communicate()
+    except OSError as err:
+        raise TwinDBBackupError(f"Failed to run {MYSQLBINLOG_BINARY}: {err}") from err
+    if proc.returncode:
+        raise TwinDBBackupError(f"{MYSQLBINLOG_BINARY} exited with code {proc.returncode}: {cerr}")
+
+
+def restore_to_point_in_time(
+    twindb_config,
+    until,
+    dst_dir,
+    copy=None,
+    hostname=None,
+    tmp_dir=None,
+    cache=None,
+):  # pylint: disable=too-many-arguments,too-many-locals
+    """
+    Restore MySQL datadir and prepare SQL that rolls it forward to a point in time.
+
+    Binlogs are downloaded by a pool of threads while the base copy is restored.
+
+    :param twindb_config: Tool configuration.
+    :type twindb_config: TwinDBBackupConfig
+    :param until: Recovery target. See :class:`RecoveryTarget`.
+    :type until: str
+    :param dst_dir: Destination directory. Must exist and be empty.
+    :type dst_dir: str
+    :param copy: Base copy. If None, the nearest copy before the target is used.
+    :type copy: MySQLCopy
+    :param hostname: Host which backups to restore. By default the copy host
+        or the local host.
+    :type hostname: str
+    :param tmp_dir: Path to temp directory.
+    :type tmp_dir: str
+    :param cache: Local cache object.
+    :type cache: Cache
+    :return: Path to the SQL file to replay.
+    :rtype: str
+    :raise TwinDBBackupError: if the target can't be reached.
+    """
+    target = RecoveryTarget(until)
+    hostname = hostname or (copy.host if copy else None) or socket.gethostname()
+    dst = twindb_config.destination(backup_source=hostname)
+    mysql_status = MySQLStatus(dst=dst, status_directory=hostname, cache=dst.status_cache)
+    binlog_status = BinlogStatus(dst=dst, status_directory=hostname, cache=dst.status_cache)
+
+    work_dir = tempfile.mkdtemp(dir=tmp_dir)
+    try:
+        active = fetch_active_binlog(twindb_config, dst, binlog_status, hostname, work_dir)
+        if copy is None:
+            target_binlog = None
+            if target.gtid is not None:
+                target_binlog = binlogs_to_apply(binlog_status, dst, target, active=active)[-1][0].name
+            copy = choose_base_copy(mysql_status, target, binlog=target_binlog)
+        elif not copy.binlog or copy.position is None:
+            raise TwinDBBackupError(f"Copy {copy.key} has no binlog coordinates")
+        LOG.info("Restoring %s and rolling it forward to %s", copy.key, target)
+
+        binlogs = binlogs_to_apply(binlog_status, dst, target, start_binlog=copy.binlog, active=active)
+        LOG.info("Binlogs to apply: %s", ", ".join(binlog_copy.name for binlog_copy, _ in binlogs))
+
+        binlog_paths = [osp.join(work_dir, binlog_copy.name) for binlog_copy, _ in binlogs]
+        with ThreadPoolExecutor(max_workers=PITR_PREFETCH_WORKERS) as executor:
+            futures = [
+                executor.submit(
+                    fetch_binlog, twindb_config, twindb_config.destination(backup_source=hostname), binlog_copy, path
+                )
+                for (binlog_copy, _), path in zip(binlogs, binlog_paths)
+                if active is None or binlog_copy is not active[0]
+            ]
+            restore_from_mysql(twindb_config, copy, dst_dir, tmp_dir=tmp_dir, cache=cache, hostname=hostname)
+            for future in futures:
+                try:
+                    future.result()
+                except (DestinationError, ModifierException, OSError) as err:
+                    for pending in futures:
+                        pending.cancel()
+                    raise TwinDBBackupError(f"Failed to fetch binlogs: {err}") from err
+
+        # The SQL file is kept after the restore, but outside of the datadir
+        sql_fd, sql_path = tempfile.mkstemp(prefix="pitr-", suffix=".sql", dir=tmp_dir)
+        os.close(sql_fd)
+        replay_binlogs(binlog_paths, int(copy.position), sql_path, target.mysqlbinlog_args(binlog_paths[-1]))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    LOG.info("SQL to roll the datadir forward to %s is saved in %s.", target, sql_path)
+    LOG.info("Start MySQL and replay it: mysql < %s", sql_path)
+    return sql_path
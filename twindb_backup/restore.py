@@ -4,24 +4,29 @@ Module that restores backup copies.
 """
 from __future__ import print_function
 
-import errno
 import os
+import shutil
 import sys
 import tempfile
 import time
+from contextlib import contextmanager
 from os import path as osp
 from subprocess import PIPE, Popen
 
 import psutil
 
 from twindb_backup import DEFAULT_FILE_ENCODING, LOG, XBSTREAM_BINARY, XTRABACKUP_BINARY
+from twindb_backup.copy.file_copy import FileCopy
 from twindb_backup.copy.mysql_copy import MySQLCopy
 from twindb_backup.destination.exceptions import DestinationError
 from twindb_backup.destination.local import Local
 from twindb_backup.exceptions import TwinDBBackupError
-from twindb_backup.export import export_info
+from twindb_backup.export import export_bandwidth, export_info, export_metrics, prepare_metrics, restore_metrics
 from twindb_backup.exporter.base_exporter import ExportCategory, ExportMeasureType
-from twindb_backup.modifiers.gpg import Gpg
+from twindb_backup.modifiers.pipeline import StageStats
+from twindb_backup.modifiers.revert import revert_pipeline
+from twindb_backup.modifiers.throttle import throttle_stream
+from twindb_backup.status.exceptions import StatusKeyNotFound
 from twindb_backup.status.mysql_status import MySQLStatus
 from twindb_backup.util import mkdir_p
 
@@ -46,6 +51,24 @@ def get_my_cnf(status, key):
             raise TwinDBBackupError(f"Unexpected type of {status[key].config[path]}")
 
 
+def bandwidth_bucket(twindb_config, dst):
+    """
+    Return the token bucket that limits downloads from the destination.
+
+    :param twindb_config: tool configuration
+    :type twindb_config: TwinDBBackupConfig
+    :param dst: Destination the copy is downloaded from.
+    :type dst: BaseDestination
+    :return: Token bucket or None if downloads aren't throttled.
+        Local copies are never throttled.
+    :rtype: TokenBucket
+    """
+    bandwidth = twindb_config.bandwidth
+    if bandwidth is None or isinstance(dst, Local):
+        return None
+    return bandwidth.bucket
+
+
 def get_free_memory():
     """Return size of available memory in bytes. It calculates it as a half
     of available memory.
@@ -56,6 +79,30 @@ def get_free_memory():
     return int(psutil.virtual_memory().available / 2)
 
 
+def get_restore_parallel(config):
+    """
+    Return how many threads extract and prepare a MySQL copy.
+
+    :param config: Tool configuration.
+    :type config: TwinDBBackupConfig
+    :return: ``restore_parallel`` from the config or the number of CPUs.
+    :rtype: int
+    """
+    return config.mysql.restore_parallel or psutil.cpu_count() or 1
+
+
+def get_prepare_memory(config):
+    """
+    Return the buffer pool size of ``xtrabackup --prepare``.
+
+    :param config: Tool configuration.
+    :type config: TwinDBBackupConfig
+    :return: ``restore_use_memory`` from the config or a half of available memory.
+    :rtype: int
+    """
+    return config.mysql.restore_use_memory or get_free_memory()
+
+
 def restore_from_mysql_full(
     stream,
     dst_dir,
@@ -63,7 +110,9 @@ def restore_from_mysql_full(
     redo_only=False,
     xtrabackup_binary=XTRABACKUP_BINARY,
     xbstream_binary=XBSTREAM_BINARY,
+    name=None,
 ):
+    # pylint: disable=too-many-arguments
     """
     Restore MySQL datadir from a backup copy
 
@@ -79,65 +128,83 @@ def restore_from_mysql_full(
     :type redo_only: bool
     :param xtrabackup_binary: path to xtrabackup binary.
     :param xbstream_binary: Path to xbstream binary
+    :param name: Copy key. Decryption and decompression are chosen
+        by its suffixes. If None they're chosen by the configuration.
+    :type name: str
     :return: If success, return True
     :rtype: bool
     """
     LOG.debug("Restore tools: %s/%s", xtrabackup_binary, xbstream_binary)
-    # GPG modifier
-    if config.gpg:
-        gpg = Gpg(
-            stream,
-            config.gpg.recipient,
-            config.gpg.keyring,
-            secret_keyring=config.gpg.secret_keyring,
-        )
-        LOG.debug("Decrypting stream")
-        stream = gpg.revert_stream()
-    else:
-        LOG.debug("Not decrypting the stream")
-
     if config.mysql.xtrabackup_binary:
         xtrabackup_binary = config.mysql.xtrabackup_binary
 
-    stream = config.compression.get_modifier(stream).revert_stream()
-
-    with stream as handler:
-        if not _extract_xbstream(handler, dst_dir, xbstream_binary):
+    with _restore_stream(config, stream, name, "mysql", "xbstream") as handler:
+        if not _extract_xbstream(handler, dst_dir, xbstream_binary, parallel=get_restore_parallel(config)):
             return False
 
-    try:
-        xtrabackup_cmd = [
-            xtrabackup_binary,
-            f"--use-memory={get_free_memory()}",
-            "--prepare",
-        ]
-        if redo_only:
-            xtrabackup_cmd += ["--apply-log-only"]
+    return _xtrabackup_prepare(config, xtrabackup_binary, dst_dir, redo_only=redo_only)
 
-        xtrabackup_cmd += ["--target-dir", dst_dir]
 
-        LOG.debug("Running %s", " ".join(xtrabackup_cmd))
-        with Popen(xtrabackup_cmd, stdout=None, stderr=None) as xtrabackup_proc:
-            xtrabackup_proc.communicate()
-            ret = xtrabackup_proc.returncode
-            if ret:
-                LOG.error("%s exited with code %d", " ".join(xtrabackup_cmd), ret)
-            return ret == 0
-    except OSError as err:
-        raise TwinDBBackupError(f"Failed to prepare backup in {dst_dir}: {err}") from err
+def restore_pipeline(config, stream, name=None, decrypt=True):
+    """
+    Build a pipeline that decrypts and decompresses a copy.
 
+    :param config: Tool configuration.
+    :type config: TwinDBBackupConfig
+    :param stream: Context manager that yields the downloaded copy.
+    :param name: Copy key. If None the copy is expected to be
+        compressed and encrypted as the configuration says.
+    :type name: str
+    :param decrypt: False if the copy isn't encrypted even if its name
+        says so, e.g. a local copy.
+    :type decrypt: bool
+    :return: Pipeline
+    :rtype: Pipeline
+    """
+    if name is None:
+        name = config.compression.get_modifier(None).suffix + (".gpg" if config.gpg else "")
+    if not decrypt and name.endswith(".gpg"):
+        name = name.rsplit(".", 1)[0]
+    return revert_pipeline(stream, name, compression=config.compression, gpg=config.gpg)
 
-def _extract_xbstream(input_stream, working_dir, xbstream_binary=XBSTREAM_BINARY):
+
+@contextmanager
+def _restore_stream(config, stream, name, media_type, tool, decrypt=True):
+    """
+    Run the restore pipeline and report time of every stage
+    including ``tool`` that extracts the restored stream.
+
+    :return: Restored stream, a pipe.
+    """
+    pipeline = restore_pipeline(config, stream, name, decrypt=decrypt)
+    extract = StageStats(tool)
+    extract.started = time.time()
+    with pipeline.get_stream() as handler:
+        yield handler
+    extract.finished = time.time()
+    if pipeline.stats:
+        extract.bytes_in = pipeline.stats[-1].bytes_out
+    for stats in pipeline.stats + [extract]:
+        LOG.info("Restore stage %s", stats)
+    export_metrics(config, restore_metrics(media_type, pipeline.stats + [extract]))
+
+
+def _extract_xbstream(input_stream, working_dir, xbstream_binary=XBSTREAM_BINARY, parallel=None):
     """
     Extract xbstream stream in directory
 
     :param input_stream: The stream in xbstream format
     :param working_dir: directory
     :param xbstream_binary: Path to xbstream
+    :param parallel: How many files xbstream writes concurrently.
+        If None xbstream uses one thread.
+    :type parallel: int
     :return: True if extracted successfully
     """
     try:
         cmd = [xbstream_binary, "-x"]
+        if parallel:
+            cmd += [f"--parallel={parallel}"]
         LOG.debug("Running %s", " ".join(cmd))
         LOG.debug("Working directory: %s", working_dir)
         LOG.debug("Xbstream binary: %s", xbstream_binary)
@@ -156,7 +223,6 @@ def _extract_xbstream(input_stream, working_dir, xbstream_binary=XBSTREAM_BINARY
         raise TwinDBBackupError(f"Failed to extract xbstream: {err}") from err
 
 
-# pylint: disable=too-many-locals,too-many-branches,too-many-statements
 def restore_from_mysql_incremental(
     stream,
     dst_dir,
@@ -164,7 +230,10 @@ def restore_from_mysql_incremental(
     tmp_dir=None,
     xtrabackup_binary=XTRABACKUP_BINARY,
     xbstream_binary=XBSTREAM_BINARY,
+    redo_only=False,
+    name=None,
 ):
+    # pylint: disable=too-many-arguments
     """
     Restore MySQL datadir from an incremental copy.
 
@@ -177,72 +246,177 @@ def restore_from_mysql_incremental(
     :type tmp_dir: str
     :param xtrabackup_binary: Path to xtrabackup binary.
     :param xbstream_binary: Path to xbstream binary
+    :param redo_only: True if more incremental copies are applied
+        after this one, so the final apply of the redo log is skipped.
+    :type redo_only: bool
+    :param name: Copy key. Decryption and decompression are chosen
+        by its suffixes. If None they're chosen by the configuration.
+    :type name: str
     :return: If success, return True
     :rtype: bool
     """
     inc_dir = tmp_dir or tempfile.mkdtemp()
-    # GPG modifier
-    if config.gpg:
-        gpg = Gpg(
-            stream,
-            config.gpg.recipient,
-            config.gpg.keyring,
-            secret_keyring=config.gpg.secret_keyring,
-        )
-        LOG.debug("Decrypting stream")
-        stream = gpg.revert_stream()
-    else:
-        LOG.debug("Not decrypting the stream")
-
     if config.mysql.xtrabackup_binary:
         xtrabackup_binary = config.mysql.xtrabackup_binary
 
-    stream = config.compression.get_modifier(stream).revert_stream()
-
-    with stream as handler:
-        if not _extract_xbstream(handler, inc_dir, xbstream_binary):
+    with _restore_stream(config, stream, name, "mysql", "xbstream") as handler:
+        if not _extract_xbstream(handler, inc_dir, xbstream_binary, parallel=get_restore_parallel(config)):
             return False
 
-    try:
-        try:
-            xtrabackup_cmd = [
-                xtrabackup_binary,
-                f"--use-memory={get_free_memory()}",
-                "--prepare",
-                "--apply-log-only",
-                f"--target-dir={dst_dir}",
-            ]
-            LOG.debug("Running %s", " ".join(xtrabackup_cmd))
-            with Popen(xtrabackup_cmd, stdout=None, stderr=None) as xtrabackup_proc:
-                xtrabackup_proc.communicate()
-                ret = xtrabackup_proc.returncode
-                if ret:
-                    LOG.error("%s exited with code %d", " ".join(xtrabackup_cmd), ret)
-                    return False
+    if not _xtrabackup_prepare(config, xtrabackup_binary, dst_dir, redo_only=True):
+        return False
+    return _xtrabackup_prepare(config, xtrabackup_binary, dst_dir, redo_only=redo_only, incremental_dir=inc_dir)
 
-            xtrabackup_cmd = [
-                xtrabackup_binary,
-                f"--use-memory={get_free_memory()}",
-                "--prepare",
-                f"--target-dir={dst_dir}",
-                f"--incremental-dir={inc_dir}",
-            ]
-            LOG.debug("Running %s", " ".join(xtrabackup_cmd))
-            with Popen(xtrabackup_cmd, stdout=None, stderr=None) as xtrabackup_proc:
-                xtrabackup_proc.communicate()
-                ret = xtrabackup_proc.returncode
-                if ret:
-                    LOG.error("%s exited with code %d", " ".join(xtrabackup_cmd), ret)
-                return ret == 0
-        except OSError as err:
-            LOG.error("Failed to prepare backup in %s: %s", dst_dir, err)
-            return False
-    finally:
+
+def get_incremental_chain(status, copy):
+    """
+    Find copies to restore an incremental copy from.
+
+    :param status: MySQL status.
+    :type status: MySQLStatus
+    :param copy: Incremental copy.
+    :type copy: MySQLCopy
+    :return: The full copy, the incremental copies it's based on
+        and the copy itself, in the order they are applied.
+    :rtype: list(MySQLCopy)
+    :raise TwinDBBackupError: if the chain is broken.
+    """
+    chain = [copy]
+    while chain[0].type != "full":
+        if chain[0].parent:
+            try:
+                parent = status[chain[0].parent]
+            except StatusKeyNotFound as err:
+                raise TwinDBBackupError(f"Parent {chain[0].parent} of {chain[0].key} is not found") from err
+        else:
+            # Copies taken before the parent was recorded
+            parent = status.candidate_parent(chain[0].run_type)
+        if parent is None or parent.key in [c.key for c in chain]:
+            raise TwinDBBackupError(f"Failed to find the full copy {copy.key} is based on")
+        chain.insert(0, parent)
+    return chain
+
+
+def chain_state_key(full_copy, lsn):
+    """
+    Cache key of a full copy with incremental copies applied up to ``lsn``
+    and prepared with ``--apply-log-only``, so more incremental copies
+    can be applied on top of it.
+
+    :param full_copy: Full copy of the chain.
+    :type full_copy: MySQLCopy
+    :param lsn: LSN of the last applied copy.
+    :type lsn: int
+    :return: Cache key.
+    :rtype: str
+    """
+    return f"{os.path.basename(full_copy.key)}.lsn-{lsn}"
+
+
+def _restore_chain(twindb_config, dst, chain, dst_dir, tmp_dir=None, cache=None):
+    """
+    Restore an incremental copy from a full copy and a chain of incremental copies.
+
+    With a cache, the restore starts from the longest prepared part of the chain
+    found in the cache. Every state prepared along the way is cached,
+    so restoring the next copy of the chain applies only one delta.
+
+    :param chain: Copies from :func:`get_incremental_chain`.
+    :type chain: list(MySQLCopy)
+    :raise TwinDBBackupError: if a copy fails to restore.
+    """
+    copy = chain[-1]
+    bucket = bandwidth_bucket(twindb_config, dst)
+    binaries = {"xtrabackup_binary": copy.xtrabackup_binary, "xbstream_binary": copy.xbstream_binary}
+
+    applied = 0
+    if cache:
+        for i in range(len(chain) - 1, -1, -1):
+            state_key = chain_state_key(chain[0], chain[i].lsn)
+            if state_key in cache:
+                LOG.info("Restoring %s up to %s from cache", chain[0].key, chain[i].key)
+                cache.restore_in(state_key, dst_dir)
+                applied = i + 1
+                break
+
+    if not applied:
+        if not restore_from_mysql_full(
+            throttle_stream(dst.get_stream(chain[0]), bucket),
+            dst_dir,
+            twindb_config,
+            redo_only=True,
+            name=chain[0].key,
+            **binaries,
+        ):
+            raise TwinDBBackupError(f"Failed to restore {chain[0].key}")
+        if cache:
+            cache.add(dst_dir, chain_state_key(chain[0], chain[0].lsn))
+        applied = 1
+
+    for i in range(applied, len(chain)):
+        # Without a cache the last copy is applied with the final prepare
+        redo_only = bool(cache) or i < len(chain) - 1
+        inc_dir = tempfile.mkdtemp(dir=tmp_dir)
         try:
-            pass
-        except OSError as exc:
-            if exc.errno != errno.ENOENT:  # ENOENT - no such file or directory
-                raise  # re-raise exception
+            if not restore_from_mysql_incremental(
+                throttle_stream(dst.get_stream(chain[i]), bucket),
+                dst_dir,
+                twindb_config,
+                inc_dir,
+                redo_only=redo_only,
+                name=chain[i].key,
+                **binaries,
+            ):
+                raise TwinDBBackupError(f"Failed to apply {chain[i].key}")
+        finally:
+            shutil.rmtree(inc_dir, ignore_errors=True)
+        if cache:
+            cache.add(dst_dir, chain_state_key(chain[0], chain[i].lsn))
+
+    if cache and not _xtrabackup_prepare(
+        twindb_config, twindb_config.mysql.xtrabackup_binary or copy.xtrabackup_binary or XTRABACKUP_BINARY, dst_dir
+    ):
+        raise TwinDBBackupError(f"Failed to prepare {copy.key}")
+
+
+def _xtrabackup_prepare(config, xtrabackup_binary, dst_dir, redo_only=False, incremental_dir=None):
+    """
+    Run ``xtrabackup --prepare``. Memory and threads are sized
+    by :func:`get_prepare_memory` and :func:`get_restore_parallel`.
+    The prepare time is logged and exported.
+
+    :return: True if xtrabackup succeeded.
+    :rtype: bool
+    """
+    xtrabackup_cmd = [
+        xtrabackup_binary,
+        f"--use-memory={get_prepare_memory(config)}",
+        f"--parallel={get_restore_parallel(config)}",
+        "--prepare",
+    ]
+    if redo_only:
+        xtrabackup_cmd += ["--apply-log-only"]
+    xtrabackup_cmd += [f"--target-dir={dst_dir}"]
+    if incremental_dir:
+        xtrabackup_cmd += [f"--incremental-dir={incremental_dir}"]
+
+    LOG.debug("Running %s", " ".join(xtrabackup_cmd))
+    started = time.time()
+    try:
+        with Popen(xtrabackup_cmd, stdout=None, stderr=None) as xtrabackup_proc:
+            xtrabackup_proc.communicate()
+            ret = xtrabackup_proc.returncode
+    except OSError as err:
+        LOG.error("Failed to prepare backup in %s: %s", dst_dir, err)
+        return False
+    if ret:
+        LOG.error("%s exited with code %d", " ".join(xtrabackup_cmd), ret)
+        return False
+
+    duration = time.time() - started
+    LOG.info("Prepared %s in %.2f seconds", dst_dir, duration)
+    export_metrics(config, prepare_metrics(duration, redo_only=redo_only))
+    return True
 
 
 def gen_grastate(path, version, uuid, seqno):
@@ -335,60 +509,33 @@ def restore_from_mysql(
         dst = twindb_config.destination(backup_source=hostname)
 
     key = copy.key
-    status = MySQLStatus(dst=dst, status_directory=hostname)
-
-    stream = dst.get_stream(copy)
+    status = MySQLStatus(dst=dst, status_directory=hostname, cache=dst.status_cache)
 
     if status[key].type == "full":
+        stream = throttle_stream(dst.get_stream(copy), bandwidth_bucket(twindb_config, dst))
 
         cache_key = os.path.basename(key)
-        if cache:
-            if cache_key in cache:
-                # restore from cache
-                cache.restore_in(cache_key, dst_dir)
-            else:
-                restore_from_mysql_full(stream, dst_dir, twindb_config, redo_only=False)
-                cache.add(dst_dir, cache_key)
+        if cache and cache_key in cache:
+            # restore from cache
+            cache.restore_in(cache_key, dst_dir)
         else:
-            restore_from_mysql_full(
+            if not restore_from_mysql_full(
                 stream,
                 dst_dir,
                 twindb_config,
                 redo_only=False,
                 xbstream_binary=copy.xbstream_binary,
                 xtrabackup_binary=copy.xtrabackup_binary,
-            )
+                name=key,
+            ):
+                raise TwinDBBackupError(f"Failed to restore {copy.key}")
+            if cache:
+                cache.add(dst_dir, cache_key)
 
     else:
-        full_copy = status.candidate_parent(copy.run_type)
-        full_stream = dst.get_stream(full_copy)
-        LOG.debug("Full parent copy is %s", full_copy.key)
-        cache_key = os.path.basename(full_copy.key)
-
-        if cache:
-            if cache_key in cache:
-                # restore from cache
-                cache.restore_in(cache_key, dst_dir)
-            else:
-                restore_from_mysql_full(full_stream, dst_dir, twindb_config, redo_only=True)
-                cache.add(dst_dir, cache_key)
-        else:
-            restore_from_mysql_full(
-                full_stream,
-                dst_dir,
-                twindb_config,
-                redo_only=True,
-                xtrabackup_binary=copy.xtrabackup_binary,
-                xbstream_binary=copy.xbstream_binary,
-            )
-        restore_from_mysql_incremental(
-            stream,
-            dst_dir,
-            twindb_config,
-            tmp_dir,
-            xtrabackup_binary=copy.xtrabackup_binary,
-            xbstream_binary=copy.xbstream_binary,
-        )
+        chain = get_incremental_chain(status, copy)
+        LOG.debug("Full parent copy is %s", chain[0].key)
+        _restore_chain(twindb_config, dst, chain, dst_dir, tmp_dir=tmp_dir, cache=cache)
 
     config_dir = os.path.join(dst_dir, "_config")
 
@@ -410,6 +557,7 @@ def restore_from_mysql(
         category=ExportCategory.mysql,
         measure_type=ExportMeasureType.restore,
     )
+    export_bandwidth(twindb_config)
     LOG.info("Successfully restored %s in %s.", copy.key, dst_dir)
     LOG.info(
         "Now copy content of %s to MySQL datadir: cp -R %s /var/lib/mysql/",
@@ -431,7 +579,8 @@ def restore_from_mysql(
 
 def restore_from_file(twindb_config, copy, dst_dir):
     """
-    Restore a directory from a backup copy in the directory
+    Restore a directory from a backup copy in the directory.
+    An incremental copy is restored on top of its parent full copy.
 
     :param twindb_config: tool configuration
     :type twindb_config: TwinDBBackupConfig
@@ -443,33 +592,76 @@ def restore_from_file(twindb_config, copy, dst_dir):
     LOG.info("Restoring %s in %s", copy.key, dst_dir)
     mkdir_p(dst_dir)
     restore_start = time.time()
+
+    if isinstance(copy, FileCopy) and copy.incremental:
+        parent = get_files_parent(twindb_config, copy)
+        LOG.info("Restoring parent full copy %s", parent.key)
+        if not _extract_file_copy(twindb_config, parent, dst_dir, incremental=True):
+            return
+        if not _extract_file_copy(twindb_config, copy, dst_dir, incremental=True):
+            return
+    elif not _extract_file_copy(twindb_config, copy, dst_dir):
+        return
+
+    export_info(
+        twindb_config,
+        data=time.time() - restore_start,
+        category=ExportCategory.files,
+        measure_type=ExportMeasureType.restore,
+    )
+    export_bandwidth(twindb_config)
+
+
+def get_files_parent(twindb_config, copy):
+    """
+    Find the full copy an incremental files copy was taken against.
+    The incremental copy name records the parent.
+
+    :param twindb_config: tool configuration
+    :type twindb_config: TwinDBBackupConfig
+    :param copy: Incremental copy.
+    :type copy: FileCopy
+    :return: Parent full copy.
+    :rtype: FileCopy
+    :raise TwinDBBackupError: if the parent full copy doesn't exist.
+    """
+    dst = twindb_config.destination(backup_source=copy.host)
+    candidates = []
+    for path in dst.list_files(f"{dst.remote_path}/{copy.parent_prefix}", recursive=True, files_only=True):
+        candidate = FileCopy(path=path)
+        if candidate.key.startswith(copy.parent_prefix) and not candidate.incremental:
+            candidates.append(candidate)
+    if not candidates:
+        raise TwinDBBackupError(f"Parent full copy {copy.parent_prefix} of {copy.key} doesn't exist")
+    return candidates[0]
+
+
+def _extract_file_copy(twindb_config, copy, dst_dir, incremental=False):
+    """
+    Extract a files copy in a directory.
+
+    :param incremental: Extract the copy as a part of incremental chain.
+        Files deleted since the parent copy are deleted.
+    :return: True if the copy was extracted.
+    :rtype: bool
+    """
     keep_local_path = twindb_config.keep_local_path
 
     if keep_local_path and os.path.exists(osp.join(keep_local_path, copy.key)):
         dst = Local(osp.join(keep_local_path, copy.key))
         stream = dst.get_stream(copy)
+        # Local copies aren't encrypted
+        decrypt = False
     else:
         dst = twindb_config.destination()
-        stream = dst.get_stream(copy)
-
-        # GPG modifier
-        if twindb_config.gpg:
-            gpg = Gpg(
-                stream,
-                twindb_config.gpg.recipient,
-                twindb_config.gpg.keyring,
-                secret_keyring=twindb_config.gpg.secret_keyring,
-            )
-            LOG.debug("Decrypting stream")
-            stream = gpg.revert_stream()
-        else:
-            LOG.debug("Not decrypting the stream")
+        stream = throttle_stream(dst.get_stream(copy), bandwidth_bucket(twindb_config, dst))
+        decrypt = True
 
-    with stream as handler:
+    with _restore_stream(twindb_config, stream, copy.key, "files", "tar", decrypt=decrypt) as handler:
         try:
-            LOG.debug("handler type: %s", type(handler))
-            LOG.debug("stream type: %s", type(stream))
-            cmd = ["tar", "zvxf", "-"]
+            cmd = ["tar", "xvf", "-"]
+            if incremental:
+                cmd.append("--listed-incremental=/dev/null")
             LOG.debug("Running %s", " ".join(cmd))
             with Popen(cmd, stdin=handler, cwd=dst_dir) as proc:
                 cout, cerr = proc.communicate()
@@ -480,15 +672,9 @@ def restore_from_file(twindb_config, copy, dst_dir):
                         LOG.error("STDOUT: %s", cout)
                     if cerr:
                         LOG.error("STDERR: %s", cerr)
-                    return
+                    return False
             LOG.info("Successfully restored %s in %s", copy.key, dst_dir)
         except (OSError, DestinationError) as err:
             LOG.error("Failed to decompress %s: %s", copy.key, err)
             sys.exit(1)
-
-    export_info(
-        twindb_config,
-        data=time.time() - restore_start,
-        category=ExportCategory.files,
-        measure_type=ExportMeasureType.restore,
-    )
+    return True
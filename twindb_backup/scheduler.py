@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Module that runs backup jobs concurrently.
+
+A backup run consists of independent jobs: a copy of every directory,
+the MySQL copy and binlogs shipping. :class:`JobScheduler` starts jobs
+in order of their priority as long as the sum of weights of running jobs
+fits into the budget. A job's weight is the share of the host resources
+(CPU, network) it takes, so the budget caps how loaded the host is.
+"""
+import threading
+import time
+from itertools import count
+
+from twindb_backup import LOG
+
+JOB_KINDS = ("files", "mysql", "binlogs")
+SCHEDULER_BUDGET = 1
+SCHEDULER_PRIORITY = 0
+SCHEDULER_WEIGHT = 1
+
+
+class Job:  # pylint: disable=too-many-instance-attributes
+    """
+    Backup job.
+
+    :param name: Job name, e.g. ``files:/etc``.
+    :type name: str
+    :param func: Function that does the job.
+    :param args: Arguments of the function.
+    :type args: tuple
+    :param priority: Jobs with higher priority start first.
+    :type priority: int
+    :param weight: Share of the budget the job takes while it's running.
+    :type weight: int
+    """
+
+    def __init__(self, name, func, args=(), priority=SCHEDULER_PRIORITY, weight=SCHEDULER_WEIGHT):
+        self.name = name
+        self.priority = priority
+        self.weight = weight
+        self.started = None
+        self.finished = None
+        self.error = None
+        self._func = func
+        self._args = args
+
+    @property
+    def duration(self):
+        """How long the job ran in seconds or None if it didn't."""
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def run(self):
+        """
+        Do the job. An exception is stored in ``error`` rather than raised.
+        That includes ``SystemExit``, sources call ``exit()`` when
+        the backup tool they run fails.
+        """
+        self.started = time.time()
+        try:
+            self._func(*self._args)
+        except BaseException as err:  # pylint: disable=broad-except
+            LOG.error("Job %s failed: %r", self.name, err)
+            self.error = err
+        finally:
+            self.finished = time.time()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name}, priority={self.priority:d}, weight={self.weight:d})"
+
+
+class JobScheduler:
+    """
+    Run jobs concurrently within the budget.
+
+    Jobs start strictly in order of priority, jobs of the same priority
+    start in order they were added. If the next job doesn't fit
+    into the budget the scheduler waits until running jobs free enough of it,
+    so a heavy job is never starved by light ones. A job heavier
+    than the whole budget runs alone.
+
+    :param budget: Sum of weights of jobs that may run at once.
+    :type budget: int
+    """
+
+    def __init__(self, budget=SCHEDULER_BUDGET):
+        self._budget = max(1, budget)
+        self._jobs = []
+        self._sequence = count()
+        self._cond = threading.Condition()
+        self._used = 0
+
+    def add(self, job):
+        """
+        Schedule a job.
+
+        :param job: Backup job.
+        :type job: Job
+        """
+        self._jobs.append((-job.priority, next(self._sequence), job))
+
+    def run(self):
+        """
+        Run all scheduled jobs and wait until they finish.
+        A failed job doesn't stop other jobs.
+
+        :return: Jobs in order they were started.
+        :rtype: list(Job)
+        """
+        pending = [job for _, _, job in sorted(self._jobs)]
+        self._jobs = []
+        threads = []
+        for job in pending:
+            weight = min(max(0, job.weight), self._budget)
+            with self._cond:
+                while self._used + weight > self._budget:
+                    self._cond.wait()
+                self._used += weight
+            LOG.debug("Starting job %r", job)
+            thread = threading.Thread(target=self._run_job, args=(job, weight), name=f"job-{job.name}")
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+        return pending
+
+    def _run_job(self, job, weight):
+        try:
+            job.run()
+            LOG.debug("Job %s finished in %.1f seconds", job.name, job.duration)
+        finally:
+            with self._cond:
+                self._used -= weight
+                self._cond.notify_all()
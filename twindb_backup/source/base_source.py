@@ -36,6 +36,11 @@ class BaseSource(object):
         self._host = socket.gethostname()
         self._created_at = time.strftime("%Y-%m-%d_%H_%M_%S")
 
+    @property
+    def media_type(self):
+        """What the source backs up: files, mysql or binlog."""
+        return self._media_type
+
     @abstractmethod
     def get_stream(self):
         """
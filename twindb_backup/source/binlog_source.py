@@ -2,7 +2,11 @@
 Module defines MySQL binlog source class for backing them up.
 """
 
+import json
+import mmap
 import struct
+import tempfile
+import uuid
 from contextlib import contextmanager
 from os import path as osp
 from subprocess import PIPE, Popen
@@ -11,20 +15,241 @@ from twindb_backup import LOG
 from twindb_backup.source.base_source import BaseSource
 from twindb_backup.source.exceptions import BinlogSourceError
 
+BINLOG_MAGIC_LENGTH = 4
+# Binlog v4 event header: timestamp, type_code, server_id,
+# event_length, next_position, flags.
+BINLOG_EVENT_HEADER = struct.Struct("<IBIIIH")
+# Event types the index looks into.
+GTID_LOG_EVENT = 33
+ANONYMOUS_GTID_LOG_EVENT = 34
+# GTID event body: commit flag, server UUID, transaction number.
+GTID_EVENT_BODY = struct.Struct("<B16sq")
 
-class BinlogV4Event(object):  # pylint: disable=too-few-public-methods
+
+def complete_events_length(data, offset):
+    """
+    Find how many bytes of the data are complete binlog events.
+    MySQL may be in the middle of writing an event at the end of
+    the active binlog, so a reader must stop at the last complete event.
+
+    :param data: Binlog content starting at the offset.
+    :type data: bytes
+    :param offset: Position in the binlog where the data starts.
+        It must be zero or an event boundary.
+    :type offset: int
+    :return: Length of the data prefix that consists of complete events.
+    :rtype: int
     """
-    MySQL Binary log event.
+    position = BINLOG_MAGIC_LENGTH - offset if offset < BINLOG_MAGIC_LENGTH else 0
+    if position > len(data):
+        return 0
+    while position + BINLOG_EVENT_HEADER.size <= len(data):
+        event_length = BINLOG_EVENT_HEADER.unpack_from(data, position)[3]
+        if event_length < BINLOG_EVENT_HEADER.size or position + event_length > len(data):
+            break
+        position += event_length
+    return position
+
+
+def _iter_events(data, size):
+    """Yield position, timestamp, type code and length of every complete event."""
+    position = BINLOG_MAGIC_LENGTH
+    unpack_header = BINLOG_EVENT_HEADER.unpack_from
+    while position + BINLOG_EVENT_HEADER.size <= size:
+        timestamp, type_code, _, event_length, _, _ = unpack_header(data, position)
+        if event_length < BINLOG_EVENT_HEADER.size or position + event_length > size:
+            return
+        yield position, timestamp, type_code, event_length
+        position += event_length
+
+
+def _gtid(data, position):
+    """Server UUID and transaction number of a GTID event."""
+    _, sid, gno = GTID_EVENT_BODY.unpack_from(data, position + BINLOG_EVENT_HEADER.size)
+    return str(uuid.UUID(bytes=sid)), gno
+
+
+class BinlogIndex(object):
+    """
+    Summary of a binlog that is stored next to its backup copy.
+
+    The index is built in one pass over the binlog. Point-in-time recovery
+    uses it to choose binlogs and positions without downloading them.
+
+    :param name: Binlog base name.
+    :type name: str
+    :param first_timestamp: Timestamp of the first event.
+    :type first_timestamp: int
+    :param last_timestamp: Timestamp of the last event.
+    :type last_timestamp: int
+    :param last_event_position: Position where the last event starts.
+    :type last_event_position: int
+    :param end_position: Position after the last complete event.
+    :type end_position: int
+    :param gtids: Executed transactions as ``{server_uuid: [[first, last], ...]}``.
+    :type gtids: dict
+    :param event_counts: Number of events of each type as ``{type_code: count}``.
+    :type event_counts: dict
+    :param transactions: Positions where transactions start as
+        ``[[timestamp, position], ...]``. Only the first transaction
+        of every second is recorded.
+    :type transactions: list
     """
 
-    def __init__(self, **kwargs):
-        self.timestamp = kwargs.get("timestamp")
-        self.type_code = kwargs.get("type_code")
-        self.server_id = kwargs.get("server_id")
-        self.event_length = kwargs.get("event_length")
-        self.curr_position = kwargs.get("curr_position")
-        self.next_position = kwargs.get("next_position")
-        self.flags = kwargs.get("flags")
+    def __init__(self, name, **kwargs):
+        self.name = name
+        self.first_timestamp = kwargs.get("first_timestamp")
+        self.last_timestamp = kwargs.get("last_timestamp")
+        self.last_event_position = kwargs.get("last_event_position", BINLOG_MAGIC_LENGTH)
+        self.end_position = kwargs.get("end_position", BINLOG_MAGIC_LENGTH)
+        self.gtids = kwargs.get("gtids") or {}
+        self.event_counts = {int(type_code): count for type_code, count in (kwargs.get("event_counts") or {}).items()}
+        self.transactions = kwargs.get("transactions") or []
+
+    @classmethod
+    def build(cls, binlog):
+        """
+        Index a binlog file.
+
+        :param binlog: Path to the binlog.
+        :type binlog: str
+        :rtype: BinlogIndex
+        :raise BinlogSourceError: if the binlog can't be read.
+        """
+        index = cls(osp.basename(binlog))
+        try:
+            with open(binlog, "rb") as binlog_descriptor:
+                size = osp.getsize(binlog)
+                if size <= BINLOG_MAGIC_LENGTH:
+                    return index
+                with mmap.mmap(binlog_descriptor.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    index._scan(data, size)
+        except (IOError, ValueError) as err:
+            raise BinlogSourceError("Failed to index %s: %s" % (binlog, err))
+        return index
+
+    @classmethod
+    def from_json(cls, content):
+        """
+        Load an index saved by :meth:`to_json`.
+
+        :param content: JSON document.
+        :type content: str
+        :rtype: BinlogIndex
+        """
+        return cls(**json.loads(content))
+
+    def to_json(self):
+        """
+        Serialize the index.
+
+        :rtype: str
+        """
+        return json.dumps(
+            {
+                "name": self.name,
+                "first_timestamp": self.first_timestamp,
+                "last_timestamp": self.last_timestamp,
+                "last_event_position": self.last_event_position,
+                "end_position": self.end_position,
+                "gtids": self.gtids,
+                "event_counts": self.event_counts,
+                "transactions": self.transactions,
+            },
+            sort_keys=True,
+        )
+
+    @property
+    def gtid_set(self):
+        """GTIDs in the binlog in MySQL notation, e.g. ``uuid:1-5:7``."""
+        return ",".join(
+            ":".join(
+                [server_uuid]
+                + ["%d" % first if first == last else "%d-%d" % (first, last) for first, last in intervals]
+            )
+            for server_uuid, intervals in sorted(self.gtids.items())
+        )
+
+    def contains_gtid(self, gtid):
+        """
+        Check whether a transaction is in the binlog.
+
+        :param gtid: GTID as ``server_uuid:number``.
+        :type gtid: str
+        :rtype: bool
+        """
+        server_uuid, number = gtid.rsplit(":", 1)
+        return any(first <= int(number) <= last for first, last in self.gtids.get(server_uuid.lower(), []))
+
+    def stop_position(self, timestamp):
+        """
+        Find where the first transaction after the timestamp starts.
+
+        :param timestamp: Time to recover to.
+        :type timestamp: int
+        :return: Binlog position to stop at.
+        :rtype: int
+        """
+        for transaction_timestamp, position in self.transactions:
+            if transaction_timestamp > timestamp:
+                return position
+        return self.end_position
+
+    @staticmethod
+    def gtid_stop_position(binlog, gtid):
+        """
+        Find where the transaction that follows a GTID starts.
+        ``mysqlbinlog --stop-position`` at it replays the transaction
+        and nothing after it, whichever server the later transactions come from.
+
+        :param binlog: Path to the binlog with the transaction.
+        :type binlog: str
+        :param gtid: Server UUID and transaction number.
+        :type gtid: tuple
+        :return: Binlog position to stop at or None if the GTID isn't in the binlog.
+        :rtype: int
+        :raise BinlogSourceError: if the binlog can't be read.
+        """
+        found = False
+        stop_position = None
+        try:
+            with open(binlog, "rb") as binlog_descriptor:
+                size = osp.getsize(binlog)
+                if size <= BINLOG_MAGIC_LENGTH:
+                    return None
+                with mmap.mmap(binlog_descriptor.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    for position, _, type_code, event_length in _iter_events(data, size):
+                        if type_code in (GTID_LOG_EVENT, ANONYMOUS_GTID_LOG_EVENT):
+                            if found:
+                                return position
+                            found = type_code == GTID_LOG_EVENT and _gtid(data, position) == tuple(gtid)
+                        stop_position = position + event_length
+        except (IOError, ValueError) as err:
+            raise BinlogSourceError("Failed to read %s: %s" % (binlog, err))
+        return stop_position if found else None
+
+    def _scan(self, data, size):
+        for position, timestamp, type_code, event_length in _iter_events(data, size):
+            if self.first_timestamp is None:
+                self.first_timestamp = timestamp
+            self.last_timestamp = timestamp
+            self.event_counts[type_code] = self.event_counts.get(type_code, 0) + 1
+
+            if type_code in (GTID_LOG_EVENT, ANONYMOUS_GTID_LOG_EVENT):
+                if not self.transactions or timestamp > self.transactions[-1][0]:
+                    self.transactions.append([timestamp, position])
+                if type_code == GTID_LOG_EVENT:
+                    self._add_gtid(*_gtid(data, position))
+
+            self.last_event_position = position
+            self.end_position = position + event_length
+
+    def _add_gtid(self, server_uuid, number):
+        intervals = self.gtids.setdefault(server_uuid, [])
+        if intervals and intervals[-1][1] + 1 == number:
+            intervals[-1][1] = number
+        else:
+            intervals.append([number, number])
 
 
 class BinlogParser(object):
@@ -37,6 +262,8 @@ class BinlogParser(object):
 
     def __init__(self, binlog):
         self._binlog = binlog
+        self._created_at = None
+        self._index = None
 
     @property
     def name(self):
@@ -46,12 +273,25 @@ class BinlogParser(object):
     @property
     def created_at(self):
         """Timestamp when the binlog was created"""
-        try:
-            with open(self._binlog, "rb") as binlog_descriptor:
-                self.__read_magic_number(binlog_descriptor)
-                return self.__read_int(binlog_descriptor, 4)
-        except IOError as err:
-            raise BinlogSourceError("Failed to read the 'created_at' attribute: %s" % err)
+        if self._created_at is None:
+            try:
+                with open(self._binlog, "rb") as binlog_descriptor:
+                    self.__read_magic_number(binlog_descriptor)
+                    self._created_at = self.__read_int(binlog_descriptor, 4)
+            except IOError as err:
+                raise BinlogSourceError("Failed to read the 'created_at' attribute: %s" % err)
+        return self._created_at
+
+    @property
+    def index(self):
+        """
+        Binlog index. It's built on first access.
+
+        :rtype: BinlogIndex
+        """
+        if self._index is None:
+            self._index = BinlogIndex.build(self._binlog)
+        return self._index
 
     @property
     def start_position(self):
@@ -60,17 +300,8 @@ class BinlogParser(object):
 
     @property
     def end_position(self):
-        """Last position in the binlog"""
-        last_position = self.start_position
-        with open(self._binlog, "rb") as binlog_descriptor:
-            self.__read_magic_number(binlog_descriptor)
-            while True:
-                event = self.__read_binlog_event(binlog_descriptor)
-                if event:
-                    last_position = event.curr_position
-                else:
-                    break
-        return last_position
+        """Position of the last event in the binlog"""
+        return self.index.last_event_position
 
     @staticmethod
     def __read_magic_number(fdesc):
@@ -87,29 +318,6 @@ class BinlogParser(object):
         else:
             raise NotImplementedError("Reading %d bytes integer is unsupported" % n_bytes)
 
-    def __read_binlog_event(self, binlog_descriptor):
-        """
-        Read binlog event from file descriptor
-        :param binlog_descriptor: File descriptor
-        :return: Binlog event
-        :rtype: BinlogV4Event
-        """
-        position = binlog_descriptor.tell()
-        try:
-            event = BinlogV4Event(
-                timestamp=self.__read_int(binlog_descriptor, 4),
-                type_code=self.__read_int(binlog_descriptor, 1),
-                server_id=self.__read_int(binlog_descriptor, 4),
-                event_length=self.__read_int(binlog_descriptor, 4),
-                curr_position=position,
-                next_position=self.__read_int(binlog_descriptor, 4),
-                flags=self.__read_int(binlog_descriptor, 2),
-            )
-            binlog_descriptor.read(event.event_length - 19)
-            return event
-        except struct.error:
-            return None
-
 
 class BinlogSource(BaseSource):
     """
@@ -175,3 +383,47 @@ class BinlogSource(BaseSource):
             self._media_type,
             "{name}{suffix}".format(name=self._binlog_file, suffix=self.suffix),
         )
+
+
+class BinlogSegmentSource(BinlogSource):
+    """
+    A piece of a binlog that is still being written.
+
+    :param run_type: The backup copy interval. hourly, daily, etc.
+    :type run_type: str
+    :param mysql_client: Instance that can be used to execute queries in MySQL.
+    :type mysql_client: MySQLClient
+    :param binlog_file: Name of the binlog file as it appears in
+        ``SHOW BINARY LOGS``.
+    :type binlog_file: str
+    :param offset: Position in the binlog where the segment starts.
+    :type offset: int
+    :param data: Segment content.
+    :type data: bytes
+    """
+
+    def __init__(self, run_type, mysql_client, binlog_file, offset, data):
+        super(BinlogSegmentSource, self).__init__(run_type, mysql_client, binlog_file=binlog_file)
+        self._offset = offset
+        self._data = data
+
+    @contextmanager
+    def get_stream(self):
+        """
+        Stream the segment content. Modifiers may run as processes
+        that read the stream from a file descriptor, so the segment
+        is spooled to a temporary file.
+
+        :return: stream of bytes with the segment content.
+        """
+        with tempfile.TemporaryFile() as segment:
+            segment.write(self._data)
+            segment.seek(0)
+            yield segment
+
+    def get_name(self):
+        return osp.join(
+            self.host,
+            self._media_type,
+            "{name}.seg-{offset:016d}{suffix}".format(name=self._binlog_file, offset=self._offset, suffix=self.suffix),
+        )
@@ -2,12 +2,20 @@
 """
 Module defines File source class for backing up local directories.
 """
+import os
+import re
 import shlex
+import shutil
 from contextlib import contextmanager
+from os import path as osp
 from subprocess import PIPE, Popen
 
-from twindb_backup import LOG, get_files_to_delete
+from twindb_backup import DEFAULT_FILE_ENCODING, INTERVALS, LOG, get_files_to_delete
+from twindb_backup.copy.file_copy import FileCopy
 from twindb_backup.source.base_source import BaseSource
+from twindb_backup.util import mkdir_p
+
+FILES_SNAPSHOT_DIR = "/var/lib/twindb-backup/files-snapshots"
 
 
 class FileSource(BaseSource):
@@ -21,14 +29,88 @@ class FileSource(BaseSource):
     :type run_type: str
     :param tar_options: Additional options passed to ``tar``.
     :type tar_options: str
+    :param full_backup: When to take full backups, e.g. ``daily``.
+        Runs with a shorter interval take incremental copies that
+        include only files changed since the last full copy.
+        The name of an incremental copy records its parent full copy.
+        If None, every copy is full.
+    :type full_backup: str
+    :param snapshot_dir: Directory with ``tar --listed-incremental``
+        snapshots of full copies.
+    :type snapshot_dir: str
     """
 
-    def __init__(self, path, run_type, tar_options: str = None):
+    def __init__(self, path, run_type, tar_options: str = None, full_backup=None, snapshot_dir=FILES_SNAPSHOT_DIR):
         self.path = path
-        self._suffix = "tar"
         self._media_type = "files"
         self._tar_options = tar_options
+        self._full_backup = full_backup
+        self._snapshot_dir = snapshot_dir
         super(FileSource, self).__init__(run_type)
+        self._parent = None
+        if full_backup is not None and INTERVALS.index(full_backup) > INTERVALS.index(run_type):
+            self._parent = self._read_parent()
+        self._incremental = self._parent is not None
+        if self._incremental:
+            self._suffix = "inc-{run_type}-{time}.tar".format(
+                run_type=self._parent.run_type,
+                time=self._parent.taken_at,
+            )
+        else:
+            self._suffix = "tar"
+
+    @property
+    def incremental(self):
+        """True if the source streams only files changed since the last full copy."""
+        return self._incremental
+
+    @property
+    def _snapshot_path(self):
+        """Snapshot of the last full copy."""
+        return osp.join(self._snapshot_dir, self._sanitize_filename() + ".snar")
+
+    @property
+    def _work_snapshot_path(self):
+        """Snapshot that tar updates during this run."""
+        return self._snapshot_path + ".new"
+
+    @property
+    def _parent_path(self):
+        """File with the key of the last full copy."""
+        return osp.join(self._snapshot_dir, self._sanitize_filename() + ".parent")
+
+    def _read_parent(self):
+        """
+        :return: The last full copy or None if there is no snapshot of it.
+        :rtype: FileCopy
+        """
+        if not osp.exists(self._snapshot_path):
+            return None
+        try:
+            with open(self._parent_path, encoding=DEFAULT_FILE_ENCODING) as parent_fd:
+                return FileCopy(path=parent_fd.read().strip())
+        except IOError:
+            LOG.warning("Key of the last full copy of %s is unknown, taking a full copy", self.path)
+            return None
+
+    def commit_snapshot(self):
+        """
+        Call when the copy is saved. A full copy becomes the parent
+        of next incremental copies.
+        """
+        if self._full_backup is None:
+            return
+        if self.incremental:
+            os.remove(self._work_snapshot_path)
+        else:
+            # The key goes first. If the snapshot isn't renamed after it,
+            # next copies include all changes since the older full copy,
+            # and they still restore correctly on top of this one.
+            with open(self._parent_path + ".new", "w", encoding=DEFAULT_FILE_ENCODING) as parent_fd:
+                parent_fd.write(self.get_name())
+            os.rename(self._parent_path + ".new", self._parent_path)
+            os.rename(self._work_snapshot_path, self._snapshot_path)
+            LOG.debug("%s is the parent of next incremental copies", self.get_name())
 
     @property
     def media_type(self):
@@ -48,6 +130,8 @@ class FileSource(BaseSource):
         :return:
         """
         cmd = ["tar", "cf", "-"]
+        if self._full_backup is not None:
+            cmd.append("--listed-incremental=%s" % self._prepare_snapshot())
         if self._tar_options:
             cmd.extend(self._tar_options.split(" "))
         cmd.append(self.path)
@@ -68,6 +152,18 @@ class FileSource(BaseSource):
             LOG.error("Failed to run %s: %s", cmd, err)
             exit(1)
 
+    def _prepare_snapshot(self):
+        """
+        Incremental copies start from the snapshot of the last full copy,
+        full copies from scratch.
+        """
+        mkdir_p(self._snapshot_dir, mode=0o700)
+        if self.incremental:
+            shutil.copyfile(self._snapshot_path, self._work_snapshot_path)
+        elif osp.exists(self._work_snapshot_path):
+            os.remove(self._work_snapshot_path)
+        return self._work_snapshot_path
+
     def get_name(self):
         """
         Generate relative destination file name
@@ -91,8 +187,42 @@ class FileSource(BaseSource):
         backups_list = dst.list_files(prefix)
 
         LOG.debug("Remote copies: %r", backups_list)
-        for backup_copy in get_files_to_delete(backups_list, keep_copies):
-            LOG.debug("Deleting remote file %s", backup_copy)
-            dst.delete(backup_copy)
+        expired = get_files_to_delete(backups_list, keep_copies)
+        if self._full_backup is not None:
+            expired = self._keep_parents(dst, expired)
+        LOG.debug("Deleting remote files %r", expired)
+        dst.delete_many(expired)
 
         self._delete_local_files(self._sanitize_filename(), config)
+
+    def _keep_parents(self, dst, expired):
+        """
+        Exclude full copies that retained incremental copies
+        of any run type are taken against.
+
+        :param dst: Destination.
+        :param expired: Copies to delete.
+        :type expired: list(str)
+        :return: Copies that can be deleted.
+        :rtype: list(str)
+        """
+        expired_keys = {FileCopy(path=path).key for path in expired}
+        parents = set()
+        for path in dst.list_files(
+            "{remote_path}/{host}/".format(remote_path=dst.remote_path, host=self._host),
+            pattern="/files/%s-" % re.escape(self._sanitize_filename()),
+            recursive=True,
+            files_only=True,
+        ):
+            copy = FileCopy(path=path)
+            if copy.incremental and copy.source == self._sanitize_filename() and copy.key not in expired_keys:
+                parents.add(copy.parent_prefix)
+
+        deletable = []
+        for path in expired:
+            key = FileCopy(path=path).key
+            if any(key.startswith(parent) for parent in parents):
+                LOG.info("Keeping %s, retained incremental copies are taken against it", key)
+            else:
+                deletable.append(path)
+        return deletable
@@ -319,9 +319,10 @@ class MySQLSource(BaseSource):  # pylint: disable=too-many-instance-attributes
 
         backups_list = dst.list_files(prefix, files_only=True)
         LOG.debug("Remote copies: %r", backups_list)
-        for backup_file in get_files_to_delete(backups_list, keep_copies):
-            LOG.debug("Deleting remote file %s", backup_file)
-            dst.delete(backup_file)
+        expired = get_files_to_delete(backups_list, keep_copies)
+        LOG.debug("Deleting remote files %r", expired)
+        dst.delete_many(expired)
+        for backup_file in expired:
             try:
                 status.remove(backup_file)
 
@@ -1,15 +1,115 @@
 """
 Module that implements SSH client.
+
+Connections are pooled. Every client of the same host, port, user and key
+runs its commands over channels of one SSH transport, so the key exchange
+and authentication happen once per process rather than once per command.
 """
 
+import atexit
+import os
 import socket
+import threading
 from contextlib import contextmanager
+from errno import ENOENT
 
 from paramiko import AuthenticationException, AutoAddPolicy, SSHClient, SSHException
 
 from twindb_backup import LOG
 from twindb_backup.ssh.exceptions import SshClientException
 
+# Seconds between keepalive packets on an idle connection
+SSH_KEEPALIVE_INTERVAL = 30
+
+
+class SshConnectionPool(object):
+    """
+    Pool of connected SSHClient instances keyed by host, port, user and key.
+
+    A connection whose transport is not active anymore is replaced
+    by a new one. A forked process doesn't reuse connections of its parent,
+    because the parent's transport thread doesn't exist in the child.
+
+    :param keepalive: Seconds between keepalive packets. 0 disables them.
+    :type keepalive: int
+    """
+
+    def __init__(self, keepalive=SSH_KEEPALIVE_INTERVAL):
+        self._keepalive = keepalive
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def get(self, host, port, user, key):
+        """
+        Get a connection to the host. Connect if there is no active one.
+
+        :return: Connected client.
+        :rtype: SSHClient
+        :raise SshClientException: if the client fails to connect.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._connections = {}
+                self._pid = os.getpid()
+
+            pool_key = (host, port, user, key)
+            shell = self._connections.get(pool_key)
+            if shell is not None:
+                transport = shell.get_transport()
+                if transport is not None and transport.is_active():
+                    return shell
+                LOG.debug("Connection to %s:%d is lost, reconnecting", host, port)
+                shell.close()
+                del self._connections[pool_key]
+
+            shell = self._connect(host, port, user, key)
+            self._connections[pool_key] = shell
+            return shell
+
+    def discard(self, shell):
+        """
+        Close a connection and remove it from the pool,
+        so the next :meth:`get` reconnects.
+
+        :param shell: Connection returned by :meth:`get`.
+        :type shell: SSHClient
+        """
+        with self._lock:
+            for pool_key, pooled in list(self._connections.items()):
+                if pooled is shell:
+                    del self._connections[pool_key]
+        shell.close()
+
+    def close(self):
+        """Close all connections."""
+        with self._lock:
+            if self._pid == os.getpid():
+                for shell in self._connections.values():
+                    shell.close()
+            self._connections = {}
+
+    def _connect(self, host, port, user, key):
+        shell = SSHClient()
+        shell.set_missing_host_key_policy(AutoAddPolicy())
+        LOG.debug("Connecting to %s:%d as %s with key %s", host, port, user, key)
+        try:
+            shell.connect(hostname=host, key_filename=key, port=port, username=user)
+        except FileNotFoundError:
+            shell.close()
+            raise
+        except (AuthenticationException, SSHException, socket.error) as err:
+            shell.close()
+            raise SshClientException(err)
+
+        if self._keepalive:
+            shell.get_transport().set_keepalive(self._keepalive)
+        return shell
+
+
+SSH_POOL = SshConnectionPool()
+atexit.register(SSH_POOL.close)
+
 
 class SshClient(object):
     """
@@ -25,14 +125,18 @@ class SshClient(object):
     :type key: str
     :param user: SSH client username. Default is 'root'.
     :type user: str
+    :param pool: Pool of connections. Default is the pool
+        shared by all clients in the process.
+    :type pool: SshConnectionPool
     """
 
-    def __init__(self, host="127.0.0.1", port=22, key="/root/.id_rsa", user="root"):
+    def __init__(self, host="127.0.0.1", port=22, key="/root/.id_rsa", user="root", pool=None):
 
         self._host = host
         self._port = port
         self._key = key
         self._user = user
+        self._pool = pool or SSH_POOL
 
     @contextmanager
     def session(self):
@@ -45,40 +149,34 @@ class SshClient(object):
         with self._shell() as client:
             transport = client.get_transport()
             session = transport.open_session()
-            yield session
+            try:
+                yield session
+            finally:
+                session.close()
 
     @contextmanager
     def _shell(self):
         """
-        Create SSHClient instance and connect to the destination host.
+        Get a pooled connection to the destination host.
+        If the connection fails while it's used, it's dropped from the pool
+        and the next call reconnects.
 
         :return: Connected to the remote destination host shell.
         :rtype: generator(SSHClient)
-        :raise SshDestinationError: if the ssh client fails to connect.
+        :raise SshClientException: if the ssh client fails to connect
+            or the connection fails while it's used.
         """
-        shell = SSHClient()
-        shell.set_missing_host_key_policy(AutoAddPolicy())
+        shell = self._pool.get(self._host, self._port, self._user, self._key)
         try:
-            LOG.debug(
-                "Connecting to %s:%d as %s with key %s",
-                self._host,
-                self._port,
-                self._user,
-                self._key,
-            )
-            shell.connect(
-                hostname=self._host,
-                key_filename=self._key,
-                port=self._port,
-                username=self._user,
-            )
             yield shell
-        except FileNotFoundError:
-            raise
-        except (AuthenticationException, SSHException, socket.error) as err:
-            raise SshClientException(err)
-        finally:
-            shell.close()
+        except (SSHException, socket.error, EOFError) as err:
+            # A missing remote file is handled by the callers
+            if isinstance(err, IOError) and err.errno == ENOENT:
+                raise
+            transport = shell.get_transport()
+            if transport is None or not transport.is_active():
+                self._pool.discard(shell)
+            raise SshClientException(err) from err
 
     @property
     def host(self):
@@ -162,7 +260,10 @@ class SshClient(object):
             with self._shell() as shell:
                 LOG.debug("Try to get remote handlers: %s", cmd)
                 stdin_, stdout_, stderr_ = shell.exec_command(cmd)
-                yield stdin_, stdout_, stderr_
+                try:
+                    yield stdin_, stdout_, stderr_
+                finally:
+                    stdout_.channel.close()
 
         except SSHException as err:
             LOG.error("Failed to execute %s", cmd)
@@ -207,9 +308,22 @@ class SshClient(object):
         """
         LOG.debug("Reading remote file %s", path)
         with self._shell() as ssh_client:
-            sftp_client = ssh_client.open_sftp()
-            with sftp_client.open(path) as remote_file:
-                return remote_file.read().decode("utf-8")
+            with ssh_client.open_sftp() as sftp_client:
+                with sftp_client.open(path) as remote_file:
+                    return remote_file.read().decode("utf-8")
+
+    def get_file_stat(self, path):
+        """
+        Get attributes of a remote file
+
+        :param path: File path
+        :type path: str
+        :return: File attributes - st_size, st_mtime, etc.
+        :rtype: paramiko.SFTPAttributes
+        """
+        with self._shell() as ssh_client:
+            with ssh_client.open_sftp() as sftp_client:
+                return sftp_client.stat(path)
 
     def write_content(self, path, content):
         """
@@ -219,9 +333,9 @@ class SshClient(object):
         :param content: Content
         """
         with self._shell() as ssh_client:
-            sftp_client = ssh_client.open_sftp()
-            with sftp_client.open(path, "w") as remote_file:
-                remote_file.write(content)
+            with ssh_client.open_sftp() as sftp_client:
+                with sftp_client.open(path, "w") as remote_file:
+                    remote_file.write(content)
 
     def write_config(self, path, cfg):
         """
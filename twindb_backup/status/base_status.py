@@ -1,4 +1,20 @@
 """Base status is a class for a general purpose status.
+
+Since version 2 the status file is a plain JSON document::
+
+    {
+        "version": 2,
+        "md5": "<md5 of the canonical JSON of status>",
+        "status": {...}
+    }
+
+where ``status`` is an index of copies keyed by the copy key.
+Versions 1 and older stored the status as a base64 encoded JSON string.
+
+All versions are readable. A status is saved in ``STATUS_WRITE_VERSION``,
+which stays 1 for one release. Once a status is saved in version 2,
+releases before 3.3.0 fail to read it, so switching to version 2
+is a one-way migration.
 """
 
 import hashlib
@@ -8,7 +24,7 @@ from abc import abstractmethod, abstractproperty
 from base64 import b64decode
 from os import path as osp
 
-from twindb_backup import LOG, STATUS_FORMAT_VERSION
+from twindb_backup import LOG, STATUS_FORMAT_VERSION, STATUS_WRITE_VERSION
 from twindb_backup.destination.exceptions import FileNotFound
 from twindb_backup.status.exceptions import CorruptedStatus, StatusKeyNotFound
 
@@ -27,15 +43,24 @@ class BaseStatus(object):
         file is stored. Usually,
         it's a hostname where backup was taken from.
     :type status_directory: str
+    :param cache: If given the status is read and saved through the cache.
+    :type cache: StatusCache
     :raise CorruptedStatus: If the content string is not a valid status
         or empty string.
     """
 
-    __version__ = STATUS_FORMAT_VERSION
+    __version__ = STATUS_WRITE_VERSION
 
-    def __init__(self, content=None, dst=None, status_directory=None):
+    def __init__(self, content=None, dst=None, status_directory=None, cache=None):
         self._status_directory = status_directory or socket.gethostname()
         self._status = []
+        self._index = {}
+        self._cache = cache
+        # Where the status was read from and the file version at the time
+        self._origin = None
+        self._origin_version = None
+        # Copies added and removed since the status was read
+        self._journal = []
         if dst:
             self.__init_from_str(self._read(dst))
         else:
@@ -66,10 +91,10 @@ class BaseStatus(object):
     def md5(self):
         """
         :return: MD5 checksum of the status. It is calculated as
-            a md5 of output of ``self._status_serialize()``.
+            a md5 of the canonical JSON of ``self._catalog()``.
         :rtype: str
         """
-        return hashlib.md5(self._status_serialize().encode("utf-8")).hexdigest()
+        return self._checksum(self._catalog())
 
     @property
     def status_path(self):
@@ -85,8 +110,9 @@ class BaseStatus(object):
     def version(self):
         """
         Version of status file. Originally status file didn't have
-        any versions, but in future the version will be used to work
-        with new features.
+        any versions. A status is saved in this version
+        regardless of the version it was read from.
+        It may be older than the latest version the status can read.
         """
         return self.__version__
 
@@ -98,6 +124,8 @@ class BaseStatus(object):
         :type backup_copy: BaseCopy
         """
         self._status.append(backup_copy)
+        self._index_copy(backup_copy)
+        self._journal.append(("add", backup_copy))
 
     def remove(self, key):
         """
@@ -109,23 +137,35 @@ class BaseStatus(object):
         copy = None
         try:
             copy = self[key]
-            self._status.remove(copy)
         except StatusKeyNotFound:
             for copy in self._status:
                 if key.endswith(copy.key):
-                    self._status.remove(copy)
-                    return
-            raise
+                    break
+            else:
+                raise
+        self._status.remove(copy)
+        self._unindex_copy(copy)
+        self._journal.append(("remove", copy.key))
 
-    def serialize(self):
+    def serialize(self, version=None):
         """
         Return a string that represents current state
+
+        :param version: Status format version. ``self.version`` by default.
+        :type version: int
         """
+        version = version or self.version
+        if version >= 2:
+            content = self._catalog()
+            md5 = self._checksum(content)
+        else:
+            content = self._status_serialize()
+            md5 = hashlib.md5(content.encode("utf-8")).hexdigest()
         return json.dumps(
             {
-                "status": self._status_serialize(),
-                "version": self.version,
-                "md5": self.md5,
+                "status": content,
+                "version": version,
+                "md5": md5,
             },
             sort_keys=True,
         )
@@ -134,10 +174,66 @@ class BaseStatus(object):
         """
         Write status file to the destination.
 
+        If the status has a cache the status file is locked. If another run
+        changed the file since it was read, copies added and removed
+        by this instance are applied to the current content, so neither
+        update is lost.
+
         :param dst: Destination instance.
         :type dst: BasicDestination
         """
-        dst.write(self.serialize(), self.status_path)
+        if self._cache is None:
+            dst.write(self.serialize(), self.status_path)
+            return
+
+        with self._cache.lock(dst, self.status_path):
+            if self._origin == self._cache.key(dst, self.status_path):
+                try:
+                    content, version = self._cache.read(dst, self.status_path)
+                except (FileNotFound, FileNotFoundError):
+                    content, version = None, None
+                if version is None or version != self._origin_version:
+                    LOG.debug("Status %s changed since it was read, merging", self.status_path)
+                    self._merge(content)
+
+            self._origin_version = self._cache.write(dst, self.status_path, self.serialize())
+            self._origin = self._cache.key(dst, self.status_path)
+            self._journal = []
+
+    def _catalog(self):
+        """
+        Index of copies as it's stored in the status file.
+
+        :return: JSON serializable dictionary.
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def _load_catalog(self, catalog):
+        """
+        Construct a status from an index of copies.
+
+        :param catalog: Index of copies as ``_catalog()`` returns it.
+        :type catalog: dict
+        :return: status object - list of BackupCopies
+        :rtype: list
+        """
+        raise NotImplementedError
+
+    def _reindex(self):
+        """Build lookup indexes from scratch."""
+        self._index = {copy.key: copy for copy in self._status}
+
+    def _index_copy(self, copy):
+        self._index[copy.key] = copy
+
+    def _unindex_copy(self, copy):
+        if self._index.get(copy.key) is copy:
+            del self._index[copy.key]
+
+    @staticmethod
+    def _checksum(catalog):
+        return hashlib.md5(json.dumps(catalog, sort_keys=True).encode("utf-8")).hexdigest()
 
     @abstractmethod
     def _load(self, status_as_json):
@@ -161,21 +257,45 @@ class BaseStatus(object):
         :rtype: str
         """
         try:
-            return dst.read(self.status_path)
+            if self._cache is None:
+                return dst.read(self.status_path)
+            self._origin = self._cache.key(dst, self.status_path)
+            content, self._origin_version = self._cache.read(dst, self.status_path)
+            return content
         except (FileNotFound, FileNotFoundError):
             return None
 
+    def _merge(self, content):
+        """
+        Reload the status from content and replay copies
+        added and removed since the status was read.
+
+        :param content: Current content of the status file.
+        :type content: str
+        """
+        journal = self._journal
+        self.__init_from_str(content)
+        for action, item in journal:
+            if action == "add" and item.key not in self._index:
+                self._status.append(item)
+                self._index_copy(item)
+            elif action == "remove" and item in self._index:
+                copy = self._index[item]
+                self._status.remove(copy)
+                self._unindex_copy(copy)
+
     def _status_serialize(self):
+        """Status in the version 1 format. It's what ``str()`` prints."""
         raise NotImplementedError
 
     def __getitem__(self, item):
         if isinstance(item, int):
             return self._status[item]
         elif isinstance(item, (str,)):
-            for copy in self._status:
-                if copy.key == str(item):
-                    return copy
-            raise StatusKeyNotFound("Copy %s not found" % item)
+            try:
+                return self._index[item]
+            except KeyError:
+                raise StatusKeyNotFound("Copy %s not found" % item)
         else:
             raise NotImplementedError("Type %s not supported" % type(item))
 
@@ -192,11 +312,21 @@ class BaseStatus(object):
         try:
             status = json.loads(content)
             md5_stored = status["md5"]
-            md5_calculated = hashlib.md5(status["status"].encode("utf-8")).hexdigest()
+            version = status.get("version", 1)
+            if version > STATUS_FORMAT_VERSION:
+                raise CorruptedStatus("Unsupported status format version %s" % version)
+
+            if version >= 2:
+                md5_calculated = self._checksum(status["status"])
+            else:
+                md5_calculated = hashlib.md5(status["status"].encode("utf-8")).hexdigest()
             if md5_calculated != md5_stored:
                 raise CorruptedStatus("Checksum mismatch")
 
-            self._status = self._load(b64decode(status["status"]).decode("utf-8"))
+            if version >= 2:
+                self._status = self._load_catalog(status["status"])
+            else:
+                self._status = self._load(b64decode(status["status"]).decode("utf-8"))
             self._status.sort(key=lambda cp: cp.created_at)
         except TypeError:  # Init from None
             self._status = []
@@ -206,3 +336,4 @@ class BaseStatus(object):
             self._status = self._load(b64decode(content).decode("utf-8"))
             LOG.debug("Loaded status: %s", self._status)
             self._status.sort(key=lambda cp: cp.sort_key)
+        self._reindex()
@@ -6,13 +6,14 @@ from base64 import b64encode
 
 from twindb_backup.copy.binlog_copy import BinlogCopy
 from twindb_backup.status.base_status import BaseStatus
+from twindb_backup.status.exceptions import CorruptedStatus
 
 
 class BinlogStatus(BaseStatus):
     """Binlog class for status"""
 
-    def __init__(self, content=None, dst=None, status_directory=None):
-        super(BinlogStatus, self).__init__(content=content, dst=dst, status_directory=status_directory)
+    def __init__(self, content=None, dst=None, status_directory=None, cache=None):
+        super(BinlogStatus, self).__init__(content=content, dst=dst, status_directory=status_directory, cache=cache)
 
     @property
     def basename(self):
@@ -21,17 +22,28 @@ class BinlogStatus(BaseStatus):
     def _status_serialize(self):
         return b64encode(json.dumps(self._as_dict()).encode("utf-8")).decode("utf-8")
 
+    def _catalog(self):
+        return {"copies": self._as_dict()}
+
+    def _load_catalog(self, catalog):
+        try:
+            return self.__load_copies(catalog["copies"])
+        except (KeyError, AttributeError) as err:
+            raise CorruptedStatus("Invalid status catalog: %s" % err)
+
     def _load(self, status_as_json):
+        return self.__load_copies(json.loads(status_as_json))
 
+    def __load_copies(self, copies):
         self._status = []
-        for key, value in sorted(json.loads(status_as_json).items()):
+        for key, value in sorted(copies.items()):
             host = key.split("/")[0]
             name = key.split("/")[2]
             try:
                 created_at = value["created_at"]
             except KeyError:
                 created_at = value["time_created"]
-            copy = BinlogCopy(host=host, name=name, created_at=created_at)
+            copy = BinlogCopy(host=host, name=name, created_at=created_at, suffix=value.get("suffix"))
             self._status.append(copy)
 
         return self._status
@@ -40,6 +52,8 @@ class BinlogStatus(BaseStatus):
         status = {}
         for copy in self:
             status[copy.key] = {"time_created": copy.created_at}
+            if copy.suffix is not None:
+                status[copy.key]["suffix"] = copy.suffix
         return status
 
     def __eq__(self, other):
@@ -0,0 +1,159 @@
+"""Status cache keeps a local copy of status files.
+
+Reading a status file costs a round-trip to the destination and
+a backup, a restore or a verification reads it several times.
+The cache stores the content together with its version (an ETag,
+a generation number or a size and modification time) and revalidates
+the copy with a conditional request, so the content is downloaded
+only if it changed.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from os import path as osp
+
+from twindb_backup import LOG
+from twindb_backup.destination.exceptions import FileNotFound
+from twindb_backup.status.exceptions import StatusError
+
+STATUS_CACHE_PATH = "/var/lib/twindb-backup/status-cache"
+
+
+class StatusCache(object):
+    """
+    Local write-through cache of status files keyed by destination and status path.
+
+    :param path: Local directory where cached status files are stored.
+    :type path: str
+    """
+
+    def __init__(self, path=STATUS_CACHE_PATH):
+        self._path = path
+
+    @property
+    def path(self):
+        """Local directory with cached status files."""
+        return self._path
+
+    @staticmethod
+    def key(dst, status_path):
+        """
+        Identify a status file across destinations.
+
+        :param dst: Destination instance.
+        :type dst: BaseDestination
+        :param status_path: Relative path to the status file.
+        :type status_path: str
+        :return: Cache key.
+        :rtype: str
+        """
+        return "%s:%s/%s" % (dst.__class__.__name__, dst.remote_path, status_path)
+
+    @contextmanager
+    def lock(self, dst, status_path):
+        """
+        Exclusive lock on a status file. Runs that update the same status
+        on this host hold it between reading and writing the status,
+        so an update isn't lost.
+
+        :param dst: Destination instance.
+        :type dst: BaseDestination
+        :param status_path: Relative path to the status file.
+        :type status_path: str
+        """
+        with open(self._entry_path(dst, status_path) + ".lock", "a") as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def read(self, dst, status_path):
+        """
+        Read a status file. The cached content is returned
+        if the destination confirms it's not modified.
+
+        :param dst: Destination instance.
+        :type dst: BaseDestination
+        :param status_path: Relative path to the status file.
+        :type status_path: str
+        :return: tuple (content, version).
+        :rtype: tuple
+        :raises FileNotFound: If the status file doesn't exist.
+        """
+        entry = self._load(dst, status_path)
+        try:
+            content, version = dst.read_if_modified(status_path, entry["version"] if entry else None)
+        except (FileNotFound, FileNotFoundError):
+            self._drop(dst, status_path)
+            raise
+
+        if content is None:
+            LOG.debug("Status %s is not modified, using cached copy", status_path)
+            return entry["content"], version
+
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+        self._store(dst, status_path, content, version)
+        return content, version
+
+    def write(self, dst, status_path, content):
+        """
+        Write a status file to the destination and to the cache.
+
+        :param dst: Destination instance.
+        :type dst: BaseDestination
+        :param status_path: Relative path to the status file.
+        :type status_path: str
+        :param content: Status content.
+        :type content: str
+        :return: Version of the written file.
+        :rtype: str
+        """
+        dst.write(content, status_path)
+        version = dst.version(status_path)
+        self._store(dst, status_path, content, version)
+        return version
+
+    def _entry_path(self, dst, status_path):
+        try:
+            os.makedirs(self._path, exist_ok=True)
+        except OSError as err:
+            raise StatusError("Failed to create status cache directory %s: %s" % (self._path, err))
+        return osp.join(self._path, hashlib.sha256(self.key(dst, status_path).encode("utf-8")).hexdigest())
+
+    def _load(self, dst, status_path):
+        try:
+            with open(self._entry_path(dst, status_path) + ".json") as entry_fd:
+                entry = json.load(entry_fd)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if entry.get("key") != self.key(dst, status_path) or entry.get("version") is None:
+            return None
+        return entry
+
+    def _store(self, dst, status_path, content, version):
+        if version is None:
+            # Without a version the copy can't be revalidated
+            self._drop(dst, status_path)
+            return
+
+        entry_path = self._entry_path(dst, status_path) + ".json"
+        try:
+            tmp_fd, tmp_path = tempfile.mkstemp(dir=self._path, suffix=".tmp")
+            with os.fdopen(tmp_fd, "w") as entry_fd:
+                json.dump({"key": self.key(dst, status_path), "version": version, "content": content}, entry_fd)
+            os.rename(tmp_path, entry_path)
+        except (IOError, OSError) as err:
+            LOG.warning("Failed to cache status %s: %s", status_path, err)
+
+    def _drop(self, dst, status_path):
+        try:
+            os.unlink(self._entry_path(dst, status_path) + ".json")
+        except FileNotFoundError:
+            pass
@@ -2,6 +2,7 @@
 
 from __future__ import print_function
 
+import hashlib
 import json
 from base64 import b64decode, b64encode
 
@@ -16,10 +17,14 @@ from twindb_backup.status.periodic_status import PeriodicStatus
 class MySQLStatus(PeriodicStatus):
     """
     Class that stores status file and implements operations on it.
+
+    In the status file copies are indexed by run type and copy key.
+    Content of my.cnf files is stored once in ``configs``
+    keyed by its SHA256 hash, copies refer to it by the hash.
     """
 
-    def __init__(self, content=None, dst=None, status_directory=None):
-        super(MySQLStatus, self).__init__(content=content, dst=dst, status_directory=status_directory)
+    def __init__(self, content=None, dst=None, status_directory=None, cache=None):
+        super(MySQLStatus, self).__init__(content=content, dst=dst, status_directory=status_directory, cache=cache)
 
     @property
     def basename(self):
@@ -77,12 +82,42 @@ class MySQLStatus(PeriodicStatus):
             return "incremental"
 
     def _load(self, status_as_json):
-        status = []
         try:
             status_as_obj = json.loads(status_as_json)
         except ValueError:
             raise CorruptedStatus("Could not load status from a bad JSON string %s" % (status_as_json,))
 
+        return self.__load_copies(status_as_obj, self.__serialize_config)
+
+    def _load_catalog(self, catalog):
+        try:
+            configs = catalog["configs"]
+            return self.__load_copies(
+                catalog["copies"],
+                lambda value: {path: configs[digest] for path, digest in value.get("config", {}).items()},
+            )
+        except (KeyError, AttributeError) as err:
+            raise CorruptedStatus("Invalid status catalog: %s" % err)
+
+    def _catalog(self):
+        configs = {}
+        copies = {}
+        for interval in INTERVALS:
+            copies[interval] = {}
+            for key, copy in getattr(self, interval).items():
+                value = copy.as_dict()
+                value["config"] = {}
+                for path, content in copy.config.items():
+                    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                    configs[digest] = content
+                    value["config"][path] = digest
+                copies[interval][key] = value
+
+        return {"configs": configs, "copies": copies}
+
+    @staticmethod
+    def __load_copies(status_as_obj, load_config):
+        status = []
         for run_type in INTERVALS:
             for key, value in status_as_obj[run_type].items():
 
@@ -91,7 +126,7 @@ class MySQLStatus(PeriodicStatus):
                     file_name = key.split("/")[3]
                     kwargs = {
                         "type": value["type"],
-                        "config": self.__serialize_config(value),
+                        "config": load_config(value),
                     }
                     keys = [
                         "backup_started",
@@ -7,10 +7,15 @@ from twindb_backup.status.base_status import BaseStatus
 
 
 class PeriodicStatus(BaseStatus):
-    """Periodic class for status."""
+    """Periodic class for status.
 
-    def __init__(self, content=None, dst=None, status_directory=None):
-        super(PeriodicStatus, self).__init__(content=content, dst=dst, status_directory=status_directory)
+    Copies are indexed by run type, so ``hourly``, ``daily``, etc
+    return a dictionary the status maintains. Don't modify it,
+    use :meth:`add` and :meth:`remove` instead.
+    """
+
+    def __init__(self, content=None, dst=None, status_directory=None, cache=None):
+        super(PeriodicStatus, self).__init__(content=content, dst=dst, status_directory=status_directory, cache=cache)
 
     @property
     def basename(self):
@@ -44,6 +49,22 @@ class PeriodicStatus(BaseStatus):
     def _load(self, status_as_json):
         raise NotImplementedError
 
+    def _reindex(self):
+        super(PeriodicStatus, self)._reindex()
+        self._run_types = {run_type: {} for run_type in INTERVALS}
+        for copy in self._status:
+            self._run_types.setdefault(copy.run_type, {})[copy.key] = copy
+
+    def _index_copy(self, copy):
+        super(PeriodicStatus, self)._index_copy(copy)
+        self._run_types.setdefault(copy.run_type, {})[copy.key] = copy
+
+    def _unindex_copy(self, copy):
+        super(PeriodicStatus, self)._unindex_copy(copy)
+        copies = self._run_types.get(copy.run_type, {})
+        if copies.get(copy.key) is copy:
+            del copies[copy.key]
+
     def _status_serialize(self):
         raise NotImplementedError
 
@@ -55,8 +76,4 @@ class PeriodicStatus(BaseStatus):
         return all(comparison)
 
     def __run_type(self, run_type):
-        result = {}
-        for copy in self._status:
-            if copy.run_type == run_type:
-                result[copy.key] = copy
-        return result
+        return self._run_types.get(run_type, {})
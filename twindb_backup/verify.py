@@ -34,7 +34,7 @@ def edit_backup_my_cnf(dst_path):
         backup_cfg.write(backup_fp)
 
 
-def verify_mysql_backup(twindb_config, dst_path, backup_file, hostname=None):
+def verify_mysql_backup(twindb_config, dst_path, backup_file, hostname=None, cache=None):
     """
     Restore mysql backup and measure time
 
@@ -43,10 +43,12 @@ def verify_mysql_backup(twindb_config, dst_path, backup_file, hostname=None):
     :param dst_path:
     :param twindb_config: tool configuration
     :type twindb_config: TwinDBBackupConfig
+    :param cache: Local cache of full copies.
+    :type cache: Cache
 
     """
     dst = twindb_config.destination(backup_source=hostname)
-    status = MySQLStatus(dst=dst)
+    status = MySQLStatus(dst=dst, cache=dst.status_cache)
     copy = None
 
     if backup_file == "latest":
@@ -68,7 +70,7 @@ def verify_mysql_backup(twindb_config, dst_path, backup_file, hostname=None):
     try:
 
         LOG.debug("Verifying backup copy in %s", tmp_dir)
-        restore_from_mysql(twindb_config, copy, dst_path, tmp_dir)
+        restore_from_mysql(twindb_config, copy, dst_path, tmp_dir, cache=cache)
         edit_backup_my_cnf(dst_path)
 
     except (TwinDBBackupError, OSError, IOError) as err: